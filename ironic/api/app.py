@@ -59,6 +59,7 @@ def get_pecan_config():
 def setup_app(pecan_config=None, extra_hooks=None):
     app_hooks = [hooks.ConfigHook(),
                  hooks.DBHook(),
+                 hooks.QueryStatsHook(),
                  hooks.ContextHook(pecan_config.app.acl_public_routes),
                  hooks.RPCHook(),
                  hooks.NoExceptionTracebackHook(),
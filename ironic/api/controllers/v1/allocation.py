@@ -70,7 +70,8 @@ def hide_fields_in_newer_versions(allocation):
         allocation.pop('owner', None)
 
 
-def convert_with_links(rpc_allocation, fields=None, sanitize=True):
+def convert_with_links(rpc_allocation, fields=None, sanitize=True,
+                       node_uuids=None):
 
     allocation = api_utils.object_to_dict(
         rpc_allocation,
@@ -87,7 +88,8 @@ def convert_with_links(rpc_allocation, fields=None, sanitize=True):
         )
     )
     try:
-        api_utils.populate_node_uuid(rpc_allocation, allocation)
+        api_utils.populate_node_uuid(rpc_allocation, allocation,
+                                     node_uuids=node_uuids)
     except exception.NodeNotFound:
         allocation['node_uuid'] = None
 
@@ -106,9 +108,11 @@ def allocation_sanitize(allocation, fields):
 
 def list_convert_with_links(rpc_allocations, limit, url, fields=None,
                             **kwargs):
+    node_uuids = api_utils.get_node_uuids(rpc_allocations)
     return collection.list_convert_with_links(
         items=[convert_with_links(p, fields=fields,
-               sanitize=False) for p in rpc_allocations],
+                                  sanitize=False, node_uuids=node_uuids)
+               for p in rpc_allocations],
         item_name='allocations',
         limit=limit,
         url=url,
@@ -178,10 +182,6 @@ class AllocationsController(pecan.rest.RestController):
             # is a subresource query.
             node_ident = parent_node
 
-        marker_obj = None
-        if marker:
-            marker_obj = objects.Allocation.get_by_uuid(api.request.context,
-                                                        marker)
         if node_ident:
             try:
                 # Check ability to access the associated node or requested
@@ -213,12 +213,19 @@ class AllocationsController(pecan.rest.RestController):
         for key, value in possible_filters.items():
             if value is not None:
                 filters[key] = value
+
+        # NOTE: the node allocation controller returns the first item.
+        if not parent_node and api_utils.check_collection_not_modified(
+                lambda: api.request.dbapi.get_allocation_watermark()):
+            return None
+
         allocations = objects.Allocation.list(api.request.context,
                                               limit=limit,
-                                              marker=marker_obj,
+                                              marker=marker,
                                               sort_key=sort_key,
                                               sort_dir=sort_dir,
                                               filters=filters)
+        api_utils.check_marker(objects.Allocation, marker, allocations)
         for allocation in allocations:
             api_utils.check_owner_policy('allocation',
                                          'baremetal:allocation:get',
@@ -308,7 +315,10 @@ class AllocationsController(pecan.rest.RestController):
             'baremetal:allocation:get', allocation_ident)
         self._check_allowed_allocation_fields(fields)
 
-        return convert_with_links(rpc_allocation, fields=fields)
+        allocation = convert_with_links(rpc_allocation, fields=fields)
+        if api_utils.check_not_modified(allocation):
+            return None
+        return allocation
 
     def _authorize_create_allocation(self, allocation):
 
@@ -13,9 +13,17 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import json
+import tempfile
+
 from ironic import api
 from ironic.api.controllers import link
 
+# NOTE: size of the response body kept in memory before it is written to
+# a temporary file, and of the blocks it is read back in.
+_SPOOL_SIZE = 1024 * 1024
+_BLOCK_SIZE = 64 * 1024
+
 
 def has_next(collection, limit):
     """Return whether collection has more items."""
@@ -72,11 +80,107 @@ def list_convert_with_links(items, item_name, limit, url, fields=None,
     return items_dict
 
 
+def write_list_with_links(chunks, item_name, limit, url, fields=None,
+                          sanitize_func=None, key_field='uuid',
+                          sanitizer_args=None, **kwargs):
+    """Write a collection to the response body, one chunk at a time.
+
+    The response body is the JSON encoding of the result of
+    ``list_convert_with_links`` for all items of the chunks, but only one
+    chunk of items is kept in memory. The body is buffered in a temporary
+    file, which is streamed once the request has been processed.
+
+    :param chunks:
+        Iterable of lists of unsanitized items to include in the collection
+    :param item_name:
+        Name of dict key for items value
+    :param limit:
+        Paging limit
+    :param url:
+        Base URL for building next link
+    :param fields:
+        Optional fields to use for sanitize function
+    :param sanitize_func:
+        Optional sanitize function run on each item
+    :param key_field:
+        Key name for building next URL
+    :param sanitizer_args:
+        Dictionary with additional arguments to be passed to the sanitizer.
+    :param kwargs:
+        other arguments passed to ``get_next``
+    :returns:
+        The response, to be returned by the controller.
+    """
+    assert url, "BUG: collections require a base URL"
+    assert limit is None or isinstance(limit, int), \
+        f"BUG: limit must be None or int, got {type(limit)}"
+
+    body = tempfile.SpooledTemporaryFile(max_size=_SPOOL_SIZE)
+    try:
+        body.write(('{%s: [' % json.dumps(item_name)).encode())
+        count = 0
+        marker = None
+        for items in chunks:
+            if not items:
+                continue
+            # NOTE: the marker is taken before sanitizing, like in
+            # list_convert_with_links.
+            marker = _get_marker(items[-1], key_field)
+            for item in items:
+                if sanitize_func:
+                    if sanitizer_args:
+                        sanitize_func(item, fields, **sanitizer_args)
+                    else:
+                        sanitize_func(item, fields=fields)
+                if count:
+                    body.write(b', ')
+                body.write(json.dumps(item).encode())
+                count += 1
+        body.write(b']')
+        if count and count == limit:
+            next_link = _get_next_link(marker, limit, url, fields=fields,
+                                       **kwargs)
+            body.write((', "next": %s' % json.dumps(next_link)).encode())
+        body.write(b'}')
+        size = body.tell()
+        body.seek(0)
+    except Exception:
+        body.close()
+        raise
+
+    api.response.content_type = 'application/json'
+    api.response.app_iter = _read_blocks(body)
+    api.response.content_length = size
+    return api.response
+
+
+def _read_blocks(body):
+    with body:
+        while True:
+            block = body.read(_BLOCK_SIZE)
+            if not block:
+                return
+            yield block
+
+
 def get_next(collection, limit, url, key_field='uuid', **kwargs):
     """Return a link to the next subset of the collection."""
     if not has_next(collection, limit):
         return None
 
+    marker = _get_marker(collection[-1], key_field)
+    return _get_next_link(marker, limit, url, **kwargs)
+
+
+def _get_marker(item, key_field):
+    # handle items which are either objects or dicts
+    if hasattr(item, key_field):
+        return getattr(item, key_field)
+    else:
+        return item.get(key_field)
+
+
+def _get_next_link(marker, limit, url, **kwargs):
     fields = kwargs.pop('fields', None)
     # NOTE(saga): If fields argument is present in kwargs and not None. It
     # is a list so convert it into a comma separated string.
@@ -84,13 +188,6 @@ def get_next(collection, limit, url, key_field='uuid', **kwargs):
         kwargs['fields'] = ','.join(fields)
     q_args = ''.join(['%s=%s&' % (key, kwargs[key]) for key in kwargs])
 
-    last_item = collection[-1]
-    # handle items which are either objects or dicts
-    if hasattr(last_item, key_field):
-        marker = getattr(last_item, key_field)
-    else:
-        marker = last_item.get(key_field)
-
     next_args = '?%(args)slimit=%(limit)d&marker=%(marker)s' % {
         'args': q_args, 'limit': limit,
         'marker': marker}
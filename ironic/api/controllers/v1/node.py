@@ -15,6 +15,7 @@
 
 import copy
 import datetime
+import functools
 from http import client as http_client
 import json
 import urllib.parse
@@ -1637,8 +1638,43 @@ def _get_fields_for_node_query(fields=None):
         return object_fields
 
 
-def node_convert_with_links(rpc_node, fields=None, sanitize=True):
+def _get_related_for_nodes(nodes, fields=None):
+    """Resolve the resources related to a list of nodes in bulk.
 
+    :param nodes: a list of Node objects.
+    :param fields: the requested fields, or None for all fields.
+    :returns: a dict for node_convert_with_links. Its ``conductor`` item
+        maps node UUIDs to conductor hostnames, its ``allocation_uuid``
+        item maps allocation IDs to UUIDs and its ``chassis_uuid`` item
+        maps chassis IDs to UUIDs. Items are only present if the
+        corresponding field is requested.
+    """
+    related = {}
+    if (api_utils.allow_expose_conductors()
+            and (fields is None or 'conductor' in fields)):
+        related['conductor'] = api.request.rpcapi.get_conductors_for(nodes)
+    if (api_utils.allow_allocations()
+            and (fields is None or 'allocation_uuid' in fields)):
+        related['allocation_uuid'] = (
+            api.request.dbapi.get_allocation_uuids_by_ids(
+                n.allocation_id for n in nodes if n.allocation_id))
+    if fields is None or 'chassis_uuid' in fields:
+        related['chassis_uuid'] = api.request.dbapi.get_chassis_uuids_by_ids(
+            n.chassis_id for n in nodes if n.chassis_id)
+    return related
+
+
+def node_convert_with_links(rpc_node, fields=None, sanitize=True,
+                            related=None):
+    """Convert a node object to a dict for the API.
+
+    :param rpc_node: a Node object.
+    :param fields: the requested fields, or None for all fields.
+    :param sanitize: whether to sanitize the result.
+    :param related: the resources related to the node, as returned by
+        _get_related_for_nodes. If not provided, they are loaded for this
+        node only.
+    """
     # NOTE(TheJulia): This takes approximately 10% of the time to
     # collect and return requests to API consumer, specifically
     # for the nova sync query which is the most intense overhead
@@ -1655,20 +1691,25 @@ def node_convert_with_links(rpc_node, fields=None, sanitize=True):
             and (fields is None or 'conductor' in fields)):
         # NOTE(kaifeng) It is possible a node gets orphaned in certain
         # circumstances, set conductor to None in such case.
-        try:
-            host = api.request.rpcapi.get_conductor_for(rpc_node)
-            node['conductor'] = host
-        except (exception.NoValidHost, exception.TemporaryFailure):
+        if related is not None:
+            node['conductor'] = related['conductor'].get(rpc_node.uuid)
+        else:
+            try:
+                node['conductor'] = api.request.rpcapi.get_conductor_for(
+                    rpc_node)
+            except (exception.NoValidHost, exception.TemporaryFailure):
+                node['conductor'] = None
+        if node['conductor'] is None:
             LOG.debug('Currently there is no conductor servicing node '
                       '%(node)s.', {'node': rpc_node.uuid})
-            node['conductor'] = None
 
-    # If allocations ever become the primary use path, this absolutely
-    # needs to become a join. :\
     if (api_utils.allow_allocations()
             and (fields is None or 'allocation_uuid' in fields)):
         node['allocation_uuid'] = None
-        if rpc_node.allocation_id:
+        if related is not None:
+            node['allocation_uuid'] = related['allocation_uuid'].get(
+                rpc_node.allocation_id)
+        elif rpc_node.allocation_id:
             try:
                 allocation = objects.Allocation.get_by_id(
                     api.request.context,
@@ -1677,7 +1718,11 @@ def node_convert_with_links(rpc_node, fields=None, sanitize=True):
             except exception.AllocationNotFound:
                 pass
     if fields is None or 'chassis_uuid' in fields:
-        node['chassis_uuid'] = _get_chassis_uuid(rpc_node)
+        if related is not None:
+            node['chassis_uuid'] = related['chassis_uuid'].get(
+                rpc_node.chassis_id)
+        else:
+            node['chassis_uuid'] = _get_chassis_uuid(rpc_node)
 
     if fields is not None:
         api_utils.check_for_invalid_fields(
@@ -1761,6 +1806,9 @@ def node_sanitize(node, fields, cdict=None,
 
     if not cdict:
         cdict = api.request.context.to_policy_values()
+    # NOTE: the decisions only depend on the owner and the lessee of the
+    # node, remember them for the other nodes of the request.
+    decisions = api_utils.get_policy_decisions()
 
     # We need a new target_dict for each node as owner/lessee field have
     # explicit associations and target comparison.
@@ -1786,11 +1834,11 @@ def node_sanitize(node, fields, cdict=None,
     # False in a noauth or password auth based situation, because the
     # effective caller doesn't match the policy check rule.
     if show_driver_secrets is None:
-        show_driver_secrets = policy.check("show_password",
-                                           cdict, target_dict)
+        show_driver_secrets = decisions.check("show_password",
+                                              cdict, target_dict)
     if show_instance_secrets is None:
-        show_instance_secrets = policy.check("show_instance_secrets",
-                                             cdict, target_dict)
+        show_instance_secrets = decisions.check("show_instance_secrets",
+                                                cdict, target_dict)
 
     # TODO(TheJulia): The above checks need to be migrated in some direction,
     # but until we have auditing clarity, it might not be a big deal.
@@ -1801,7 +1849,7 @@ def node_sanitize(node, fields, cdict=None,
     # a minimum as they are likely the regular API users as well.
     # Also, the default for the filter_threshold is system-member.
     if evaluate_additional_policies is None:
-        evaluate_additional_policies = not policy.check_policy(
+        evaluate_additional_policies = not decisions.check_policy(
             "baremetal:node:get:filter_threshold",
             target_dict, cdict)
 
@@ -1810,12 +1858,13 @@ def node_sanitize(node, fields, cdict=None,
     if evaluate_additional_policies:
         # Perform extended sanitization of nodes based upon policy
         # baremetal:node:get:filter_threshold
-        _node_sanitize_extended(node, node_keys, target_dict, cdict)
+        _node_sanitize_extended(node, node_keys, target_dict, cdict,
+                                decisions)
 
     if 'driver_info' in node_keys:
         if (evaluate_additional_policies
-            and not policy.check("baremetal:node:get:driver_info",
-                                 target_dict, cdict)):
+            and not decisions.check("baremetal:node:get:driver_info",
+                                    target_dict, cdict)):
             # Guard infrastructure intenral details from being visible.
             node['driver_info'] = {
                 'content': '** Redacted - requires baremetal:node:get:'
@@ -1865,27 +1914,27 @@ def node_sanitize(node, fields, cdict=None,
         node.pop('states', None)
 
 
-def _node_sanitize_extended(node, node_keys, target_dict, cdict):
+def _node_sanitize_extended(node, node_keys, target_dict, cdict, decisions):
     # NOTE(TheJulia): The net effect of this is that by default,
     # at least matching common/policy.py defaults. is these should
     # be stripped out.
     if ('last_error' in node_keys
-        and not policy.check("baremetal:node:get:last_error",
-                             target_dict, cdict)):
+        and not decisions.check("baremetal:node:get:last_error",
+                                target_dict, cdict)):
         # Guard the last error from being visible as it can contain
         # hostnames revealing infrastructure internal details.
         node['last_error'] = ('** Value Redacted - Requires '
                               'baremetal:node:get:last_error '
                               'permission. **')
     if ('reservation' in node_keys
-        and not policy.check("baremetal:node:get:reservation",
-                             target_dict, cdict)):
+        and not decisions.check("baremetal:node:get:reservation",
+                                target_dict, cdict)):
         # Guard conductor names from being visible.
         node['reservation'] = ('** Redacted - requires baremetal:'
                                'node:get:reservation permission. **')
     if ('driver_internal_info' in node_keys
-        and not policy.check("baremetal:node:get:driver_internal_info",
-                             target_dict, cdict)):
+        and not decisions.check("baremetal:node:get:driver_internal_info",
+                                target_dict, cdict)):
         # Guard conductor names from being visible.
         node['driver_internal_info'] = {
             'content': '** Redacted - Requires baremetal:node:get:'
@@ -1898,10 +1947,17 @@ def _mask_fields(dictionary, fields, secret):
             dictionary[field] = secret
 
 
-def node_list_convert_with_links(nodes, limit, url, fields=None, **kwargs):
+def _get_nodes_watermark():
+    count, latest = api.request.dbapi.get_node_watermark()
+    # NOTE: the conductor of a node changes with the conductor membership.
+    generation, hosts = api.request.dbapi.get_conductor_membership_stamp()
+    return [count, generation, sorted(hosts)], latest
+
+
+def _node_list_sanitizer_args():
     cdict = api.request.context.to_policy_values()
     target_dict = dict(cdict)
-    sanitizer_args = {
+    return {
         'cdict': cdict,
         'show_driver_secrets': policy.check("show_password", cdict,
                                             target_dict),
@@ -1912,10 +1968,40 @@ def node_list_convert_with_links(nodes, limit, url, fields=None, **kwargs):
             target_dict, cdict),
     }
 
+
+def _node_list_convert(nodes, fields=None):
+    # NOTE: resolve the allocations, chassis and conductors of the whole
+    # page at once instead of issuing queries for every node.
+    related = _get_related_for_nodes(nodes, fields=fields)
+    return [node_convert_with_links(n, fields=fields, sanitize=False,
+                                    related=related)
+            for n in nodes]
+
+
+def node_list_convert_with_links(nodes, limit, url, fields=None, **kwargs):
+    sanitizer_args = _node_list_sanitizer_args()
     return collection.list_convert_with_links(
-        items=[node_convert_with_links(n, fields=fields,
-                                       sanitize=False)
-               for n in nodes],
+        items=_node_list_convert(nodes, fields=fields),
+        item_name='nodes',
+        limit=limit,
+        url=url,
+        fields=fields,
+        sanitize_func=node_sanitize,
+        sanitizer_args=sanitizer_args,
+        **kwargs
+    )
+
+
+def node_list_write_with_links(node_chunks, limit, url, fields=None,
+                               **kwargs):
+    """Write a list of nodes loaded in chunks to the response body.
+
+    :param node_chunks: an iterable of lists of Node objects.
+    :returns: the response.
+    """
+    sanitizer_args = _node_list_sanitizer_args()
+    return collection.write_list_with_links(
+        (_node_list_convert(nodes, fields=fields) for nodes in node_chunks),
         item_name='nodes',
         limit=limit,
         url=url,
@@ -2138,19 +2224,16 @@ class NodeHistoryController(rest.RestController):
 
         fields = self.detail_fields if detail else self.standard_fields
 
-        marker_obj = None
-        if marker:
-            marker_obj = objects.NodeHistory.get_by_uuid(api.request.context,
-                                                         marker)
         limit = api_utils.validate_limit(limit)
         sort_dir = api_utils.validate_sort_dir(sort_dir)
 
         events = objects.NodeHistory.list_by_node_id(api.request.context,
                                                      node.id,
-                                                     marker=marker_obj,
+                                                     marker=marker,
                                                      limit=limit,
                                                      sort_key=sort_key,
                                                      sort_dir=sort_dir)
+        api_utils.check_marker(objects.NodeHistory, marker, events)
 
         return collection.list_convert_with_links(
             items=[
@@ -2160,7 +2243,6 @@ class NodeHistoryController(rest.RestController):
             item_name='history',
             url=f'nodes/{self.node_ident}/history',
             fields=fields,
-            marker=marker_obj,
             limit=limit,
             sort_key=sort_key,
             sort_dir=sort_dir
@@ -2449,11 +2531,6 @@ class NodesController(rest.RestController):
                 _("The sort_key value %(key)s is an invalid field for "
                   "sorting") % {'key': sort_key})
 
-        marker_obj = None
-        if marker:
-            marker_obj = objects.Node.get_by_uuid(api.request.context,
-                                                  marker)
-
         # The query parameters for the 'next' URL
         parameters = {}
 
@@ -2488,9 +2565,12 @@ class NodesController(rest.RestController):
                 filters[key] = value
 
         if fields:
-            obj_fields = fields[:]
+            # NOTE: allocation_uuid, chassis_uuid and conductor are not
+            # node fields, they are resolved from the fields below.
+            obj_fields = _get_fields_for_node_query(fields)
             required_object_fields = ('allocation_id', 'chassis_id',
                                       'uuid', 'owner', 'lessee',
+                                      'driver', 'conductor_group',
                                       'created_at', 'updated_at')
             for req_field in required_object_fields:
                 if req_field not in obj_fields:
@@ -2505,13 +2585,8 @@ class NodesController(rest.RestController):
         # when requesting specific fields aligning with Nova's sync
         # process. (Local DB though)
 
-        nodes = objects.Node.list(api.request.context, limit, marker_obj,
-                                  sort_key=sort_key, sort_dir=sort_dir,
-                                  filters=filters, fields=obj_fields)
-
-        # Special filtering on results based on conductor field
-        if conductor:
-            nodes = self._filter_by_conductor(nodes, conductor)
+        if api_utils.check_collection_not_modified(_get_nodes_watermark):
+            return None
 
         parameters = {'sort_key': sort_key, 'sort_dir': sort_dir}
         if associated:
@@ -2524,6 +2599,32 @@ class NodesController(rest.RestController):
         if detail is not None:
             parameters['detail'] = detail
 
+        # NOTE: very large pages are loaded, converted and serialized in
+        # chunks to bound the memory used by the request. The instance UUID
+        # is unique, so such a page has at most one node.
+        if api_utils.use_list_chunks(limit) and not instance_uuid:
+            node_chunks = api_utils.list_in_chunks(
+                functools.partial(objects.Node.list, api.request.context,
+                                  sort_key=sort_key, sort_dir=sort_dir,
+                                  filters=filters, fields=obj_fields),
+                objects.Node, limit, marker)
+            if conductor:
+                node_chunks = (self._filter_by_conductor(nodes, conductor)
+                               for nodes in node_chunks)
+            return node_list_write_with_links(node_chunks, limit,
+                                              url=resource_url,
+                                              fields=fields,
+                                              **parameters)
+
+        nodes = objects.Node.list(api.request.context, limit, marker,
+                                  sort_key=sort_key, sort_dir=sort_dir,
+                                  filters=filters, fields=obj_fields)
+        api_utils.check_marker(objects.Node, marker, nodes)
+
+        # Special filtering on results based on conductor field
+        if conductor:
+            nodes = self._filter_by_conductor(nodes, conductor)
+
         if instance_uuid:
             # NOTE(rloo) if limit==1 and len(nodes)==1 (see
             # Collection.has_next()), a 'next' link will
@@ -2872,7 +2973,10 @@ class NodesController(rest.RestController):
         api_utils.check_allow_specify_fields(fields)
         api_utils.check_allowed_fields(fields)
 
-        return node_convert_with_links(rpc_node, fields=fields)
+        node = node_convert_with_links(rpc_node, fields=fields)
+        if api_utils.check_not_modified(node):
+            return None
+        return node
 
     @METRICS.timer('NodesController.post')
     @method.expose(status_code=http_client.CREATED)
@@ -13,6 +13,7 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import functools
 from http import client as http_client
 
 from oslo_log import log
@@ -141,7 +142,16 @@ def hide_fields_in_newer_versions(port):
         port.pop('description', None)
 
 
-def convert_with_links(rpc_port, fields=None, sanitize=True):
+def convert_with_links(rpc_port, fields=None, sanitize=True,
+                       portgroup_uuids=None):
+    """Convert a port object to a dict for the API.
+
+    :param rpc_port: a Port object.
+    :param fields: the requested fields, or None for all fields.
+    :param sanitize: whether to sanitize the result.
+    :param portgroup_uuids: optional dict mapping portgroup IDs to UUIDs
+        to use instead of fetching the portgroup of the port.
+    """
     port = api_utils.object_to_dict(
         rpc_port,
         link_resource='ports',
@@ -158,11 +168,13 @@ def convert_with_links(rpc_port, fields=None, sanitize=True):
             'description',
         )
     )
-    if rpc_port.portgroup_id:
+    if not rpc_port.portgroup_id:
+        port['portgroup_uuid'] = None
+    elif portgroup_uuids is not None:
+        port['portgroup_uuid'] = portgroup_uuids.get(rpc_port.portgroup_id)
+    else:
         pg = objects.Portgroup.get(api.request.context, rpc_port.portgroup_id)
         port['portgroup_uuid'] = pg.uuid
-    else:
-        port['portgroup_uuid'] = None
 
     _validate_fields(port, fields)
 
@@ -192,19 +204,49 @@ def port_sanitize(port, fields=None):
     api_utils.sanitize_dict(port, fields)
 
 
-def list_convert_with_links(rpc_ports, limit, url, fields=None, **kwargs):
+def _list_convert(rpc_ports, fields=None):
+    # NOTE: the node UUIDs are loaded with the ports, look up the portgroup
+    # UUIDs of the whole page at once as well.
+    portgroup_ids = {p.portgroup_id for p in rpc_ports if p.portgroup_id}
+    portgroup_uuids = {}
+    if portgroup_ids:
+        portgroup_uuids = api.request.dbapi.get_portgroup_uuids_by_ids(
+            portgroup_ids)
     ports = []
     for rpc_port in rpc_ports:
         port = convert_with_links(rpc_port, fields=fields,
-                                  sanitize=False)
+                                  sanitize=False,
+                                  portgroup_uuids=portgroup_uuids)
         # NOTE(dtantsur): node was deleted after we fetched the port
         # list, meaning that the port was also deleted. Skip it.
         if port['node_uuid'] is None:
             continue
 
         ports.append(port)
+    return ports
+
+
+def list_convert_with_links(rpc_ports, limit, url, fields=None, **kwargs):
     return collection.list_convert_with_links(
-        items=ports,
+        items=_list_convert(rpc_ports, fields=fields),
+        item_name='ports',
+        limit=limit,
+        url=url,
+        fields=fields,
+        sanitize_func=port_sanitize,
+        **kwargs
+    )
+
+
+def list_write_with_links(port_chunks, limit, url, fields=None, **kwargs):
+    """Write a list of ports loaded in chunks to the response body.
+
+    :param port_chunks: an iterable of lists of Port objects.
+    :returns: the response.
+    """
+    return collection.write_list_with_links(
+        (_list_convert(rpc_ports, fields=fields)
+         for rpc_ports in port_chunks),
         item_name='ports',
         limit=limit,
         url=url,
@@ -266,11 +308,6 @@ class PortsController(rest.RestController):
         limit = api_utils.validate_limit(limit)
         sort_dir = api_utils.validate_sort_dir(sort_dir)
 
-        marker_obj = None
-        if marker:
-            marker_obj = objects.Port.get_by_uuid(api.request.context,
-                                                  marker)
-
         if sort_key in self.invalid_sort_key_list:
             raise exception.InvalidParameterValue(
                 _("The sort_key value %(key)s is an invalid field for "
@@ -290,49 +327,63 @@ class PortsController(rest.RestController):
         if description_contains:
             filters['description_contains'] = description_contains
 
+        if api_utils.check_collection_not_modified(
+                lambda: api.request.dbapi.get_port_watermark()):
+            return None
+
+        list_ports = None
         if portgroup_ident:
             # FIXME: Since all we need is the portgroup ID, we can
             #                 make this more efficient by only querying
             #                 for that column. This will get cleaned up
             #                 as we move to the object interface.
             portgroup = api_utils.get_rpc_portgroup(portgroup_ident)
-            ports = objects.Port.list_by_portgroup_id(api.request.context,
-                                                      portgroup.id, limit,
-                                                      marker_obj,
-                                                      sort_key=sort_key,
-                                                      sort_dir=sort_dir,
-                                                      project=project,
-                                                      filters=filters)
+            list_ports = functools.partial(objects.Port.list_by_portgroup_id,
+                                           api.request.context, portgroup.id)
         elif node_ident:
             # FIXME(comstud): Since all we need is the node ID, we can
             #                 make this more efficient by only querying
             #                 for that column. This will get cleaned up
             #                 as we move to the object interface.
             node = api_utils.get_rpc_node(node_ident)
-            ports = objects.Port.list_by_node_id(api.request.context,
-                                                 node.id, limit, marker_obj,
-                                                 sort_key=sort_key,
-                                                 sort_dir=sort_dir,
-                                                 project=project,
-                                                 filters=filters)
+            list_ports = functools.partial(objects.Port.list_by_node_id,
+                                           api.request.context, node.id)
         elif address:
-            ports = self._get_ports_by_address(address, project=project)
+            # NOTE: at most one port has the address, it is looked up below.
+            pass
         elif shard:
-            ports = objects.Port.list_by_node_shards(api.request.context,
-                                                     shard, limit,
-                                                     marker_obj, sort_key,
-                                                     sort_dir, project=project,
-                                                     filters=filters)
+            list_ports = functools.partial(objects.Port.list_by_node_shards,
+                                           api.request.context, shard)
         else:
-            ports = objects.Port.list(api.request.context, limit,
-                                      marker_obj, sort_key=sort_key,
-                                      sort_dir=sort_dir, project=project,
-                                      filters=filters)
+            list_ports = functools.partial(objects.Port.list,
+                                           api.request.context)
+
         parameters = {}
 
         if detail is not None:
             parameters['detail'] = detail
 
+        if list_ports is None:
+            ports = self._get_ports_by_address(address, project=project)
+        else:
+            list_ports = functools.partial(list_ports, sort_key=sort_key,
+                                           sort_dir=sort_dir,
+                                           project=project,
+                                           filters=filters)
+            # NOTE: very large pages are loaded, converted and serialized
+            # in chunks to bound the memory used by the request.
+            if api_utils.use_list_chunks(limit):
+                port_chunks = api_utils.list_in_chunks(
+                    list_ports, objects.Port, limit, marker)
+                return list_write_with_links(port_chunks, limit,
+                                             url=resource_url,
+                                             fields=fields,
+                                             sort_key=sort_key,
+                                             sort_dir=sort_dir,
+                                             **parameters)
+            ports = list_ports(limit, marker)
+        api_utils.check_marker(objects.Port, marker, ports)
+
         return list_convert_with_links(ports, limit,
                                        url=resource_url,
                                        fields=fields,
@@ -565,7 +616,10 @@ class PortsController(rest.RestController):
         api_utils.check_allow_specify_fields(fields)
         self._check_allowed_port_fields(fields)
 
-        return convert_with_links(rpc_port, fields=fields)
+        port = convert_with_links(rpc_port, fields=fields)
+        if api_utils.check_not_modified(port):
+            return None
+        return port
 
     @METRICS.timer('PortsController.post')
     @method.expose(status_code=http_client.CREATED)
@@ -183,11 +183,6 @@ class PortgroupsController(pecan.rest.RestController):
         limit = api_utils.validate_limit(limit)
         sort_dir = api_utils.validate_sort_dir(sort_dir)
 
-        marker_obj = None
-        if marker:
-            marker_obj = objects.Portgroup.get_by_uuid(api.request.context,
-                                                       marker)
-
         if sort_key in self.invalid_sort_key_list:
             raise exception.InvalidParameterValue(
                 _("The sort_key value %(key)s is an invalid field for "
@@ -203,16 +198,17 @@ class PortgroupsController(pecan.rest.RestController):
             node = api_utils.get_rpc_node(node_ident)
             portgroups = objects.Portgroup.list_by_node_id(
                 api.request.context, node.id, limit,
-                marker_obj, sort_key=sort_key, sort_dir=sort_dir,
+                marker, sort_key=sort_key, sort_dir=sort_dir,
                 project=project)
         elif address:
             portgroups = self._get_portgroups_by_address(address,
                                                          project=project)
         else:
             portgroups = objects.Portgroup.list(api.request.context, limit,
-                                                marker_obj, sort_key=sort_key,
+                                                marker, sort_key=sort_key,
                                                 sort_dir=sort_dir,
                                                 project=project)
+        api_utils.check_marker(objects.Portgroup, marker, portgroups)
         parameters = {}
         if detail is not None:
             parameters['detail'] = detail
@@ -31,6 +31,7 @@ from ironic.common import exception
 from ironic.common.i18n import _
 from ironic.common import states
 from ironic.common import utils
+from ironic.db import api as dbapi
 from ironic.drivers.modules import inspect_utils
 from ironic import objects
 
@@ -146,6 +147,10 @@ class LookupController(rest.RestController):
         if not valid_addresses and not node_uuid:
             raise exception.IncompleteLookup()
 
+        # NOTE: the agent looks up its node right after it has been moved
+        # to a waiting state, a lagging replica could still miss that.
+        dbapi.allow_replica_reads(False)
+
         try:
             if node_uuid:
                 node = objects.Node.get_by_uuid(
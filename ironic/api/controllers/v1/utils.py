@@ -15,9 +15,12 @@
 
 import collections
 import copy
+import datetime
+import hashlib
 from http import client as http_client
 import inspect
 import io
+import json
 import re
 import string
 
@@ -27,6 +30,7 @@ from jsonschema import exceptions as json_schema_exc
 import os_traits
 from oslo_config import cfg
 from oslo_policy import policy as oslo_policy
+from oslo_utils import timeutils
 from oslo_utils import uuidutils
 from pecan import rest
 
@@ -275,7 +279,21 @@ def object_to_dict(obj, include_created_at=True, include_updated_at=True,
     return to_dict
 
 
-def populate_node_uuid(obj, to_dict):
+def get_node_uuids(objs):
+    """Look up the nodes referenced by several objects at once.
+
+    :param objs:
+        objects to get the node_id attribute of
+    :returns:
+        a dict mapping node IDs to node UUIDs, for populate_node_uuid
+    """
+    node_ids = {obj.node_id for obj in objs if obj.node_id}
+    if not node_ids:
+        return {}
+    return api.request.dbapi.get_node_uuids_by_ids(node_ids)
+
+
+def populate_node_uuid(obj, to_dict, node_uuids=None):
     """Look up the node referenced in the object and populate a dict.
 
     The node is fetched with the object ``node_id`` attribute and the
@@ -285,12 +303,21 @@ def populate_node_uuid(obj, to_dict):
         object to get the node_id attribute
     :param to_dict:
         dict to populate with a ``node_uuid`` value
+    :param node_uuids:
+        optional dict mapping node IDs to node UUIDs, as returned by
+        get_node_uuids, to use instead of fetching the node
     :raises:
         exception.NodeNotFound if the node is not found
     """
     if not obj.node_id:
         to_dict['node_uuid'] = None
         return
+    if node_uuids is not None:
+        try:
+            to_dict['node_uuid'] = node_uuids[obj.node_id]
+        except KeyError:
+            raise exception.NodeNotFound(node=obj.node_id)
+        return
     to_dict['node_uuid'] = objects.Node.get_by_id(
         api.request.context,
         obj.node_id).uuid
@@ -470,6 +497,70 @@ def validate_sort_dir(sort_dir):
     return sort_dir
 
 
+def check_marker(obj_cls, marker, items):
+    """Check that the marker of an empty page exists.
+
+    Markers are resolved by the database query of the page itself, so an
+    unknown marker results in an empty page rather than in an error.
+
+    :param obj_cls: the object class of the listed items.
+    :param marker: the UUID of the marker or None.
+    :param items: the items of the page.
+    :raises: the NotFound exception of the object if the marker does not
+        exist.
+    """
+    if marker and not items:
+        obj_cls.get_by_uuid(api.request.context, marker)
+
+
+def use_list_chunks(limit):
+    """Check whether a page of items should be processed in chunks.
+
+    :param limit: the validated limit of the page.
+    :returns: True if the page is larger than ``[api]list_chunk_size``.
+    """
+    chunk_size = CONF.api.list_chunk_size
+    return bool(chunk_size) and limit > chunk_size
+
+
+def list_in_chunks(list_func, obj_cls, limit, marker):
+    """Load a page of items in chunks of ``[api]list_chunk_size`` items.
+
+    Chunks are loaded lazily, each with its own database query starting
+    after the last item of the previous chunk.
+
+    :param list_func: a function accepting a limit and a marker, returning
+        a list of objects.
+    :param obj_cls: the object class of the listed items.
+    :param limit: the maximum number of items to load.
+    :param marker: the UUID of the marker or None.
+    :raises: the NotFound exception of the object if the marker does not
+        exist.
+    :raises: Conflict if the last item of a chunk is deleted before the
+        next chunk is loaded.
+    :returns: a generator of non-empty lists of objects.
+    """
+    chunk_size = CONF.api.list_chunk_size
+    items = list_func(min(chunk_size, limit), marker)
+    check_marker(obj_cls, marker, items)
+    while items:
+        yield items
+        limit -= len(items)
+        if len(items) < chunk_size or limit <= 0:
+            return
+        last = items[-1].uuid
+        items = list_func(min(chunk_size, limit), last)
+        if not items:
+            # NOTE: a deleted marker also results in an empty chunk, which
+            # must not be mistaken for the end of the list.
+            try:
+                obj_cls.get_by_uuid(api.request.context, last)
+            except exception.NotFound:
+                raise exception.Conflict(
+                    _('The list was modified while it was being loaded, '
+                      'please retry the request.'))
+
+
 def apply_jsonpatch(doc, patch):
     """Apply a JSON patch, one operation at a time.
 
@@ -1643,6 +1734,72 @@ def allow_inspection_rules():
     return api.request.version.minor >= versions.MINOR_96_INSPECTION_RULES
 
 
+def check_not_modified(*values):
+    """Handle a conditional GET request.
+
+    Sets the ETag header of the response to a tag computed from the given
+    values and from everything else the response depends on: the request
+    URL, the API version and the credentials of the request.
+
+    :param values: JSON serializable values which change whenever the
+        response changes.
+    :returns: True if the tag matches the If-None-Match header of the
+        request, in which case the response status is set to 304 (Not
+        Modified) and the caller must return None. False otherwise.
+    """
+    if not CONF.api.conditional_requests:
+        return False
+
+    cdict = api.request.context.to_policy_values()
+    key = json.dumps([values, api.request.url, repr(api.request.version),
+                      sorted((k, cdict[k]) for k in cdict)],
+                     sort_keys=True, default=str)
+    etag = hashlib.sha256(key.encode()).hexdigest()
+    api.response.etag = etag
+    if etag in api.request.if_none_match:
+        api.response.status = http_client.NOT_MODIFIED
+        return True
+    return False
+
+
+def check_collection_not_modified(get_watermark):
+    """Handle a conditional GET request on a collection.
+
+    :param get_watermark: a function returning a tuple (state, latest),
+        state being a JSON serializable value changing whenever the
+        collection changes, and latest the time of the latest change or
+        None. Only called if conditional requests are enabled.
+    :returns: True if the collection has not changed since the client
+        fetched it, in which case the response status is set to 304 (Not
+        Modified) and the caller must return None. False otherwise.
+    """
+    if not CONF.api.conditional_requests:
+        return False
+
+    # NOTE: some databases store timestamps with a one second resolution,
+    # and changes are timestamped before they are committed, so a collection
+    # changed recently may still change without its watermark moving. Do not
+    # tag collections changed too recently.
+    state, latest = get_watermark()
+    settle_time = datetime.timedelta(
+        seconds=CONF.api.conditional_requests_settle_time)
+    if latest is not None and latest > timeutils.utcnow() - settle_time:
+        return False
+    return check_not_modified(state, latest)
+
+
+def get_policy_decisions():
+    """Return the policy decision cache of the current request.
+
+    :returns: a DecisionCache object, a new one when not called while
+        processing an API request.
+    """
+    decisions = getattr(api.request, 'policy_decisions', None)
+    if not isinstance(decisions, policy.DecisionCache):
+        decisions = policy.DecisionCache()
+    return decisions
+
+
 def check_owner_policy(object_type, policy_name, owner, lessee=None,
                        conceal_node=False):
     """Check if the policy authorizes this request on an object.
@@ -1663,7 +1820,8 @@ def check_owner_policy(object_type, policy_name, owner, lessee=None,
     if lessee:
         target_dict[object_type + '.lessee'] = lessee
     try:
-        policy.authorize(policy_name, target_dict, api.request.context)
+        get_policy_decisions().authorize(policy_name, target_dict,
+                                         api.request.context)
     except exception.HTTPForbidden:
         if conceal_node:
             # The caller does NOT have access to the node and we've been told
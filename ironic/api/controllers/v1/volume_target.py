@@ -70,7 +70,8 @@ PATCH_ALLOWED_FIELDS = [
 ]
 
 
-def convert_with_links(rpc_target, fields=None, sanitize=True):
+def convert_with_links(rpc_target, fields=None, sanitize=True,
+                       node_uuids=None):
     target = api_utils.object_to_dict(
         rpc_target,
         link_resource='volume/targets',
@@ -82,7 +83,7 @@ def convert_with_links(rpc_target, fields=None, sanitize=True):
             'volume_type'
         )
     )
-    api_utils.populate_node_uuid(rpc_target, target)
+    api_utils.populate_node_uuid(rpc_target, target, node_uuids=node_uuids)
 
     if fields is not None:
         api_utils.check_for_invalid_fields(fields, target)
@@ -99,8 +100,10 @@ def list_convert_with_links(rpc_targets, limit, url, fields=None,
                             detail=None, **kwargs):
     if detail:
         kwargs['detail'] = detail
+    node_uuids = api_utils.get_node_uuids(rpc_targets)
     return collection.list_convert_with_links(
-        items=[convert_with_links(p, fields=fields, sanitize=False)
+        items=[convert_with_links(p, fields=fields, sanitize=False,
+                                  node_uuids=node_uuids)
                for p in rpc_targets],
         item_name='targets',
         limit=limit,
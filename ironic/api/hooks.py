@@ -25,6 +25,7 @@ from ironic.common import context
 from ironic.common import policy
 from ironic.conductor import rpcapi
 from ironic.db import api as dbapi
+from ironic.db import query_stats
 
 LOG = log.getLogger(__name__)
 
@@ -82,11 +83,34 @@ class DBHook(hooks.PecanHook):
 
     def before(self, state):
         state.request.dbapi = DBAPI
+        # NOTE: only read-only requests can use the replica, anything else
+        # may need to read its own writes.
+        dbapi.allow_replica_reads(
+            cfg.CONF.database.api_read_from_replica
+            and state.request.method in ('GET', 'HEAD'))
 
     def after(self, state):
         # Explicitly set to None since we don't need the DB connection
         # after we're done processing the request.
         state.request.dbapi = None
+        dbapi.allow_replica_reads(False)
+
+
+class QueryStatsHook(hooks.PecanHook):
+    """Collect statistics of the database queries of every request."""
+
+    def before(self, state):
+        controller = state.controller
+        owner = getattr(controller, '__self__', None)
+        if owner is not None:
+            name = '%s.%s' % (owner.__class__.__name__, controller.__name__)
+        else:
+            name = getattr(controller, '__name__', 'unknown')
+        state.request.query_stats = query_stats.start('API.%s' % name)
+
+    def after(self, state):
+        query_stats.stop(getattr(state.request, 'query_stats', None))
+        state.request.query_stats = None
 
 
 class ContextHook(hooks.PecanHook):
@@ -114,6 +138,7 @@ class ContextHook(hooks.PecanHook):
         policy_deprecation_check()
 
         state.request.context = ctx
+        state.request.policy_decisions = policy.DecisionCache()
 
     def after(self, state):
         if state.request.context == {}:
@@ -59,6 +59,8 @@ def expose(status_code=None):
                     pecan.response.status = orig_code
                 else:
                     pecan.response.status = 500
+                # NOTE: an error must not be served again as not modified.
+                pecan.response.etag = None
 
             def _empty():
                 # This is for a pecan workaround originally in WSME,
@@ -67,14 +69,18 @@ def expose(status_code=None):
                 pecan.request.pecan['content_type'] = None
                 pecan.response.content_type = None
 
-            # never return content for NO_CONTENT
-            if pecan.response.status_code == 204:
+            # never return content for NO_CONTENT and NOT_MODIFIED
+            if pecan.response.status_code in (204, 304):
                 return _empty()
 
             # don't encode None for ACCEPTED responses
             if result is None and pecan.response.status_code == 202:
                 return _empty()
 
+            # the controller has written the response body itself
+            if result is pecan.response:
+                return result
+
             return json.dumps(result)
 
         pecan_json_decorate(callfunction)
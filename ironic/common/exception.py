@@ -562,6 +562,11 @@ class NodeNotLocked(Invalid):
     _msg_fmt = _("Node %(node)s found not to be locked on release")
 
 
+class NodePreconditionFailed(Conflict):
+    _msg_fmt = _("Node %(node)s does not match the requested "
+                 "preconditions.")
+
+
 class NoFreeConductorWorker(TemporaryFailure):
     _msg_fmt = _('Requested action cannot be performed due to lack of free '
                  'conductor workers.')
@@ -32,6 +32,12 @@ LOG = log.getLogger(__name__)
 class HashRingManager(object):
     _hash_rings = (None, 0)
     _lock = threading.Lock()
+    _generation = 0
+    """Incremented every time the rings are rebuilt with different members."""
+    _members = None
+    _membership_stamp = None
+    _node_hosts = (0, {})
+    """A tuple (generation, {(ring key, node UUID): hosts})."""
 
     def __init__(self, use_groups=True, cache=True):
         self.dbapi = dbapi.get_instance()
@@ -59,9 +65,28 @@ class HashRingManager(object):
         with self._lock:
             hash_rings, updated_at = self.__class__._hash_rings
             if hash_rings is None or updated_at < limit:
+                # NOTE: fetch the stamp before the rings, so that a change
+                # happening in between causes another rebuild next time.
+                stamp = self.dbapi.get_conductor_membership_stamp()
+                if (hash_rings is not None
+                        and stamp == self.__class__._membership_stamp):
+                    # No conductor has come or gone, no need to rebuild
+                    self.__class__._hash_rings = hash_rings, time.monotonic()
+                    return hash_rings
+
                 LOG.debug('Rebuilding cached hash rings')
                 hash_rings = self._load_hash_rings()
                 self.__class__._hash_rings = hash_rings, time.monotonic()
+                self.__class__._membership_stamp = stamp
+                # NOTE: the generation must only be changed after the new
+                # rings are published, see get_hosts_for_nodes.
+                members = ({key: frozenset(ring.nodes)
+                            for key, ring in hash_rings.items()},
+                           CONF.hash_partition_exponent,
+                           CONF.hash_ring_algorithm)
+                if members != self.__class__._members:
+                    self.__class__._members = members
+                    self.__class__._generation += 1
                 LOG.debug('Finished rebuilding hash rings, available drivers '
                           'are %s', ', '.join(hash_rings))
             return hash_rings
@@ -78,6 +103,14 @@ class HashRingManager(object):
 
         return rings
 
+    @property
+    def generation(self):
+        """A number that changes every time the node mapping may change.
+
+        Rebuilding the rings with the same conductors does not change it.
+        """
+        return self.__class__._generation
+
     @classmethod
     def reset(cls):
         with cls._lock:
@@ -105,9 +138,95 @@ class HashRingManager(object):
             raise exception.TemporaryFailure()
 
         try:
-            if self.use_groups:
-                return ring['%s:%s' % (conductor_group, driver_name)]
-            return ring[driver_name]
+            return ring[self._ring_key(driver_name, conductor_group)]
         except KeyError:
             raise exception.DriverNotFound(
                 _("The driver '%s' is unknown.") % driver_name)
+
+    def _ring_key(self, driver_name, conductor_group):
+        if self.use_groups:
+            return '%s:%s' % (conductor_group, driver_name)
+        return driver_name
+
+    def _get_node_hosts_cache(self, generation):
+        cache_generation, cache = self.__class__._node_hosts
+        if cache_generation != generation:
+            cache = {}
+            # Do not throw away a cache of a newer generation
+            if generation == self.__class__._generation:
+                self.__class__._node_hosts = (generation, cache)
+        return cache
+
+    def get_hosts(self, driver_name, conductor_group, node_uuid):
+        """Get the conductors a node is mapped to.
+
+        The result is cached until the set of conductors changes.
+
+        :param driver_name: the node's hardware type.
+        :param conductor_group: the node's conductor group.
+        :param node_uuid: the node's UUID.
+        :returns: a frozenset of conductor host names.
+        :raises: DriverNotFound or TemporaryFailure, see :meth:`get_ring`.
+        """
+        key = (self._ring_key(driver_name, conductor_group), node_uuid)
+        if self.cache:
+            # Hot path: skip looking up the ring while it is still valid.
+            cache_generation, cache = self.__class__._node_hosts
+            hash_rings, updated_at = self.__class__._hash_rings
+            if (cache_generation == self.__class__._generation
+                    and hash_rings is not None
+                    and updated_at >= (time.monotonic()
+                                       - CONF.hash_ring_reset_interval)):
+                hosts = cache.get(key)
+                if hosts is not None:
+                    return hosts
+
+        generation = self.__class__._generation
+        ring = self.get_ring(driver_name, conductor_group)
+        if not self.cache:
+            return frozenset(ring.get_nodes(node_uuid.encode('utf-8')))
+
+        cache = self._get_node_hosts_cache(generation)
+        hosts = cache.get(key)
+        if hosts is None:
+            hosts = frozenset(ring.get_nodes(node_uuid.encode('utf-8')))
+            if self.__class__._generation == generation:
+                cache[key] = hosts
+        return hosts
+
+    def get_hosts_for_nodes(self, driver_name, conductor_group, node_uuids):
+        """Get the conductors several nodes are mapped to.
+
+        The results are cached until the set of conductors changes.
+
+        :param driver_name: the nodes' hardware type.
+        :param conductor_group: the nodes' conductor group.
+        :param node_uuids: an iterable of node UUIDs.
+        :returns: a dictionary mapping node UUIDs to frozensets of conductor
+            host names.
+        :raises: DriverNotFound or TemporaryFailure, see :meth:`get_ring`.
+        """
+        # NOTE: read the generation before fetching the ring. If the rings
+        # are rebuilt in the meantime, the generation will no longer match
+        # and the results will not be cached.
+        generation = self.__class__._generation
+        ring = self.get_ring(driver_name, conductor_group)
+        if not self.cache:
+            return {node_uuid: frozenset(ring.get_nodes(
+                    node_uuid.encode('utf-8')))
+                    for node_uuid in node_uuids}
+
+        ring_key = self._ring_key(driver_name, conductor_group)
+        cache = self._get_node_hosts_cache(generation)
+        result = {}
+        missing = {}
+        for node_uuid in node_uuids:
+            hosts = cache.get((ring_key, node_uuid))
+            if hosts is None:
+                hosts = frozenset(ring.get_nodes(node_uuid.encode('utf-8')))
+                missing[(ring_key, node_uuid)] = hosts
+            result[node_uuid] = hosts
+
+        if missing and self.__class__._generation == generation:
+            cache.update(missing)
+        return result
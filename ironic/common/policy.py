@@ -15,6 +15,7 @@
 
 """Policy Engine For Ironic."""
 
+import collections.abc
 import itertools
 import sys
 
@@ -2193,3 +2194,58 @@ def check_policy(rule, target, creds, *args, **kwargs):
         return True
     enforcer = get_enforcer()
     return enforcer.enforce(rule, target, creds, *args, **kwargs)
+
+
+def _freeze(value):
+    if isinstance(value, collections.abc.Mapping):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+class DecisionCache(object):
+    """Memoized policy decisions for the credentials of a single request.
+
+    Listing objects evaluates the same rules for every object, with targets
+    which only differ by the owner and the lessee of the object. Remembering
+    the decisions makes a page of objects owned by a few projects cost a
+    few policy evaluations per rule.
+
+    The decisions are remembered per rule, target and credentials. A cache
+    is meant to live as long as the request it was created for.
+    """
+
+    def __init__(self):
+        self._decisions = {}
+
+    def _decide(self, func, rule, target, creds):
+        key = (func.__name__, rule, _freeze(target), _freeze(creds))
+        if key not in self._decisions:
+            self._decisions[key] = func(rule, target, creds)
+        return self._decisions[key]
+
+    def check(self, rule, target, creds):
+        """Memoized version of check()."""
+        return self._decide(check, rule, target, creds)
+
+    def check_policy(self, rule, target, creds):
+        """Memoized version of check_policy()."""
+        return self._decide(check_policy, rule, target, creds)
+
+    def authorize(self, rule, target, creds):
+        """Memoized version of authorize().
+
+        :raises: HTTPForbidden if the policy forbids access.
+        """
+        if not self._decide(_check_authorized, rule, target, creds):
+            raise exception.HTTPForbidden(resource=rule)
+        return True
+
+
+def _check_authorized(rule, target, creds):
+    try:
+        authorize(rule, target, creds)
+    except exception.HTTPForbidden:
+        return False
+    return True
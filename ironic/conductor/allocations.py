@@ -12,8 +12,6 @@
 
 """Functionality related to allocations."""
 
-import random
-
 from oslo_config import cfg
 from oslo_log import log
 from oslo_utils import excutils
@@ -24,12 +22,13 @@ from ironic.common.i18n import _
 from ironic.common import metrics_utils
 from ironic.common import states
 from ironic.conductor import task_manager
-from ironic import objects
+from ironic.db import api as dbapi
 
 
 CONF = cfg.CONF
 LOG = log.getLogger(__name__)
 METRICS = metrics_utils.get_metrics_logger(__name__)
+DBAPI = dbapi.get_instance()
 
 
 def do_allocate(context, allocation):
@@ -102,7 +101,10 @@ def _traits_match(traits, node):
 
 
 def _candidate_nodes(context, allocation):
-    """Get a list of candidate nodes for the allocation."""
+    """Get a random sample of candidate nodes for the allocation.
+
+    :returns: a list of UUIDs of the candidate nodes.
+    """
     # NOTE(dtantsur): not checking the retired flag because it's impossible
     # (by the API contract) to have a retired node in the available state.
     filters = {'resource_class': allocation.resource_class,
@@ -116,39 +118,44 @@ def _candidate_nodes(context, allocation):
         filters['uuid_in'] = allocation.candidate_nodes
     if allocation.owner:
         filters['project'] = allocation.owner
-
-    nodes = objects.Node.list(context, filters=filters)
-
-    if not nodes:
-        if allocation.candidate_nodes:
-            error = _("none of the requested nodes are available and match "
-                      "the resource class %s") % allocation.resource_class
-        else:
-            error = _("no available nodes match the resource class %s") % (
-                allocation.resource_class)
-        raise exception.AllocationFailed(uuid=allocation.uuid, error=error)
-
-    # TODO(dtantsur): database-level filtering?
     if allocation.traits:
-        traits = set(allocation.traits)
-        nodes = [n for n in nodes if _traits_match(traits, n)]
-        if not nodes:
-            error = (_("no suitable nodes have the requested traits %s") %
-                     ', '.join(traits))
-            raise exception.AllocationFailed(uuid=allocation.uuid, error=error)
+        filters['traits'] = allocation.traits
 
     # NOTE(dtantsur): make sure that parallel allocations do not try the nodes
     # in the same order.
-    random.shuffle(nodes)
+    limit = CONF.conductor.allocation_candidates_limit or None
+    nodes = [uuid for (uuid,) in DBAPI.get_nodeinfo_sample(
+        columns=['uuid'], filters=filters, limit=limit)]
 
     # NOTE(sbaker): if the allocation name matches a node name, attempt that
     # node first. This will reduce confusion when nodes have the same naming
     # scheme as allocations.
     if allocation.name:
-        for i, node in enumerate(nodes):
-            if node.name == allocation.name:
-                nodes.insert(0, nodes.pop(i))
-                break
+        named = DBAPI.get_nodeinfo_list(
+            columns=['uuid'], filters=dict(filters, name=allocation.name))
+        if named:
+            uuid = named[0][0]
+            if uuid in nodes:
+                nodes.remove(uuid)
+            nodes.insert(0, uuid)
+
+    if not nodes:
+        any_without_traits = False
+        if allocation.traits:
+            del filters['traits']
+            any_without_traits = bool(
+                DBAPI.get_nodeinfo_sample(filters=filters, limit=1))
+
+        if any_without_traits:
+            error = (_("no suitable nodes have the requested traits %s") %
+                     ', '.join(allocation.traits))
+        elif allocation.candidate_nodes:
+            error = _("none of the requested nodes are available and match "
+                      "the resource class %s") % allocation.resource_class
+        else:
+            error = _("no available nodes match the resource class %s") % (
+                allocation.resource_class)
+        raise exception.AllocationFailed(uuid=allocation.uuid, error=error)
 
     LOG.debug('%(count)d nodes are candidates for allocation %(uuid)s',
               {'count': len(nodes), 'uuid': allocation.uuid})
@@ -206,15 +213,15 @@ def _verify_node(node, allocation):
         CONF.conductor.node_locked_retry_interval),
     reraise=True)
 def _allocate_node(context, allocation, nodes):
-    """Go through the list of nodes and try to allocate one of them."""
+    """Go through the list of node UUIDs and try to allocate one of them."""
     retry_nodes = []
-    for node in nodes:
+    for node_uuid in nodes:
         try:
             # NOTE(dtantsur): retries are done for all nodes above, so disable
             # per-node retry. Also disable loading the driver, since the
             # current conductor may not have the required hardware type or
             # interfaces (it's picked at random).
-            with task_manager.acquire(context, node.uuid, shared=False,
+            with task_manager.acquire(context, node_uuid, shared=False,
                                       retry=False, load_driver=False,
                                       purpose='allocating') as task:
                 # NOTE(dtantsur): double-check the node details, since they
@@ -231,15 +238,15 @@ def _allocate_node(context, allocation, nodes):
                 allocation.save()
                 LOG.info('Node %(node)s has been successfully reserved for '
                          'allocation %(uuid)s',
-                         {'node': node.uuid, 'uuid': allocation.uuid})
+                         {'node': node_uuid, 'uuid': allocation.uuid})
                 return allocation
         except exception.NodeLocked:
             LOG.debug('Node %s is currently locked, moving to the next one',
-                      node.uuid)
-            retry_nodes.append(node)
+                      node_uuid)
+            retry_nodes.append(node_uuid)
         except exception.NodeAssociated:
             LOG.debug('Node %s is already associated, moving to the next one',
-                      node.uuid)
+                      node_uuid)
 
     # NOTE(dtantsur): rewrite the passed list to only contain the nodes that
     # are worth retrying. Do not include nodes that are no longer suitable.
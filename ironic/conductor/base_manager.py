@@ -15,6 +15,7 @@
 import copy
 import inspect
 import threading
+import time
 
 import eventlet
 import futurist
@@ -24,6 +25,7 @@ from oslo_db import exception as db_exception
 from oslo_log import log
 from oslo_utils import excutils
 from oslo_utils import netutils
+from oslo_utils import timeutils
 from oslo_utils import versionutils
 
 from ironic.common import context as ironic_context
@@ -32,14 +34,18 @@ from ironic.common import exception
 from ironic.common import hash_ring
 from ironic.common.i18n import _
 from ironic.common import mdns
+from ironic.common import metrics_utils
 from ironic.common import release_mappings as versions
 from ironic.common import rpc
 from ironic.common import states
 from ironic.common import utils as common_utils
 from ironic.conductor import allocations
+from ironic.conductor import history_writer
 from ironic.conductor import notification_utils as notify_utils
 from ironic.conductor import task_manager
 from ironic.conductor import utils
+from ironic.conductor import wait_timeouts
+from ironic.conductor import worker_classes
 from ironic.conf import CONF
 from ironic.db import api as dbapi
 from ironic.drivers.modules import deploy_utils
@@ -49,6 +55,8 @@ from ironic import version
 
 LOG = log.getLogger(__name__)
 
+METRICS = metrics_utils.get_metrics_logger(__name__)
+
 
 class BaseConductorManager(object):
 
@@ -63,6 +71,8 @@ class BaseConductorManager(object):
         self._shutdown = None
         self._zeroconf = None
         self.dbapi = None
+        self._wait_timeout_indexes = {}
+        self._worker_classes = None
 
     def prepare_host(self):
         """Prepares host for initialization
@@ -122,6 +132,15 @@ class BaseConductorManager(object):
         else:
             self._reserved_executor = None
 
+        if CONF.conductor.worker_class_limits:
+            self._worker_classes = worker_classes.WorkerClasses(
+                remaining, CONF.conductor.worker_class_limits,
+                CONF.conductor.worker_class_minimum)
+            LOG.info("Limits of the worker classes: %s",
+                     self._worker_classes.limits)
+        else:
+            self._worker_classes = None
+
     def init_host(self, admin_context=None, start_consoles=True,
                   start_allocations=True):
         """Initialize the conductor host.
@@ -180,6 +199,9 @@ class BaseConductorManager(object):
 
         self._collect_periodic_tasks(admin_context)
 
+        if CONF.conductor.wait_timeout_index:
+            self._init_wait_timeout_indexes()
+
         try:
             # Register this conductor with the cluster
             self.conductor = objects.Conductor.register(
@@ -207,6 +229,8 @@ class BaseConductorManager(object):
                 LOG.error('Failed to register hardware types. %s', e)
                 self.del_host()
 
+        history_writer.start()
+
         # Start periodic tasks
         self._periodic_tasks_worker = self._executor.submit(
             self._periodic_tasks.start, allow_empty=True)
@@ -376,11 +400,16 @@ class BaseConductorManager(object):
         if self._reserved_executor is not None:
             self._reserved_executor.shutdown(wait=True)
         self._executor.shutdown(wait=True)
+        # Write the node history recorded by the workers.
+        history_writer.stop()
 
         if self._zeroconf is not None:
             self._zeroconf.close()
             self._zeroconf = None
 
+        self._wait_timeout_indexes = {}
+        wait_timeouts.unregister_all()
+
         self._started = False
 
     def get_online_conductor_count(self):
@@ -463,7 +492,10 @@ class BaseConductorManager(object):
         :return: generator yielding tuples of requested fields
         """
         columns = ['uuid', 'driver', 'conductor_group'] + list(fields or ())
-        node_list = self.dbapi.get_nodeinfo_list(columns=columns, **kwargs)
+        kwargs['filters'] = self._mapped_nodes_filters(kwargs.get('filters'))
+        node_list = self.dbapi.iter_nodeinfo(
+            columns=columns,
+            chunk_size=CONF.conductor.periodic_nodes_chunk_size, **kwargs)
         for result in node_list:
             if self._shutdown:
                 break
@@ -471,17 +503,26 @@ class BaseConductorManager(object):
                 yield result
 
     def _spawn_worker(self, func, *args, _allow_reserved_pool=True,
-                      **kwargs):
+                      _worker_class=worker_classes.INTERACTIVE, **kwargs):
 
         """Create a greenthread to run func(*args, **kwargs).
 
         Spawns a greenthread if there are free slots in pool, otherwise raises
         exception. Execution control returns immediately to the caller.
 
+        :param _allow_reserved_pool: whether the reserved pool may be used
+            when the normal pool is full.
+        :param _worker_class: the class of the work, one of
+            ``worker_classes.CLASSES``. Only used when
+            ``[conductor]worker_class_limits`` is set.
         :returns: Future object.
         :raises: NoFreeConductorWorker if worker pool is currently full.
 
         """
+        if self._worker_classes is not None:
+            return self._spawn_classified_worker(
+                _worker_class, _allow_reserved_pool, func, args, kwargs)
+
         try:
             return self._executor.submit(func, *args, **kwargs)
         except futurist.RejectedSubmission:
@@ -495,6 +536,50 @@ class BaseConductorManager(object):
         except futurist.RejectedSubmission:
             raise exception.NoFreeConductorWorker()
 
+    def _spawn_classified_worker(self, worker_class, allow_reserved_pool,
+                                 func, args, kwargs):
+        classes = self._worker_classes
+        metric_prefix = 'ConductorManager.WorkerClass.%s.' % worker_class
+        submitted = time.monotonic()
+
+        def _run():
+            METRICS.send_timer(metric_prefix + 'Wait',
+                               (time.monotonic() - submitted) * 1000)
+            return func(*args, **kwargs)
+
+        def _release(future):
+            classes.release(worker_class)
+            METRICS.send_gauge(metric_prefix + 'Running',
+                               classes.running(worker_class))
+
+        if not classes.acquire(worker_class):
+            # NOTE: the reserved pool is only used when the normal pool is
+            # full, not to exceed the limit of the class.
+            METRICS.send_counter(metric_prefix + 'Rejected', 1)
+            raise exception.NoFreeConductorWorker()
+
+        try:
+            future = self._executor.submit(_run)
+        except futurist.RejectedSubmission:
+            classes.release(worker_class)
+        else:
+            METRICS.send_gauge(metric_prefix + 'Running',
+                               classes.running(worker_class))
+            future.add_done_callback(_release)
+            return future
+
+        if allow_reserved_pool and self._reserved_executor is not None:
+            LOG.debug('Normal workers pool is full, using reserved pool to '
+                      'run %(func)s of class %(cls)s',
+                      {'cls': worker_class, 'func': func.__qualname__})
+            try:
+                return self._reserved_executor.submit(_run)
+            except futurist.RejectedSubmission:
+                pass
+
+        METRICS.send_counter(metric_prefix + 'Rejected', 1)
+        raise exception.NoFreeConductorWorker()
+
     def _conductor_service_record_keepalive(self):
         if common_utils.is_ironic_using_sqlite():
             # Exit this keepalive heartbeats are disabled and not
@@ -511,6 +596,26 @@ class BaseConductorManager(object):
                               {'err': e})
             self._keepalive_evt.wait(CONF.conductor.heartbeat_interval)
 
+    def _mapped_nodes_filters(self, filters):
+        """Add database filters excluding nodes not mapped to this conductor.
+
+        Nodes can only be mapped to this conductor if they use one of its
+        hardware types and, if groups are used, its conductor group. The
+        hash ring still has to be checked for the remaining nodes.
+
+        :param filters: the filters requested by the caller or None.
+        :returns: a new dict of filters.
+        """
+        filters = dict(filters or {})
+        conductor = getattr(self, 'conductor', None)
+        if conductor is None:
+            return filters
+        if conductor.drivers and 'driver_in' not in filters:
+            filters['driver_in'] = list(conductor.drivers)
+        if self.ring_manager.use_groups:
+            filters.setdefault('conductor_group', conductor.conductor_group)
+        return filters
+
     def _mapped_to_this_conductor(self, node_uuid, driver, conductor_group):
         """Check that node is mapped to this conductor.
 
@@ -520,11 +625,12 @@ class BaseConductorManager(object):
         take out a lock.
         """
         try:
-            ring = self.ring_manager.get_ring(driver, conductor_group)
+            hosts = self.ring_manager.get_hosts(driver, conductor_group,
+                                                node_uuid)
         except exception.DriverNotFound:
             return False
 
-        return self.host in ring.get_nodes(node_uuid.encode('utf-8'))
+        return self.host in hosts
 
     def _fail_if_in_state(self, context, filters, provision_state,
                           sort_key, callback_method=None,
@@ -607,6 +713,100 @@ class BaseConductorManager(object):
             if workers_count >= CONF.conductor.periodic_max_workers:
                 break
 
+    def _init_wait_timeout_indexes(self):
+        """Create the in-memory deadline indexes for the wait states."""
+        definitions = [
+            ('deploy', states.DEPLOYWAIT, 'provision_updated_at',
+             CONF.conductor.deploy_callback_timeout),
+            ('clean', states.CLEANWAIT, 'provision_updated_at',
+             CONF.conductor.clean_callback_timeout),
+            ('rescue', states.RESCUEWAIT, 'provision_updated_at',
+             CONF.conductor.rescue_callback_timeout),
+            ('service', states.SERVICEWAIT, 'provision_updated_at',
+             CONF.conductor.service_callback_timeout),
+            ('inspect', states.INSPECTWAIT, 'inspection_started_at',
+             CONF.conductor.inspect_wait_timeout),
+        ]
+        for name, state, field, timeout in definitions:
+            if timeout > 0:
+                index = wait_timeouts.DeadlineIndex(name, state, field,
+                                                    timeout)
+                self._wait_timeout_indexes[state] = index
+                wait_timeouts.register(index)
+
+    def _rebuild_wait_timeout_index(self, index):
+        """(Re-)build a deadline index from the database if needed.
+
+        The index is built on the first use and whenever the hash ring
+        changes, since the set of nodes mapped to this conductor may have
+        changed as well.
+        """
+        # NOTE: read the generation before rebuilding, so that a concurrent
+        # change of the rings causes another rebuild rather than being missed.
+        generation = self.ring_manager.generation
+        if generation == index.ring_generation:
+            return
+
+        LOG.debug('Rebuilding the deadline index for nodes in the %s state',
+                  index.provision_state)
+        index.clear()
+        node_iter = self.iter_nodes(
+            fields=[index.timestamp_field],
+            filters={'provision_state': index.provision_state})
+        for node_uuid, driver, conductor_group, started_at in node_iter:
+            index.add(node_uuid, started_at)
+        index.ring_generation = generation
+
+    def _fail_expired_in_state(self, context, filters, provision_state,
+                               sort_key, **kwargs):
+        """Fail nodes that have been in a wait state for too long.
+
+        Uses the in-memory deadline index for the state if there is one,
+        so that only nodes whose deadline has passed are considered.
+        Otherwise, falls back to :meth:`_fail_if_in_state`.
+
+        :param context: request context
+        :param filters: criteria (as a dictionary) the nodes must match,
+            see :meth:`_fail_if_in_state`.
+        :param provision_state: the wait state.
+        :param sort_key: the nodes are sorted based on this key.
+        :param kwargs: additional arguments for :meth:`_fail_if_in_state`.
+        """
+        index = self._wait_timeout_indexes.get(provision_state)
+        if index is None:
+            self._fail_if_in_state(context, filters, provision_state,
+                                   sort_key, **kwargs)
+            return
+
+        self._rebuild_wait_timeout_index(index)
+        expired = index.pop_expired()
+        METRICS.send_gauge(
+            'BaseConductorManager.WaitTimeoutIndex.%s.Size' % index.name,
+            len(index))
+        if not expired:
+            return
+
+        now = timeutils.utcnow()
+        for node_uuid, deadline in expired:
+            METRICS.send_timer(
+                'BaseConductorManager.WaitTimeoutIndex.%s.FiringLag'
+                % index.name,
+                (now - deadline).total_seconds() * 1000)
+
+        # NOTE: the database has the final word on whether a node has
+        # timed out, e.g. a heartbeat may have moved its deadline.
+        uuids = [node_uuid for node_uuid, deadline in expired]
+        self._fail_if_in_state(context, dict(filters, uuid_in=uuids),
+                               provision_state, sort_key, **kwargs)
+
+        # Re-arm the nodes that are still waiting: their deadline was moved,
+        # they were locked or the workers limit has been reached.
+        node_iter = self.iter_nodes(
+            fields=[index.timestamp_field],
+            filters={'uuid_in': uuids, 'provision_state': provision_state})
+        for node_uuid, driver, conductor_group, started_at in node_iter:
+            index.add(node_uuid, started_at)
+
     def _start_consoles(self, context):
         """Start consoles if set enabled.
 
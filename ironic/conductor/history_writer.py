@@ -0,0 +1,222 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Write-behind buffer for the node history entries of a conductor.
+
+Node history entries are often recorded while holding a node lock, and
+in bursts: a BMC outage or a mass deployment can produce thousands of
+them per minute. Instead of one transaction per entry, a running conductor
+buffers the entries and writes them with multi-row INSERTs, every
+``[conductor]node_history_write_interval`` seconds or as soon as
+``[conductor]node_history_write_batch_size`` entries are pending. The
+buffer is flushed when the conductor shuts down gracefully, falling back to
+writing the entries one by one if that fails.
+
+When the writer is not running (e.g. outside of a conductor) or the buffer
+is full, entries are written immediately.
+"""
+
+import threading
+
+from oslo_db import exception as db_exc
+from oslo_log import log
+from oslo_utils import timeutils
+
+from ironic.common import metrics_utils
+from ironic.conf import CONF
+from ironic.db import api as dbapi
+
+LOG = log.getLogger(__name__)
+
+METRICS = metrics_utils.get_metrics_logger(__name__)
+
+# NOTE: Number of batches that can be pending before entries are written
+# synchronously again, so that a database outage does not grow the buffer
+# without bounds.
+MAX_PENDING_BATCHES = 10
+
+_WRITER = None
+"""The running writer, if any."""
+
+
+class HistoryWriter(object):
+    """Buffer of node history entries written by a background thread."""
+
+    def __init__(self, interval, batch_size):
+        self.interval = interval
+        self.batch_size = batch_size
+        self._records = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run,
+                                        name='node-history-writer',
+                                        daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        """Stop the writer after writing all pending entries."""
+        with self._lock:
+            self._stopped = True
+        self._wakeup.set()
+        self._thread.join()
+
+    def record(self, values):
+        """Queue a history entry to be written.
+
+        :param values: dict of values of the entry.
+        :returns: False if the entry cannot be queued because the writer is
+            stopped or the buffer is full, True otherwise.
+        """
+        with self._lock:
+            if (self._stopped
+                    or len(self._records)
+                    >= self.batch_size * MAX_PENDING_BATCHES):
+                return False
+            self._records.append(values)
+            depth = len(self._records)
+        METRICS.send_gauge('HistoryWriter.BufferDepth', depth)
+        if depth >= self.batch_size:
+            self._wakeup.set()
+        return True
+
+    def _run(self):
+        stopped = False
+        while not stopped:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            with self._lock:
+                stopped = self._stopped
+            flushed = self._flush()
+        if not flushed:
+            self._write_remaining()
+
+    def _flush(self):
+        """Write the pending entries in batches.
+
+        :returns: True if all pending entries have been written, False if
+            writing failed.
+        """
+        # NOTE: this is only called by the writer thread, so the pending
+        # entries can only be appended to in the meantime.
+        while True:
+            with self._lock:
+                records = self._records[:self.batch_size]
+            if not records:
+                return True
+            done = len(records)
+            try:
+                with METRICS.timer('HistoryWriter.Flush'):
+                    dbapi.get_instance().create_node_history_records(
+                        records)
+            except db_exc.DBConnectionError as e:
+                # Keep the entries to retry on the next interval.
+                LOG.error('Failed to write %(count)d node history entries, '
+                          'will retry. Error: %(err)s',
+                          {'count': len(records), 'err': e})
+                return False
+            except Exception as e:
+                # NOTE: e.g. the node of an entry has been deleted in the
+                # meantime, find out which entries cannot be written instead
+                # of retrying the same batch forever.
+                LOG.warning('Failed to write %(count)d node history entries '
+                            'at once, writing them one by one. Error: '
+                            '%(err)s', {'count': len(records), 'err': e})
+                done = self._write_separately(records, drop_failed=False)
+            with self._lock:
+                del self._records[:done]
+                depth = len(self._records)
+            METRICS.send_gauge('HistoryWriter.BufferDepth', depth)
+            if done < len(records):
+                return False
+
+    def _write_separately(self, records, drop_failed):
+        """Write entries one by one.
+
+        Entries of deleted nodes are dropped.
+
+        :param records: list of dicts of values of the entries.
+        :param drop_failed: whether to drop the entries failing with other
+            errors as well, instead of stopping at the first one.
+        :returns: the number of entries, from the start of the list, which
+            have been written or dropped.
+        """
+        done = 0
+        dropped = 0
+        error = None
+        for values in records:
+            try:
+                dbapi.get_instance().create_node_history_records([values])
+            except db_exc.DBReferenceError as e:
+                dropped += 1
+                error = e
+            except Exception as e:
+                if not drop_failed:
+                    LOG.error('Failed to write %(count)d node history '
+                              'entries, will retry. Error: %(err)s',
+                              {'count': len(records) - done, 'err': e})
+                    break
+                dropped += 1
+                error = e
+            done += 1
+        if dropped:
+            LOG.error('Dropped %(count)d node history entries which could '
+                      'not be written. Last error: %(err)s',
+                      {'count': dropped, 'err': error})
+        return done
+
+    def _write_remaining(self):
+        # NOTE: there is no next interval once stopped, write the entries one
+        # by one, so that an entry which cannot be written does not prevent
+        # writing the others.
+        with self._lock:
+            records, self._records = self._records, []
+        self._write_separately(records, drop_failed=True)
+
+
+def start():
+    """Start buffering node history entries, if enabled."""
+    global _WRITER
+    interval = CONF.conductor.node_history_write_interval
+    if _WRITER is not None or not interval:
+        return
+    _WRITER = HistoryWriter(interval,
+                            CONF.conductor.node_history_write_batch_size)
+    _WRITER.start()
+
+
+def stop():
+    """Stop buffering node history entries and write the pending ones."""
+    global _WRITER
+    writer, _WRITER = _WRITER, None
+    if writer is not None:
+        writer.stop()
+
+
+def record(history):
+    """Record a node history entry.
+
+    The entry is written in the background if the writer is running,
+    otherwise immediately.
+
+    :param history: a new NodeHistory object.
+    """
+    writer = _WRITER
+    if writer is not None:
+        values = history.do_version_changes_for_db()
+        # NOTE: the entry is written later, keep the time of the event.
+        values['created_at'] = timeutils.utcnow()
+        if writer.record(values):
+            return
+    history.create()
@@ -0,0 +1,83 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Registry of threads waiting for a node lock held by this conductor.
+
+A task failing to reserve a node waits for
+``[conductor]node_locked_retry_interval`` seconds before retrying. When the
+lock is held by another task of the same conductor, there is no need to
+wait for that long: the waiter is queued here and woken as soon as the
+other task releases the node. Waiters are woken one at a time in FIFO
+order. The retry interval remains the upper bound of a wait, so locks held
+by other conductors are still polled for.
+"""
+
+import collections
+import threading
+
+
+_QUEUES = {}
+"""Queues of waiters (events), keyed by node ID."""
+
+_LOCK = threading.Lock()
+
+
+def wait(node_id, timeout, first=False):
+    """Wait until a node is released by this conductor.
+
+    :param node_id: the ID of the node.
+    :param timeout: the maximum time to wait, in seconds.
+    :param first: whether to queue in front of the other waiters, e.g.
+        because the caller has been woken already but lost the race for the
+        lock.
+    :returns: True if the node has been released, False on timeout.
+    """
+    event = threading.Event()
+    with _LOCK:
+        queue = _QUEUES.setdefault(node_id, collections.deque())
+        if first:
+            queue.appendleft(event)
+        else:
+            queue.append(event)
+    try:
+        return event.wait(timeout)
+    finally:
+        with _LOCK:
+            queue = _QUEUES.get(node_id)
+            # The event is not queued any more if it has been notified
+            if queue is not None and event in queue:
+                queue.remove(event)
+                if not queue:
+                    del _QUEUES[node_id]
+
+
+def notify(node_id):
+    """Wake the first thread waiting for a node.
+
+    :param node_id: the ID of the node.
+    :returns: True if a waiter has been woken, False if there was none.
+    """
+    with _LOCK:
+        queue = _QUEUES.get(node_id)
+        if not queue:
+            return False
+        event = queue.popleft()
+        if not queue:
+            del _QUEUES[node_id]
+    event.set()
+    return True
+
+
+def waiting(node_id):
+    """Return the number of threads waiting for a node."""
+    with _LOCK:
+        return len(_QUEUES.get(node_id, ()))
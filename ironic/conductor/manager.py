@@ -42,6 +42,7 @@ notifying Neutron of a change, etc.
 
 import collections
 import queue
+import time
 
 import eventlet
 from futurist import waiters
@@ -68,11 +69,13 @@ from ironic.conductor import deployments
 from ironic.conductor import inspection
 from ironic.conductor import notification_utils as notify_utils
 from ironic.conductor import periodics
+from ironic.conductor import power_sync
 from ironic.conductor import servicing
 from ironic.conductor import steps as conductor_steps
 from ironic.conductor import task_manager
 from ironic.conductor import utils
 from ironic.conductor import verify
+from ironic.conductor import worker_classes
 from ironic.conf import CONF
 from ironic.drivers import base as drivers_base
 from ironic.drivers.modules import deploy_utils
@@ -90,6 +93,16 @@ METRICS = metrics_utils.get_metrics_logger(__name__)
 SYNC_EXCLUDED_STATES = (states.DEPLOYWAIT, states.CLEANWAIT, states.ENROLL,
                         states.ADOPTFAIL)
 
+# Preconditions for syncing the power state of a node, checked by the
+# database when the node is loaded by task_manager.acquire.
+SYNC_POWER_STATE_FILTERS = {'provision_state_not_in': SYNC_EXCLUDED_STATES,
+                            'maintenance': False,
+                            'with_target_power_state': False,
+                            'reserved': False}
+
+# Maximum number of node history records deleted by one statement.
+NODE_HISTORY_PURGE_CHUNK = 100
+
 
 class ConductorManager(base_manager.BaseConductorManager):
     """Ironic Conductor manager main class."""
@@ -106,6 +119,7 @@ class ConductorManager(base_manager.BaseConductorManager):
         # NOTE(TheJulia): This is less a metric-able count, but a means to
         # sort out nodes and prioritise a subset (of non-responding nodes).
         self.power_state_sync_count = collections.defaultdict(int)
+        self._power_sync_schedule = power_sync.PowerSyncSchedule()
 
     @METRICS.timer('ConductorManager._clean_up_caches')
     @periodics.periodic(spacing=CONF.conductor.cache_clean_up_interval,
@@ -988,7 +1002,8 @@ class ConductorManager(base_manager.BaseConductorManager):
                                       task.node)
             task.spawn_after(
                 self._spawn_worker,
-                deployments.continue_node_deploy, task)
+                deployments.continue_node_deploy, task,
+                _worker_class=worker_classes.CONTINUATION)
 
     @METRICS.timer('ConductorManager.continue_node_service')
     def continue_node_service(self, context, node_id):
@@ -1028,7 +1043,8 @@ class ConductorManager(base_manager.BaseConductorManager):
                                       task.node)
             task.spawn_after(
                 self._spawn_worker,
-                servicing.continue_node_service, task)
+                servicing.continue_node_service, task,
+                _worker_class=worker_classes.CONTINUATION)
 
     @METRICS.timer('ConductorManager.do_node_tear_down')
     @messaging.expected_exceptions(exception.NoFreeConductorWorker,
@@ -1295,7 +1311,8 @@ class ConductorManager(base_manager.BaseConductorManager):
                                       task.node)
             task.spawn_after(
                 self._spawn_worker,
-                cleaning.continue_node_clean, task)
+                cleaning.continue_node_clean, task,
+                _worker_class=worker_classes.CONTINUATION)
 
     @METRICS.timer('ConductorManager.do_provisioning_action')
     @messaging.expected_exceptions(exception.NoFreeConductorWorker,
@@ -1462,9 +1479,14 @@ class ConductorManager(base_manager.BaseConductorManager):
         """Periodic task to sync power states for the nodes."""
         filters = {'maintenance': False}
 
+        if power_sync.enabled():
+            nodes = self._get_power_sync_due_nodes(filters)
+        else:
+            nodes = self.iter_nodes(fields=['id'], filters=filters)
+
         # NOTE(etingof): prioritize non-responding nodes to fail them fast
         nodes = sorted(
-            self.iter_nodes(fields=['id'], filters=filters),
+            nodes,
             key=lambda n: -self.power_state_sync_count.get(n[0], 0)
         )
 
@@ -1482,7 +1504,8 @@ class ConductorManager(base_manager.BaseConductorManager):
             try:
                 futures.append(
                     self._spawn_worker(self._sync_power_state_nodes_task,
-                                       context, nodes_queue))
+                                       context, nodes_queue,
+                                       _worker_class=worker_classes.BULK))
             except exception.NoFreeConductorWorker:
                 LOG.warning("There are no more conductor workers for "
                             "power sync task. %(workers)d workers have "
@@ -1504,6 +1527,38 @@ class ConductorManager(base_manager.BaseConductorManager):
         LOG.debug('Completed power state sync operation, evaluated %s '
                   'nodes.', len(futures))
 
+    def _get_power_sync_due_nodes(self, filters):
+        """Get the nodes due a power state sync by the adaptive schedule.
+
+        :param filters: filters to apply to the list of nodes.
+        :returns: a list of tuples (node UUID, driver, conductor group,
+            node ID) of the nodes to sync.
+        """
+        nodes = []
+        seen = set()
+        skipped = 0
+        now = timeutils.utcnow()
+        for (node_uuid, driver, conductor_group, node_id, power_state,
+             provision_updated_at) in self.iter_nodes(
+                fields=['id', 'power_state', 'provision_updated_at'],
+                filters=filters):
+            seen.add(node_uuid)
+            if (self.power_state_sync_count.get(node_uuid)
+                    or self._power_sync_schedule.is_due(
+                        node_uuid, power_state, provision_updated_at,
+                        now=now)):
+                nodes.append((node_uuid, driver, conductor_group, node_id))
+            else:
+                skipped += 1
+
+        # Drop nodes that are no longer mapped to this conductor, are in
+        # maintenance or have been deleted.
+        self._power_sync_schedule.retain(seen)
+
+        METRICS.send_gauge(
+            'ConductorManager.PowerSyncSkippedNodesCount', skipped)
+        return nodes
+
     def _sync_power_state_nodes_task(self, context, nodes):
         """Invokes power state sync on nodes from synchronized queue.
 
@@ -1514,6 +1569,11 @@ class ConductorManager(base_manager.BaseConductorManager):
         2) Node is not in maintenance mode.
         3) Node is not in DEPLOYWAIT/CLEANWAIT provision state.
         4) Node doesn't have a reservation
+        5) Node doesn't have a power action in progress
+
+        Conditions 2-5 are passed as preconditions to
+        task_manager.acquire(), so that they are checked by the same
+        database query that loads the node.
 
         NOTE: Grabbing a lock here can cause other methods to fail to
         grab it. We want to avoid trying to grab a lock while a node
@@ -1522,19 +1582,6 @@ class ConductorManager(base_manager.BaseConductorManager):
         can do here to avoid failing a brand new deploy to a node that
         we've locked here, though.
         """
-
-        # FIXME(comstud): Since our initial state checks are outside
-        # of the lock (to try to avoid the lock), some checks are
-        # repeated after grabbing the lock so we can unlock quickly.
-        # The node mapping is not re-checked because it doesn't much
-        # matter if things happened to re-balance.
-        #
-        # This is inefficient and racey. We end up with calling DB API's
-        # get_node() twice (once here, and once in acquire(). Ideally we
-        # add a way to pass constraints to task_manager.acquire()
-        # (through to its DB API call) so that we can eliminate our call
-        # and first set of checks below.
-
         while not self._shutdown:
             try:
                 (node_uuid, driver, conductor_group,
@@ -1544,20 +1591,16 @@ class ConductorManager(base_manager.BaseConductorManager):
 
             try:
                 # NOTE(dtantsur): start with a shared lock, upgrade if needed
-                with task_manager.acquire(context, node_uuid,
-                                          purpose='power state sync',
-                                          shared=True) as task:
-                    # NOTE(tenbrae): we should not acquire a lock on a node in
-                    #             DEPLOYWAIT/CLEANWAIT, as this could cause
-                    #             an error within a deploy ramdisk POSTing back
-                    #             at the same time.
-                    # NOTE(dtantsur): it's also pointless (and dangerous) to
-                    # sync power state when a power action is in progress
-                    if (task.node.provision_state in SYNC_EXCLUDED_STATES
-                            or task.node.maintenance
-                            or task.node.target_power_state
-                            or task.node.reservation):
-                        continue
+                # NOTE(tenbrae): we should not acquire a lock on a node in
+                #             DEPLOYWAIT/CLEANWAIT, as this could cause
+                #             an error within a deploy ramdisk POSTing back
+                #             at the same time.
+                # NOTE(dtantsur): it's also pointless (and dangerous) to
+                # sync power state when a power action is in progress
+                with task_manager.acquire(
+                        context, node_uuid, purpose='power state sync',
+                        shared=True,
+                        filters=SYNC_POWER_STATE_FILTERS) as task:
                     count = do_sync_power_state(
                         task, self.power_state_sync_count[node_uuid])
                     if count:
@@ -1565,6 +1608,11 @@ class ConductorManager(base_manager.BaseConductorManager):
                     else:
                         # don't bloat the dict with non-failing nodes
                         del self.power_state_sync_count[node_uuid]
+                    if power_sync.enabled():
+                        self._power_sync_schedule.record(
+                            node_uuid, task.node.power_state,
+                            task.node.provision_updated_at,
+                            failed=bool(count))
             except exception.NodeNotFound:
                 LOG.info("During sync_power_state, node %(node)s was not "
                          "found and presumed deleted by another process.",
@@ -1579,6 +1627,10 @@ class ConductorManager(base_manager.BaseConductorManager):
                 LOG.info("During sync_power_state, node %(node)s was "
                          "already locked by another process. Skip.",
                          {'node': node_uuid})
+            except exception.NodePreconditionFailed:
+                LOG.debug("During sync_power_state, node %(node)s was "
+                          "excluded from power state sync. Skip.",
+                          {'node': node_uuid})
             finally:
                 # Yield on every iteration
                 eventlet.sleep(0)
@@ -1592,6 +1644,7 @@ class ConductorManager(base_manager.BaseConductorManager):
         # condition.
         filters={'maintenance': True, 'fault': faults.POWER_FAILURE},
         node_count_metric_name='ConductorManager.PowerSyncRecoveryNodeCount',
+        workers=lambda: CONF.conductor.sync_power_state_workers,
     )
     def _power_failure_recovery(self, task, context):
         """Periodic task to check power states for nodes in maintenance.
@@ -1675,8 +1728,9 @@ class ConductorManager(base_manager.BaseConductorManager):
         sort_key = 'provision_updated_at'
         callback_method = utils.cleanup_after_timeout
         err_handler = utils.provisioning_error_handler
-        self._fail_if_in_state(context, filters, states.DEPLOYWAIT,
-                               sort_key, callback_method, err_handler)
+        self._fail_expired_in_state(context, filters, states.DEPLOYWAIT,
+                                    sort_key, callback_method=callback_method,
+                                    err_handler=err_handler)
 
     @METRICS.timer('ConductorManager._check_orphan_nodes')
     @periodics.periodic(
@@ -1898,10 +1952,11 @@ class ConductorManager(base_manager.BaseConductorManager):
                    'provision_state': states.CLEANWAIT,
                    'maintenance': False,
                    'provisioned_before': callback_timeout}
-        self._fail_if_in_state(context, filters, states.CLEANWAIT,
-                               'provision_updated_at',
-                               keep_target_state=True,
-                               callback_method=utils.cleanup_cleanwait_timeout)
+        self._fail_expired_in_state(
+            context, filters, states.CLEANWAIT,
+            'provision_updated_at',
+            keep_target_state=True,
+            callback_method=utils.cleanup_cleanwait_timeout)
 
     @METRICS.timer('ConductorManager._check_rescuewait_timeouts')
     @periodics.periodic(spacing=CONF.conductor.check_rescue_state_interval,
@@ -1918,11 +1973,11 @@ class ConductorManager(base_manager.BaseConductorManager):
                    'provision_state': states.RESCUEWAIT,
                    'maintenance': False,
                    'provisioned_before': callback_timeout}
-        self._fail_if_in_state(context, filters, states.RESCUEWAIT,
-                               'provision_updated_at',
-                               keep_target_state=True,
-                               callback_method=utils.cleanup_rescuewait_timeout
-                               )
+        self._fail_expired_in_state(
+            context, filters, states.RESCUEWAIT,
+            'provision_updated_at',
+            keep_target_state=True,
+            callback_method=utils.cleanup_rescuewait_timeout)
 
     @METRICS.timer('ConductorManager._check_servicewait_timeouts')
     @periodics.periodic(
@@ -1940,7 +1995,7 @@ class ConductorManager(base_manager.BaseConductorManager):
                    'provision_state': states.SERVICEWAIT,
                    'maintenance': False,
                    'provisioned_before': callback_timeout}
-        self._fail_if_in_state(
+        self._fail_expired_in_state(
             context, filters, states.SERVICEWAIT,
             'provision_updated_at',
             keep_target_state=True,
@@ -2790,7 +2845,8 @@ class ConductorManager(base_manager.BaseConductorManager):
                 # the self collection of "sensor" data from the conductor,
                 # as were not launching external processes, we're just reading
                 # from an internal data structure, if we can.
-                self._spawn_worker(self._sensors_conductor, context)
+                self._spawn_worker(self._sensors_conductor, context,
+                                   _worker_class=worker_classes.BULK)
         if not CONF.sensor_data.enable_for_nodes:
             # NOTE(TheJulia): If node sensor data is not required, then
             # skip the rest of this method.
@@ -2811,7 +2867,8 @@ class ConductorManager(base_manager.BaseConductorManager):
             try:
                 futures.append(
                     self._spawn_worker(self._sensors_nodes_task,
-                                       context, nodes))
+                                       context, nodes,
+                                       _worker_class=worker_classes.BULK))
             except exception.NoFreeConductorWorker:
                 LOG.warning("There is no more conductor workers for "
                             "task of sending sensors data. %(workers)d "
@@ -3148,8 +3205,8 @@ class ConductorManager(base_manager.BaseConductorManager):
                    'inspection_started_before': callback_timeout}
         sort_key = 'inspection_started_at'
         last_error = _("timeout reached while inspecting the node")
-        self._fail_if_in_state(context, filters, states.INSPECTWAIT,
-                               sort_key, last_error=last_error)
+        self._fail_expired_in_state(context, filters, states.INSPECTWAIT,
+                                    sort_key, last_error=last_error)
 
     @METRICS.timer('ConductorManager.set_target_raid_config')
     @messaging.expected_exceptions(exception.NodeLocked,
@@ -3293,7 +3350,8 @@ class ConductorManager(base_manager.BaseConductorManager):
                 agent_status, agent_status_message,
                 # NOTE(dtantsur): heartbeats are not that critical to allow
                 # them to potentially overload the conductor.
-                _allow_reserved_pool=False)
+                _allow_reserved_pool=False,
+                _worker_class=worker_classes.CONTINUATION)
 
     @METRICS.timer('ConductorManager.vif_list')
     @messaging.expected_exceptions(exception.NetworkError,
@@ -3704,37 +3762,46 @@ class ConductorManager(base_manager.BaseConductorManager):
     def _manage_node_history(self, context):
         """Periodic task to keep the node history tidy."""
         max_batch = CONF.conductor.node_history_cleanup_batch_count
-        # NOTE(TheJulia): Asks the db for the list. Presently just gets
-        # the node id and the count. If we incorporate by date constraint
-        # or handling, then it will need to be something like the method
-        # needs to identify the explicit ID values to delete, and then
-        # the deletion process needs to erase in logical chunks.
-        entries_to_clean = self.dbapi.query_node_history_records_for_purge(
-            conductor_id=self.conductor.id)
-        count = 0
-        for node_id in entries_to_clean:
-            if count < max_batch:
-                # If we have not hit our total limit, proceed
-                if entries_to_clean[node_id]:
-                    # if we have work to do on this node, proceed.
-                    self.dbapi.bulk_delete_node_history_records(
-                        entries_to_clean[node_id])
-            else:
-                LOG.warning('While cleaning up node history records, '
-                            'we reached the maximum number of records '
-                            'permitted in a single batch. If this error '
-                            'is repeated, consider tuning node history '
-                            'configuration options to be more aggressive '
-                            'by increasing frequency and lowering the '
-                            'number of entries to be deleted to not '
-                            'negatively impact performance.')
+        started = time.monotonic()
+        purged = 0
+        marker = None
+        work_left = False
+        while purged < max_batch:
+            limit = min(max_batch - purged, NODE_HISTORY_PURGE_CHUNK)
+            # NOTE: one more ID is requested to find out if there will be
+            # work left after this chunk.
+            with METRICS.timer('ConductorManager.NodeHistoryPurgeQuery'):
+                entries = self.dbapi.get_node_history_ids_for_purge(
+                    self.conductor.id, limit + 1, marker=marker)
+            work_left = len(entries) > limit
+            entries = entries[:limit]
+            if not entries:
+                break
+            with METRICS.timer('ConductorManager.NodeHistoryPurgeDelete'):
+                self.dbapi.bulk_delete_node_history_records(entries)
+            purged += len(entries)
+            marker = entries[-1]
+            if not work_left:
                 break
-            count = count + len(entries_to_clean[node_id])
             # Yield to other threads, since we also don't want to be
             # looping tightly deleting rows as that will negatively
             # impact DB access if done in excess.
             eventlet.sleep(0)
 
+        METRICS.send_gauge('ConductorManager.NodeHistoryPurged', purged)
+        LOG.debug('Purged %(count)d node history records in %(time).2f '
+                  'seconds', {'count': purged,
+                              'time': time.monotonic() - started})
+        if work_left:
+            LOG.warning('While cleaning up node history records, '
+                        'we reached the maximum number of records '
+                        'permitted in a single batch. If this error '
+                        'is repeated, consider tuning node history '
+                        'configuration options to be more aggressive '
+                        'by increasing frequency and lowering the '
+                        'number of entries to be deleted to not '
+                        'negatively impact performance.')
+
     def _concurrent_action_limit(self, action):
         """Check Concurrency limits and block operations if needed.
 
@@ -3808,13 +3875,16 @@ class ConductorManager(base_manager.BaseConductorManager):
                 task.spawn_after(
                     self._spawn_worker,
                     inspection.continue_inspection,
-                    task, inventory, plugin_data)
+                    task, inventory, plugin_data,
+                    _worker_class=worker_classes.CONTINUATION)
             else:
                 task.process_event(
                     'resume',
                     callback=self._spawn_worker,
                     call_args=(inspection.continue_inspection,
                                task, inventory, plugin_data),
+                    call_kwargs={
+                        '_worker_class': worker_classes.CONTINUATION},
                     err_handler=utils.provisioning_error_handler)
 
     @METRICS.timer('ConductorManager.do_node_service')
@@ -4116,7 +4186,8 @@ def do_sync_power_state(task, count):
         return 0
 
     # We will modify a node, so upgrade our lock and use reloaded node.
-    # This call may raise NodeLocked that will be caught on upper level.
+    # This call may raise NodeLocked or NodePreconditionFailed that will be
+    # caught on upper level.
     task.upgrade_lock()
     node = task.node
 
@@ -15,15 +15,20 @@
 import collections
 import functools
 import inspect
+import itertools
+import threading
 
 import eventlet
 from futurist import periodics
+from futurist import waiters
 from oslo_log import log
 
 from ironic.common import exception
 from ironic.common import metrics_utils
 from ironic.conductor import base_manager
 from ironic.conductor import task_manager
+from ironic.conductor import worker_classes
+from ironic.conf import CONF
 from ironic.drivers import base as driver_base
 
 
@@ -50,7 +55,8 @@ class Stop(Exception):
 
 def node_periodic(purpose, spacing, enabled=True, filters=None,
                   predicate=None, predicate_extra_fields=(), limit=None,
-                  shared_task=True, node_count_metric_name=None):
+                  shared_task=True, node_count_metric_name=None,
+                  workers=None):
     """A decorator to define a periodic task to act on nodes.
 
     Defines a periodic task that fetches the list of nodes mapped to the
@@ -91,6 +97,12 @@ def node_periodic(purpose, spacing, enabled=True, filters=None,
     :param node_count_metric_name: A string value to identify a metric
         representing the count of matching nodes to be recorded upon the
         completion of the periodic.
+    :param workers: how many nodes to process in parallel. If greater than 1,
+        the nodes are processed by up to this many conductor workers (capped
+        by ``[conductor]periodic_max_workers``), the periodic task itself
+        being one of them. Can be a callable, in which case it will be called
+        on each iteration to determine the number of workers. Defaults to
+        processing the nodes one by one.
     """
     node_type = collections.namedtuple(
         'Node',
@@ -123,11 +135,20 @@ def node_periodic(purpose, spacing, enabled=True, filters=None,
             else:
                 local_limit = limit
             assert local_limit is None or local_limit > 0
-            node_count = 0
+
+            if callable(workers):
+                local_workers = workers()
+            else:
+                local_workers = workers
+            local_workers = min(local_workers or 1,
+                                CONF.conductor.periodic_max_workers)
+
             nodes = manager.iter_nodes(filters=filters,
                                        fields=predicate_extra_fields)
-            for (node_uuid, *other) in nodes:
-                node_count += 1
+            state = _IterationState(nodes, local_limit)
+
+            def _process_node(node_uuid, other):
+                """Process one node, returns whether it counts to the limit."""
                 if predicate is not None:
                     node = node_type(node_uuid, *other)
                     if accepts_manager:
@@ -135,7 +156,7 @@ def node_periodic(purpose, spacing, enabled=True, filters=None,
                     else:
                         result = predicate(node)
                     if not result:
-                        continue
+                        return False
 
                 try:
                     with task_manager.acquire(context, node_uuid,
@@ -144,35 +165,167 @@ def node_periodic(purpose, spacing, enabled=True, filters=None,
                         if interface_type is not None:
                             impl = getattr(task.driver, interface_type)
                             if not isinstance(impl, self.__class__):
-                                continue
+                                return False
 
                         result = func(self, task, *args, **kwargs)
                 except exception.NodeNotFound:
                     LOG.info("During %(action)s, node %(node)s was not found "
                              "and presumed deleted by another process.",
                              {'node': node_uuid, 'action': purpose})
+                    return False
                 except exception.NodeLocked:
                     LOG.info("During %(action)s, node %(node)s was already "
                              "locked by another process. Skip.",
                              {'node': node_uuid, 'action': purpose})
-                except Stop:
-                    break
+                    return False
                 finally:
                     # Yield on every iteration
                     eventlet.sleep(0)
 
-                if (local_limit is not None
-                        and (result is None or result)):
-                    local_limit -= 1
-                    if not local_limit:
-                        return
+                return result is None or result
+
+            _run_workers(manager, local_workers, state, _process_node,
+                         purpose)
+
+            if state.limit_reached:
+                return
             if node_count_metric_name:
                 # Send post-run metrics.
                 METRICS.send_gauge(
                     node_count_metric_name,
-                    node_count)
+                    state.node_count)
             LOG.debug('Completed periodic task for purpose %s.', purpose)
 
         return wrapper
 
     return decorator
+
+
+def _run_workers(manager, workers, state, process_node, purpose):
+    """Process the nodes from the iteration state using several workers.
+
+    :param manager: the conductor manager instance.
+    :param workers: the maximum number of workers, including the current
+        thread. Additional workers are only spawned when there is a node for
+        them to process.
+    :param state: an _IterationState instance.
+    :param process_node: a callable processing one node, returns whether
+        the node counts towards the limit.
+    :param purpose: a human-readable description of the activity.
+    """
+    def _worker(item):
+        while item is not None:
+            try:
+                counted = process_node(*item)
+            except Stop:
+                state.stop()
+                return
+            except Exception:
+                # Do not let other workers carry on
+                state.stop()
+                raise
+            finally:
+                state.node_done()
+            if counted:
+                state.count_node()
+            item = state.next_node()
+
+    futures = []
+    try:
+        first_item = state.next_node()
+        # NOTE: the nodes are fetched lazily, only spawn a worker once there
+        # is a node for it.
+        for worker_number in range(workers - 1):
+            try:
+                item = state.next_node()
+            except Exception:
+                state.stop()
+                raise
+            if item is None:
+                break
+            try:
+                futures.append(manager._spawn_worker(
+                    _worker, item, _allow_reserved_pool=False,
+                    _worker_class=worker_classes.PERIODIC))
+            except exception.NoFreeConductorWorker:
+                state.put_back(item)
+                LOG.warning("There are no more conductor workers for "
+                            "%(action)s. %(workers)d workers have been "
+                            "already spawned.",
+                            {'action': purpose, 'workers': worker_number})
+                break
+
+        _worker(first_item)
+    finally:
+        if futures:
+            waiters.wait_for_all(futures)
+    for future in futures:
+        # Re-raise the first unexpected exception, if any
+        future.result()
+
+
+class _IterationState(object):
+    """State of an iteration of a node periodic task shared by its workers.
+
+    The limit is never exceeded: a node is only handed out if the nodes
+    already counted plus the ones being processed are below the limit.
+    A worker that cannot get a node because of that exits, the ones still
+    processing nodes carry on if their nodes end up not being counted.
+    """
+
+    def __init__(self, nodes, limit):
+        self._nodes = iter(nodes)
+        self._limit = limit
+        self._lock = threading.Lock()
+        self._counted = 0
+        self._in_progress = 0
+        self._stopped = False
+        self.node_count = 0
+        self.limit_reached = False
+
+    def next_node(self):
+        """Get the next node to process.
+
+        :returns: a tuple (node UUID, other fields) or None if the iteration
+            is over for the calling worker.
+        """
+        with self._lock:
+            if self._stopped:
+                return None
+            if (self._limit is not None
+                    and self._counted + self._in_progress >= self._limit):
+                return None
+            try:
+                (node_uuid, *other) = next(self._nodes)
+            except StopIteration:
+                self._stopped = True
+                return None
+            self.node_count += 1
+            self._in_progress += 1
+            return node_uuid, other
+
+    def put_back(self, item):
+        """Return a node that has not been processed to the iteration.
+
+        :param item: a tuple returned by next_node.
+        """
+        node_uuid, other = item
+        with self._lock:
+            self._nodes = itertools.chain([(node_uuid, *other)], self._nodes)
+            self.node_count -= 1
+            self._in_progress -= 1
+
+    def node_done(self):
+        with self._lock:
+            self._in_progress -= 1
+
+    def count_node(self):
+        with self._lock:
+            self._counted += 1
+            if self._limit is not None and self._counted >= self._limit:
+                self.limit_reached = True
+                self._stopped = True
+
+    def stop(self):
+        with self._lock:
+            self._stopped = True
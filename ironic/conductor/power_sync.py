@@ -0,0 +1,140 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Adaptive per-node schedule for the power state synchronization.
+
+By default every node is synchronized on every run of the power state sync
+periodic task. When ``[conductor]power_state_sync_max_interval`` is set,
+the interval between syncs of a node doubles every time its power state is
+found unchanged, up to that ceiling. A node goes back to the base interval
+(``[conductor]sync_power_state_interval``) as soon as its power state
+changes, a sync fails, or its provision state changes.
+"""
+
+import datetime
+import threading
+
+from oslo_utils import timeutils
+
+from ironic.conf import CONF
+
+
+class _Entry(object):
+
+    __slots__ = ('interval', 'next_due', 'power_state', 'provision_updated_at')
+
+    def __init__(self, interval, next_due, power_state, provision_updated_at):
+        self.interval = interval
+        self.next_due = next_due
+        self.power_state = power_state
+        self.provision_updated_at = provision_updated_at
+
+
+def _normalize(timestamp):
+    # NOTE: objects carry timezone-aware timestamps while the database
+    # API returns naive UTC ones, normalize to the latter.
+    if timestamp is None:
+        return None
+    return timeutils.normalize_time(timestamp)
+
+
+def enabled():
+    """Whether the adaptive schedule is enabled."""
+    return (CONF.conductor.power_state_sync_max_interval
+            > CONF.conductor.sync_power_state_interval > 0)
+
+
+class PowerSyncSchedule(object):
+    """Tracks when the power state of each node should be synced next."""
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def is_due(self, node_uuid, power_state, provision_updated_at, now=None):
+        """Check if the power state of a node should be synced.
+
+        :param node_uuid: node UUID.
+        :param power_state: the power state of the node in the database.
+        :param provision_updated_at: the last time the provision state of
+            the node was updated.
+        :param now: the current time, defaults to ``timeutils.utcnow()``.
+        :returns: True if the node has never been synced, if it has been
+            changed since its last sync or if its next sync is due.
+        """
+        entry = self._entries.get(node_uuid)
+        if entry is None:
+            return True
+        if (entry.power_state != power_state
+                or entry.provision_updated_at
+                != _normalize(provision_updated_at)):
+            return True
+        if now is None:
+            now = timeutils.utcnow()
+        # NOTE: syncs happen at some point during a run of the periodic
+        # task, allow half of a period of slack so that a node due right
+        # after the next run starts is not postponed by a whole period.
+        slack = datetime.timedelta(
+            seconds=CONF.conductor.sync_power_state_interval / 2)
+        return now + slack >= entry.next_due
+
+    def record(self, node_uuid, power_state, provision_updated_at,
+               failed=False, now=None):
+        """Record the result of a power state sync and schedule the next.
+
+        :param node_uuid: node UUID.
+        :param power_state: the power state of the node after the sync.
+        :param provision_updated_at: the last time the provision state of
+            the node was updated.
+        :param failed: whether the sync failed.
+        :param now: the current time, defaults to ``timeutils.utcnow()``.
+        """
+        base = CONF.conductor.sync_power_state_interval
+        ceiling = CONF.conductor.power_state_sync_max_interval
+        if now is None:
+            now = timeutils.utcnow()
+        provision_updated_at = _normalize(provision_updated_at)
+
+        with self._lock:
+            entry = self._entries.get(node_uuid)
+            if (failed
+                    or entry is None
+                    or entry.power_state != power_state
+                    or entry.provision_updated_at != provision_updated_at
+                    or (provision_updated_at is not None
+                        and (now - provision_updated_at).total_seconds()
+                        < ceiling)):
+                # New, failing, changed or recently provisioned nodes are
+                # synced on every run.
+                interval = base
+            else:
+                interval = min(entry.interval * 2, ceiling)
+            self._entries[node_uuid] = _Entry(
+                interval, now + datetime.timedelta(seconds=interval),
+                power_state, provision_updated_at)
+
+    def forget(self, node_uuid):
+        """Stop tracking a node, its next sync will be due immediately."""
+        with self._lock:
+            self._entries.pop(node_uuid, None)
+
+    def retain(self, node_uuids):
+        """Stop tracking all nodes except for the given ones.
+
+        :param node_uuids: a set of node UUIDs.
+        """
+        with self._lock:
+            for node_uuid in set(self._entries) - node_uuids:
+                del self._entries[node_uuid]
@@ -18,6 +18,7 @@
 Client side of the conductor RPC API.
 """
 
+import collections
 import random
 
 from oslo_log import log
@@ -51,6 +52,9 @@ class LocalContext:
                 _("The built-in conductor is not available, it might have "
                   "crashed. Please check the logs and correct the "
                   "configuration, if required."))
+        # NOTE: the conductor must not read from the database replica, even
+        # when serving a read-only API request.
+        replica_reads = dbapi.allow_replica_reads(False)
         try:
             return getattr(rpc.GLOBAL_MANAGER, rpc_call_name)(context,
                                                               **kwargs)
@@ -58,6 +62,8 @@ class LocalContext:
         except messaging.ExpectedException as exc:
             exc_value, exc_tb = exc.exc_info[1:]
             raise exc_value.with_traceback(exc_tb) from None
+        finally:
+            dbapi.allow_replica_reads(replica_reads)
 
     def cast(self, context, rpc_call_name, **kwargs):
         """Make a local conductor call.
@@ -232,10 +238,10 @@ class ConductorAPI(object):
 
         """
         try:
-            ring = self.ring_manager.get_ring(node.driver,
-                                              node.conductor_group)
-            dest = ring.get_nodes(node.uuid.encode('utf-8'))
-            return dest.pop()
+            hosts = self.ring_manager.get_hosts(node.driver,
+                                                node.conductor_group,
+                                                node.uuid)
+            return next(iter(hosts))
         except exception.DriverNotFound:
             reason = (_('No conductor service registered which supports '
                         'driver %(driver)s for conductor group "%(group)s". '
@@ -243,6 +249,31 @@ class ConductorAPI(object):
                       {'driver': node.driver, 'group': node.conductor_group})
             raise exception.NoValidHost(reason=reason)
 
+    def get_conductors_for(self, nodes):
+        """Get the conductors which several nodes are mapped to.
+
+        Unlike calling get_conductor_for() for every node, the hash ring of
+        each driver and conductor group is only looked up once.
+
+        :param nodes: an iterable of node objects.
+        :returns: a dict mapping node UUIDs to conductor hostnames. Nodes
+            which are not mapped to any conductor are omitted.
+        """
+        groups = collections.defaultdict(list)
+        for node in nodes:
+            groups[(node.driver, node.conductor_group)].append(node.uuid)
+
+        result = {}
+        for (driver, conductor_group), node_uuids in groups.items():
+            try:
+                hosts = self.ring_manager.get_hosts_for_nodes(
+                    driver, conductor_group, node_uuids)
+            except (exception.DriverNotFound, exception.TemporaryFailure):
+                continue
+            for node_uuid, node_hosts in hosts.items():
+                result[node_uuid] = next(iter(node_hosts))
+        return result
+
     def get_topic_for(self, node):
         """Get the RPC topic for the conductor service the node is mapped to.
 
@@ -102,6 +102,7 @@ raised in the background thread.):
 
 import copy
 import functools
+import re
 import traceback
 
 import futurist
@@ -115,7 +116,10 @@ from ironic.common import driver_factory
 from ironic.common import exception
 from ironic.common.i18n import _
 from ironic.common import states
+from ironic.conductor import lock_waiters
 from ironic.conductor import notification_utils as notify
+from ironic.conductor import wait_timeouts
+from ironic.db import query_stats
 from ironic import objects
 from ironic.objects import fields
 
@@ -176,7 +180,7 @@ class TaskManager(object):
 
     def __init__(self, context, node_id, shared=False,
                  purpose='unspecified action', retry=True, patient=False,
-                 load_driver=True):
+                 load_driver=True, filters=None):
         """Create a new TaskManager.
 
         Acquire a lock on a node. The lock can be either shared or
@@ -199,10 +203,20 @@ class TaskManager(object):
         :param load_driver: whether to load the ``driver`` object. Set this to
                             False if loading the driver is undesired or
                             impossible.
+        :param filters: optional preconditions the node must match, in the
+                        format accepted by the ``get_nodeinfo_list`` database
+                        API, e.g. ``{'maintenance': False}``. They are
+                        checked by the same database statement that loads
+                        (for shared locks) or reserves (for exclusive locks)
+                        the node, so a node that does not match is rejected
+                        before any driver is loaded. They are checked again
+                        when a shared lock is upgraded. Failing
+                        preconditions are never retried.
         :raises: DriverNotFound
         :raises: InterfaceNotFoundInEntrypoint
         :raises: NodeNotFound
         :raises: NodeLocked
+        :raises: NodePreconditionFailed if the node does not match filters.
 
         """
 
@@ -219,10 +233,15 @@ class TaskManager(object):
         self.shared = shared
         self._retry = retry
         self._patient = patient
+        self._filters = filters
 
         self.fsm = states.machine.copy()
         self._purpose = purpose
         self._debug_timer = timeutils.StopWatch()
+        # NOTE: only the queries executed by the thread acquiring the task
+        # are accounted for, not those of a worker spawned to complete it.
+        self._query_stats = query_stats.start(
+            'TaskManager.%s' % re.sub(r'\W+', '_', purpose).strip('_'))
 
         # states and event for notification
         self._prev_provision_state = None
@@ -231,13 +250,16 @@ class TaskManager(object):
         self._saved_node = None
 
         try:
-            node = objects.Node.get(context, node_id)
+            if filters:
+                node = objects.Node.get(context, node_id, filters=filters)
+            else:
+                node = objects.Node.get(context, node_id)
             LOG.debug("Attempting to get %(type)s lock on node %(node)s (for "
                       "%(purpose)s)",
                       {'type': 'shared' if shared else 'exclusive',
                        'node': node.uuid, 'purpose': purpose})
             if not self.shared:
-                self._lock()
+                self._lock(node.id)
             else:
                 self._debug_timer.restart()
                 self.node = node
@@ -327,20 +349,42 @@ class TaskManager(object):
         if self.driver is None:
             self.driver = driver_factory.build_driver_for_task(self)
 
-    def _lock(self):
+    def _lock(self, node_id):
         self._debug_timer.restart()
 
+        max_lock_time = \
+            CONF.conductor.node_locked_retry_interval * \
+            CONF.conductor.node_locked_retry_attempts
+
+        woken = False
+        early_wakeups = 0
+
+        def stop_after_attempts(retry_state):
+            # NOTE: attempts made after being woken early by a release, but
+            # which lost the race for the lock, do not count as long as the
+            # usual time of all attempts is not exceeded: they did not wait
+            # for node_locked_retry_interval.
+            attempts = CONF.conductor.node_locked_retry_attempts
+            if retry_state.attempt_number - early_wakeups >= attempts:
+                return True
+            return (retry_state.attempt_number >= attempts
+                    and retry_state.seconds_since_start >= max_lock_time)
+
         if self._patient:
             stop_after = tenacity.stop_never
         elif self._retry:
-            stop_after = tenacity.stop_after_attempt(
-                CONF.conductor.node_locked_retry_attempts)
+            stop_after = stop_after_attempts
         else:
             stop_after = tenacity.stop_after_attempt(1)
 
-        max_lock_time = \
-            CONF.conductor.node_locked_retry_interval * \
-            CONF.conductor.node_locked_retry_attempts
+        def wait_for_release(seconds):
+            # NOTE: Returns early if the lock is released by another task of
+            # this conductor. Otherwise it is likely held by another
+            # conductor, poll for it every node_locked_retry_interval.
+            nonlocal woken, early_wakeups
+            woken = lock_waiters.wait(node_id, seconds, first=woken)
+            if woken:
+                early_wakeups += 1
 
         # NodeLocked exceptions can be annoying. Let's try to alleviate
         # some of that pain by retrying our lock attempts.
@@ -349,6 +393,7 @@ class TaskManager(object):
             stop=stop_after,
             wait=tenacity.wait_fixed(
                 CONF.conductor.node_locked_retry_interval),
+            sleep=wait_for_release,
             reraise=True)
         def reserve_node():
             if self._debug_timer.elapsed() > max_lock_time:
@@ -358,15 +403,26 @@ class TaskManager(object):
                             '%(time).2f seconds.',
                             {'node': self.node_id, 'purpose': self._purpose,
                              'time': self._debug_timer.elapsed()})
-            self.node = objects.Node.reserve(self.context, CONF.host,
-                                             self.node_id)
+            if self._filters:
+                self.node = objects.Node.reserve(self.context, CONF.host,
+                                                 self.node_id,
+                                                 filters=self._filters)
+            else:
+                self.node = objects.Node.reserve(self.context, CONF.host,
+                                                 self.node_id)
             LOG.debug("Node %(node)s successfully reserved for %(purpose)s "
                       "(took %(time).2f seconds)",
                       {'node': self.node.uuid, 'purpose': self._purpose,
                        'time': self._debug_timer.elapsed()})
             self._debug_timer.restart()
 
-        reserve_node()
+        try:
+            reserve_node()
+        except Exception:
+            # Pass the release notification on to the next waiter
+            if woken:
+                lock_waiters.notify(node_id)
+            raise
 
     def upgrade_lock(self, purpose=None, retry=None):
         """Upgrade a shared lock to an exclusive lock.
@@ -392,7 +448,7 @@ class TaskManager(object):
                       'seconds)',
                       {'uuid': self.node.uuid, 'purpose': self._purpose,
                        'time': self._debug_timer.elapsed()})
-            self._lock()
+            self._lock(self.node.id)
             self.shared = False
 
     def spawn_after(self, _spawn_method, *args, **kwargs):
@@ -447,14 +503,14 @@ class TaskManager(object):
         longer be accessed.
         """
 
-        if not self.shared:
+        if not self.shared and self.node:
             try:
-                if self.node:
-                    objects.Node.release(self.context, CONF.host, self.node.id)
+                objects.Node.release(self.context, CONF.host, self.node.id)
             except exception.NodeNotFound:
                 # squelch the exception if the node was deleted
                 # within the task's context.
                 pass
+            lock_waiters.notify(self.node.id)
         if self.node:
             LOG.debug("Successfully released %(type)s lock for %(purpose)s "
                       "on node %(node)s (lock was held %(time).2f sec)",
@@ -468,6 +524,7 @@ class TaskManager(object):
         self.volume_connectors = None
         self.volume_targets = None
         self.fsm = None
+        query_stats.stop(self._query_stats)
 
     def _write_exception(self, future):
         """Set node last_error if exception raised in thread."""
@@ -598,6 +655,7 @@ class TaskManager(object):
 
         # publish the state transition by saving the Node
         self.node.save()
+        wait_timeouts.track(self.node)
 
         log_message = ('Node %(node)s moved to provision state "%(state)s" '
                        'from state "%(previous)s"; target provision state is '
@@ -632,6 +690,7 @@ class TaskManager(object):
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
+        query_stats.stop(self._query_stats)
         if exc_type is None and self._spawn_method is not None:
             # Spawn a worker to complete the task
             # The linked callback below will be called whenever:
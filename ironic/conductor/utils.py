@@ -39,6 +39,7 @@ from ironic.common import network
 from ironic.common import nova
 from ironic.common import states
 from ironic.common import utils
+from ironic.conductor import history_writer
 from ironic.conductor import notification_utils as notify_utils
 from ironic.conductor import task_manager
 from ironic.objects import fields
@@ -1777,7 +1778,9 @@ def node_history_record(node, conductor=None, event=None,
     :param error: Boolean value, default false, to signify if the event
                   is an error which should be recorded in the node
                   ``last_error`` field.
-    :returns: None. No value is returned by this method.
+    :returns: None. No value is returned by this method. Please note that
+              a running conductor writes the entry to the database in the
+              background, see :mod:`ironic.conductor.history_writer`.
     """
     if not event:
         # No error has occurred, apparently.
@@ -1794,13 +1797,13 @@ def node_history_record(node, conductor=None, event=None,
         # then we should record the entry.
         # NOTE(TheJulia): DB API automatically adds in a uuid.
         # TODO(TheJulia): At some point, we should allow custom severity.
-        node_history.NodeHistory(
+        history_writer.record(node_history.NodeHistory(
             node_id=node.id,
             conductor=CONF.host,
             user=user,
             severity=error and "ERROR" or "INFO",
             event=event,
-            event_type=event_type or "UNKNOWN").create()
+            event_type=event_type or "UNKNOWN"))
 
 
 def update_image_type(context, node):
@@ -0,0 +1,140 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""In-memory index of the deadlines of nodes in ``*wait`` states.
+
+The periodic tasks checking for ``*wait`` timeouts normally scan the whole
+nodes table on every run even though very few nodes are ever timing out.
+When ``[conductor]wait_timeout_index`` is enabled, the conductor keeps a
+heap of deadlines per wait state instead, and only asks the database about
+nodes whose deadline has passed. The database remains the source of truth:
+expired entries are always re-checked there before a node is failed, so an
+entry that is out of date (for example, because a heartbeat has moved the
+deadline) only costs a single re-check.
+"""
+
+import datetime
+import heapq
+import threading
+
+from oslo_utils import timeutils
+
+
+_INDEXES = {}
+"""Registered deadline indexes, keyed by provision state."""
+
+
+class DeadlineIndex(object):
+    """A heap of node deadlines for one wait state.
+
+    :param name: a short name of the index, used in metric names.
+    :param provision_state: the wait state tracked by this index.
+    :param timestamp_field: the node field the timeout is counted from,
+        e.g. ``provision_updated_at``.
+    :param timeout: the timeout in seconds.
+    """
+
+    def __init__(self, name, provision_state, timestamp_field, timeout):
+        self.name = name
+        self.provision_state = provision_state
+        self.timestamp_field = timestamp_field
+        self.timeout = timeout
+        self.ring_generation = None
+        """Generation of the hash rings the index was built for."""
+        self._heap = []
+        self._deadlines = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._deadlines)
+
+    def __contains__(self, node_uuid):
+        return node_uuid in self._deadlines
+
+    def add(self, node_uuid, started_at):
+        """Add or update the deadline of a node.
+
+        :param node_uuid: node UUID.
+        :param started_at: the value of the node's ``timestamp_field``.
+            Nodes without it never time out and are not added.
+        """
+        if started_at is None:
+            self.discard(node_uuid)
+            return
+        # NOTE: objects carry timezone-aware timestamps while the database
+        # API returns naive UTC ones, normalize to the latter.
+        deadline = (timeutils.normalize_time(started_at)
+                    + datetime.timedelta(seconds=self.timeout))
+        with self._lock:
+            self._deadlines[node_uuid] = deadline
+            heapq.heappush(self._heap, (deadline, node_uuid))
+
+    def discard(self, node_uuid):
+        """Remove a node from the index if it is present."""
+        with self._lock:
+            # NOTE: the heap entry is dropped lazily by pop_expired.
+            self._deadlines.pop(node_uuid, None)
+
+    def clear(self):
+        """Remove all nodes from the index."""
+        with self._lock:
+            self._heap = []
+            self._deadlines = {}
+
+    def pop_expired(self, now=None):
+        """Remove and return the nodes with an expired deadline.
+
+        :param now: the current time, defaults to ``timeutils.utcnow()``.
+        :returns: a list of tuples (node UUID, deadline), earliest first.
+        """
+        if now is None:
+            now = timeutils.utcnow()
+        expired = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                deadline, node_uuid = heapq.heappop(self._heap)
+                # Skip entries superseded by a later add() or discard()
+                if self._deadlines.get(node_uuid) != deadline:
+                    continue
+                del self._deadlines[node_uuid]
+                expired.append((node_uuid, deadline))
+            # Do not let superseded entries accumulate forever
+            if len(self._heap) > 2 * len(self._deadlines) + 64:
+                self._heap = [(d, u) for u, d in self._deadlines.items()]
+                heapq.heapify(self._heap)
+        return expired
+
+
+def register(index):
+    """Register a deadline index to be fed by :func:`track`."""
+    _INDEXES[index.provision_state] = index
+
+
+def unregister_all():
+    """Unregister all deadline indexes."""
+    _INDEXES.clear()
+
+
+def track(node):
+    """Update the registered indexes after a node changed its state.
+
+    Called when a node has been saved with a new provision state. Adds the
+    node to the index for its new state (if any) and removes it from the
+    others.
+
+    :param node: a Node object.
+    """
+    for provision_state, index in _INDEXES.items():
+        if node.provision_state == provision_state:
+            index.add(node.uuid, getattr(node, index.timestamp_field))
+        else:
+            index.discard(node.uuid)
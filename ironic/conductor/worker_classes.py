@@ -0,0 +1,99 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Priority classes of the conductor workers pool.
+
+Work is never queued in the conductor workers pool: when it is full, new
+work is rejected with ``NoFreeConductorWorker``. When
+``[conductor]worker_class_limits`` is set, every piece of work is assigned
+a class, and each class may only occupy its configured share of the pool,
+so that, for example, a sweep of bulk work cannot exhaust the pool for API
+requests. To protect the classes with lower limits from starvation,
+``[conductor]worker_class_minimum`` workers are kept available for each
+class running fewer workers than that.
+"""
+
+import threading
+
+from ironic.common import exception
+from ironic.common.i18n import _
+
+
+INTERACTIVE = 'interactive'
+"""API requests, the default class."""
+
+CONTINUATION = 'continuation'
+"""Agent heartbeats and continuations of deploy, clean, service and
+inspection."""
+
+PERIODIC = 'periodic'
+"""Workers of periodic tasks."""
+
+BULK = 'bulk'
+"""Sweeps over many nodes, such as the power state sync and the collection
+of sensor data."""
+
+CLASSES = (INTERACTIVE, CONTINUATION, PERIODIC, BULK)
+
+
+class WorkerClasses(object):
+    """Admission control of the classes of work for a pool of workers.
+
+    :param pool_size: the number of workers in the pool.
+    :param limits: a dict mapping classes to the maximum percentage of the
+        pool they may use. Classes not in it may use the whole pool.
+    :param minimum: the number of workers kept available for each class.
+    :raises: ConfigInvalid on unknown classes.
+    """
+
+    def __init__(self, pool_size, limits, minimum):
+        unknown = set(limits) - set(CLASSES)
+        if unknown:
+            raise exception.ConfigInvalid(
+                error_msg=_('Unknown worker classes %(unknown)s in '
+                            '[conductor]worker_class_limits, valid classes '
+                            'are %(valid)s')
+                % {'unknown': ', '.join(sorted(unknown)),
+                   'valid': ', '.join(CLASSES)})
+        self.pool_size = pool_size
+        self.limits = {cls: max(1, pool_size * limits.get(cls, 100) // 100)
+                       for cls in CLASSES}
+        self.minimum = minimum
+        self._running = dict.fromkeys(CLASSES, 0)
+        self._lock = threading.Lock()
+
+    def running(self, worker_class):
+        """Return the number of workers running for a class."""
+        return self._running[worker_class]
+
+    def acquire(self, worker_class):
+        """Try to take a worker for a class of work.
+
+        :param worker_class: the class of work.
+        :returns: True if a worker has been taken, False if the class may
+            not use any more workers.
+        """
+        with self._lock:
+            if self._running[worker_class] >= self.limits[worker_class]:
+                return False
+            kept = sum(max(0, min(self.minimum, self.limits[cls]) - running)
+                       for cls, running in self._running.items()
+                       if cls != worker_class)
+            if sum(self._running.values()) + kept >= self.pool_size:
+                return False
+            self._running[worker_class] += 1
+            return True
+
+    def release(self, worker_class):
+        """Return a worker taken by :meth:`acquire`."""
+        with self._lock:
+            self._running[worker_class] -= 1
@@ -48,6 +48,17 @@ opts = [
                mutable=True,
                help=_('The maximum number of items returned in a single '
                       'response from a collection resource.')),
+    cfg.IntOpt('list_chunk_size',
+               default=1000,
+               min=0,
+               mutable=True,
+               help=_('Collections of nodes and ports requested with a '
+                      'limit larger than this value are loaded, converted '
+                      'and serialized in chunks of this many items, and '
+                      'the response is buffered in a temporary file, '
+                      'which keeps the memory used by very large lists '
+                      'bounded. Only relevant if max_limit is larger than '
+                      'this value. Set to 0 to disable.')),
     cfg.StrOpt('public_endpoint',
                mutable=True,
                help=_("Public URL to use when building the links to the API "
@@ -103,6 +114,32 @@ opts = [
                 mutable=True,
                 help=_("Specifies a list of boot modes that are not allowed "
                        "during enrollment. Eg: ['bios']")),
+    cfg.BoolOpt('conditional_requests',
+                default=False,
+                mutable=True,
+                help=_('Return an ETag header with nodes, ports and '
+                       'allocations, and respond with 304 (Not Modified) to '
+                       'requests with a matching If-None-Match header. '
+                       'Whether a collection has changed is determined '
+                       'from the number of its database rows and the '
+                       'time of their latest update, which requires the '
+                       'clocks of the ironic hosts to be synchronized. '
+                       'See conditional_requests_settle_time for the '
+                       'changes that may go unnoticed.')),
+    cfg.IntOpt('conditional_requests_settle_time',
+               default=2,
+               min=0,
+               mutable=True,
+               help=_('Number of seconds after the latest update of a '
+                      'collection of nodes, ports or allocations during '
+                      'which it is not tagged when conditional requests are '
+                      'enabled. Changes are timestamped when they are made, '
+                      'not when they are committed: a change committed more '
+                      'than this many seconds after it was made, for '
+                      'example after waiting on a lock, is not detected if '
+                      'the collection was tagged in the meantime, until the '
+                      'collection changes again. This also covers databases '
+                      'storing timestamps with a one second resolution.')),
 ]
 
 opt_group = cfg.OptGroup(name='api',
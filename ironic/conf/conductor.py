@@ -38,6 +38,25 @@ opts = [
                       'kept for API requests and other important tasks. '
                       'This part of the pool will not be used for periodic '
                       'tasks or agent heartbeats. Set to 0 to disable.')),
+    cfg.Opt('worker_class_limits',
+            type=types.Dict(value_type=types.Integer(min=1, max=100)),
+            default={},
+            help=_('Maximum percentage of the normal (not reserved) '
+                   'workers pool that each class of work may use, e.g. '
+                   '"periodic:50,bulk:25". The classes are "interactive" '
+                   '(API requests), "continuation" (agent heartbeats and '
+                   'continuations of deploy, clean, service and '
+                   'inspection), "periodic" (workers of periodic tasks) '
+                   'and "bulk" (power state sync and sensor data '
+                   'collection). Classes that are not listed may use the '
+                   'whole pool. Classes are not used if this is empty, '
+                   'which is the default.')),
+    cfg.IntOpt('worker_class_minimum',
+               default=1, min=0,
+               help=_('Number of workers of the normal pool kept available '
+                      'for each class of work running fewer workers than '
+                      'that, so that other classes cannot starve it. Only '
+                      'used when [conductor]worker_class_limits is set.')),
     cfg.IntOpt('heartbeat_interval',
                default=10,
                help=_('Seconds between conductor heart beats.')),
@@ -69,6 +88,13 @@ opts = [
                min=0,
                help=_('Interval between checks of orphaned allocations, '
                       'in seconds. Set to 0 to disable checks.')),
+    cfg.IntOpt('allocation_candidates_limit',
+               default=100,
+               min=0,
+               mutable=True,
+               help=_('Maximum number of suitable nodes, picked at random, '
+                      'that an allocation tries to reserve. Set to 0 to try '
+                      'all suitable nodes.')),
     cfg.IntOpt('cache_clean_up_interval',
                default=3600, min=0,
                help=_('Interval between cleaning up image caches, in seconds. '
@@ -91,6 +117,19 @@ opts = [
                       'number of times Ironic should try syncing the '
                       'hardware node power state with the node power state '
                       'in DB')),
+    cfg.IntOpt('power_state_sync_max_interval',
+               default=0,
+               min=0,
+               help=_('Maximum interval (in seconds) between power state '
+                      'syncs of a node whose power state is stable. If '
+                      'set to a value larger than sync_power_state_interval, '
+                      'the interval between syncs of a node is doubled '
+                      'every time its power state is found unchanged, up '
+                      'to this value. Nodes whose power or provision state '
+                      'has recently changed and nodes failing to sync are '
+                      'synced every sync_power_state_interval. Set to 0 '
+                      '(the default) to sync all nodes every '
+                      'sync_power_state_interval.')),
     cfg.IntOpt('sync_power_state_workers',
                default=8, min=1,
                help=_('The maximum number of worker threads that can be '
@@ -101,6 +140,11 @@ opts = [
                help=_('Maximum number of worker threads that can be started '
                       'simultaneously by a periodic task. Should be less '
                       'than RPC thread pool size.')),
+    cfg.IntOpt('periodic_nodes_chunk_size',
+               default=1000, min=1,
+               help=_('Number of nodes fetched from the database at once by '
+                      'the periodic tasks iterating over the nodes. Higher '
+                      'values need fewer queries but more memory.')),
     cfg.IntOpt('node_locked_retry_attempts',
                default=3,
                help=_('Number of attempts to grab a node lock.')),
@@ -185,6 +229,20 @@ opts = [
                       'rescue ramdisk. If the timeout is reached the node '
                       'will be put in the "rescue failed" provision state. '
                       'Set to 0 to disable timeout.')),
+    cfg.BoolOpt('wait_timeout_index',
+                default=False,
+                help=_('If enabled, the conductor tracks the deadlines of '
+                       'the nodes in the deploy, clean, rescue, service and '
+                       'inspect wait states in memory instead of scanning '
+                       'the database for timed out nodes on every check. '
+                       'The index is rebuilt from the database on start up '
+                       'and when the hash ring changes, and every expired '
+                       'deadline is re-checked in the database. Since a '
+                       'check then only costs work proportional to the '
+                       'number of expired nodes, '
+                       '[conductor]check_provision_state_interval and '
+                       '[conductor]check_rescue_state_interval can be '
+                       'lowered to fail nodes closer to their deadline.')),
     cfg.IntOpt('soft_power_off_timeout',
                default=600,
                min=1,
@@ -326,8 +384,8 @@ opts = [
                mutable=False,
                help=_('The target number of node history records to purge '
                       'from the database when performing clean-up. '
-                      'Deletes are performed by node, and a node with excess '
-                      'records for a node will still be deleted. '
+                      'The oldest records are deleted first, in chunks of '
+                      'at most 100 records. '
                       'Defaults to 1000. Operators who find node history '
                       'building up may wish to '
                       'lower this threshold and decrease the time between '
@@ -343,6 +401,24 @@ opts = [
                       'node_history_max_entries setting as users of '
                       'this setting are anticipated to need to retain '
                       'history by policy.')),
+    cfg.IntOpt('node_history_write_interval',
+               min=0,
+               default=1,
+               help=_('Interval in seconds at which the node history entries '
+                      'recorded by the conductor are written to the '
+                      'database in batches. Entries are also written as '
+                      'soon as [conductor]node_history_write_batch_size '
+                      'of them are pending, and on graceful shutdown. '
+                      'Setting to 0 writes every entry immediately in its '
+                      'own transaction.')),
+    cfg.IntOpt('node_history_write_batch_size',
+               min=1,
+               default=100,
+               help=_('Maximum number of node history entries written to '
+                      'the database in one statement. When ten times as '
+                      'many entries are pending, for example because the '
+                      'database is unavailable, new entries are written '
+                      'immediately.')),
     cfg.MultiOpt('verify_step_priority_override',
                  item_type=types.Dict(),
                  default={},
@@ -32,6 +32,45 @@ opts = [
                       'returned to the caller. This does not presently apply '
                       'to internal node lock release actions and DB actions '
                       'centered around the completion of tasks.')),
+    cfg.BoolOpt('api_read_from_replica',
+                default=False,
+                help=_('If enabled, read-only API requests (GET and HEAD) '
+                       'serve node, port, port group, chassis, allocation '
+                       'and node history queries from the database replica '
+                       'configured in [database]slave_connection. Requests '
+                       'modifying resources, conductor operations and node '
+                       'reservations always use the primary database. '
+                       'Has no effect without slave_connection.')),
+    cfg.IntOpt('replica_max_staleness',
+               default=10,
+               min=0,
+               help=_('Maximum replication lag, in seconds, of the database '
+                      'replica for it to be used by API requests. When the '
+                      'replica is further behind, or its lag cannot be '
+                      'determined, queries fall back to the primary '
+                      'database. Set to 0 to use the replica regardless of '
+                      'its lag. Only checked with MySQL and PostgreSQL. '
+                      'With MySQL and MariaDB, the database user needs the '
+                      'REPLICATION CLIENT privilege to check the lag.')),
+    cfg.BoolOpt('collect_query_stats',
+                default=False,
+                help=_('If enabled, the number of database queries, the '
+                       'number of rows they returned or modified and the '
+                       'time spent executing them are emitted as metrics '
+                       'for every API request, named after the API '
+                       'controller method, and every conductor task, named '
+                       'after the task purpose. Only the queries executed '
+                       'by the thread handling the request or acquiring the '
+                       'task are accounted for.')),
+    cfg.IntOpt('repeated_query_threshold',
+               default=0,
+               min=0,
+               help=_('Debugging aid for [database]collect_query_stats. '
+                      'When set, a warning is logged for every query '
+                      'executed at least this many times, with different '
+                      'parameters, by a single API request or conductor '
+                      'task, which usually indicates a query issued for '
+                      'every item of a list. Set to 0 to disable.')),
 ]
 
 
@@ -205,8 +205,11 @@ hash_opts = [
     cfg.IntOpt('hash_ring_reset_interval',
                default=15,
                help=_('Time (in seconds) after which the hash ring is '
-                      'considered outdated and is refreshed on the next '
-                      'access.')),
+                      'considered outdated. On the next access, the list '
+                      'of active conductors is checked in the database, '
+                      'and the hash ring is rebuilt only if a conductor '
+                      'has registered, unregistered or stopped '
+                      'heartbeating since the last check.')),
     cfg.StrOpt('hash_ring_algorithm',
                default='md5',
                advanced=True,
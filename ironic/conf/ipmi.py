@@ -85,6 +85,26 @@ opts = [
                 help=_('List of possible cipher suites versions that can '
                        'be supported by the hardware in case the field '
                        '`cipher_suite` is not set for the node.')),
+    cfg.IntOpt('bmc_max_concurrent_requests',
+               default=0,
+               min=0,
+               help=_('Maximum number of ipmitool requests in flight to a '
+                      'single BMC address at any time, across all nodes '
+                      'managed by the conductor. The value of `0` disables '
+                      'the limit.')),
+    cfg.FloatOpt('bmc_requests_per_second',
+                 default=0,
+                 min=0,
+                 help=_('Maximum rate, in requests per second, at which '
+                        'ipmitool requests are started against a single '
+                        'BMC address. The value of `0` disables the '
+                        'limit.')),
+    cfg.IntOpt('bmc_requests_burst',
+               default=1,
+               min=1,
+               help=_('Number of ipmitool requests that may be started at '
+                      'once against a single BMC address before '
+                      '`bmc_requests_per_second` applies.')),
 ]
 
 
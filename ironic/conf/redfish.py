@@ -121,6 +121,26 @@ opts = [
                help=_('Number of seconds to wait for boot mode or secure '
                       'boot status change to take effect after a reboot. '
                       'Set to 0 to disable waiting.')),
+    cfg.IntOpt('bmc_max_concurrent_requests',
+               default=0,
+               min=0,
+               help=_('Maximum number of Redfish requests in flight to a '
+                      'single BMC address at any time, across all nodes '
+                      'managed by the conductor. The value of `0` disables '
+                      'the limit.')),
+    cfg.FloatOpt('bmc_requests_per_second',
+                 default=0,
+                 min=0,
+                 help=_('Maximum rate, in requests per second, at which '
+                        'Redfish requests are started against a single '
+                        'BMC address. The value of `0` disables the '
+                        'limit.')),
+    cfg.IntOpt('bmc_requests_burst',
+               default=1,
+               min=1,
+               help=_('Number of Redfish requests that may be started at '
+                      'once against a single BMC address before '
+                      '`bmc_requests_per_second` applies.')),
 ]
 
 
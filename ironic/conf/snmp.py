@@ -51,6 +51,26 @@ opts = [
                min=0,
                help=_('Maximum number of UDP request retries, '
                       '0 means no retries.')),
+    cfg.IntOpt('bmc_max_concurrent_requests',
+               default=0,
+               min=0,
+               help=_('Maximum number of SNMP requests in flight to a '
+                      'single SNMP device address at any time, across all '
+                      'nodes managed by the conductor. The value of `0` '
+                      'disables the limit.')),
+    cfg.FloatOpt('bmc_requests_per_second',
+                 default=0,
+                 min=0,
+                 help=_('Maximum rate, in requests per second, at which '
+                        'SNMP requests are started against a single '
+                        'SNMP device address. The value of `0` disables the '
+                        'limit.')),
+    cfg.IntOpt('bmc_requests_burst',
+               default=1,
+               min=1,
+               help=_('Number of SNMP requests that may be started at '
+                      'once against a single SNMP device address before '
+                      '`bmc_requests_per_second` applies.')),
 ]
 
 
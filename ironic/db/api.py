@@ -18,6 +18,7 @@ Base classes for storage engines
 """
 
 import abc
+import threading
 
 from oslo_config import cfg
 from oslo_db import api as db_api
@@ -33,6 +34,28 @@ def get_instance():
     return IMPL
 
 
+_REPLICA_READS = threading.local()
+
+
+def allow_replica_reads(allowed=True):
+    """Allow or disallow reads from the database replica in this thread.
+
+    Only the read-only queries of the API that support it are served from
+    the replica, and only when it is configured and fresh enough.
+
+    :param allowed: whether replica reads are allowed.
+    :returns: the previous value.
+    """
+    previous = replica_reads_allowed()
+    _REPLICA_READS.allowed = allowed
+    return previous
+
+
+def replica_reads_allowed():
+    """Whether reads from the database replica are allowed in this thread."""
+    return getattr(_REPLICA_READS, 'allowed', False)
+
+
 class Connection(object, metaclass=abc.ABCMeta):
     """Base class for storage system connections."""
 
@@ -58,6 +81,7 @@ class Connection(object, metaclass=abc.ABCMeta):
                         :console_enabled: True | False
                         :description_contains: substring in description
                         :driver: driver's name
+                        :driver_in: driver's name (multiple possibilities)
                         :fault: current fault type
                         :id: numeric ID
                         :inspection_started_before:
@@ -66,6 +90,7 @@ class Connection(object, metaclass=abc.ABCMeta):
                         :instance_uuid: uuid of instance
                         :lessee: node's lessee (e.g. project ID)
                         :maintenance: True | False
+                        :name: name of node
                         :owner: node's owner (e.g. project ID)
                         :project: either owner or lessee
                         :reserved: True | False
@@ -73,15 +98,19 @@ class Connection(object, metaclass=abc.ABCMeta):
                         :resource_class: resource class name
                         :retired: True | False
                         :shard_in: shard (multiple possibilities)
+                        :traits: list of traits the node must all have
                         :provision_state: provision state of node
                         :provision_state_in:
                             provision state of node (multiple possibilities)
+                        :provision_state_not_in:
+                            provision state of node (excluded possibilities)
                         :provisioned_before:
                             nodes with provision_updated_at field before this
                             interval in seconds
                         :uuid: uuid of node
                         :uuid_in: uuid of node (multiple possibilities)
                         :with_power_state: True | False
+                        :with_target_power_state: True | False
         :param limit: Maximum number of nodes to return.
         :param marker: the last item of the previous page; we return the next
                        result set.
@@ -91,9 +120,43 @@ class Connection(object, metaclass=abc.ABCMeta):
         :returns: A list of tuples of the specified columns.
         """
 
+    @abc.abstractmethod
+    def get_nodeinfo_sample(self, columns=None, filters=None, limit=None):
+        """Get specific columns for a random sample of matching nodes.
+
+        :param columns: List of column names to return.
+                        Defaults to 'id' column when columns == None.
+        :param filters: Filters to apply, see get_nodeinfo_list.
+        :param limit: Maximum number of nodes to return. All matching
+                      nodes are returned, in random order, if None.
+        :returns: A list of tuples of the specified columns.
+        """
+
+    @abc.abstractmethod
+    def iter_nodeinfo(self, columns=None, filters=None, limit=None,
+                      sort_key=None, sort_dir=None, chunk_size=1000):
+        """Iterate over specific columns of matching nodes.
+
+        Unlike :meth:`get_nodeinfo_list`, the nodes are fetched in chunks,
+        each with its own query, so that the memory usage does not depend
+        on the number of nodes and no database transaction is kept open
+        between the chunks.
+
+        :param columns: List of column names to return.
+                        Defaults to 'id' column when columns == None.
+        :param filters: Filters to apply, see :meth:`get_nodeinfo_list`.
+        :param limit: Maximum number of nodes to return.
+        :param sort_key: Attribute by which results should be sorted.
+        :param sort_dir: direction in which results should be sorted.
+                         (asc, desc)
+        :param chunk_size: Number of nodes fetched by each query.
+        :returns: A generator of tuples of the specified columns.
+        """
+
     @abc.abstractmethod
     def get_node_list(self, filters=None, limit=None, marker=None,
-                      sort_key=None, sort_dir=None, fields=None):
+                      sort_key=None, sort_dir=None, fields=None,
+                      decode_json=True):
         """Return a list of nodes.
 
         :param filters: Filters to apply. Defaults to None.
@@ -109,8 +172,8 @@ class Connection(object, metaclass=abc.ABCMeta):
                             interval in seconds
                         :shard: nodes with the given shard
         :param limit: Maximum number of nodes to return.
-        :param marker: the last item of the previous page; we return the next
-                       result set.
+        :param marker: the last item of the previous page, or its UUID;
+                       we return the next result set.
         :param sort_key: Attribute by which results should be sorted.
         :param sort_dir: direction in which results should be sorted.
                          (asc, desc)
@@ -118,6 +181,10 @@ class Connection(object, metaclass=abc.ABCMeta):
                        only specific fields to be returned to have maximum
                        API performance calls where not all columns are
                        needed from the database.
+        :param decode_json: If False, the JSON dict fields of the nodes are
+                            returned as their JSON text, with the same
+                            ``serialized`` attribute as the decoded dicts,
+                            for the caller to decode the ones it needs.
         """
 
     @abc.abstractmethod
@@ -135,7 +202,7 @@ class Connection(object, metaclass=abc.ABCMeta):
         """
 
     @abc.abstractmethod
-    def reserve_node(self, tag, node_id):
+    def reserve_node(self, tag, node_id, filters=None):
         """Reserve a node.
 
         To prevent other ManagerServices from manipulating the given
@@ -143,9 +210,14 @@ class Connection(object, metaclass=abc.ABCMeta):
 
         :param tag: A string uniquely identifying the reservation holder.
         :param node_id: A node id or uuid.
+        :param filters: Optional preconditions the node must match, in the
+                        format accepted by :meth:`get_nodeinfo_list`. They
+                        are checked by the same statement that places the
+                        reservation.
         :returns: A Node object.
         :raises: NodeNotFound if the node is not found.
         :raises: NodeLocked if the node is already reserved.
+        :raises: NodePreconditionFailed if the node does not match filters.
         """
 
     @abc.abstractmethod
@@ -185,19 +257,49 @@ class Connection(object, metaclass=abc.ABCMeta):
         """
 
     @abc.abstractmethod
-    def get_node_by_id(self, node_id):
+    def get_node_by_id(self, node_id, filters=None):
         """Return a node.
 
         :param node_id: The id of a node.
+        :param filters: Optional preconditions the node must match, in the
+                        format accepted by :meth:`get_nodeinfo_list`.
         :returns: A node.
+        :raises: NodeNotFound if the node is not found.
+        :raises: NodePreconditionFailed if the node does not match filters.
         """
 
     @abc.abstractmethod
-    def get_node_by_uuid(self, node_uuid):
+    def get_node_by_uuid(self, node_uuid, filters=None):
         """Return a node.
 
         :param node_uuid: The uuid of a node.
+        :param filters: Optional preconditions the node must match, in the
+                        format accepted by :meth:`get_nodeinfo_list`.
         :returns: A node.
+        :raises: NodeNotFound if the node is not found.
+        :raises: NodePreconditionFailed if the node does not match filters.
+        """
+
+    @abc.abstractmethod
+    def get_node_uuids_by_ids(self, node_ids):
+        """Return the UUIDs of several nodes.
+
+        :param node_ids: An iterable of node IDs.
+        :returns: A dict mapping the IDs of the existing nodes to their
+            UUIDs.
+        """
+
+    @abc.abstractmethod
+    def get_node_watermark(self):
+        """Return a watermark of the nodes and their traits.
+
+        The watermark changes whenever a node or a trait is created, updated
+        or deleted, provided that the clocks of the hosts updating the
+        database are synchronized.
+
+        :returns: A tuple (count, latest) with the number of rows and the
+            time of the latest creation or update, None if there are no
+            rows.
         """
 
     @abc.abstractmethod
@@ -229,7 +331,7 @@ class Connection(object, metaclass=abc.ABCMeta):
         """
 
     @abc.abstractmethod
-    def update_node(self, node_id, values):
+    def update_node(self, node_id, values, load_relationships=True):
         """Update properties of a node.
 
         :param node_id: The id or uuid of a node.
@@ -246,6 +348,9 @@ class Connection(object, metaclass=abc.ABCMeta):
                               'my-field-2': val2,
                              }
                         }
+        :param load_relationships: Whether to load the tags and traits of
+                                   the updated node. If False, they must
+                                   not be accessed on the returned node.
         :returns: A node.
         :raises: NodeAssociated
         :raises: NodeNotFound
@@ -283,14 +388,28 @@ class Connection(object, metaclass=abc.ABCMeta):
         :returns: A port.
         """
 
+    @abc.abstractmethod
+    def get_port_watermark(self):
+        """Return a watermark of the ports, port groups and nodes.
+
+        The ports listed for a user depend on their node, so the watermark
+        changes whenever a port, a port group or a node is created, updated
+        or deleted, provided that the clocks of the hosts updating the
+        database are synchronized.
+
+        :returns: A tuple (count, latest) with the number of rows and the
+            time of the latest creation or update, None if there are no
+            rows.
+        """
+
     @abc.abstractmethod
     def get_port_list(self, limit=None, marker=None,
                       sort_key=None, sort_dir=None, filters=None):
         """Return a list of ports.
 
         :param limit: Maximum number of ports to return.
-        :param marker: the last item of the previous page; we return the next
-                       result set.
+        :param marker: the last item of the previous page, or its UUID;
+                       we return the next result set.
         :param sort_key: Attribute by which results should be sorted.
         :param sort_dir: direction in which results should be sorted.
                          (asc, desc)
@@ -312,8 +431,8 @@ class Connection(object, metaclass=abc.ABCMeta):
 
         :param node_id: The integer node ID.
         :param limit: Maximum number of ports to return.
-        :param marker: the last item of the previous page; we return the next
-                       result set.
+        :param marker: the last item of the previous page, or its UUID;
+                       we return the next result set.
         :param sort_key: Attribute by which results should be sorted
         :param sort_dir: direction in which results should be sorted
                          (asc, desc)
@@ -328,8 +447,8 @@ class Connection(object, metaclass=abc.ABCMeta):
 
         :param portgroup_id: The integer portgroup ID.
         :param limit: Maximum number of ports to return.
-        :param marker: The last item of the previous page; we return the next
-                       result set.
+        :param marker: The last item of the previous page, or its UUID;
+                       we return the next result set.
         :param sort_key: Attribute by which results should be sorted
         :param sort_dir: Direction in which results should be sorted
                          (asc, desc)
@@ -378,6 +497,15 @@ class Connection(object, metaclass=abc.ABCMeta):
         :raises: PortgroupNotFound
         """
 
+    @abc.abstractmethod
+    def get_portgroup_uuids_by_ids(self, portgroup_ids):
+        """Return the UUIDs of several portgroups.
+
+        :param portgroup_ids: An iterable of portgroup IDs.
+        :returns: A dict mapping the IDs of the existing portgroups to their
+            UUIDs.
+        """
+
     @abc.abstractmethod
     def get_portgroup_by_address(self, address, project=None):
         """Return a network portgroup representation.
@@ -404,8 +532,8 @@ class Connection(object, metaclass=abc.ABCMeta):
         """Return a list of portgroups.
 
         :param limit: Maximum number of portgroups to return.
-        :param marker: The last item of the previous page; we return the next
-                       result set.
+        :param marker: The last item of the previous page, or its UUID;
+                       we return the next result set.
         :param sort_key: Attribute by which results should be sorted.
         :param sort_dir: Direction in which results should be sorted.
                          (asc, desc)
@@ -421,8 +549,8 @@ class Connection(object, metaclass=abc.ABCMeta):
 
         :param node_id: The integer node ID.
         :param limit: Maximum number of portgroups to return.
-        :param marker: The last item of the previous page; we return the next
-                       result set.
+        :param marker: The last item of the previous page, or its UUID;
+                       we return the next result set.
         :param sort_key: Attribute by which results should be sorted
         :param sort_dir: Direction in which results should be sorted
                          (asc, desc)
@@ -502,6 +630,15 @@ class Connection(object, metaclass=abc.ABCMeta):
         :returns: A chassis.
         """
 
+    @abc.abstractmethod
+    def get_chassis_uuids_by_ids(self, chassis_ids):
+        """Return the UUIDs of several chassis.
+
+        :param chassis_ids: An iterable of chassis IDs.
+        :returns: A dict mapping the IDs of the existing chassis to their
+            UUIDs.
+        """
+
     @abc.abstractmethod
     def get_chassis_list(self, limit=None, marker=None,
                          sort_key=None, sort_dir=None):
@@ -615,6 +752,19 @@ class Connection(object, metaclass=abc.ABCMeta):
                      hardware-type-b: set([host2, host3])}
         """
 
+    @abc.abstractmethod
+    def get_conductor_membership_stamp(self):
+        """Retrieve a stamp that changes when the active conductors change.
+
+        The stamp changes every time a conductor registers or unregisters,
+        registers or unregisters its hardware interfaces, or stops (or
+        resumes) heartbeating.
+
+        :returns: A tuple (generation, frozenset of the hostnames of the
+                  active conductors) that can be compared with the
+                  previously returned one.
+        """
+
     @abc.abstractmethod
     def get_offline_conductors(self, field='hostname'):
         """Get a list conductors that are offline (dead).
@@ -1177,6 +1327,28 @@ class Connection(object, metaclass=abc.ABCMeta):
         :raises: AllocationNotFound
         """
 
+    @abc.abstractmethod
+    def get_allocation_uuids_by_ids(self, allocation_ids):
+        """Return the UUIDs of several allocations.
+
+        :param allocation_ids: An iterable of allocation IDs.
+        :returns: A dict mapping the IDs of the existing allocations to
+            their UUIDs.
+        """
+
+    @abc.abstractmethod
+    def get_allocation_watermark(self):
+        """Return a watermark of the allocations and nodes.
+
+        The watermark changes whenever an allocation or a node is created,
+        updated or deleted, provided that the clocks of the hosts updating
+        the database are synchronized.
+
+        :returns: A tuple (count, latest) with the number of rows and the
+            time of the latest creation or update, None if there are no
+            rows.
+        """
+
     @abc.abstractmethod
     def get_allocation_by_name(self, name):
         """Return an allocation representation.
@@ -1197,8 +1369,8 @@ class Connection(object, metaclass=abc.ABCMeta):
                         :state: allocation state
                         :resource_class: requested resource class
         :param limit: Maximum number of allocations to return.
-        :param marker: The last item of the previous page; we return the next
-                       result set.
+        :param marker: The last item of the previous page, or its UUID;
+                       we return the next result set.
         :param sort_key: Attribute by which results should be sorted.
         :param sort_dir: Direction in which results should be sorted.
                          (asc, desc)
@@ -1452,6 +1624,14 @@ class Connection(object, metaclass=abc.ABCMeta):
         :param values: Dict of values.
         """
 
+    @abc.abstractmethod
+    def create_node_history_records(self, records):
+        """Create several history records with one statement.
+
+        :param records: List of dicts of values. The records get a new UUID
+            and the current time as created_at unless provided.
+        """
+
     @abc.abstractmethod
     def destroy_node_history_by_uuid(self, history_uuid):
         """Destroy a history record.
@@ -1481,8 +1661,8 @@ class Connection(object, metaclass=abc.ABCMeta):
         """Return a list of node history records
 
         :param limit: Maximum number of history records to return.
-        :param marker: the last item of the previous page; we return the next
-                       result set.
+        :param marker: the last item of the previous page, or its UUID;
+                       we return the next result set.
         :param sort_key: Attribute by which results should be sorted.
         :param sort_dir: direction in which results should be sorted.
                          (asc, desc)
@@ -1495,8 +1675,8 @@ class Connection(object, metaclass=abc.ABCMeta):
 
         :param node_id: The integer node ID.
         :param limit: Maximum number of history records to return.
-        :param marker: the last item of the previous page; we return the next
-                       result set.
+        :param marker: the last item of the previous page, or its UUID;
+                       we return the next result set.
         :param sort_key: Attribute by which results should be sorted
         :param sort_dir: direction in which results should be sorted
                          (asc, desc)
@@ -1504,17 +1684,24 @@ class Connection(object, metaclass=abc.ABCMeta):
         """
 
     @abc.abstractmethod
-    def query_node_history_records_for_purge(self, conductor_id):
-        """Utility method to identify nodes to clean history records for.
+    def get_node_history_ids_for_purge(self, conductor_id, limit,
+                                       marker=None):
+        """Get the IDs of history records exceeding the retention settings.
+
+        Records of a node are purged when there are more than
+        ``[conductor]node_history_max_entries`` of them, oldest first.
+        Records newer than ``[conductor]node_history_minimum_days`` are
+        always retained.
 
         :param conductor_id: Id value for the conductor to perform this
                              query on behalf of.
-        :returns: A dictionary with key values of node database ID values
-                  and a list of values associated with the node.
+        :param limit: Maximum number of IDs to return.
+        :param marker: Only return IDs greater than this one.
+        :returns: A sorted list of node history record IDs.
         """
 
     @abc.abstractmethod
-    def bulk_delete_node_history_records(self, node_id, limit):
+    def bulk_delete_node_history_records(self, entries):
         """Utility method to bulk delete node history entries.
 
         :param entries: A list of node history entry id's to be
@@ -0,0 +1,221 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Statistics of the database queries executed by a unit of work.
+
+When ``[database]collect_query_stats`` is enabled, the SQL statements
+executed by an API request or a conductor task are counted, and the number
+of queries, the number of rows they returned or modified and the time spent
+executing them are emitted as metrics named after the API controller method
+or the task purpose, e.g. ``API.NodesController.get_all.Queries``.
+
+When ``[database]repeated_query_threshold`` is set, a warning is logged for
+every statement executed at least that many times, with different
+parameters, within one API request or task. This usually indicates a query
+issued for every item of a list (the "N+1 queries" problem).
+
+Statistics are collected per thread: only the statements executed by the
+thread that started the collection are accounted for.
+"""
+
+import collections
+import contextlib
+import re
+import threading
+import time
+
+from oslo_log import log
+from sqlalchemy import engine
+from sqlalchemy import event
+
+from ironic.common import metrics_utils
+from ironic.conf import CONF
+
+LOG = log.getLogger(__name__)
+
+METRICS = metrics_utils.get_metrics_logger(__name__)
+
+_LOCAL = threading.local()
+
+_LISTENING = False
+_LISTEN_LOCK = threading.Lock()
+
+_PLACEHOLDER = r'\s*(?:\?|%s|%\(\w+\)s|:\w+)\s*'
+_PLACEHOLDER_LIST = re.compile(r'\((?:%s,)*%s\)' % (_PLACEHOLDER,
+                                                    _PLACEHOLDER))
+
+
+def statement_shape(statement):
+    """Return the shape of a SQL statement.
+
+    Statements only differing by the number of values in their ``IN``
+    clauses or inserted rows have the same shape.
+
+    :param statement: SQL statement, with placeholders for its parameters.
+    :returns: the statement with lists of placeholders collapsed.
+    """
+    return _PLACEHOLDER_LIST.sub('(?)', statement)
+
+
+class QueryStats(object):
+    """Statistics of the queries executed by a unit of work."""
+
+    def __init__(self, name):
+        self.name = name
+        self.queries = 0
+        self.rows = 0
+        self.duration = 0.0
+        self.shapes = collections.Counter()
+        self._thread_id = threading.get_ident()
+
+    def add(self, statement, rows, duration):
+        """Account for an executed statement.
+
+        :param statement: SQL statement, with placeholders for its
+            parameters.
+        :param rows: number of rows returned or modified, as reported by the
+            database driver, negative if unknown.
+        :param duration: time spent executing the statement, in seconds.
+        """
+        self.queries += 1
+        if rows > 0:
+            self.rows += rows
+        self.duration += duration
+        self.shapes[statement_shape(statement)] += 1
+
+    def repeated(self, threshold):
+        """Return the statements executed at least threshold times.
+
+        :param threshold: the minimum number of executions.
+        :returns: a list of (statement shape, count) tuples, most executed
+            first.
+        """
+        return [(shape, count) for shape, count in self.shapes.most_common()
+                if count >= threshold]
+
+
+def _active():
+    try:
+        return _LOCAL.active
+    except AttributeError:
+        _LOCAL.active = []
+        return _LOCAL.active
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context,
+                           executemany):
+    if getattr(_LOCAL, 'active', None):
+        context._query_stats_started = time.monotonic()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context,
+                          executemany):
+    started = getattr(context, '_query_stats_started', None)
+    active = getattr(_LOCAL, 'active', None)
+    # NOTE: transactions are started explicitly with SQLite, do not count
+    # them as queries.
+    if started is None or not active or statement == 'BEGIN':
+        return
+    duration = time.monotonic() - started
+    for stats in active:
+        stats.add(statement, cursor.rowcount, duration)
+
+
+def _listen():
+    global _LISTENING
+    with _LISTEN_LOCK:
+        if _LISTENING:
+            return
+        event.listen(engine.Engine, 'before_cursor_execute',
+                     _before_cursor_execute)
+        event.listen(engine.Engine, 'after_cursor_execute',
+                     _after_cursor_execute)
+        _LISTENING = True
+
+
+def activate(stats):
+    """Account for the statements executed by the current thread.
+
+    Nested collections are supported: a statement is accounted for in all
+    active collections of the thread.
+
+    :param stats: a QueryStats object.
+    """
+    _listen()
+    _active().append(stats)
+
+
+def deactivate(stats):
+    """Stop accounting for statements.
+
+    :param stats: a QueryStats object previously activated.
+    :returns: True if the collection was active in the current thread,
+        False otherwise.
+    """
+    active = _active()
+    if stats not in active:
+        return False
+    active.remove(stats)
+    return True
+
+
+def start(name):
+    """Start collecting statistics, if enabled.
+
+    :param name: metric name prefix for the unit of work.
+    :returns: a QueryStats object, or None if collection is disabled.
+    """
+    if not CONF.database.collect_query_stats:
+        return None
+    stats = QueryStats(name)
+    activate(stats)
+    return stats
+
+
+def stop(stats):
+    """Stop collecting statistics and emit them.
+
+    Does nothing if the collection has already been stopped, or if it was
+    started by another thread.
+
+    :param stats: a QueryStats object returned by start(), or None.
+    """
+    if (stats is None or stats._thread_id != threading.get_ident()
+            or not deactivate(stats)):
+        return
+
+    METRICS.send_counter('%s.Queries' % stats.name, stats.queries)
+    METRICS.send_counter('%s.Rows' % stats.name, stats.rows)
+    METRICS.send_timer('%s.QueryTime' % stats.name, stats.duration * 1000)
+
+    threshold = CONF.database.repeated_query_threshold
+    if threshold:
+        for shape, count in stats.repeated(threshold):
+            LOG.warning('%(name)s executed the same database query '
+                        '%(count)d times, consider loading the data with a '
+                        'single query. Query: %(query)s',
+                        {'name': stats.name, 'count': count,
+                         'query': shape})
+
+
+@contextlib.contextmanager
+def collect(name):
+    """Collect statistics of the queries executed in the block, if enabled.
+
+    :param name: metric name prefix for the unit of work.
+    :returns: a QueryStats object, or None if collection is disabled.
+    """
+    stats = start(name)
+    try:
+        yield stats
+    finally:
+        stop(stats)
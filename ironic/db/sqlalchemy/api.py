@@ -19,7 +19,9 @@ import datetime
 import functools
 import json
 import logging
+import operator
 import threading
+import time
 
 from oslo_concurrency import lockutils
 from oslo_db import api as oslo_db_api
@@ -36,6 +38,8 @@ from osprofiler import sqlalchemy as osp_sqlalchemy
 import sqlalchemy as sa
 from sqlalchemy import or_
 from sqlalchemy.exc import NoResultFound, MultipleResultsFound
+from sqlalchemy.orm import aliased
+from sqlalchemy.orm import lazyload
 from sqlalchemy.orm import Load
 from sqlalchemy.orm import selectinload
 from sqlalchemy import sql
@@ -43,6 +47,7 @@ import tenacity
 
 from ironic.common import exception
 from ironic.common.i18n import _
+from ironic.common import metrics_utils
 from ironic.common import profiler
 from ironic.common import release_mappings
 from ironic.common import states
@@ -54,18 +59,42 @@ from ironic.db.sqlalchemy import models
 
 LOG = log.getLogger(__name__)
 
+METRICS = metrics_utils.get_metrics_logger(__name__)
+
 
 _CONTEXT = threading.local()
 
+# NOTE: Result of the last replication lag check, shared between threads.
+_REPLICA_STATE = {'checked_at': None, 'fresh': False, 'warned': False}
+# Number of seconds between replication lag checks.
+REPLICA_CHECK_INTERVAL = 1
+
 
 RESERVATION_SEMAPHORE = "reserve_node_db_lock"
-synchronized = lockutils.synchronized_with_prefix('ironic-')
+# NOTE: Number of in-process locks node reservations are striped over.
+RESERVATION_LOCK_STRIPES = 256
 
 # NOTE(mgoddard): We limit the number of traits per node to 50 as this is the
 # maximum number of traits per resource provider allowed in placement.
 MAX_TRAITS_PER_NODE = 50
 
 
+def _reservation_lock(node_id):
+    """Return the in-process lock guarding reservations of a node.
+
+    :param node_id: the ID of the node.
+    :returns: a context manager acquiring a fair lock.
+    """
+    if utils.is_ironic_using_sqlite():
+        # NOTE: SQLite only allows a single writer at a time, concurrent
+        # reservations would only end up retrying on "database is locked".
+        stripe = 0
+    else:
+        stripe = node_id % RESERVATION_LOCK_STRIPES
+    return lockutils.lock('%s-%d' % (RESERVATION_SEMAPHORE, stripe),
+                          lock_file_prefix='ironic-', fair=True)
+
+
 def wrap_sqlite_retry(f):
 
     @functools.wraps(f)
@@ -113,10 +142,82 @@ def get_backend():
     return Connection()
 
 
-def _session_for_read():
+def _session_for_read(allow_replica=False):
+    # NOTE: only read-only API requests allow reading from the replica, see
+    # ironic.db.api.allow_replica_reads. Conductors always use the primary.
+    if (allow_replica and CONF.database.slave_connection
+            and api.replica_reads_allowed() and _replica_is_fresh()):
+        return _wrap_session(enginefacade.reader.async_.using(_CONTEXT))
     return _wrap_session(enginefacade.reader.using(_CONTEXT))
 
 
+def _replica_lag(session):
+    """Return the replication lag of the replica in seconds.
+
+    :param session: a session connected to the replica.
+    :returns: the lag in seconds, or None if replication is broken.
+    """
+    dialect = session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        return session.execute(sa.text(
+            'SELECT CASE WHEN pg_is_in_recovery() '
+            'THEN EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) '
+            'ELSE 0 END')).scalar()
+    elif dialect == 'mysql':
+        try:
+            status = session.execute(
+                sa.text('SHOW REPLICA STATUS')).mappings().first()
+        except (db_exc.DBError, sa.exc.DBAPIError):
+            # NOTE: MySQL before 8.0.22 and MariaDB before 10.5.1 only
+            # support the old statement.
+            status = session.execute(
+                sa.text('SHOW SLAVE STATUS')).mappings().first()
+        if status is None:
+            # Not a replica at all.
+            return 0
+        # NOTE: MariaDB and MySQL before 8.0.22 use the old column name.
+        return status.get('Seconds_Behind_Source',
+                          status.get('Seconds_Behind_Master'))
+    return 0
+
+
+def _replica_is_fresh():
+    """Check whether the replica is within the configured staleness.
+
+    The result is cached for REPLICA_CHECK_INTERVAL seconds.
+    """
+    max_staleness = CONF.database.replica_max_staleness
+    if not max_staleness:
+        return True
+
+    now = time.monotonic()
+    if (_REPLICA_STATE['checked_at'] is not None
+            and now - _REPLICA_STATE['checked_at'] < REPLICA_CHECK_INTERVAL):
+        return _REPLICA_STATE['fresh']
+
+    try:
+        with enginefacade.reader.async_.using(_CONTEXT) as session:
+            lag = _replica_lag(session)
+    except (db_exc.DBError, sa.exc.SQLAlchemyError) as exc:
+        # NOTE: the check is repeated every REPLICA_CHECK_INTERVAL seconds,
+        # only warn once until it succeeds again, e.g. when the database
+        # user lacks the REPLICATION CLIENT privilege.
+        log = LOG.debug if _REPLICA_STATE['warned'] else LOG.warning
+        log('Unable to determine the lag of the database replica, '
+            'using the primary database. Error: %s', exc)
+        _REPLICA_STATE['warned'] = True
+        lag = None
+    else:
+        _REPLICA_STATE['warned'] = False
+
+    fresh = lag is not None and lag <= max_staleness
+    if not fresh and lag is not None:
+        LOG.debug('The database replica is %(lag)s seconds behind, using '
+                  'the primary database', {'lag': lag})
+    _REPLICA_STATE.update(checked_at=now, fresh=fresh)
+    return fresh
+
+
 # Please add @oslo_db_api.retry_on_deadlock decorator to all methods using
 # _session_for_write (as deadlocks happen on write), so that oslo_db is able
 # to retry in case of deadlocks.
@@ -366,8 +467,108 @@ def add_allocation_filter_by_conductor(query, value):
         return query.filter(models.Conductor.hostname == value)
 
 
+def _keyset_after(attrs, values, nullable, descending):
+    """Build the criteria selecting the rows following a marker.
+
+    :param attrs: the model attributes of the sort keys. Only the first one
+        may be nullable.
+    :param values: the values of the sort keys for the marker, either
+        python values or SQL expressions.
+    :param nullable: whether the first sort key is nullable.
+    :param descending: whether the rows are sorted in descending order.
+    :returns: a SQL expression.
+    """
+    op = operator.lt if descending else operator.gt
+    if len(attrs) == 1:
+        after = op(attrs[0], values[0])
+    else:
+        after = op(sa.tuple_(*attrs), sa.tuple_(*values))
+    if not nullable:
+        return after
+
+    # NOTE: NULL values are ordered first in ascending order, and row value
+    # comparisons cannot be used to compare them.
+    first, value = attrs[0], values[0]
+    rest = op(attrs[1], values[1])
+    if isinstance(value, sa.ColumnElement):
+        if descending:
+            return or_(after, first.is_(None) & (value.is_not(None) | rest))
+        return or_(after, value.is_(None) & (first.is_not(None) | rest))
+    elif value is None:
+        if descending:
+            return first.is_(None) & rest
+        return first.is_not(None) | rest
+    elif descending:
+        return or_(after, first.is_(None))
+    return after
+
+
+def _keyset_paginate(query, model, limit, sort_keys, marker, sort_dir,
+                     dialect):
+    """Add sorting and keyset pagination to a query.
+
+    Only the rows following the marker are returned, selected by comparing
+    the sort keys of each row with the ones of the marker, so that the cost
+    of a page does not depend on its position in the result set.
+
+    :param query: the query to paginate.
+    :param model: the model to paginate.
+    :param limit: the maximum number of rows to return.
+    :param sort_keys: the names of the sort keys, unique together and
+        ending with ``id``.
+    :param marker: the last item of the previous page, or its UUID. The
+        sort key values of a UUID are read by a subquery of the page query.
+    :param sort_dir: ``asc`` or ``desc``.
+    :param dialect: the name of the database dialect.
+    :returns: the paginated query.
+    """
+    sort_dir = sort_dir or 'asc'
+    if sort_dir not in ('asc', 'desc'):
+        raise exception.InvalidParameterValue(
+            _('The sort_dir value "%s" is invalid, valid values are '
+              '"asc" and "desc"') % sort_dir)
+    descending = sort_dir == 'desc'
+    columns = sa.inspect(model).columns
+    for key in sort_keys:
+        if key not in columns:
+            raise exception.InvalidParameterValue(
+                _('The sort_key value "%(key)s" is an invalid field for '
+                  'sorting') % {'key': key})
+    attrs = [getattr(model, key) for key in sort_keys]
+    nullable = columns[sort_keys[0]].nullable
+
+    for key, attr in zip(sort_keys, attrs):
+        order = attr.desc() if descending else attr.asc()
+        if dialect == 'postgresql' and columns[key].nullable:
+            # Order NULL values like MySQL and SQLite do
+            order = order.nulls_last() if descending else order.nulls_first()
+        query = query.order_by(order)
+
+    if marker is not None:
+        if isinstance(marker, str):
+            marker_model = aliased(model)
+            values = [sa.select(getattr(marker_model, key))
+                      .where(marker_model.uuid == marker)
+                      .scalar_subquery()
+                      for key in sort_keys]
+            if nullable:
+                # NOTE: the sort key values of an unknown marker are NULL,
+                # which would select the rows following a NULL value.
+                query = query.where(
+                    sa.exists().where(marker_model.uuid == marker))
+        else:
+            values = [getattr(marker, key) for key in sort_keys]
+        query = query.where(
+            _keyset_after(attrs, values, nullable, descending))
+
+    if limit is not None:
+        query = query.limit(limit)
+    return query
+
+
 def _paginate_query(model, limit=None, marker=None, sort_key=None,
-                    sort_dir=None, query=None, return_base_tuple=False):
+                    sort_dir=None, query=None, return_base_tuple=False,
+                    allow_replica=False):
     # NOTE(TheJulia): We can't just ask for the bool of query if it is
     # populated, so we need to ask if it is None.
     if query is None:
@@ -377,14 +578,9 @@ def _paginate_query(model, limit=None, marker=None, sort_key=None,
     sort_keys = ['id']
     if sort_key and sort_key not in sort_keys:
         sort_keys.insert(0, sort_key)
-    try:
-        query = db_utils.paginate_query(query, model, limit, sort_keys,
-                                        marker=marker, sort_dir=sort_dir)
-    except db_exc.InvalidSortKey:
-        raise exception.InvalidParameterValue(
-            _('The sort_key value "%(key)s" is an invalid field for sorting')
-            % {'key': sort_key})
-    with _session_for_read() as session:
+    with _session_for_read(allow_replica=allow_replica) as session:
+        query = _keyset_paginate(query, model, limit, sort_keys, marker,
+                                 sort_dir, session.get_bind().dialect.name)
         # We have a sqlalchemy.sql.selectable.Select
         # (most likely) which utilizes the unified select interface.
         res = session.execute(query).fetchall()
@@ -403,6 +599,16 @@ def _paginate_query(model, limit=None, marker=None, sort_key=None,
     return ref
 
 
+def _supports_window_functions(dialect):
+    """Whether the database server supports window functions."""
+    if dialect.name == 'sqlite':
+        return dialect.dbapi.sqlite_version_info >= (3, 25)
+    if dialect.name == 'mysql':
+        minimum = (10, 2) if dialect.is_mariadb else (8, 0)
+        return dialect.server_version_info >= minimum
+    return True
+
+
 def _filter_active_conductors(query, interval=None):
     if interval is None:
         interval = CONF.conductor.heartbeat_timeout
@@ -417,6 +623,58 @@ def _filter_active_conductors(query, interval=None):
     return query
 
 
+def _bump_conductor_membership(session):
+    """Increment the generation of the registered conductors."""
+    query = sa.update(models.ConductorMembership).values(
+        generation=models.ConductorMembership.generation + 1,
+        updated_at=timeutils.utcnow())
+    if session.execute(query).rowcount == 0:
+        membership = models.ConductorMembership(generation=1)
+        session.add(membership)
+        session.flush()
+
+
+def _get_watermark(*model_classes):
+    """Return the number of rows and the time of the latest change.
+
+    Deleting rows decreases the count, creating them moves the time of the
+    latest change, so the result changes whenever the tables change.
+
+    :param model_classes: the models of the tables to check.
+    :returns: A tuple (count, latest), latest being None if the tables are
+        empty.
+    """
+    count = 0
+    latest = None
+    with _session_for_read(allow_replica=True) as session:
+        for model in model_classes:
+            rows, created, updated = session.execute(
+                sa.select(sa.func.count(),
+                          sa.func.max(model.created_at),
+                          sa.func.max(model.updated_at))
+                .select_from(model)).one()
+            count += rows
+            for value in (created, updated):
+                if value is not None and (latest is None or value > latest):
+                    latest = value
+    return count, latest
+
+
+def _get_uuids_by_ids(model, ids):
+    """Return the UUIDs of several rows.
+
+    :param model: the model of the rows.
+    :param ids: an iterable of row IDs.
+    :returns: A dict mapping the IDs of the existing rows to their UUIDs.
+    """
+    ids = set(ids)
+    if not ids:
+        return {}
+    query = sa.select(model.id, model.uuid).where(model.id.in_(ids))
+    with _session_for_read(allow_replica=True) as session:
+        return dict(session.execute(query).all())
+
+
 def _zip_matching(a, b, key):
     """Zip two unsorted lists, yielding matching items or None.
 
@@ -462,19 +720,24 @@ class Connection(api.Connection):
     _NODE_QUERY_FIELDS = {'console_enabled', 'maintenance', 'retired',
                           'driver', 'resource_class', 'provision_state',
                           'uuid', 'id', 'fault', 'conductor_group',
-                          'owner', 'lessee', 'instance_uuid'}
+                          'owner', 'lessee', 'instance_uuid', 'name'}
     _NODE_IN_QUERY_FIELDS = {'%s_in' % field: field
-                             for field in ('uuid', 'provision_state', 'shard')}
+                             for field in ('uuid', 'provision_state', 'shard',
+                                           'driver')}
+    _NODE_NOT_IN_QUERY_FIELDS = {'%s_not_in' % field: field
+                                 for field in ('provision_state',)}
     _NODE_NON_NULL_FILTERS = {'associated': 'instance_uuid',
                               'reserved': 'reservation',
                               'with_power_state': 'power_state',
+                              'with_target_power_state': 'target_power_state',
                               'sharded': 'shard'}
     _NODE_FILTERS = ({'chassis_uuid', 'reserved_by_any_of',
                       'provisioned_before', 'inspection_started_before',
                       'description_contains', 'project', 'include_children',
-                      'parent_node'}
+                      'parent_node', 'traits'}
                      | _NODE_QUERY_FIELDS
                      | set(_NODE_IN_QUERY_FIELDS)
+                     | set(_NODE_NOT_IN_QUERY_FIELDS)
                      | set(_NODE_NON_NULL_FILTERS))
 
     _RUNBOOK_QUERY_FIELDS = {'id', 'uuid', 'name', 'public', 'owner',
@@ -506,6 +769,10 @@ class Connection(api.Connection):
             if key in filters:
                 query = query.filter(
                     getattr(models.Node, field).in_(filters[key]))
+        for key, field in self._NODE_NOT_IN_QUERY_FIELDS.items():
+            if key in filters:
+                query = query.filter(
+                    getattr(models.Node, field).not_in(filters[key]))
         for key, field in self._NODE_NON_NULL_FILTERS.items():
             if key in filters:
                 column = getattr(models.Node, field)
@@ -541,6 +808,15 @@ class Connection(api.Connection):
             project = filters['project']
             query = query.filter((models.Node.owner == project)
                                  | (models.Node.lessee == project))
+        if filters.get('traits'):
+            traits = set(filters['traits'])
+            # Nodes having all of the traits
+            with_traits = (
+                sa.select(models.NodeTrait.node_id)
+                .where(models.NodeTrait.trait.in_(traits))
+                .group_by(models.NodeTrait.node_id)
+                .having(sa.func.count(models.NodeTrait.trait) == len(traits)))
+            query = query.filter(models.Node.id.in_(with_traits))
         # Determine parent/child node handling
         if not filters.get('include_children', False):
             if 'parent_node' in filters:
@@ -554,6 +830,18 @@ class Connection(api.Connection):
         # a full list of both parents and children being conveyed.
         return query
 
+    def _add_node_preconditions(self, query, filters):
+        # NOTE: preconditions always target one explicitly
+        # requested node, so child nodes must not be filtered out.
+        filters = dict(filters, include_children=True)
+        return self._add_nodes_filters(query, filters)
+
+    def _raise_node_precondition_failed(self, node_id):
+        # Only called when a query with preconditions returned nothing:
+        # tell a missing node apart from a node that does not match.
+        node = self._get_node_reservation(node_id)
+        raise exception.NodePreconditionFailed(node=node.uuid)
+
     def _validate_runbooks_filters(self, filters):
         if filters is None:
             filters = dict()
@@ -619,21 +907,67 @@ class Connection(api.Connection):
 
         query = sa.select(*columns)
         query = self._add_nodes_filters(query, filters)
-        # TODO(TheJulia): Why are we paginating this?!?!?!
-        # If we are not using sorting, or any other query magic,
-        # we could likely just do a query execution and
-        # prepare the tuple responses.
+        # NOTE: use iter_nodeinfo to go over large numbers of nodes without
+        # building the whole list.
         return _paginate_query(models.Node, limit, marker,
                                sort_key, sort_dir, query,
                                return_base_tuple=True)
 
+    def get_nodeinfo_sample(self, columns=None, filters=None, limit=None):
+        columns = [getattr(models.Node, c) for c in columns or ['id']]
+        query = sa.select(*columns)
+        query = self._add_nodes_filters(query, filters)
+        with _session_for_read() as session:
+            if session.get_bind().dialect.name == 'mysql':
+                order = sa.func.rand()
+            else:
+                order = sa.func.random()
+            query = query.order_by(order).limit(limit)
+            return [tuple(r) for r in session.execute(query)]
+
+    def iter_nodeinfo(self, columns=None, filters=None, limit=None,
+                      sort_key=None, sort_dir=None, chunk_size=1000):
+        columns = list(columns or ['id'])
+        sort_keys = ['id']
+        if sort_key and sort_key not in sort_keys:
+            sort_keys.insert(0, sort_key)
+        # The sort keys of the last row are the marker of the next chunk
+        select_columns = columns + [k for k in sort_keys if k not in columns]
+        query = sa.select(*[getattr(models.Node, c) for c in select_columns])
+        query = self._add_nodes_filters(query, filters)
+
+        marker = None
+        while limit is None or limit > 0:
+            size = chunk_size if limit is None else min(chunk_size, limit)
+            # NOTE: the session must not be kept open while yielding, the
+            # caller is likely to access the database in between.
+            with _session_for_read() as session:
+                chunk_query = _keyset_paginate(
+                    query, models.Node, size, sort_keys, marker, sort_dir,
+                    session.get_bind().dialect.name)
+                rows = session.execute(chunk_query).fetchall()
+            for row in rows:
+                yield tuple(row[:len(columns)])
+            if len(rows) < size:
+                return
+            marker = rows[-1]
+            if limit is not None:
+                limit -= len(rows)
+
     def get_node_list(self, filters=None, limit=None, marker=None,
-                      sort_key=None, sort_dir=None, fields=None):
+                      sort_key=None, sort_dir=None, fields=None,
+                      decode_json=True):
+        if not decode_json:
+            with models.undecoded_json():
+                return self.get_node_list(filters=filters, limit=limit,
+                                          marker=marker, sort_key=sort_key,
+                                          sort_dir=sort_dir, fields=fields)
         if not fields:
             query = _get_node_select()
             query = self._add_nodes_filters(query, filters)
             return _paginate_query(models.Node, limit, marker,
-                                   sort_key, sort_dir, query)
+                                   sort_key, sort_dir, query,
+                                   allow_replica=True)
         else:
             # Shunt to the proper method to return the limited list.
             return self.get_node_list_columns(columns=fields, filters=filters,
@@ -688,7 +1022,8 @@ class Connection(api.Connection):
             )
         query = self._add_nodes_filters(query, filters)
         return _paginate_query(models.Node, limit, marker,
-                               sort_key, sort_dir, query)
+                               sort_key, sort_dir, query,
+                               allow_replica=True)
 
     def check_node_list(self, idents, project=None):
         mapping = {}
@@ -728,21 +1063,32 @@ class Connection(api.Connection):
 
         return mapping
 
-    @synchronized(RESERVATION_SEMAPHORE, fair=True)
-    @wrap_sqlite_retry
-    def _reserve_node_place_lock(self, tag, node_id, node):
+    def _reserve_node_place_lock(self, tag, node_id, node, filters=None):
         # NOTE(TheJulia): We explicitly do *not* synch the session
         # so the other actions in the conductor do not become aware
         # that the lock is in place and believe they hold the lock.
-        # This necessitates an overall lock in the code side, so
-        # we avoid conditions where two separate threads can believe
-        # they hold locks at the same time.
+        # This necessitates a lock in the code side, so we avoid
+        # conditions where two separate threads can believe they hold
+        # locks at the same time.
+        # NOTE: Such a condition can only happen between threads reserving
+        # the same node, hence the lock is striped by node ID instead of
+        # serializing all reservations in the process.
+        started = time.monotonic()
+        with _reservation_lock(node.id):
+            METRICS.send_timer('Connection.ReserveNodeLockWait',
+                               (time.monotonic() - started) * 1000)
+            self._reserve_node_update(tag, node, filters=filters)
+
+    @wrap_sqlite_retry
+    def _reserve_node_update(self, tag, node, filters=None):
+        query = (sa.update(models.Node).
+                 where(models.Node.id == node.id).
+                 where(models.Node.reservation == None))  # noqa
+        if filters:
+            query = self._add_node_preconditions(query, filters)
         with _session_for_write() as session:
             res = session.execute(
-                sa.update(models.Node).
-                where(models.Node.id == node.id).
-                where(models.Node.reservation == None).  # noqa
-                values(reservation=tag).
+                query.values(reservation=tag).
                 execution_options(synchronize_session=False))
             session.flush()
         # NOTE(TheJulia): In SQLAlchemy 2.0 style, we don't
@@ -750,22 +1096,27 @@ class Connection(api.Connection):
         # many ways to do things to singular ways to do things.
         if res.rowcount != 1:
             # Nothing updated and node exists. Must already be
-            # locked. Identify who holds it and log.
-            if utils.is_ironic_using_sqlite():
+            # locked or not matching the preconditions. Identify
+            # who holds it and log.
+            if filters:
+                lock_holder = self._get_node_reservation(node.id).reservation
+                if lock_holder is None:
+                    raise exception.NodePreconditionFailed(node=node.uuid)
+            elif utils.is_ironic_using_sqlite():
                 lock_holder = CONF.host
             else:
                 lock_holder = self._get_node_reservation(node.id).reservation
             raise exception.NodeLocked(node=node.uuid, host=lock_holder)
 
     @oslo_db_api.retry_on_deadlock
-    def reserve_node(self, tag, node_id):
+    def reserve_node(self, tag, node_id, filters=None):
         # Check existence and convert UUID to ID
         node = self._get_node_reservation(node_id)
         if node.reservation:
             # Fail fast, instead of attempt the update.
             raise exception.NodeLocked(node=node.uuid, host=node.reservation)
 
-        self._reserve_node_place_lock(tag, node_id, node)
+        self._reserve_node_place_lock(tag, node_id, node, filters=filters)
         # Return a node object as that is the contract for this method.
         return self.get_node_by_id(node.id)
 
@@ -855,32 +1206,46 @@ class Connection(api.Connection):
         else:
             return res
 
-    def get_node_by_id(self, node_id):
+    def get_node_by_id(self, node_id, filters=None):
         try:
             query = _get_node_select()
-            with _session_for_read() as session:
+            if filters:
+                query = self._add_node_preconditions(query, filters)
+            with _session_for_read(allow_replica=True) as session:
                 res = session.scalars(
                     query.filter_by(id=node_id).limit(1)
                 ).unique().one()
         except NoResultFound:
+            if filters:
+                self._raise_node_precondition_failed(node_id)
             raise exception.NodeNotFound(node=node_id)
         return res
 
-    def get_node_by_uuid(self, node_uuid):
+    def get_node_uuids_by_ids(self, node_ids):
+        return _get_uuids_by_ids(models.Node, node_ids)
+
+    def get_node_watermark(self):
+        return _get_watermark(models.Node, models.NodeTrait)
+
+    def get_node_by_uuid(self, node_uuid, filters=None):
         try:
             query = _get_node_select()
-            with _session_for_read() as session:
+            if filters:
+                query = self._add_node_preconditions(query, filters)
+            with _session_for_read(allow_replica=True) as session:
                 res = session.scalars(
                     query.filter_by(uuid=node_uuid).limit(1)
                 ).unique().one()
         except NoResultFound:
+            if filters:
+                self._raise_node_precondition_failed(node_uuid)
             raise exception.NodeNotFound(node=node_uuid)
         return res
 
     def get_node_by_name(self, node_name):
         try:
             query = _get_node_select()
-            with _session_for_read() as session:
+            with _session_for_read(allow_replica=True) as session:
                 res = session.scalars(
                     query.filter_by(name=node_name).limit(1)
                 ).unique().one()
@@ -979,14 +1344,14 @@ class Connection(api.Connection):
             query.delete()
 
     @wrap_sqlite_retry
-    def update_node(self, node_id, values):
+    def update_node(self, node_id, values, load_relationships=True):
         # NOTE(dtantsur): this can lead to very strange errors
         if 'uuid' in values:
             msg = _("Cannot overwrite UUID for an existing Node.")
             raise exception.InvalidParameterValue(err=msg)
 
         try:
-            return self._do_update_node(node_id, values)
+            return self._do_update_node(node_id, values, load_relationships)
         except db_exc.DBDuplicateEntry as e:
             if 'name' in e.columns:
                 raise exception.DuplicateName(name=values['name'])
@@ -999,43 +1364,74 @@ class Connection(api.Connection):
             else:
                 raise
 
-    @oslo_db_api.retry_on_deadlock
-    def _do_update_node(self, node_id, values):
-        with _session_for_write() as session:
-            # NOTE(mgoddard): Don't issue a joined query for the update as this
-            # does not work with PostgreSQL.
-            query = session.query(models.Node)
-            query = add_identity_filter(query, node_id)
-            try:
-                ref = query.with_for_update().one()
-            except NoResultFound:
-                raise exception.NodeNotFound(node=node_id)
+    @staticmethod
+    def _provision_state_timestamps(provision_state):
+        """Return the timestamps to update with the provision state.
 
-            if 'provision_state' in values:
-                values['provision_updated_at'] = timeutils.utcnow()
-                if values['provision_state'] == states.INSPECTING:
-                    values['inspection_started_at'] = timeutils.utcnow()
-                    values['inspection_finished_at'] = None
-                elif ((ref.provision_state == states.INSPECTING
-                       or ref.provision_state == states.INSPECTWAIT)
-                      and values['provision_state'] == states.MANAGEABLE):
-                    values['inspection_finished_at'] = timeutils.utcnow()
-                    values['inspection_started_at'] = None
-                elif ((ref.provision_state == states.INSPECTING
-                       or ref.provision_state == states.INSPECTWAIT)
-                      and values['provision_state'] == states.INSPECTFAIL):
-                    values['inspection_started_at'] = None
+        The inspection timestamps depend on the current provision state of
+        the node, so they are computed by the database in the update
+        statement instead of reading the node first.
 
-            ref.update(values)
+        :param provision_state: The new provision state.
+        :returns: A dict of column names to values or SQL expressions.
+        """
+        now = timeutils.utcnow()
+        values = {'provision_updated_at': now}
+        inspecting = models.Node.provision_state.in_(
+            [states.INSPECTING, states.INSPECTWAIT])
+        if provision_state == states.INSPECTING:
+            values['inspection_started_at'] = now
+            values['inspection_finished_at'] = None
+        elif provision_state == states.MANAGEABLE:
+            values['inspection_finished_at'] = sa.case(
+                (inspecting, now),
+                else_=models.Node.inspection_finished_at)
+            values['inspection_started_at'] = sa.case(
+                (inspecting, None),
+                else_=models.Node.inspection_started_at)
+        elif provision_state == states.INSPECTFAIL:
+            values['inspection_started_at'] = sa.case(
+                (inspecting, None),
+                else_=models.Node.inspection_started_at)
+        return values
 
-        # Return the updated node model joined with all relevant fields.
-        query = _get_node_select()
-        query = add_identity_filter(query, node_id)
-        # FIXME(TheJulia): This entire method needs to be re-written to
-        # use the proper execution format for SQLAlchemy 2.0. Likely
-        # A query, independent update, and a re-query on the transaction.
-        with _session_for_read() as session:
-            res = session.execute(query).one()[0]
+    @oslo_db_api.retry_on_deadlock
+    def _do_update_node(self, node_id, values, load_relationships=True):
+        values = dict(values)
+        expressions = {}
+        if 'provision_state' in values:
+            for key, value in self._provision_state_timestamps(
+                    values['provision_state']).items():
+                if isinstance(value, sa.ColumnElement):
+                    values.pop(key, None)
+                    expressions[key] = value
+                else:
+                    values[key] = value
+        # NOTE: MySQL evaluates the assignments of an UPDATE from left to
+        # right, so the expressions depending on the current provision state
+        # must come before the new provision state.
+        query = sa.update(models.Node).ordered_values(
+            *expressions.items(), *values.items())
+        query = add_identity_where(query, models.Node, node_id)
+        query = query.execution_options(synchronize_session=False)
+
+        options = []
+        if not load_relationships:
+            options = [lazyload(models.Node.tags),
+                       lazyload(models.Node.traits)]
+
+        with _session_for_write() as session:
+            if values and session.get_bind().dialect.update_returning:
+                query = query.returning(models.Node).options(*options)
+                res = session.execute(query).scalars().one_or_none()
+            else:
+                if values:
+                    session.execute(query)
+                query = sa.select(models.Node).options(*options)
+                query = add_identity_where(query, models.Node, node_id)
+                res = session.execute(query).scalars().one_or_none()
+        if res is None:
+            raise exception.NodeNotFound(node=node_id)
         return res
 
     def get_port_by_id(self, port_id):
@@ -1049,7 +1445,7 @@ class Connection(api.Connection):
 
     def get_port_by_uuid(self, port_uuid):
         try:
-            with _session_for_read() as session:
+            with _session_for_read(allow_replica=True) as session:
                 query = session.query(models.Port).filter_by(uuid=port_uuid)
                 res = query.one()
         except NoResultFound:
@@ -1071,13 +1467,16 @@ class Connection(api.Connection):
 
     def get_port_by_name(self, port_name):
         try:
-            with _session_for_read() as session:
+            with _session_for_read(allow_replica=True) as session:
                 query = session.query(models.Port).filter_by(name=port_name)
                 res = query.one()
         except NoResultFound:
             raise exception.PortNotFound(port=port_name)
         return res
 
+    def get_port_watermark(self):
+        return _get_watermark(models.Port, models.Portgroup, models.Node)
+
     def get_port_list(self, limit=None, marker=None,
                       sort_key=None, sort_dir=None, owner=None,
                       project=None, filters=None):
@@ -1088,7 +1487,8 @@ class Connection(api.Connection):
             query = add_port_filter_by_node_project(query, project)
         query = add_port_filter_description_contains(query, filters)
         return _paginate_query(models.Port, limit, marker,
-                               sort_key, sort_dir, query)
+                               sort_key, sort_dir, query,
+                               allow_replica=True)
 
     def get_ports_by_shards(self, shards, limit=None, marker=None,
                             sort_key=None, sort_dir=None, filters=None):
@@ -1099,7 +1499,8 @@ class Connection(api.Connection):
             .where(models.Port.node_id.in_(shard_node_ids))
         query = add_port_filter_description_contains(query, filters)
         return _paginate_query(
-            models.Port, limit, marker, sort_key, sort_dir, query)
+            models.Port, limit, marker, sort_key, sort_dir, query,
+            allow_replica=True)
 
     def get_ports_by_node_id(self, node_id, limit=None, marker=None,
                              sort_key=None, sort_dir=None, owner=None,
@@ -1111,7 +1512,8 @@ class Connection(api.Connection):
             query = add_port_filter_by_node_project(query, project)
         query = add_port_filter_description_contains(query, filters)
         return _paginate_query(models.Port, limit, marker,
-                               sort_key, sort_dir, query)
+                               sort_key, sort_dir, query,
+                               allow_replica=True)
 
     def get_ports_by_portgroup_id(self, portgroup_id, limit=None, marker=None,
                                   sort_key=None, sort_dir=None, owner=None,
@@ -1124,7 +1526,8 @@ class Connection(api.Connection):
             query = add_port_filter_by_node_project(query, project)
         query = add_port_filter_description_contains(query, filters)
         return _paginate_query(models.Port, limit, marker,
-                               sort_key, sort_dir, query)
+                               sort_key, sort_dir, query,
+                               allow_replica=True)
 
     @wrap_sqlite_retry
     @oslo_db_api.retry_on_deadlock
@@ -1190,9 +1593,12 @@ class Connection(api.Connection):
             raise exception.PortgroupNotFound(portgroup=portgroup_id)
         return res
 
+    def get_portgroup_uuids_by_ids(self, portgroup_ids):
+        return _get_uuids_by_ids(models.Portgroup, portgroup_ids)
+
     def get_portgroup_by_uuid(self, portgroup_uuid):
         try:
-            with _session_for_read() as session:
+            with _session_for_read(allow_replica=True) as session:
                 query = session.query(models.Portgroup).filter_by(
                     uuid=portgroup_uuid)
                 res = query.one()
@@ -1215,7 +1621,7 @@ class Connection(api.Connection):
 
     def get_portgroup_by_name(self, name):
         try:
-            with _session_for_read() as session:
+            with _session_for_read(allow_replica=True) as session:
                 query = session.query(models.Portgroup).filter_by(name=name)
                 res = query.one()
         except NoResultFound:
@@ -1228,7 +1634,8 @@ class Connection(api.Connection):
         if project:
             query = add_portgroup_filter_by_node_project(query, project)
         return _paginate_query(models.Portgroup, limit, marker,
-                               sort_key, sort_dir, query)
+                               sort_key, sort_dir, query,
+                               allow_replica=True)
 
     def get_portgroups_by_node_id(self, node_id, limit=None, marker=None,
                                   sort_key=None, sort_dir=None, project=None):
@@ -1237,7 +1644,8 @@ class Connection(api.Connection):
         if project:
             query = add_portgroup_filter_by_node_project(query, project)
         return _paginate_query(models.Portgroup, limit, marker,
-                               sort_key, sort_dir, query)
+                               sort_key, sort_dir, query,
+                               allow_replica=True)
 
     @oslo_db_api.retry_on_deadlock
     def create_portgroup(self, values):
@@ -1321,6 +1729,9 @@ class Connection(api.Connection):
             raise exception.ChassisNotFound(chassis=chassis_id)
         return res
 
+    def get_chassis_uuids_by_ids(self, chassis_ids):
+        return _get_uuids_by_ids(models.Chassis, chassis_ids)
+
     def get_chassis_by_uuid(self, chassis_uuid):
         query = sa.select(models.Chassis).where(
             models.Chassis.uuid == chassis_uuid)
@@ -1335,7 +1746,7 @@ class Connection(api.Connection):
     def get_chassis_list(self, limit=None, marker=None,
                          sort_key=None, sort_dir=None):
         return _paginate_query(models.Chassis, limit, marker,
-                               sort_key, sort_dir)
+                               sort_key, sort_dir, allow_replica=True)
 
     @oslo_db_api.retry_on_deadlock
     def create_chassis(self, values):
@@ -1403,6 +1814,7 @@ class Connection(api.Connection):
             # a conductor, especially when updating an existing one
             ref.update({'updated_at': timeutils.utcnow(),
                         'online': True})
+            _bump_conductor_membership(session)
         return ref
 
     def get_conductor_list(self, limit=None, marker=None,
@@ -1432,6 +1844,7 @@ class Connection(api.Connection):
             count = session.execute(query).rowcount
             if count == 0:
                 raise exception.ConductorNotFound(conductor=hostname)
+            _bump_conductor_membership(session)
 
     @oslo_db_api.retry_on_deadlock
     def touch_conductor(self, hostname, online=True):
@@ -1485,27 +1898,36 @@ class Connection(api.Connection):
 
     def get_active_hardware_type_dict(self, use_groups=False):
         with _session_for_read() as session:
-            # TODO(TheJulia): We should likely take a look at this
-            # joined query, as we may not be getting what we expect.
-            # Metal3 logs upwards of 200 rows returned with multiple datetime
-            # columns.
-            # Given dualing datetime fields, we really can't just expect
-            # requesting a unique set to "just work".
-            query = (session.query(models.ConductorHardwareInterfaces,
-                                   models.Conductor)
-                     .join(models.Conductor))
+            # NOTE: only fetch the columns needed to build the mapping, one
+            # row per conductor and hardware type rather than a row with
+            # all columns of both tables for every registered interface.
+            query = (session.query(
+                models.ConductorHardwareInterfaces.hardware_type,
+                models.Conductor.hostname,
+                models.Conductor.conductor_group)
+                .join(models.Conductor)
+                .distinct())
             result = _filter_active_conductors(query)
 
             d2c = collections.defaultdict(set)
-            for iface_row, cdr_row in result:
-                hw_type = iface_row['hardware_type']
+            for hw_type, hostname, conductor_group in result:
                 if use_groups:
-                    key = '%s:%s' % (cdr_row['conductor_group'], hw_type)
+                    key = '%s:%s' % (conductor_group, hw_type)
                 else:
                     key = hw_type
-                d2c[key].add(cdr_row['hostname'])
+                d2c[key].add(hostname)
         return d2c
 
+    def get_conductor_membership_stamp(self):
+        with _session_for_read() as session:
+            generation = session.execute(
+                sa.select(models.ConductorMembership.generation)
+            ).scalar()
+            query = session.query(models.Conductor.hostname)
+            hostnames = frozenset(
+                row[0] for row in _filter_active_conductors(query))
+        return (generation or 0, hostnames)
+
     def get_offline_conductors(self, field='hostname'):
         with _session_for_read() as session:
             field = getattr(models.Conductor, field)
@@ -1559,6 +1981,7 @@ class Connection(api.Connection):
                     # bulk operation and not insert each row.
                     session.add(conductor_hw_iface)
                 session.flush()
+                _bump_conductor_membership(session)
             except db_exc.DBDuplicateEntry as e:
                 r = exception.ConductorHardwareInterfacesAlreadyRegistered(
                     row=str(e.inner_exception.params))
@@ -1570,6 +1993,7 @@ class Connection(api.Connection):
             query = (session.query(models.ConductorHardwareInterfaces)
                      .filter_by(conductor_id=conductor_id))
             query.delete()
+            _bump_conductor_membership(session)
 
     @wrap_sqlite_retry
     @oslo_db_api.retry_on_deadlock
@@ -2297,6 +2721,9 @@ class Connection(api.Connection):
                 raise exception.AllocationNotFound(allocation=allocation_id)
         return ref
 
+    def get_allocation_uuids_by_ids(self, allocation_ids):
+        return _get_uuids_by_ids(models.Allocation, allocation_ids)
+
     def get_allocation_by_uuid(self, allocation_uuid):
         """Return an allocation representation.
 
@@ -2313,6 +2740,9 @@ class Connection(api.Connection):
                 raise exception.AllocationNotFound(allocation=allocation_uuid)
         return ref
 
+    def get_allocation_watermark(self):
+        return _get_watermark(models.Allocation, models.Node)
+
     def get_allocation_by_name(self, name):
         """Return an allocation representation.
 
@@ -2349,7 +2779,8 @@ class Connection(api.Connection):
             sa.select(models.Allocation),
             filters)
         return _paginate_query(models.Allocation, limit, marker,
-                               sort_key, sort_dir, query)
+                               sort_key, sort_dir, query,
+                               allow_replica=True)
 
     @oslo_db_api.retry_on_deadlock
     def create_allocation(self, values):
@@ -2848,6 +3279,23 @@ class Connection(api.Connection):
                 raise exception.NodeHistoryAlreadyExists(uuid=values['uuid'])
         return history
 
+    @oslo_db_api.retry_on_deadlock
+    def create_node_history_records(self, records):
+        if not records:
+            return
+        now = timeutils.utcnow()
+        # NOTE: a multi-row INSERT needs the same columns in every row.
+        columns = set().union(*records) | {'uuid', 'created_at'}
+        rows = []
+        for values in records:
+            row = dict.fromkeys(columns)
+            row.update(values)
+            row['uuid'] = row['uuid'] or uuidutils.generate_uuid()
+            row['created_at'] = row['created_at'] or now
+            rows.append(row)
+        with _session_for_write() as session:
+            session.execute(sa.insert(models.NodeHistory).values(rows))
+
     @oslo_db_api.retry_on_deadlock
     def destroy_node_history_by_uuid(self, history_uuid):
         with _session_for_write() as session:
@@ -2859,7 +3307,7 @@ class Connection(api.Connection):
 
     def get_node_history_by_id(self, history_id):
         try:
-            with _session_for_read() as session:
+            with _session_for_read(allow_replica=True) as session:
                 query = session.query(models.NodeHistory).filter_by(
                     id=history_id)
                 res = query.one()
@@ -2869,7 +3317,7 @@ class Connection(api.Connection):
 
     def get_node_history_by_uuid(self, history_uuid):
         try:
-            with _session_for_read() as session:
+            with _session_for_read(allow_replica=True) as session:
                 query = session.query(models.NodeHistory).filter_by(
                     uuid=history_uuid)
                 res = query.one()
@@ -2880,72 +3328,67 @@ class Connection(api.Connection):
     def get_node_history_list(self, limit=None, marker=None,
                               sort_key='created_at', sort_dir='asc'):
         return _paginate_query(models.NodeHistory, limit, marker, sort_key,
-                               sort_dir)
+                               sort_dir, allow_replica=True)
 
     def get_node_history_by_node_id(self, node_id, limit=None, marker=None,
                                     sort_key=None, sort_dir=None):
         query = sa.select(models.NodeHistory) \
             .where(models.NodeHistory.node_id == node_id)
         return _paginate_query(models.NodeHistory, limit, marker,
-                               sort_key, sort_dir, query)
+                               sort_key, sort_dir, query,
+                               allow_replica=True)
 
-    def query_node_history_records_for_purge(self, conductor_id):
+    def get_node_history_ids_for_purge(self, conductor_id, limit,
+                                       marker=None):
         min_days = CONF.conductor.node_history_minimum_days
         max_num = CONF.conductor.node_history_max_entries
 
-        with _session_for_read() as session:
-            # First, figure out our nodes.
-            nodes = session.query(
-                models.Node.id,
-            ).filter(
-                models.Node.conductor_affinity == conductor_id
-            )
+        history = models.NodeHistory
+        # Only the nodes of this conductor are cleaned up.
+        nodes = sa.select(models.Node.id).where(
+            models.Node.conductor_affinity == conductor_id)
+        conditions = [history.node_id.in_(nodes)]
+        if min_days > 0:
+            before = datetime.datetime.now() - datetime.timedelta(
+                days=min_days)
+            conditions.append(history.created_at < before)
 
-            # Build our query to get the node_id and record id.
-            query = session.query(
-                models.NodeHistory.node_id,
-                models.NodeHistory.id,
-            )
-
-            # Filter by the nodes
-            query = query.filter(
-                models.NodeHistory.node_id.in_(nodes)
-            ).order_by(
-                # Order in an ascending order as older is always first.
-                models.NodeHistory.created_at.asc()
-            )
-
-            # Filter by minimum days
-            if min_days > 0:
-                before = datetime.datetime.now() - datetime.timedelta(
-                    days=min_days)
-                query = query.filter(
-                    models.NodeHistory.created_at < before
-                )
-
-            # Build our result set
-            result_set = {}
-            for entry in query.all():
-                if entry[0] not in result_set:
-                    result_set[entry[0]] = []
-                result_set[entry[0]].append(entry[1])
-
-            final_set = {}
-            # Generate our final set of entries which should be removed
-            # by accounting for the number of permitted entries.
-            for entry in result_set:
-                final_set[entry] = []
-                set_len = len(result_set[entry])
-                # Any count <= the maximum number is okay
-                if set_len > max_num:
-                    # figure out how many entries need to be removed
-                    num_to_remove = set_len - max_num
-                    for i in range(0, num_to_remove):
-                        final_set[entry].append(result_set[entry][i])
-                        # remove the entries at the end of the list
-                        # which will be the more recent items as we
-                        # ordered ascending originally.
-            return final_set
+        with _session_for_read() as session:
+            if _supports_window_functions(session.get_bind().dialect):
+                # Number the entries of every node from the most recent one,
+                # the numbers of the remaining entries do not change when
+                # older ones are deleted.
+                position = sa.func.row_number().over(
+                    partition_by=history.node_id,
+                    order_by=(history.created_at.desc(), history.id.desc()),
+                ).label('position')
+                ranked = (sa.select(history.id, position)
+                          .where(*conditions)
+                          .subquery())
+                query = sa.select(ranked.c.id).where(
+                    ranked.c.position > max_num)
+                id_column = ranked.c.id
+            else:
+                # Count the newer entries of the same node instead.
+                newer = aliased(history)
+                newer_conditions = [newer.node_id == history.node_id]
+                if min_days > 0:
+                    newer_conditions.append(newer.created_at < before)
+                newer_count = (
+                    sa.select(sa.func.count(newer.id))
+                    .where(*newer_conditions)
+                    .where(or_(newer.created_at > history.created_at,
+                               sa.and_(newer.created_at == history.created_at,
+                                       newer.id > history.id)))
+                    .scalar_subquery())
+                query = sa.select(history.id).where(*conditions).where(
+                    newer_count >= max_num)
+                id_column = history.id
+
+            if marker is not None:
+                query = query.where(id_column > marker)
+            query = query.order_by(id_column).limit(limit)
+            return session.scalars(query).all()
 
     @wrap_sqlite_retry
     def bulk_delete_node_history_records(self, entries):
@@ -18,7 +18,10 @@
 SQLAlchemy models for baremetal data.
 """
 
+import contextlib
+import json
 from os import path
+import threading
 from typing import List
 from urllib import parse as urlparse
 
@@ -51,6 +54,67 @@ def table_args():
     return None
 
 
+_JSON_DECODING = threading.local()
+
+
+class SerializedDict(dict):
+    """A dict decoded from JSON, keeping the JSON text it was decoded from.
+
+    The JSON text is available as the ``serialized`` attribute.
+    """
+
+    __slots__ = ('serialized',)
+
+
+class SerializedJson(str):
+    """The JSON text of a value loaded without decoding it.
+
+    See :func:`undecoded_json`.
+    """
+
+    __slots__ = ()
+
+    @property
+    def serialized(self):
+        return self
+
+
+@contextlib.contextmanager
+def undecoded_json():
+    """Load the values of SerializedJsonEncodedDict columns undecoded.
+
+    Within this context, the values are loaded as :class:`SerializedJson`
+    text instead of being decoded, leaving it to the caller to decode the
+    ones it needs.
+    """
+    previous = getattr(_JSON_DECODING, 'undecoded', False)
+    _JSON_DECODING.undecoded = True
+    try:
+        yield
+    finally:
+        _JSON_DECODING.undecoded = previous
+
+
+class SerializedJsonEncodedDict(db_types.JsonEncodedDict):
+    """JsonEncodedDict loading values as :class:`SerializedDict`.
+
+    This allows finding out whether a value changed since it was loaded by
+    comparing its serialization with the JSON text stored in the database,
+    without keeping a copy of the value.
+    """
+
+    cache_ok = True
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return value
+        if getattr(_JSON_DECODING, 'undecoded', False):
+            return SerializedJson(value)
+        result = SerializedDict(json.loads(value))
+        result.serialized = value
+        return result
+
+
 class IronicBase(models.TimestampMixin,
                  models.ModelBase):
 
@@ -118,6 +182,20 @@ class ConductorHardwareInterfaces(Base):
     default = Column(Boolean, default=False, nullable=False)
 
 
+class ConductorMembership(Base):
+    """Internal table used to track changes of the registered conductors.
+
+    Contains a single row whose generation is incremented every time a
+    conductor registers or unregisters, so that the hash rings only need to
+    be rebuilt when it changes.
+    """
+
+    __tablename__ = 'conductor_membership'
+    __table_args__ = (table_args())
+    id = Column(Integer, primary_key=True)
+    generation = Column(Integer, nullable=False, default=0)
+
+
 class NodeBase(Base):
     """Represents a base bare metal node."""
 
@@ -151,17 +229,17 @@ class NodeBase(Base):
     target_provision_state = Column(String(15), nullable=True)
     provision_updated_at = Column(DateTime, nullable=True)
     last_error = Column(Text, nullable=True)
-    instance_info = Column(db_types.JsonEncodedDict(mysql_as_long=True))
-    properties = Column(db_types.JsonEncodedDict)
+    instance_info = Column(SerializedJsonEncodedDict(mysql_as_long=True))
+    properties = Column(SerializedJsonEncodedDict)
     driver = Column(String(255))
-    driver_info = Column(db_types.JsonEncodedDict)
-    driver_internal_info = Column(db_types.JsonEncodedDict)
-    clean_step = Column(db_types.JsonEncodedDict)
-    deploy_step = Column(db_types.JsonEncodedDict)
+    driver_info = Column(SerializedJsonEncodedDict)
+    driver_internal_info = Column(SerializedJsonEncodedDict)
+    clean_step = Column(SerializedJsonEncodedDict)
+    deploy_step = Column(SerializedJsonEncodedDict)
     resource_class = Column(String(80), nullable=True)
 
-    raid_config = Column(db_types.JsonEncodedDict)
-    target_raid_config = Column(db_types.JsonEncodedDict)
+    raid_config = Column(SerializedJsonEncodedDict)
+    target_raid_config = Column(SerializedJsonEncodedDict)
 
     # NOTE(tenbrae): this is the host name of the conductor which has
     #             acquired a TaskManager lock on the node.
@@ -185,7 +263,7 @@ class NodeBase(Base):
     console_enabled = Column(Boolean, default=False)
     inspection_finished_at = Column(DateTime, nullable=True)
     inspection_started_at = Column(DateTime, nullable=True)
-    extra = Column(db_types.JsonEncodedDict)
+    extra = Column(SerializedJsonEncodedDict)
     automated_clean = Column(Boolean, nullable=True)
     protected = Column(Boolean, nullable=False, default=False,
                        server_default=false())
@@ -209,7 +287,7 @@ class NodeBase(Base):
     retired = Column(Boolean, nullable=True, default=False,
                      server_default=false())
     retired_reason = Column(Text, nullable=True)
-    network_data = Column(db_types.JsonEncodedDict)
+    network_data = Column(SerializedJsonEncodedDict)
     storage_interface = Column(String(255), nullable=True)
     power_interface = Column(String(255), nullable=True)
     vendor_interface = Column(String(255), nullable=True)
@@ -217,7 +295,7 @@ class NodeBase(Base):
     secure_boot = Column(Boolean, nullable=True)
     shard = Column(String(255), nullable=True)
     parent_node = Column(String(36), nullable=True)
-    service_step = Column(db_types.JsonEncodedDict)
+    service_step = Column(SerializedJsonEncodedDict)
     disable_power_off = Column(Boolean, nullable=True, default=False,
                                server_default=false())
 
@@ -0,0 +1,177 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Conductor-wide limits on the requests sent to a BMC.
+
+Many BMCs cannot cope with concurrent requests or with bursts of them, and
+several nodes may share a single management endpoint (e.g. a PDU or a
+chassis manager). The requests of every node with the same BMC address are
+therefore limited together, using the options of the configuration group of
+the hardware type:
+
+* ``bmc_max_concurrent_requests`` caps the number of requests in flight.
+* ``bmc_requests_per_second`` and ``bmc_requests_burst`` configure a token
+  bucket limiting the rate at which requests are started.
+
+Both limits are disabled by default. The time requests spend waiting for
+the limits is reported as the ``BMCLimiter.<group>.ThrottledWait`` timer.
+"""
+
+import contextlib
+import threading
+import time
+from urllib import parse as urlparse
+
+from oslo_log import log as logging
+from oslo_utils import netutils
+
+from ironic.common import metrics_utils
+from ironic.conf import CONF
+
+
+LOG = logging.getLogger(__name__)
+
+METRICS = metrics_utils.get_metrics_logger(__name__)
+
+_LIMITERS = {}
+"""Limiters keyed by configuration group, BMC address and limits."""
+
+_LOCK = threading.Lock()
+
+_HELD = threading.local()
+"""Limiters held by the current thread, so that nested calls (e.g. retries
+of a request) do not wait for themselves."""
+
+
+class _Limiter(object):
+    """Concurrency and rate limits of a single BMC.
+
+    :param max_concurrent: the maximum number of requests in flight, 0 for
+        no limit.
+    :param rate: the maximum number of requests started per second, 0 for
+        no limit.
+    :param burst: the number of requests that can be started at once before
+        the rate limit applies.
+    """
+
+    def __init__(self, max_concurrent, rate, burst):
+        self._semaphore = (threading.BoundedSemaphore(max_concurrent)
+                           if max_concurrent else None)
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self):
+        """Take a token, possibly in advance.
+
+        :returns: the time to wait for the token, in seconds.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens
+                               + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return max(0, -self._tokens / self.rate)
+
+    def acquire(self):
+        """Wait until a request can be sent.
+
+        :returns: the time spent waiting, in seconds, 0 if the request has
+            not been throttled.
+        """
+        started = time.monotonic()
+        throttled = False
+        if (self._semaphore is not None
+                and not self._semaphore.acquire(blocking=False)):
+            throttled = True
+            self._semaphore.acquire()
+        if self.rate:
+            delay = self._reserve()
+            if delay > 0:
+                throttled = True
+                time.sleep(delay)
+        return time.monotonic() - started if throttled else 0
+
+    def release(self):
+        """Mark a request as completed."""
+        if self._semaphore is not None:
+            self._semaphore.release()
+
+
+def _normalize_address(address):
+    """Normalize a BMC address to its host name.
+
+    :param address: an address, host name or URL.
+    :returns: the lower case host name without brackets or port.
+    """
+    address = str(address).strip().lower()
+    if netutils.is_valid_ipv6(address):
+        return address
+    if '://' not in address:
+        address = '//' + address
+    try:
+        return urlparse.urlsplit(address).hostname or address
+    except ValueError:
+        return address
+
+
+def enabled(group):
+    """Whether requests are limited for a configuration group.
+
+    :param group: the name of the configuration group, e.g. ``redfish``.
+    """
+    conf = CONF[group]
+    return bool(conf.bmc_max_concurrent_requests
+                or conf.bmc_requests_per_second)
+
+
+@contextlib.contextmanager
+def limit(group, address):
+    """Limit a request to a BMC.
+
+    :param group: the name of the configuration group of the hardware type,
+        e.g. ``ipmi``.
+    :param address: the address of the BMC from the driver_info.
+    """
+    if not address or not enabled(group):
+        yield
+        return
+
+    conf = CONF[group]
+    key = (group, _normalize_address(address),
+           conf.bmc_max_concurrent_requests, conf.bmc_requests_per_second,
+           conf.bmc_requests_burst)
+    held = _HELD.__dict__.setdefault('keys', set())
+    if key in held:
+        yield
+        return
+
+    with _LOCK:
+        limiter = _LIMITERS.get(key)
+        if limiter is None:
+            limiter = _LIMITERS[key] = _Limiter(*key[2:])
+
+    waited = limiter.acquire()
+    if waited:
+        LOG.debug('Request to BMC %(address)s was throttled for %(waited).3f '
+                  'seconds', {'address': address, 'waited': waited})
+        METRICS.send_timer('BMCLimiter.%s.ThrottledWait' % group,
+                           waited * 1000)
+    held.add(key)
+    try:
+        yield
+    finally:
+        held.discard(key)
+        limiter.release()
@@ -52,6 +52,7 @@ from ironic.conductor import task_manager
 from ironic.conductor import utils as cond_utils
 from ironic.conf import CONF
 from ironic.drivers import base
+from ironic.drivers.modules import bmc_limiter
 from ironic.drivers.modules import boot_mode_utils
 from ironic.drivers.modules import console_utils
 from ironic.drivers import utils as driver_utils
@@ -679,7 +680,8 @@ def _exec_ipmitool(driver_info, command, check_exit_code=None,
             cmd_args.extend(command.split(" "))
 
             try:
-                out, err = utils.execute(*cmd_args, **extra_args)
+                with bmc_limiter.limit('ipmi', driver_info['address']):
+                    out, err = utils.execute(*cmd_args, **extra_args)
                 return out, err
             except processutils.ProcessExecutionError as e:
                 if change_cs and check_cipher_suite_errors(e.stderr):
@@ -340,6 +340,7 @@ class RedfishFirmware(base.FirmwareInterface):
                  states.DEPLOYWAIT, states.SERVICEWAIT]},
         predicate_extra_fields=['driver_internal_info'],
         predicate=lambda n: n.driver_internal_info.get('redfish_fw_updates'),
+        workers=lambda: CONF.conductor.periodic_max_workers,
     )
     def _query_update_status(self, task, manager, context):
         """Periodic job to check firmware update tasks."""
@@ -992,6 +992,7 @@ class RedfishManagement(base.ManagementInterface):
         filters={'reserved': False, 'provision_state': states.CLEANWAIT},
         predicate_extra_fields=['driver_internal_info'],
         predicate=lambda n: n.driver_internal_info.get('firmware_updates'),
+        workers=lambda: CONF.conductor.periodic_max_workers,
     )
     def _query_firmware_update_status(self, task, manager, context):
         """Periodic job to check firmware update tasks."""
@@ -972,6 +972,7 @@ class RedfishRAID(base.RAIDInterface):
             states.CLEANWAIT, states.DEPLOYWAIT}},
         predicate_extra_fields=['driver_internal_info'],
         predicate=lambda n: n.driver_internal_info.get('raid_configs'),
+        workers=lambda: CONF.conductor.periodic_max_workers,
     )
     def _query_raid_config_status(self, task, manager, context):
         """Periodic job to check RAID config tasks."""
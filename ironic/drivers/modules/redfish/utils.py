@@ -30,6 +30,7 @@ from ironic.common import exception
 from ironic.common.i18n import _
 from ironic.common import utils
 from ironic.conf import CONF
+from ironic.drivers.modules import bmc_limiter
 
 LOG = log.getLogger(__name__)
 
@@ -196,6 +197,31 @@ def parse_driver_info(node):
     return sushy_params
 
 
+class LimitedConnector(sushy.connector.Connector):
+    """Sushy connector applying the limits of the BMC to every request.
+
+    :param url: the address of the BMC.
+    """
+
+    # NOTE: the server side retries of the connector created by sushy by
+    # default, which are not applied to user-defined connectors.
+    SERVER_SIDE_RETRIES = 10
+    SERVER_SIDE_RETRIES_DELAY = 3
+
+    def __init__(self, url, **kwargs):
+        kwargs.setdefault('server_side_retries', self.SERVER_SIDE_RETRIES)
+        kwargs.setdefault('server_side_retries_delay',
+                          self.SERVER_SIDE_RETRIES_DELAY)
+        super(LimitedConnector, self).__init__(url, **kwargs)
+        self._address = url
+
+    def _op(self, *args, **kwargs):
+        # NOTE: retries and re-authentication call _op recursively, the
+        # limiter lets nested calls of the same thread through.
+        with bmc_limiter.limit('redfish', self._address):
+            return super(LimitedConnector, self)._op(*args, **kwargs)
+
+
 class SessionCache(object):
     """Cache of HTTP sessions credentials"""
 
@@ -250,6 +276,10 @@ class SessionCache(object):
                         'auth': authenticator}
         if 'root_prefix' in self._driver_info:
             sushy_params['root_prefix'] = self._driver_info['root_prefix']
+        if bmc_limiter.enabled('redfish'):
+            sushy_params['connector'] = LimitedConnector(
+                self._driver_info['address'],
+                verify=self._driver_info['verify_ca'])
         conn = sushy.Sushy(
             self._driver_info['address'],
             **sushy_params
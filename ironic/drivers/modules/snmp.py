@@ -24,6 +24,7 @@ models.
 """
 
 import abc
+import functools
 import time
 
 from oslo_log import log as logging
@@ -37,6 +38,7 @@ from ironic.common import utils
 from ironic.conductor import task_manager
 from ironic.conf import CONF
 from ironic.drivers import base
+from ironic.drivers.modules import bmc_limiter
 
 pysnmp = importutils.try_import('pysnmp')
 if pysnmp:
@@ -161,6 +163,15 @@ COMMON_PROPERTIES.update(OPTIONAL_PROPERTIES)
 COMMON_PROPERTIES.update(DEPRECATED_PROPERTIES)
 
 
+def _limited(func):
+    """Apply the limits of the SNMP device to a method of SNMPClient."""
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        with bmc_limiter.limit('snmp', self.address):
+            return func(self, *args, **kwargs)
+    return wrapper
+
+
 class SNMPClient(object):
     """SNMP client object.
 
@@ -255,6 +266,7 @@ class SNMPClient(object):
             contextName=self.context_name
         )
 
+    @_limited
     def get(self, oid):
         """Use PySNMP to perform an SNMP GET operation on a single object.
 
@@ -288,6 +300,7 @@ class SNMPClient(object):
         name, val = var_binds[0]
         return val
 
+    @_limited
     def get_next(self, oid):
         """Use PySNMP to perform an SNMP GET NEXT operation on a table object.
 
@@ -327,6 +340,7 @@ class SNMPClient(object):
 
         return vals
 
+    @_limited
     def set(self, oid, value):
         """Use PySNMP to perform an SNMP SET operation on a single object.
 
@@ -12,6 +12,8 @@
 #    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
 #    License for the specific language governing permissions and limitations
 #    under the License.
+import json
+
 from oslo_config import cfg
 from oslo_log import log
 from oslo_utils import strutils
@@ -232,7 +234,28 @@ class Node(base.IronicObject, object_base.VersionedObjectDictCompat):
 
     def _set_from_db_object(self, context, db_object, fields=None):
         use_fields = set(fields or self.fields) - {'traits'}
-        super(Node, self)._set_from_db_object(context, db_object, use_fields)
+        # NOTE: remember the JSON the dict fields were loaded from and the
+        # version of the database entry, see _remove_unchanged_json_fields.
+        # The dict fields loaded as JSON text are only decoded when
+        # accessed, see obj_load_attr.
+        serialized = dict(getattr(self, '_db_serialized', {}))
+        undecoded = set()
+        for field in use_fields:
+            value = db_object[field]
+            text = getattr(value, 'serialized', None)
+            if text is None:
+                serialized.pop(field, None)
+                continue
+            serialized[field] = text
+            if not isinstance(value, dict):
+                undecoded.add(field)
+                if super(Node, self).obj_attr_is_set(field):
+                    delattr(self, field)
+        self._db_serialized = serialized
+        self._undecoded = undecoded
+        self._db_version = db_object['version']
+        super(Node, self)._set_from_db_object(context, db_object,
+                                              use_fields - undecoded)
         if not fields or 'traits' in fields:
             self.traits = object_base.obj_make_list(
                 context, objects.TraitList(context),
@@ -240,22 +263,57 @@ class Node(base.IronicObject, object_base.VersionedObjectDictCompat):
                 fields=['trait', 'version'])
             self.traits.obj_reset_changes()
 
+    def _is_undecoded(self, attrname):
+        return (attrname in getattr(self, '_undecoded', ())
+                and not super(Node, self).obj_attr_is_set(attrname))
+
+    def obj_attr_is_set(self, attrname):
+        return (super(Node, self).obj_attr_is_set(attrname)
+                or self._is_undecoded(attrname))
+
+    def obj_load_attr(self, attrname):
+        """Decode a dict field loaded from the database as JSON text."""
+        if not self._is_undecoded(attrname):
+            return super(Node, self).obj_load_attr(attrname)
+        setattr(self, attrname, json.loads(self._db_serialized[attrname]))
+        # Decoding a field does not change it
+        self._changed_fields.discard(attrname)
+        self._undecoded.discard(attrname)
+
+    def obj_what_changed(self):
+        # NOTE: the base implementation gets every field to find the changed
+        # objects in them, which would decode all the dict fields.
+        changes = {field for field in self._changed_fields
+                   if field in self.fields}
+        for field in self.fields:
+            if (field in changes or not self.obj_attr_is_set(field)
+                    or self._is_undecoded(field)):
+                continue
+            value = getattr(self, field)
+            if (isinstance(value, object_base.VersionedObject)
+                    and value.obj_what_changed()):
+                changes.add(field)
+        return changes
+
     # NOTE(xek): We don't want to enable RPC on this call just yet. Remotable
     # methods can be used in the future to replace current explicit RPC calls.
     # Implications of calling new remote procedures should be thought through.
     # @object_base.remotable_classmethod
     @classmethod
-    def get(cls, context, node_id):
+    def get(cls, context, node_id, filters=None):
         """Find a node based on its id or uuid and return a Node object.
 
         :param context: Security context
         :param node_id: the id *or* uuid of a node.
+        :param filters: optional preconditions the node must match, checked
+                        by the database query that loads the node.
+        :raises: NodePreconditionFailed if the node does not match filters.
         :returns: a :class:`Node` object.
         """
         if strutils.is_int_like(node_id):
-            return cls.get_by_id(context, node_id)
+            return cls.get_by_id(context, node_id, filters=filters)
         elif uuidutils.is_uuid_like(node_id):
-            return cls.get_by_uuid(context, node_id)
+            return cls.get_by_uuid(context, node_id, filters=filters)
         else:
             raise exception.InvalidIdentity(identity=node_id)
 
@@ -264,15 +322,17 @@ class Node(base.IronicObject, object_base.VersionedObjectDictCompat):
     # Implications of calling new remote procedures should be thought through.
     # @object_base.remotable_classmethod
     @classmethod
-    def get_by_id(cls, context, node_id):
+    def get_by_id(cls, context, node_id, filters=None):
         """Find a node based on its integer ID and return a Node object.
 
         :param cls: the :class:`Node`
         :param context: Security context
         :param node_id: the ID of a node.
+        :param filters: optional preconditions the node must match.
+        :raises: NodePreconditionFailed if the node does not match filters.
         :returns: a :class:`Node` object.
         """
-        db_node = cls.dbapi.get_node_by_id(node_id)
+        db_node = cls.dbapi.get_node_by_id(node_id, filters=filters)
         node = cls._from_db_object(context, cls(), db_node)
         return node
 
@@ -281,15 +341,17 @@ class Node(base.IronicObject, object_base.VersionedObjectDictCompat):
     # Implications of calling new remote procedures should be thought through.
     # @object_base.remotable_classmethod
     @classmethod
-    def get_by_uuid(cls, context, uuid):
+    def get_by_uuid(cls, context, uuid, filters=None):
         """Find a node based on UUID and return a Node object.
 
         :param cls: the :class:`Node`
         :param context: Security context
         :param uuid: the UUID of a node.
+        :param filters: optional preconditions the node must match.
+        :raises: NodePreconditionFailed if the node does not match filters.
         :returns: a :class:`Node` object.
         """
-        db_node = cls.dbapi.get_node_by_uuid(uuid)
+        db_node = cls.dbapi.get_node_by_uuid(uuid, filters=filters)
         node = cls._from_db_object(context, cls(), db_node)
         return node
 
@@ -361,10 +423,12 @@ class Node(base.IronicObject, object_base.VersionedObjectDictCompat):
         else:
             target_fields = None
 
+        # NOTE: the dict fields of the nodes are only decoded when accessed
         db_nodes = cls.dbapi.get_node_list(filters=filters, limit=limit,
                                            marker=marker, sort_key=sort_key,
                                            sort_dir=sort_dir,
-                                           fields=target_fields)
+                                           fields=target_fields,
+                                           decode_json=False)
         return cls._from_db_object_list(context, db_nodes, target_fields)
 
     # NOTE(xek): We don't want to enable RPC on this call just yet. Remotable
@@ -372,7 +436,7 @@ class Node(base.IronicObject, object_base.VersionedObjectDictCompat):
     # Implications of calling new remote procedures should be thought through.
     # @object_base.remotable_classmethod
     @classmethod
-    def reserve(cls, context, tag, node_id):
+    def reserve(cls, context, tag, node_id, filters=None):
         """Get and reserve a node.
 
         To prevent other ManagerServices from manipulating the given
@@ -382,11 +446,14 @@ class Node(base.IronicObject, object_base.VersionedObjectDictCompat):
         :param context: Security context.
         :param tag: A string uniquely identifying the reservation holder.
         :param node_id: A node ID or UUID.
+        :param filters: optional preconditions the node must match, checked
+                        by the same statement that places the reservation.
         :raises: NodeNotFound if the node is not found.
+        :raises: NodePreconditionFailed if the node does not match filters.
         :returns: a :class:`Node` object.
 
         """
-        db_node = cls.dbapi.reserve_node(tag, node_id)
+        db_node = cls.dbapi.reserve_node(tag, node_id, filters=filters)
         node = cls._from_db_object(context, cls(), db_node)
         return node
 
@@ -481,11 +548,44 @@ class Node(base.IronicObject, object_base.VersionedObjectDictCompat):
                         attr_value[0:CONF.log_in_db_max_size])
 
         updates = self.do_version_changes_for_db()
+        self._remove_unchanged_json_fields(updates)
         self._validate_property_values(updates.get('properties'))
         self._validate_and_remove_traits(updates)
         self._validate_and_format_conductor_group(updates)
-        db_node = self.dbapi.update_node(self.uuid, updates)
-        self._from_db_object(self._context, self, db_node)
+        if (set(updates) == {'version'}
+                and updates['version'] == getattr(self, '_db_version', None)):
+            # Nothing changed since the node was loaded
+            self.obj_reset_changes()
+            return
+
+        # NOTE: traits are saved separately, so they only need to be loaded
+        # with the updated node if this object does not have them yet.
+        load_traits = not self.obj_attr_is_set('traits')
+        db_node = self.dbapi.update_node(self.uuid, updates,
+                                         load_relationships=load_traits)
+        fields = None if load_traits else set(self.fields) - {'traits'}
+        self._from_db_object(self._context, self, db_node, fields=fields)
+
+    def _remove_unchanged_json_fields(self, fields):
+        """Remove the dict fields not changed since they were loaded.
+
+        Dict fields are flagged for saving whenever they are set or one of
+        their values is, even if their contents do not change. Such fields
+        are detected by comparing their serialization with the JSON they
+        were loaded from, so that they are not written again.
+
+        :param fields: a dict of Node fields for update.
+        """
+        for field, serialized in getattr(self, '_db_serialized', {}).items():
+            if field not in fields:
+                continue
+            try:
+                unchanged = json.dumps(fields[field]) == serialized
+            except (TypeError, ValueError):
+                # Let the database API report the invalid value
+                continue
+            if unchanged:
+                del fields[field]
 
     @staticmethod
     def _validate_and_remove_traits(fields):
@@ -217,6 +217,8 @@ class TestCase(oslo_test_base.BaseTestCase):
         self.config(enabled_hardware_types=['fake-hardware',
                                             'manual-management'])
         self.config(initial_grub_template=None, group='pxe')
+        # Tests check the node history right after recording it.
+        self.config(node_history_write_interval=0, group='conductor')
         for iface in drivers_base.ALL_INTERFACES:
             default = None
 
@@ -50,6 +50,26 @@ class TestListAllocations(test_api_base.BaseApiTest):
         data = self.get_json('/allocations', headers=self.headers)
         self.assertEqual([], data['allocations'])
 
+    def test_get_all_conditional(self):
+        self.config(conditional_requests=True,
+                    conditional_requests_settle_time=0, group='api')
+        allocation = obj_utils.create_test_allocation(self.context,
+                                                      node_id=self.node.id)
+        for url in ('/allocations', '/allocations/%s' % allocation.uuid):
+            response = self.get_json(url, headers=self.headers,
+                                     expect_errors=True)
+            self.assertEqual(http_client.OK, response.status_int)
+            headers = dict(self.headers,
+                           **{'If-None-Match': response.headers['ETag']})
+            response = self.get_json(url, headers=headers,
+                                     expect_errors=True)
+            self.assertEqual(http_client.NOT_MODIFIED, response.status_int)
+
+        response = self.get_json('/nodes/%s/allocation' % self.node.uuid,
+                                 headers=headers, expect_errors=True)
+        self.assertEqual(http_client.OK, response.status_int)
+        self.assertNotIn('ETag', response.headers)
+
     def test_one(self):
         allocation = obj_utils.create_test_allocation(self.context,
                                                       node_id=self.node.id)
@@ -13,12 +13,14 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import json
 from unittest import mock
 
 from oslo_utils import uuidutils
 
 from ironic import api
 from ironic.api.controllers.v1 import collection
+from ironic.common import exception
 from ironic.tests import base
 
 
@@ -100,3 +102,42 @@ class TestCollection(base.TestCase):
             'http://192.0.2.1:5050/v1/foo?limit=3&'
             'marker=%s' % col[-1]['identifier'],
             collection.get_next(col, 3, 'foo', key_field='identifier'))
+
+    @mock.patch.object(api, 'response', autospec=False)
+    def test_write_list_with_links(self, mock_resp):
+        col = self._generate_collection(5)
+
+        def sanitize(item, fields):
+            item.pop('uuid')
+
+        for limit in (5, 6):
+            expected = collection.list_convert_with_links(
+                [dict(item) for item in col], 'things', limit, url='thing',
+                sanitize_func=sanitize, bar='baz')
+            result = collection.write_list_with_links(
+                [[dict(item) for item in col[:2]], [],
+                 [dict(item) for item in col[2:]]],
+                'things', limit, url='thing', sanitize_func=sanitize,
+                bar='baz')
+            self.assertIs(mock_resp, result)
+            body = b''.join(mock_resp.app_iter)
+            self.assertEqual(json.dumps(expected).encode(), body)
+            self.assertEqual(len(body), mock_resp.content_length)
+            self.assertEqual('application/json', mock_resp.content_type)
+
+    @mock.patch.object(api, 'response', autospec=False)
+    def test_write_list_with_links_empty(self, mock_resp):
+        collection.write_list_with_links(iter([]), 'things', 5, url='thing')
+        self.assertEqual(b'{"things": []}', b''.join(mock_resp.app_iter))
+
+    @mock.patch.object(api, 'response', autospec=False)
+    def test_write_list_with_links_error(self, mock_resp):
+        def chunks():
+            yield self._generate_collection(2)
+            raise exception.NodeNotFound(node='foo')
+
+        mock_resp.app_iter = None
+        self.assertRaises(exception.NodeNotFound,
+                          collection.write_list_with_links, chunks(),
+                          'things', 5, url='thing')
+        self.assertIsNone(mock_resp.app_iter)
@@ -75,6 +75,12 @@ class TestListNodes(test_api_base.BaseApiTest):
             fixtures.MockPatchObject(rpcapi.ConductorAPI, 'get_conductor_for',
                                      autospec=True)).mock
         self.mock_get_conductor_for.return_value = 'fake.conductor'
+        self.mock_get_conductors_for = self.useFixture(
+            fixtures.MockPatchObject(rpcapi.ConductorAPI,
+                                     'get_conductors_for',
+                                     autospec=True)).mock
+        self.mock_get_conductors_for.side_effect = (
+            lambda api, nodes: {n.uuid: 'fake.conductor' for n in nodes})
 
     def _create_association_test_nodes(self):
         # create some unassociated nodes
@@ -176,6 +182,141 @@ class TestListNodes(test_api_base.BaseApiTest):
             mock.call().__bool__(),
         ])
 
+    @mock.patch.object(policy, 'check', autospec=True)
+    @mock.patch.object(policy, 'check_policy', autospec=True)
+    def test_many_sanitization_memoized(self, mock_check_policy, mock_check):
+        for i in range(6):
+            obj_utils.create_test_node(self.context,
+                                       uuid=uuidutils.generate_uuid(),
+                                       owner='project%d' % (i % 2),
+                                       last_error='meow')
+        mock_check_policy.return_value = False
+        mock_check.return_value = False
+        data = self.get_json(
+            '/nodes/detail',
+            headers={api_base.Version.string: str(api_v1.max_version())})
+        self.assertEqual(6, len(data['nodes']))
+        for node in data['nodes']:
+            self.assertIn('Redacted', node['last_error'])
+        # One evaluation per node owner
+        last_error_calls = [c for c in mock_check.call_args_list
+                            if c.args[0] == 'baremetal:node:get:last_error']
+        self.assertEqual(['project0', 'project1'],
+                         sorted(c.args[1]['node.owner']
+                                for c in last_error_calls))
+
+    def _enable_conditional_requests(self):
+        self.config(conditional_requests=True,
+                    conditional_requests_settle_time=0, group='api')
+
+    def test_get_all_conditional(self):
+        self._enable_conditional_requests()
+        node = obj_utils.create_test_node(self.context)
+        headers = {api_base.Version.string: str(api_v1.max_version())}
+        response = self.get_json('/nodes', headers=headers,
+                                 expect_errors=True)
+        self.assertEqual(http_client.OK, response.status_int)
+        etag = response.headers['ETag']
+
+        headers['If-None-Match'] = etag
+        with mock.patch.object(objects.Node, 'list',
+                               autospec=True) as mock_list:
+            response = self.get_json('/nodes', headers=headers,
+                                     expect_errors=True)
+        self.assertEqual(http_client.NOT_MODIFIED, response.status_int)
+        self.assertEqual(etag, response.headers['ETag'])
+        self.assertEqual(b'', response.body)
+        self.assertFalse(mock_list.called)
+
+        # Different query parameters
+        response = self.get_json('/nodes?fields=uuid,name', headers=headers,
+                                 expect_errors=True)
+        self.assertEqual(http_client.OK, response.status_int)
+        self.assertNotEqual(etag, response.headers['ETag'])
+
+        # Modified node
+        self.dbapi.update_node(node.id, {'power_state': 'power off'})
+        response = self.get_json('/nodes', headers=headers,
+                                 expect_errors=True)
+        self.assertEqual(http_client.OK, response.status_int)
+        self.assertNotEqual(etag, response.headers['ETag'])
+        self.assertEqual('power off', response.json['nodes'][0]['power_state'])
+
+    def test_get_all_conditional_traits(self):
+        self._enable_conditional_requests()
+        node = obj_utils.create_test_node(self.context)
+        headers = {api_base.Version.string: str(api_v1.max_version())}
+        response = self.get_json('/nodes?fields=uuid,traits',
+                                 headers=headers, expect_errors=True)
+        headers['If-None-Match'] = response.headers['ETag']
+        self.dbapi.add_node_trait(node.id, 'CUSTOM_1', '1.0')
+        response = self.get_json('/nodes?fields=uuid,traits',
+                                 headers=headers, expect_errors=True)
+        self.assertEqual(http_client.OK, response.status_int)
+        self.assertEqual(['CUSTOM_1'], response.json['nodes'][0]['traits'])
+
+    def test_get_all_conditional_recent_change(self):
+        self.config(conditional_requests=True, group='api')
+        obj_utils.create_test_node(self.context)
+        response = self.get_json('/nodes', expect_errors=True)
+        self.assertEqual(http_client.OK, response.status_int)
+        self.assertNotIn('ETag', response.headers)
+
+    def test_get_all_conditional_disabled(self):
+        obj_utils.create_test_node(self.context)
+        response = self.get_json('/nodes', expect_errors=True,
+                                 headers={'If-None-Match': '*'})
+        self.assertEqual(http_client.OK, response.status_int)
+        self.assertNotIn('ETag', response.headers)
+
+    def test_get_all_chunked(self):
+        for i in range(5):
+            obj_utils.create_test_node(self.context,
+                                       uuid=uuidutils.generate_uuid(),
+                                       name='node-%d' % i)
+        headers = {api_base.Version.string: str(api_v1.max_version())}
+        for url in ('/nodes/detail', '/nodes?limit=4&fields=name',
+                    '/nodes?limit=3&sort_key=name&sort_dir=desc'):
+            self.config(list_chunk_size=0, group='api')
+            expected = self.get_json(url, headers=headers,
+                                     expect_errors=True)
+            self.config(list_chunk_size=2, group='api')
+            with mock.patch.object(objects.Node, 'list', autospec=True,
+                                   side_effect=objects.Node.list) as mock_list:
+                response = self.get_json(url, headers=headers,
+                                         expect_errors=True)
+            self.assertEqual(http_client.OK, response.status_int)
+            self.assertEqual('application/json', response.content_type)
+            # The response is identical to the one built at once
+            self.assertEqual(expected.body, response.body)
+            self.assertGreater(mock_list.call_count, 1)
+        self.assertIn('next', response.json)
+
+    def test_get_all_chunked_unknown_marker(self):
+        self.config(list_chunk_size=2, group='api')
+        response = self.get_json(
+            '/nodes?marker=%s' % uuidutils.generate_uuid(),
+            expect_errors=True)
+        self.assertEqual(http_client.NOT_FOUND, response.status_int)
+
+    def test_get_one_conditional(self):
+        self._enable_conditional_requests()
+        node = obj_utils.create_test_node(self.context)
+        headers = {api_base.Version.string: str(api_v1.max_version())}
+        response = self.get_json('/nodes/%s' % node.uuid, headers=headers,
+                                 expect_errors=True)
+        self.assertEqual(http_client.OK, response.status_int)
+        headers['If-None-Match'] = response.headers['ETag']
+        response = self.get_json('/nodes/%s' % node.uuid, headers=headers,
+                                 expect_errors=True)
+        self.assertEqual(http_client.NOT_MODIFIED, response.status_int)
+
+        self.dbapi.update_node(node.id, {'power_state': 'power off'})
+        response = self.get_json('/nodes/%s' % node.uuid, headers=headers,
+                                 expect_errors=True)
+        self.assertEqual(http_client.OK, response.status_int)
+        self.assertEqual('power off', response.json['power_state'])
+
     def test_get_one(self):
         node = obj_utils.create_test_node(self.context,
                                           chassis_id=self.chassis.id)
@@ -913,6 +1054,85 @@ class TestListNodes(test_api_base.BaseApiTest):
         self.assertIn('network_data', data['nodes'][0])
         self.assertIn('disable_power_off', data['nodes'][0])
 
+    def _create_nodes_with_relations(self, count):
+        nodes = []
+        for _ in range(count):
+            allocation_uuid = uuidutils.generate_uuid()
+            allocation = obj_utils.create_test_allocation(
+                self.context, uuid=allocation_uuid,
+                name='allocation-%s' % allocation_uuid)
+            nodes.append(obj_utils.create_test_node(
+                self.context, uuid=uuidutils.generate_uuid(),
+                chassis_id=self.chassis.id, allocation_id=allocation.id))
+            nodes[-1].allocation_uuid = allocation.uuid
+        return nodes
+
+    @mock.patch.object(objects.Chassis, 'get_by_id', autospec=True)
+    @mock.patch.object(objects.Allocation, 'get_by_id', autospec=True)
+    def test_detail_related_resources(self, mock_get_allocation,
+                                      mock_get_chassis):
+        nodes = self._create_nodes_with_relations(3)
+        data = self.get_json(
+            '/nodes/detail',
+            headers={api_base.Version.string: str(api_v1.max_version())})
+        result = {n['uuid']: n for n in data['nodes']}
+        for node in nodes:
+            self.assertEqual(self.chassis.uuid,
+                             result[node.uuid]['chassis_uuid'])
+            self.assertEqual(node.allocation_uuid,
+                             result[node.uuid]['allocation_uuid'])
+            self.assertEqual('fake.conductor',
+                             result[node.uuid]['conductor'])
+        self.mock_get_conductors_for.assert_called_once_with(mock.ANY,
+                                                             mock.ANY)
+        self.assertFalse(self.mock_get_conductor_for.called)
+        self.assertFalse(mock_get_allocation.called)
+        self.assertFalse(mock_get_chassis.called)
+
+    def test_detail_related_resources_missing(self):
+        node = self._create_nodes_with_relations(1)[0]
+        self.mock_get_conductors_for.side_effect = None
+        self.mock_get_conductors_for.return_value = {}
+        # The related resources are deleted while listing
+        with mock.patch.object(self.dbapi, 'get_chassis_uuids_by_ids',
+                               autospec=True, return_value={}), \
+                mock.patch.object(self.dbapi, 'get_allocation_uuids_by_ids',
+                                  autospec=True, return_value={}):
+            data = self.get_json(
+                '/nodes/detail',
+                headers={api_base.Version.string:
+                         str(api_v1.max_version())})
+        self.assertEqual(node.uuid, data['nodes'][0]['uuid'])
+        self.assertIsNone(data['nodes'][0]['chassis_uuid'])
+        self.assertIsNone(data['nodes'][0]['allocation_uuid'])
+        self.assertIsNone(data['nodes'][0]['conductor'])
+
+    def test_detail_related_resources_fields(self):
+        self._create_nodes_with_relations(2)
+        with mock.patch.object(self.dbapi, 'get_chassis_uuids_by_ids',
+                               autospec=True) as mock_chassis:
+            data = self.get_json(
+                '/nodes?fields=uuid,allocation_uuid',
+                headers={api_base.Version.string: str(api_v1.max_version())})
+        self.assertEqual(2, len(data['nodes']))
+        self.assertFalse(mock_chassis.called)
+        self.assertFalse(self.mock_get_conductors_for.called)
+
+    def test_detail_query_budget(self):
+        # The number of queries does not depend on the number of nodes
+        def _count_queries():
+            with self.assertQueryBudget(100) as stats:
+                self.get_json(
+                    '/nodes/detail',
+                    headers={api_base.Version.string:
+                             str(api_v1.max_version())})
+            return stats.queries
+
+        self._create_nodes_with_relations(1)
+        expected = _count_queries()
+        self._create_nodes_with_relations(5)
+        self.assertEqual(expected, _count_queries())
+
     def test_detail_snmpv3(self):
         driver_info = {
             'snmp_version': 3,
@@ -1500,6 +1720,32 @@ class TestListNodes(test_api_base.BaseApiTest):
         self.assertIn(next_marker, data['next'])
         self.assertIn('nodes', data['next'])
 
+    def test_collection_marker(self):
+        nodes = [obj_utils.create_test_node(self.context,
+                                            uuid=uuidutils.generate_uuid())
+                 for _ in range(3)]
+        data = self.get_json('/nodes/?limit=3&marker=%s' % nodes[0].uuid)
+        self.assertEqual([n.uuid for n in nodes[1:]],
+                         [n['uuid'] for n in data['nodes']])
+        self.assertNotIn('next', data)
+
+    def test_collection_marker_not_found(self):
+        obj_utils.create_test_node(self.context)
+        response = self.get_json(
+            '/nodes/?marker=%s' % uuidutils.generate_uuid(),
+            expect_errors=True)
+        self.assertEqual(http_client.NOT_FOUND, response.status_int)
+
+    def test_collection_marker_not_found_nullable_sort_key(self):
+        obj_utils.create_test_node(self.context, name='node-a')
+        for sort_dir in ('asc', 'desc'):
+            response = self.get_json(
+                '/nodes/?marker=%s&sort_key=name&sort_dir=%s'
+                % (uuidutils.generate_uuid(), sort_dir),
+                headers={api_base.Version.string: str(api_v1.max_version())},
+                expect_errors=True)
+            self.assertEqual(http_client.NOT_FOUND, response.status_int)
+
     def test_collection_links_default_limit(self):
         cfg.CONF.set_override('max_limit', 3, 'api')
         nodes = []
@@ -545,6 +545,73 @@ class TestListPorts(test_api_base.BaseApiTest):
         self.assertNotIn('node_id', data['ports'][0])
         self.assertNotIn('portgroup_id', data['ports'][0])
 
+    @mock.patch.object(objects.Portgroup, 'get', autospec=True)
+    def test_detail_portgroups(self, mock_get_pg):
+        portgroups = [
+            obj_utils.create_test_portgroup(
+                self.context, node_id=self.node.id,
+                uuid=uuidutils.generate_uuid(), name='pg%d' % i,
+                address='52:54:00:cf:2d:3%d' % i)
+            for i in range(2)]
+        expected = {}
+        for i in range(4):
+            portgroup = portgroups[i % 2] if i < 3 else None
+            port = obj_utils.create_test_port(
+                self.context, node_id=self.node.id,
+                uuid=uuidutils.generate_uuid(),
+                address='52:54:00:cf:2d:4%d' % i,
+                portgroup_id=portgroup.id if portgroup else None)
+            expected[port.uuid] = portgroup.uuid if portgroup else None
+        data = self.get_json(
+            '/ports/detail',
+            headers={api_base.Version.string: str(api_v1.max_version())}
+        )
+        self.assertEqual(expected, {p['uuid']: p['portgroup_uuid']
+                                    for p in data['ports']})
+        self.assertEqual({self.node.uuid},
+                         {p['node_uuid'] for p in data['ports']})
+        self.assertFalse(mock_get_pg.called)
+
+    def test_get_all_chunked(self):
+        for i in range(5):
+            obj_utils.create_test_port(self.context, node_id=self.node.id,
+                                       uuid=uuidutils.generate_uuid(),
+                                       address='52:54:00:cf:2d:3%s' % i)
+        headers = {api_base.Version.string: str(api_v1.max_version())}
+        for url in ('/ports/detail', '/ports?limit=3&fields=address',
+                    '/nodes/%s/ports?limit=4' % self.node.uuid):
+            self.config(list_chunk_size=0, group='api')
+            expected = self.get_json(url, headers=headers,
+                                     expect_errors=True)
+            self.config(list_chunk_size=2, group='api')
+            response = self.get_json(url, headers=headers,
+                                     expect_errors=True)
+            self.assertEqual(http_client.OK, response.status_int)
+            # The response is identical to the one built at once
+            self.assertEqual(expected.body, response.body)
+        self.assertIn('next', response.json)
+
+    def test_get_all_conditional(self):
+        self.config(conditional_requests=True,
+                    conditional_requests_settle_time=0, group='api')
+        port = obj_utils.create_test_port(self.context, node_id=self.node.id)
+        response = self.get_json('/ports', expect_errors=True)
+        self.assertEqual(http_client.OK, response.status_int)
+        headers = {'If-None-Match': response.headers['ETag']}
+        response = self.get_json('/ports', headers=headers,
+                                 expect_errors=True)
+        self.assertEqual(http_client.NOT_MODIFIED, response.status_int)
+        response = self.get_json('/ports/%s' % port.uuid, expect_errors=True)
+        self.assertEqual(http_client.OK, response.status_int)
+        self.assertNotEqual(headers['If-None-Match'],
+                            response.headers['ETag'])
+
+        # The ports visible to a project depend on their node
+        self.dbapi.update_node(self.node.id, {'owner': '54321'})
+        response = self.get_json('/ports', headers=headers,
+                                 expect_errors=True)
+        self.assertEqual(http_client.OK, response.status_int)
+
     def test_detail_query(self):
         llc = {'switch_info': 'switch', 'switch_id': 'aa:bb:cc:dd:ee:ff',
                'port_id': 'Gig0/1'}
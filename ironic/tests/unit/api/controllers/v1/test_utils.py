@@ -19,7 +19,9 @@ from http import client as http_client
 import io
 from unittest import mock
 
+import fixtures
 from oslo_config import cfg
+from oslo_utils import timeutils
 from oslo_utils import uuidutils
 
 from ironic import api
@@ -997,6 +999,34 @@ class TestNodeIdent(base.TestCase):
         self.assertRaises(exception.NodeNotFound,
                           utils.populate_node_uuid, port, d)
 
+    @mock.patch.object(objects.Node, 'get_by_id', autospec=True)
+    def test_populate_node_uuid_prefetched(self, mock_gbi, mock_pr):
+        port = obj_utils.get_test_port(self.context)
+        d = {}
+        utils.populate_node_uuid(port, d,
+                                 node_uuids={port.node_id: self.valid_uuid})
+        self.assertEqual({'node_uuid': self.valid_uuid}, d)
+
+        # not found, raise exception
+        self.assertRaises(exception.NodeNotFound,
+                          utils.populate_node_uuid, port, {}, node_uuids={})
+        self.assertFalse(mock_gbi.called)
+
+    def test_get_node_uuids(self, mock_pr):
+        ports = [obj_utils.get_test_port(self.context, id=i, node_id=node_id)
+                 for i, node_id in enumerate([1, 2, 1, None])]
+        with mock.patch.object(api, 'request',
+                               spec_set=['dbapi']) as mock_request:
+            self.assertIs(
+                mock_request.dbapi.get_node_uuids_by_ids.return_value,
+                utils.get_node_uuids(ports))
+        mock_request.dbapi.get_node_uuids_by_ids.assert_called_once_with(
+            {1, 2})
+
+    def test_get_node_uuids_no_nodes(self, mock_pr):
+        port = obj_utils.get_test_port(self.context, node_id=None)
+        self.assertEqual({}, utils.get_node_uuids([port]))
+
     @mock.patch.object(utils, 'check_owner_policy', autospec=True)
     @mock.patch.object(objects.Node, 'get_by_uuid', autospec=True)
     def test_replace_node_uuid_with_id(self, mock_gbu, mock_check, mock_pr):
@@ -1175,6 +1205,145 @@ class TestPortgroupIdent(base.TestCase):
                           self.invalid_name)
 
 
+class TestListInChunks(base.TestCase):
+
+    def setUp(self):
+        super(TestListInChunks, self).setUp()
+        self.config(list_chunk_size=3, group='api')
+        self.items = [mock.Mock(uuid=str(i)) for i in range(8)]
+
+    def _list(self, limit, marker):
+        start = int(marker) + 1 if marker else 0
+        return self.items[start:start + limit]
+
+    def test_use_list_chunks(self):
+        self.assertFalse(utils.use_list_chunks(3))
+        self.assertTrue(utils.use_list_chunks(4))
+        self.config(list_chunk_size=0, group='api')
+        self.assertFalse(utils.use_list_chunks(1000))
+
+    def test_list_in_chunks(self):
+        mock_list = mock.Mock(side_effect=self._list)
+        chunks = utils.list_in_chunks(mock_list, objects.Node, 100, None)
+        self.assertEqual([self.items[:3], self.items[3:6], self.items[6:]],
+                         list(chunks))
+        mock_list.assert_has_calls([mock.call(3, None), mock.call(3, '2'),
+                                    mock.call(3, '5')])
+
+    def test_list_in_chunks_limit(self):
+        mock_list = mock.Mock(side_effect=self._list)
+        chunks = utils.list_in_chunks(mock_list, objects.Node, 5, '0')
+        self.assertEqual([self.items[1:4], self.items[4:6]], list(chunks))
+        mock_list.assert_has_calls([mock.call(3, '0'), mock.call(2, '3')])
+
+    @mock.patch.object(objects.Node, 'get_by_uuid', autospec=True)
+    @mock.patch.object(api, 'request', spec_set=['context'])
+    def test_list_in_chunks_exact(self, mock_request, mock_get):
+        self.items = self.items[:6]
+        mock_list = mock.Mock(side_effect=self._list)
+        chunks = utils.list_in_chunks(mock_list, objects.Node, 100, None)
+        self.assertEqual([self.items[:3], self.items[3:]], list(chunks))
+        # The end of the list is only known from an empty chunk
+        self.assertEqual(3, mock_list.call_count)
+        mock_get.assert_called_once_with(mock_request.context, '5')
+
+    @mock.patch.object(objects.Node, 'get_by_uuid', autospec=True)
+    @mock.patch.object(api, 'request', spec_set=['context'])
+    def test_list_in_chunks_marker_deleted(self, mock_request, mock_get):
+        mock_get.side_effect = exception.NodeNotFound(node='2')
+
+        def _list(limit, marker):
+            # The last item of the first chunk is deleted meanwhile
+            return [] if marker == '2' else self._list(limit, marker)
+
+        chunks = utils.list_in_chunks(_list, objects.Node, 100, None)
+        self.assertEqual(self.items[:3], next(chunks))
+        self.assertRaises(exception.Conflict, next, chunks)
+        mock_get.assert_called_once_with(mock_request.context, '2')
+
+    @mock.patch.object(objects.Node, 'get_by_uuid', autospec=True)
+    @mock.patch.object(api, 'request', spec_set=['context'])
+    def test_list_in_chunks_unknown_marker(self, mock_request, mock_get):
+        mock_get.side_effect = exception.NodeNotFound(node='foo')
+        chunks = utils.list_in_chunks(lambda limit, marker: [],
+                                      objects.Node, 100, 'foo')
+        self.assertRaises(exception.NodeNotFound, list, chunks)
+        mock_get.assert_called_once_with(mock_request.context, 'foo')
+
+
+@mock.patch.object(api, 'response', spec_set=['etag', 'status'])
+@mock.patch.object(api, 'request',
+                   spec_set=['context', 'url', 'version', 'if_none_match'])
+class TestCheckNotModified(base.TestCase):
+
+    def setUp(self):
+        super(TestCheckNotModified, self).setUp()
+        self.config(conditional_requests=True, group='api')
+        self.now = datetime.datetime(2024, 1, 1, 12, 0, 0)
+        self.useFixture(fixtures.MockPatchObject(
+            timeutils, 'utcnow', autospec=True,
+            return_value=self.now))
+
+    def _prepare(self, mock_request, project_id='12345', if_none_match=()):
+        mock_request.context = ironic_context.RequestContext(
+            project_id=project_id)
+        mock_request.url = 'http://127.0.0.1/v1/nodes'
+        mock_request.version.minor = 90
+        mock_request.if_none_match = if_none_match
+
+    def test_not_modified(self, mock_request, mock_response):
+        self._prepare(mock_request)
+        self.assertFalse(utils.check_not_modified(1, 'a'))
+        etag = mock_response.etag
+        self._prepare(mock_request, if_none_match=[etag])
+        self.assertTrue(utils.check_not_modified(1, 'a'))
+        self.assertEqual(http_client.NOT_MODIFIED, mock_response.status)
+
+    def test_modified(self, mock_request, mock_response):
+        self._prepare(mock_request)
+        utils.check_not_modified(1, 'a')
+        etag = mock_response.etag
+        self._prepare(mock_request, if_none_match=[etag])
+        self.assertFalse(utils.check_not_modified(2, 'a'))
+        self.assertNotEqual(etag, mock_response.etag)
+
+    def test_other_credentials(self, mock_request, mock_response):
+        self._prepare(mock_request)
+        utils.check_not_modified(1, 'a')
+        etag = mock_response.etag
+        self._prepare(mock_request, project_id='54321',
+                      if_none_match=[etag])
+        self.assertFalse(utils.check_not_modified(1, 'a'))
+
+    def test_disabled(self, mock_request, mock_response):
+        self.config(conditional_requests=False, group='api')
+        get_watermark = mock.Mock()
+        self.assertFalse(
+            utils.check_collection_not_modified(get_watermark))
+        self.assertFalse(get_watermark.called)
+        self.assertFalse(mock_request.context.to_policy_values.called)
+
+    def test_collection(self, mock_request, mock_response):
+        self._prepare(mock_request)
+        latest = self.now - datetime.timedelta(seconds=10)
+        get_watermark = mock.Mock(return_value=(3, latest))
+        self.assertFalse(utils.check_collection_not_modified(get_watermark))
+        self._prepare(mock_request, if_none_match=[mock_response.etag])
+        self.assertTrue(utils.check_collection_not_modified(get_watermark))
+
+    @mock.patch.object(utils, 'check_not_modified', autospec=True)
+    def test_collection_recent_change(self, mock_check, mock_request,
+                                      mock_response):
+        latest = self.now - datetime.timedelta(seconds=5)
+        get_watermark = mock.Mock(return_value=(3, latest))
+        self.config(conditional_requests_settle_time=10, group='api')
+        self.assertFalse(utils.check_collection_not_modified(get_watermark))
+        self.assertFalse(mock_check.called)
+        self.config(conditional_requests_settle_time=2, group='api')
+        utils.check_collection_not_modified(get_watermark)
+        mock_check.assert_called_once_with(3, latest)
+
+
 class TestCheckOwnerPolicy(base.TestCase):
     def setUp(self):
         super(TestCheckOwnerPolicy, self).setUp()
@@ -1201,6 +1370,18 @@ class TestCheckOwnerPolicy(base.TestCase):
         mock_authorize.assert_called_once_with(
             'fake_policy', expected_target, fake_context)
 
+    @mock.patch.object(api, 'request',
+                       spec_set=["context", "version", "policy_decisions"])
+    @mock.patch.object(policy, 'authorize', spec=True)
+    def test_check_owner_policy_memoized(
+            self, mock_authorize, mock_pr
+    ):
+        mock_pr.context = ironic_context.RequestContext()
+        mock_pr.policy_decisions = policy.DecisionCache()
+        for owner in ['12345', '67890', '12345']:
+            utils.check_owner_policy('node', 'fake_policy', owner)
+        self.assertEqual(2, mock_authorize.call_count)
+
     @mock.patch.object(api, 'request', spec_set=["context", "version"])
     @mock.patch.object(policy, 'authorize', spec=True)
     def test_check_owner_policy_forbidden(
@@ -153,6 +153,23 @@ class TestListVolumeConnectors(test_api_base.BaseApiTest):
         # never expose the node_id
         self.assertNotIn('node_id', data['connectors'][0])
 
+    @mock.patch.object(objects.Node, 'get_by_id', autospec=True)
+    def test_detail_node_uuids(self, mock_get_node):
+        node2 = obj_utils.create_test_node(self.context,
+                                           uuid=uuidutils.generate_uuid())
+        expected = {}
+        for i, node in enumerate([self.node, node2, self.node]):
+            connector = obj_utils.create_test_volume_connector(
+                self.context, node_id=node.id,
+                uuid=uuidutils.generate_uuid(),
+                connector_id='test-connector_id-%s' % i)
+            expected[connector.uuid] = node.uuid
+        data = self.get_json('/volume/connectors?detail=True',
+                             headers=self.headers)
+        self.assertEqual(expected, {c['uuid']: c['node_uuid']
+                                    for c in data['connectors']})
+        self.assertFalse(mock_get_node.called)
+
     def test_detail_false(self):
         connector = obj_utils.create_test_volume_connector(
             self.context, node_id=self.node.id)
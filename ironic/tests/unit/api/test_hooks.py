@@ -25,6 +25,8 @@ from ironic.api.controllers import root
 from ironic.api import hooks
 from ironic.common import context
 from ironic.common import policy
+from ironic.db import api as dbapi
+from ironic.db import query_stats
 from ironic.tests import base as tests_base
 from ironic.tests.unit.api import base
 
@@ -35,6 +37,7 @@ class FakeRequest(object):
         self.context = context
         self.environ = environ or {}
         self.version = (1, 0)
+        self.method = 'GET'
         self.host_url = 'http://127.0.0.1:6385'
 
 
@@ -90,6 +93,65 @@ def headers_to_environ(headers, **kwargs):
     return environ
 
 
+class TestDBHook(tests_base.TestCase):
+
+    def setUp(self):
+        super(TestDBHook, self).setUp()
+        self.addCleanup(dbapi.allow_replica_reads, False)
+        self.reqstate = FakeRequestState(headers=fake_headers())
+        self.hook = hooks.DBHook()
+
+    def test_replica_reads_disabled(self):
+        self.hook.before(self.reqstate)
+        self.assertIs(hooks.DBAPI, self.reqstate.request.dbapi)
+        self.assertFalse(dbapi.replica_reads_allowed())
+
+    def test_replica_reads(self):
+        self.config(api_read_from_replica=True, group='database')
+        self.hook.before(self.reqstate)
+        self.assertTrue(dbapi.replica_reads_allowed())
+        self.hook.after(self.reqstate)
+        self.assertIsNone(self.reqstate.request.dbapi)
+        self.assertFalse(dbapi.replica_reads_allowed())
+
+    def test_replica_reads_not_read_only(self):
+        self.config(api_read_from_replica=True, group='database')
+        dbapi.allow_replica_reads(True)
+        self.reqstate.request.method = 'PATCH'
+        self.hook.before(self.reqstate)
+        self.assertFalse(dbapi.replica_reads_allowed())
+
+
+class FakeController(object):
+    def get_all(self):
+        pass
+
+
+class TestQueryStatsHook(tests_base.TestCase):
+
+    def setUp(self):
+        super(TestQueryStatsHook, self).setUp()
+        self.reqstate = FakeRequestState(headers=fake_headers())
+        self.reqstate.controller = FakeController().get_all
+        self.hook = hooks.QueryStatsHook()
+
+    @mock.patch.object(query_stats, 'stop', autospec=True)
+    @mock.patch.object(query_stats, 'start', autospec=True)
+    def test_query_stats(self, mock_start, mock_stop):
+        self.hook.before(self.reqstate)
+        mock_start.assert_called_once_with('API.FakeController.get_all')
+        self.assertIs(mock_start.return_value,
+                      self.reqstate.request.query_stats)
+        self.hook.after(self.reqstate)
+        mock_stop.assert_called_once_with(mock_start.return_value)
+        self.assertIsNone(self.reqstate.request.query_stats)
+
+    @mock.patch.object(query_stats, 'stop', autospec=True)
+    def test_query_stats_no_before(self, mock_stop):
+        self.hook.after(self.reqstate)
+        mock_stop.assert_called_once_with(None)
+
+
 class TestNoExceptionTracebackHook(base.BaseApiTest):
 
     TRACE = [u'Traceback (most recent call last):',
@@ -231,6 +293,8 @@ class TestContextHook(base.BaseApiTest):
             mock_ctx.from_environ.assert_called_once_with(
                 environ, **creds_dict)
         mock_policy.assert_not_called()
+        self.assertIsInstance(reqstate.request.policy_decisions,
+                              policy.DecisionCache)
         if auth_strategy == 'noauth':
             self.assertIsNone(ctx.auth_token)
         mock_policy.assert_not_called()
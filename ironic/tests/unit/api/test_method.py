@@ -30,9 +30,12 @@ class MyThingController(pecan.rest.RestController):
 
     _custom_actions = {
         'no_content': ['GET'],
+        'not_modified': ['GET'],
         'response_content': ['GET'],
         'response_custom_status': ['GET'],
+        'response_written': ['GET'],
         'ouch': ['GET'],
+        'ouch_tagged': ['GET'],
     }
 
     @method.expose()
@@ -45,6 +48,11 @@ class MyThingController(pecan.rest.RestController):
         api.response.status_code = 204
         return 'nothing'
 
+    @method.expose()
+    def not_modified(self):
+        api.response.etag = 'tag'
+        api.response.status_code = 304
+
     @method.expose()
     def response_content(self):
         resp = v1.utils.PassthruResponse('nothing', status_code=200)
@@ -55,10 +63,21 @@ class MyThingController(pecan.rest.RestController):
     def response_custom_status(self):
         return 'accepted'
 
+    @method.expose()
+    def response_written(self):
+        api.response.content_type = 'application/json'
+        api.response.app_iter = (block for block in [b'{"a": ', b'1}'])
+        return api.response
+
     @method.expose()
     def ouch(self):
         raise Exception('ouch')
 
+    @method.expose()
+    def ouch_tagged(self):
+        api.response.etag = 'tag'
+        raise Exception('ouch')
+
     @method.expose(status_code=201)
     @method.body('body')
     @args.validate(body=args.schema({
@@ -114,6 +133,12 @@ class TestExpose(test_api_base.BaseApiTest):
         self.assertIsNone(response.content_type)
         self.assertEqual(b'', response.normal_body)
 
+    def test_response_304(self):
+        response = self.get_json('/things/not_modified', expect_errors=True)
+        self.assertEqual(http_client.NOT_MODIFIED, response.status_int)
+        self.assertEqual('"tag"', response.headers['ETag'])
+        self.assertEqual(b'', response.normal_body)
+
     def test_response_content(self):
         response = self.get_json('/things/response_content',
                                  expect_errors=True)
@@ -128,6 +153,13 @@ class TestExpose(test_api_base.BaseApiTest):
         self.assertEqual(b'"accepted"', response.normal_body)
         self.assertEqual('application/json', response.content_type)
 
+    def test_response_written(self):
+        response = self.get_json('/things/response_written',
+                                 expect_errors=True)
+        self.assertEqual(http_client.OK, response.status_int)
+        self.assertEqual(b'{"a": 1}', response.normal_body)
+        self.assertEqual('application/json', response.content_type)
+
     def test_exception(self):
         response = self.get_json('/things/ouch',
                                  expect_errors=True)
@@ -138,6 +170,13 @@ class TestExpose(test_api_base.BaseApiTest):
         self.assertEqual('Server', error_message['faultcode'])
         self.assertEqual('ouch', error_message['faultstring'])
 
+    def test_exception_no_etag(self):
+        response = self.get_json('/things/ouch_tagged',
+                                 expect_errors=True)
+        self.assertEqual(http_client.INTERNAL_SERVER_ERROR,
+                         response.status_int)
+        self.assertNotIn('ETag', response.headers)
+
     def test_post_body(self):
         data = {
             'three': 'three',
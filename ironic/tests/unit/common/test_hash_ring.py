@@ -137,7 +137,8 @@ class HashRingManagerTestCase(db_base.DbTestCase):
         )
         ring = self.ring_manager.get_ring('hardware-type', '')
         self.assertEqual(2, len(ring))
-        self.assertEqual(3, is_sqlite_mock.call_count)
+        # Two calls come from fetching the membership stamp
+        self.assertEqual(5, is_sqlite_mock.call_count)
 
     @mock.patch.object(utils, 'is_ironic_using_sqlite', autospec=True)
     def test_hash_ring_manager_reset_interval_not_happen_sqlite(
@@ -183,7 +184,46 @@ class HashRingManagerTestCase(db_base.DbTestCase):
         )
         ring = self.ring_manager.get_ring('hardware-type', '')
         self.assertEqual(1, len(ring))
-        self.assertEqual(2, is_sqlite_mock.call_count)
+        # One call comes from fetching the membership stamp
+        self.assertEqual(3, is_sqlite_mock.call_count)
+
+    @mock.patch.object(utils, 'is_ironic_using_sqlite', autospec=True)
+    def test_hash_ring_manager_reset_interval_no_changes(self,
+                                                         is_sqlite_mock):
+        is_sqlite_mock.return_value = False
+        CONF.set_override('hash_ring_reset_interval', 30)
+        self.register_conductors()
+        ring = self.ring_manager.get_ring('hardware-type', '')
+
+        with mock.patch.object(self.ring_manager, '_load_hash_rings',
+                               autospec=True) as mock_load:
+            self.ring_manager.__class__._hash_rings = (
+                self.ring_manager.__class__._hash_rings[0],
+                time.monotonic() - 31
+            )
+            # The conductors have not changed, the rings are not rebuilt
+            self.assertIs(ring,
+                          self.ring_manager.get_ring('hardware-type', ''))
+            mock_load.assert_not_called()
+            self.assertGreater(self.ring_manager.__class__._hash_rings[1],
+                               time.monotonic() - 31)
+
+    @mock.patch.object(utils, 'is_ironic_using_sqlite', autospec=True)
+    def test_hash_ring_manager_reset_interval_conductor_gone(self,
+                                                             is_sqlite_mock):
+        is_sqlite_mock.return_value = False
+        CONF.set_override('hash_ring_reset_interval', 30)
+        self.register_conductors()
+        ring = self.ring_manager.get_ring('hardware-type', '')
+        self.assertIn('host2', ring.nodes)
+
+        self.dbapi.unregister_conductor('host2')
+        self.ring_manager.__class__._hash_rings = (
+            self.ring_manager.__class__._hash_rings[0],
+            time.monotonic() - 31
+        )
+        ring = self.ring_manager.get_ring('hardware-type', '')
+        self.assertNotIn('host2', ring.nodes)
 
     def test_hash_ring_manager_uncached(self):
         ring_mgr = hash_ring.HashRingManager(cache=False,
@@ -192,6 +232,85 @@ class HashRingManagerTestCase(db_base.DbTestCase):
         self.assertIsNotNone(ring)
         self.assertEqual((None, 0), hash_ring.HashRingManager._hash_rings)
 
+    def test_get_hosts(self):
+        self.register_conductors()
+        ring = self.ring_manager.get_ring('hardware-type', '')
+        uuid = '1be26c0b-03f2-4d2e-ae87-c02d7f33c123'
+        expected = frozenset(ring.get_nodes(uuid.encode('utf-8')))
+        with mock.patch.object(ring, 'get_nodes', autospec=True) as mock_get:
+            mock_get.return_value = set(expected)
+            self.assertEqual(expected, self.ring_manager.get_hosts(
+                'hardware-type', '', uuid))
+            self.assertEqual(expected, self.ring_manager.get_hosts(
+                'hardware-type', '', uuid))
+            # The second call is cached
+            mock_get.assert_called_once_with(uuid.encode('utf-8'))
+
+    def test_get_hosts_for_nodes(self):
+        self.register_conductors()
+        ring = self.ring_manager.get_ring('hardware-type', '')
+        uuids = ['1be26c0b-03f2-4d2e-ae87-c02d7f33c123',
+                 '1be26c0b-03f2-4d2e-ae87-c02d7f33c124']
+        result = self.ring_manager.get_hosts_for_nodes(
+            'hardware-type', '', uuids)
+        self.assertEqual(
+            {uuid: frozenset(ring.get_nodes(uuid.encode('utf-8')))
+             for uuid in uuids},
+            result)
+
+    def test_get_hosts_driver_not_found(self):
+        self.register_conductors()
+        self.assertRaises(exception.DriverNotFound,
+                          self.ring_manager.get_hosts,
+                          'driver3', '', 'uuid')
+
+    def test_get_hosts_uncached(self):
+        self.register_conductors()
+        ring_mgr = hash_ring.HashRingManager(cache=False,
+                                             use_groups=self.use_groups)
+        uuid = '1be26c0b-03f2-4d2e-ae87-c02d7f33c123'
+        with mock.patch.object(hash_ring.HashRingManager,
+                               '_get_node_hosts_cache',
+                               autospec=True) as mock_cache:
+            hosts = ring_mgr.get_hosts('hardware-type', '', uuid)
+            mock_cache.assert_not_called()
+        self.assertEqual(1, len(hosts))
+
+    @mock.patch.object(utils, 'is_ironic_using_sqlite', autospec=True)
+    def test_generation(self, is_sqlite_mock):
+        is_sqlite_mock.return_value = False
+        self.register_conductors()
+        self.ring_manager.get_ring('hardware-type', '')
+        generation = self.ring_manager.generation
+        uuid = '1be26c0b-03f2-4d2e-ae87-c02d7f33c123'
+        self.ring_manager.get_hosts('hardware-type', '', uuid)
+
+        # Rebuilding the rings with the same conductors keeps the cache
+        self.ring_manager.reset()
+        self.ring_manager.get_ring('hardware-type', '')
+        self.assertEqual(generation, self.ring_manager.generation)
+        cache_generation, cache = hash_ring.HashRingManager._node_hosts
+        self.assertEqual(generation, cache_generation)
+        self.assertEqual(1, len(cache))
+
+        # A new conductor changes the generation
+        c6 = self.dbapi.register_conductor({'hostname': 'host6',
+                                            'drivers': []})
+        self.dbapi.register_conductor_hardware_interfaces(
+            c6.id,
+            [{'hardware_type': 'hardware-type', 'interface_type': 'deploy',
+              'interface_name': 'ansible', 'default': True}])
+        self.ring_manager.reset()
+        self.ring_manager.get_hosts('hardware-type', '', uuid)
+        self.assertEqual(generation + 1, self.ring_manager.generation)
+        # Not cached, since the rings were rebuilt during the call
+        cache_generation, cache = hash_ring.HashRingManager._node_hosts
+        self.assertEqual(generation, cache_generation)
+        self.ring_manager.get_hosts('hardware-type', '', uuid)
+        cache_generation, cache = hash_ring.HashRingManager._node_hosts
+        self.assertEqual(generation + 1, cache_generation)
+        self.assertEqual(1, len(cache))
+
 
 class HashRingManagerWithGroupsTestCase(HashRingManagerTestCase):
 
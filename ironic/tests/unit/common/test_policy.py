@@ -248,6 +248,37 @@ class PolicyTestCase(base.TestCase):
             oslo_policy.PolicyNotRegistered,
             policy.authorize, 'has_bar_role', creds, creds)
 
+    @mock.patch.object(policy, 'check', autospec=True)
+    def test_decision_cache_check(self, mock_check):
+        mock_check.side_effect = lambda rule, target, creds: (
+            target.get('node.owner') == 'alice')
+        decisions = policy.DecisionCache()
+        creds = {'roles': ['foo'], 'project_id': 'alice'}
+        for owner in ['alice', 'bob', 'alice', 'bob']:
+            target = dict(creds, **{'node.owner': owner})
+            self.assertEqual(owner == 'alice',
+                             decisions.check('has_foo_role', target, creds))
+        self.assertEqual(2, mock_check.call_count)
+        # Other rules and credentials are evaluated separately
+        decisions.check('has_bar_role', target, creds)
+        decisions.check('has_foo_role', target, {'roles': ['bar']})
+        decisions.check_policy('has_foo_role', target, creds)
+        self.assertEqual(4, mock_check.call_count)
+
+    def test_decision_cache_authorize(self):
+        decisions = policy.DecisionCache()
+        creds = {'roles': ['foo']}
+        self.assertTrue(decisions.authorize('has_foo_role', creds, creds))
+        with mock.patch.object(policy, 'authorize', autospec=True) as mock_a:
+            mock_a.side_effect = exception.HTTPForbidden(resource='fake')
+            for _ in range(2):
+                self.assertRaises(exception.HTTPForbidden,
+                                  decisions.authorize, 'has_bar_role',
+                                  creds, creds)
+            self.assertTrue(decisions.authorize('has_foo_role', creds,
+                                                creds))
+        mock_a.assert_called_once_with('has_bar_role', creds, creds)
+
     @mock.patch.object(cfg, 'CONF', autospec=True)
     @mock.patch.object(policy, 'get_enforcer', autospec=True)
     def test_get_oslo_policy_enforcer_no_args(self, mock_gpe, mock_cfg):
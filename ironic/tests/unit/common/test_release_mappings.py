@@ -101,6 +101,7 @@ class ReleaseMappingsTestCase(base.TestCase):
         # initialize them with the version 1.0 instead.
         # NodeBase is also excluded as it is covered by Node.
         exceptions = set(['NodeTag', 'ConductorHardwareInterfaces',
+                          'ConductorMembership',
                           'NodeTrait', 'DeployTemplateStep',
                           'NodeBase', 'RunbookStep'])
         model_names -= exceptions
@@ -303,6 +303,49 @@ class DoAllocateTestCase(db_base.DbTestCase):
         self.assertEqual(allocation['id'], node['allocation_id'])
         self.assertEqual([node['uuid']], allocation['candidate_nodes'])
 
+    @mock.patch.object(task_manager, 'acquire', autospec=True,
+                       side_effect=task_manager.acquire)
+    def test_traits_do_not_match(self, mock_acquire):
+        node = obj_utils.create_test_node(self.context,
+                                          power_state='power on',
+                                          resource_class='x-large',
+                                          provision_state='available')
+        db_utils.create_test_node_traits(['tr1'], node_id=node.id)
+
+        allocation = obj_utils.create_test_allocation(self.context,
+                                                      resource_class='x-large',
+                                                      traits=['tr1', 'tr2'])
+        allocations.do_allocate(self.context, allocation)
+        self.assertIn('no suitable nodes have the requested traits',
+                      allocation['last_error'])
+        self.assertEqual('error', allocation['state'])
+
+        # All nodes are filtered out on the database level.
+        self.assertFalse(mock_acquire.called)
+
+    def test_candidates_limit(self):
+        self.config(allocation_candidates_limit=2, group='conductor')
+        uuids = [obj_utils.create_test_node(self.context,
+                                            uuid=uuidutils.generate_uuid(),
+                                            name='node-%d' % i,
+                                            power_state='power on',
+                                            resource_class='x-large',
+                                            provision_state='available').uuid
+                 for i in range(5)]
+        allocation = obj_utils.create_test_allocation(self.context,
+                                                      resource_class='x-large')
+        candidates = allocations._candidate_nodes(self.context, allocation)
+        self.assertEqual(2, len(set(candidates)))
+        self.assertTrue(set(candidates).issubset(uuids))
+
+        # The node with the same name as the allocation is always tried
+        allocation.name = 'node-3'
+        for _ in range(3):
+            candidates = allocations._candidate_nodes(self.context,
+                                                      allocation)
+            self.assertEqual(uuids[3], candidates[0])
+            self.assertIn(len(candidates), (2, 3))
+
     @mock.patch.object(task_manager, 'acquire', autospec=True,
                        side_effect=task_manager.acquire)
     def test_nodes_filtered_out(self, mock_acquire):
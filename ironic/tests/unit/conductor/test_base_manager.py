@@ -32,6 +32,7 @@ from ironic.conductor import base_manager
 from ironic.conductor import manager
 from ironic.conductor import notification_utils
 from ironic.conductor import task_manager
+from ironic.conductor import worker_classes
 from ironic.db import api as dbapi
 from ironic.drivers import fake_hardware
 from ironic.drivers import generic
@@ -453,6 +454,88 @@ class ManagerSpawnWorkerTestCase(tests_base.TestCase):
                           self.service._spawn_worker, self.func)
 
 
+@mock.patch.object(base_manager.METRICS, 'send_gauge', autospec=True)
+class ManagerSpawnClassifiedWorkerTestCase(tests_base.TestCase):
+    def setUp(self):
+        super(ManagerSpawnClassifiedWorkerTestCase, self).setUp()
+        self.config(worker_class_limits={'bulk': 50}, group='conductor')
+        self.service = manager.ConductorManager('hostname', 'test-topic')
+        self.service._init_executors(4, 0)
+        self.addCleanup(self.service._executor.shutdown)
+        self.func = mock.Mock(return_value=42, __qualname__='func')
+
+    def test_spawn_worker(self, mock_gauge):
+        future = self.service._spawn_worker(
+            self.func, 1, foo='bar', _worker_class=worker_classes.BULK)
+        self.assertEqual(42, future.result())
+        self.func.assert_called_once_with(1, foo='bar')
+        mock_gauge.assert_has_calls([
+            mock.call('ConductorManager.WorkerClass.bulk.Running', 1),
+            mock.call('ConductorManager.WorkerClass.bulk.Running', 0)])
+        self.assertEqual(
+            0, self.service._worker_classes.running(worker_classes.BULK))
+
+    @mock.patch.object(base_manager.METRICS, 'send_counter', autospec=True)
+    def test_spawn_worker_class_full(self, mock_counter, mock_gauge):
+        self.service._worker_classes.acquire(worker_classes.BULK)
+        self.service._worker_classes.acquire(worker_classes.BULK)
+
+        self.assertRaises(exception.NoFreeConductorWorker,
+                          self.service._spawn_worker, self.func,
+                          _worker_class=worker_classes.BULK)
+        mock_counter.assert_called_once_with(
+            'ConductorManager.WorkerClass.bulk.Rejected', 1)
+        # Other classes are not affected
+        future = self.service._spawn_worker(self.func)
+        self.assertEqual(42, future.result())
+
+    def test_spawn_worker_reserved(self, mock_gauge):
+        self.service._reserved_executor = mock.Mock(
+            spec=futurist.GreenThreadPoolExecutor)
+        self.service._executor = mock.Mock(
+            spec=futurist.GreenThreadPoolExecutor)
+        self.service._executor.submit.side_effect = \
+            futurist.RejectedSubmission()
+
+        self.service._spawn_worker(self.func,
+                                   _worker_class=worker_classes.BULK)
+        self.service._reserved_executor.submit.assert_called_once_with(
+            mock.ANY)
+        self.assertEqual(
+            0, self.service._worker_classes.running(worker_classes.BULK))
+        self.assertRaises(exception.NoFreeConductorWorker,
+                          self.service._spawn_worker, self.func,
+                          _worker_class=worker_classes.BULK,
+                          _allow_reserved_pool=False)
+
+    def test_spawn_worker_class_full_reserved_free(self, mock_gauge):
+        self.service._reserved_executor = mock.Mock(
+            spec=futurist.GreenThreadPoolExecutor)
+        self.service._worker_classes.acquire(worker_classes.BULK)
+        self.service._worker_classes.acquire(worker_classes.BULK)
+
+        self.assertRaises(exception.NoFreeConductorWorker,
+                          self.service._spawn_worker, self.func,
+                          _worker_class=worker_classes.BULK)
+        self.service._reserved_executor.submit.assert_not_called()
+
+    def test_spawn_worker_rejected(self, mock_gauge):
+        self.service._executor = mock.Mock(
+            spec=futurist.GreenThreadPoolExecutor)
+        self.service._executor.submit.side_effect = \
+            futurist.RejectedSubmission()
+
+        self.assertRaises(exception.NoFreeConductorWorker,
+                          self.service._spawn_worker, self.func)
+        self.assertEqual(0, self.service._worker_classes.running(
+            worker_classes.INTERACTIVE))
+
+    def test_unknown_class(self, mock_gauge):
+        self.config(worker_class_limits={'urgent': 50}, group='conductor')
+        self.assertRaises(exception.ConfigInvalid,
+                          self.service._init_executors, 4, 0)
+
+
 @mock.patch.object(objects.Conductor, 'unregister_all_hardware_interfaces',
                    autospec=True)
 @mock.patch.object(objects.Conductor, 'register_hardware_interfaces',
@@ -223,18 +223,21 @@ class DoNodeDeployTestCase(mgr_utils.ServiceSetUpMixin, db_base.DbTestCase):
                 mock.call(node.uuid,
                           {'version': mock.ANY,
                            'instance_info': expected_instance_info,
-                           'driver_internal_info': mock.ANY}),
+                           'driver_internal_info': mock.ANY},
+                          load_relationships=False),
                 mock.call(node.uuid,
                           {'version': mock.ANY,
-                           'last_error': mock.ANY}),
+                           'last_error': mock.ANY},
+                          load_relationships=False),
                 mock.call(node.uuid,
                           {'version': mock.ANY,
-                           'deploy_step': {},
-                           'driver_internal_info': mock.ANY}),
+                           'driver_internal_info': mock.ANY},
+                          load_relationships=False),
                 mock.call(node.uuid,
                           {'version': mock.ANY,
                            'provision_state': states.DEPLOYFAIL,
-                           'target_provision_state': states.ACTIVE}),
+                           'target_provision_state': states.ACTIVE},
+                          load_relationships=False),
             ]
             self.assertEqual(expected_calls, mock_db.mock_calls)
             self.assertFalse(mock_prepare.called)
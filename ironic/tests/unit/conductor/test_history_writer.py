@@ -0,0 +1,155 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from unittest import mock
+
+from oslo_db import exception as db_exc
+from oslo_utils import uuidutils
+
+from ironic.conductor import history_writer
+from ironic.db.sqlalchemy import api as sqlalchemy_api
+from ironic.objects import node_history
+from ironic.tests.unit.db import base as db_base
+from ironic.tests.unit.db import utils as db_utils
+
+
+class HistoryWriterTestCase(db_base.DbTestCase):
+
+    def setUp(self):
+        super(HistoryWriterTestCase, self).setUp()
+        self.node = db_utils.create_test_node()
+        self.addCleanup(history_writer.stop)
+
+    def _history(self, event='event'):
+        return node_history.NodeHistory(node_id=self.node.id, event=event,
+                                        severity='INFO', conductor='host')
+
+    def _events(self):
+        return [h.event for h in
+                self.dbapi.get_node_history_by_node_id(self.node.id)]
+
+    def test_record_not_started(self):
+        history_writer.record(self._history())
+        self.assertEqual(['event'], self._events())
+
+    def test_start_disabled(self):
+        history_writer.start()
+        self.assertIsNone(history_writer._WRITER)
+        history_writer.record(self._history())
+        self.assertEqual(['event'], self._events())
+
+    def test_record_buffered(self):
+        self.config(node_history_write_interval=3600, group='conductor')
+        history_writer.start()
+        for i in range(3):
+            history_writer.record(self._history('event %d' % i))
+        self.assertEqual([], self._events())
+        history_writer.stop()
+        self.assertEqual(['event 0', 'event 1', 'event 2'], self._events())
+        self.assertIsNone(history_writer._WRITER)
+        # Entries are written immediately after stopping
+        history_writer.record(self._history('event 3'))
+        self.assertEqual(4, len(self._events()))
+
+    def test_record_batch_size(self):
+        self.config(node_history_write_interval=3600,
+                    node_history_write_batch_size=2, group='conductor')
+        history_writer.start()
+        writer = history_writer._WRITER
+        history_writer.record(self._history())
+        self.assertFalse(writer._wakeup.is_set())
+        history_writer.record(self._history())
+        # Either the writer is woken, or it has already written the batch
+        self.assertTrue(writer._wakeup.is_set() or self._events())
+
+    @mock.patch.object(sqlalchemy_api.Connection,
+                       'create_node_history_records', autospec=True)
+    def test_flush_in_batches(self, mock_create):
+        writer = history_writer.HistoryWriter(3600, 2)
+        for i in range(5):
+            self.assertTrue(writer.record({'event': i}))
+        writer._flush()
+        self.assertEqual([[{'event': 0}, {'event': 1}],
+                          [{'event': 2}, {'event': 3}],
+                          [{'event': 4}]],
+                         [c.args[1] for c in mock_create.call_args_list])
+        self.assertEqual([], writer._records)
+
+    @mock.patch.object(history_writer.LOG, 'error', autospec=True)
+    @mock.patch.object(sqlalchemy_api.Connection,
+                       'create_node_history_records', autospec=True)
+    def test_flush_error(self, mock_create, mock_log):
+        mock_create.side_effect = db_exc.DBConnectionError()
+        writer = history_writer.HistoryWriter(3600, 2)
+        for i in range(3):
+            writer.record({'event': i})
+        writer._flush()
+        mock_create.assert_called_once_with(mock.ANY,
+                                            [{'event': 0}, {'event': 1}])
+        self.assertTrue(mock_log.called)
+        # The entries are kept for the next attempt
+        self.assertEqual(3, len(writer._records))
+
+    @mock.patch.object(history_writer.LOG, 'error', autospec=True)
+    @mock.patch.object(sqlalchemy_api.Connection,
+                       'create_node_history_records', autospec=True)
+    def test_stop_flush_error(self, mock_create, mock_log):
+        def create(dbapi, records):
+            # Batches and the invalid entry cannot be written
+            if len(records) > 1 or records[0]['event'] == 1:
+                raise db_exc.DBError()
+
+        mock_create.side_effect = create
+        writer = history_writer.HistoryWriter(3600, 10)
+        writer.start()
+        for i in range(3):
+            writer.record({'event': i})
+        writer.stop()
+        self.assertEqual([[{'event': i} for i in range(3)],
+                          [{'event': 0}], [{'event': 1}],
+                          [{'event': 1}], [{'event': 2}]],
+                         [c.args[1] for c in mock_create.call_args_list])
+        self.assertEqual([], writer._records)
+        # The failed attempt and the dropped entry
+        self.assertEqual(2, mock_log.call_count)
+        self.assertEqual(1, mock_log.call_args.args[1]['count'])
+
+    @mock.patch.object(history_writer.LOG, 'error', autospec=True)
+    def test_flush_deleted_node(self, mock_log):
+        other = db_utils.create_test_node(uuid=uuidutils.generate_uuid())
+        writer = history_writer.HistoryWriter(3600, 10)
+        for node_id, event in [(self.node.id, 'event 0'),
+                               (other.id, 'deleted'),
+                               (self.node.id, 'event 1')]:
+            history = node_history.NodeHistory(node_id=node_id, event=event,
+                                               severity='INFO',
+                                               conductor='host')
+            writer.record(history.do_version_changes_for_db())
+        self.dbapi.destroy_node(other.id)
+        self.assertTrue(writer._flush())
+        self.assertEqual(['event 0', 'event 1'], self._events())
+        self.assertEqual([], writer._records)
+        self.assertEqual(1, mock_log.call_args.args[1]['count'])
+
+    def test_record_buffer_full(self):
+        writer = history_writer.HistoryWriter(3600, 1)
+        for i in range(history_writer.MAX_PENDING_BATCHES):
+            self.assertTrue(writer.record({'event': i}))
+        self.assertFalse(writer.record({'event': 'full'}))
+
+    @mock.patch.object(history_writer.HistoryWriter, 'record', autospec=True)
+    def test_record_writer_full(self, mock_record):
+        self.config(node_history_write_interval=3600, group='conductor')
+        mock_record.return_value = False
+        history_writer.start()
+        history_writer.record(self._history())
+        self.assertEqual(['event'], self._events())
@@ -0,0 +1,78 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import threading
+
+from ironic.conductor import lock_waiters
+from ironic.tests import base as tests_base
+
+
+class LockWaitersTestCase(tests_base.TestCase):
+
+    def setUp(self):
+        super(LockWaitersTestCase, self).setUp()
+        self.woken = []
+        self.addCleanup(lock_waiters._QUEUES.clear)
+
+    def _wait(self, name, node_id=1, timeout=5, first=False):
+        def _waiter():
+            if lock_waiters.wait(node_id, timeout, first=first):
+                self.woken.append(name)
+
+        queued = lock_waiters.waiting(node_id)
+        thread = threading.Thread(target=_waiter)
+        thread.start()
+        self.addCleanup(thread.join)
+        # Wait until the thread is queued
+        for _ in range(500):
+            if lock_waiters.waiting(node_id) > queued:
+                break
+            threading.Event().wait(0.01)
+        return thread
+
+    def test_notify_fifo(self):
+        threads = [self._wait('first'), self._wait('second')]
+        self.assertEqual(2, lock_waiters.waiting(1))
+
+        self.assertTrue(lock_waiters.notify(1))
+        threads[0].join()
+        self.assertEqual(['first'], self.woken)
+        self.assertEqual(1, lock_waiters.waiting(1))
+
+        self.assertTrue(lock_waiters.notify(1))
+        threads[1].join()
+        self.assertEqual(['first', 'second'], self.woken)
+        self.assertEqual(0, lock_waiters.waiting(1))
+        self.assertNotIn(1, lock_waiters._QUEUES)
+
+    def test_notify_first(self):
+        threads = [self._wait('second'), self._wait('first', first=True)]
+
+        self.assertTrue(lock_waiters.notify(1))
+        threads[1].join()
+        self.assertEqual(['first'], self.woken)
+        lock_waiters.notify(1)
+
+    def test_notify_other_node(self):
+        self._wait('first')
+        self.assertFalse(lock_waiters.notify(2))
+        self.assertEqual(1, lock_waiters.waiting(1))
+        lock_waiters.notify(1)
+
+    def test_notify_no_waiters(self):
+        self.assertFalse(lock_waiters.notify(1))
+
+    def test_wait_timeout(self):
+        self.assertFalse(lock_waiters.wait(1, 0.01))
+        self.assertEqual(0, lock_waiters.waiting(1))
+        self.assertNotIn(1, lock_waiters._QUEUES)
+        self.assertFalse(lock_waiters.notify(1))
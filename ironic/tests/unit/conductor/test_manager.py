@@ -28,6 +28,7 @@ import eventlet
 from futurist import waiters
 from oslo_config import cfg
 import oslo_messaging as messaging
+from oslo_utils import timeutils
 from oslo_utils import uuidutils
 from oslo_versionedobjects import base as ovo_base
 from oslo_versionedobjects import fields
@@ -54,6 +55,7 @@ from ironic.conductor import steps as conductor_steps
 from ironic.conductor import task_manager
 from ironic.conductor import utils as conductor_utils
 from ironic.conductor import verify
+from ironic.conductor import worker_classes
 from ironic.db import api as dbapi
 from ironic.drivers import base as drivers_base
 from ironic.drivers.modules import fake
@@ -2223,9 +2225,9 @@ class ContinueNodeDeployTestCase(mgr_utils.ServiceSetUpMixin,
         node.refresh()
         self.assertEqual(states.DEPLOYING, node.provision_state)
         self.assertEqual(tgt_prv_state, node.target_provision_state)
-        mock_spawn.assert_called_with(mock.ANY,
-                                      deployments.continue_node_deploy,
-                                      mock.ANY)
+        mock_spawn.assert_called_with(
+            mock.ANY, deployments.continue_node_deploy, mock.ANY,
+            _worker_class=worker_classes.CONTINUATION)
 
     @mock.patch.object(tenacity, 'stop_after_attempt',
                        return_value=tenacity.stop_after_attempt(4),
@@ -2276,9 +2278,9 @@ class ContinueNodeDeployTestCase(mgr_utils.ServiceSetUpMixin,
         node.refresh()
         self.assertEqual(states.DEPLOYING, node.provision_state)
         self.assertEqual(tgt_prv_state, node.target_provision_state)
-        mock_spawn.assert_called_with(mock.ANY,
-                                      deployments.continue_node_deploy,
-                                      mock.ANY)
+        mock_spawn.assert_called_with(
+            mock.ANY, deployments.continue_node_deploy, mock.ANY,
+            _worker_class=worker_classes.CONTINUATION)
         self.assertFalse(mock_event.called)
 
 
@@ -2303,6 +2305,78 @@ class CheckTimeoutsTestCase(mgr_utils.ServiceSetUpMixin, db_base.DbTestCase):
         self.assertIsNotNone(node.last_error)
         mock_cleanup.assert_called_once_with(mock.ANY, mock.ANY)
 
+    @mock.patch('ironic.drivers.modules.fake.FakeDeploy.clean_up',
+                autospec=True)
+    def test__check_deploy_timeouts_with_index(self, mock_cleanup):
+        CONF.set_override('wait_timeout_index', True, group='conductor')
+        CONF.set_override('deploy_callback_timeout', 60, group='conductor')
+        self._start_service()
+        node = obj_utils.create_test_node(
+            self.context, driver='fake-hardware',
+            provision_state=states.DEPLOYWAIT,
+            target_provision_state=states.ACTIVE,
+            provision_updated_at=datetime.datetime(2000, 1, 1, 0, 0))
+        node2 = obj_utils.create_test_node(
+            self.context, driver='fake-hardware',
+            uuid=uuidutils.generate_uuid(),
+            provision_state=states.DEPLOYWAIT,
+            target_provision_state=states.ACTIVE,
+            provision_updated_at=timeutils.utcnow())
+
+        self.service._check_deploy_timeouts(self.context)
+        self._stop_service()
+        node.refresh()
+        self.assertEqual(states.DEPLOYFAIL, node.provision_state)
+        mock_cleanup.assert_called_once_with(mock.ANY, mock.ANY)
+        node2.refresh()
+        self.assertEqual(states.DEPLOYWAIT, node2.provision_state)
+
+    def test__check_deploy_timeouts_with_index_nothing_expired(self):
+        CONF.set_override('wait_timeout_index', True, group='conductor')
+        CONF.set_override('deploy_callback_timeout', 60, group='conductor')
+        self._start_service()
+        node = obj_utils.create_test_node(
+            self.context, driver='fake-hardware',
+            provision_state=states.DEPLOYWAIT,
+            target_provision_state=states.ACTIVE,
+            provision_updated_at=timeutils.utcnow())
+
+        with mock.patch.object(self.service, '_fail_if_in_state',
+                               autospec=True) as mock_fail:
+            # The first run builds the index, the second one only looks
+            # at the index.
+            self.service._check_deploy_timeouts(self.context)
+            with mock.patch.object(self.service, 'iter_nodes',
+                                   autospec=True) as mock_iter:
+                self.service._check_deploy_timeouts(self.context)
+                mock_iter.assert_not_called()
+            mock_fail.assert_not_called()
+
+        index = self.service._wait_timeout_indexes[states.DEPLOYWAIT]
+        self.assertIn(node.uuid, index)
+
+    def test__check_deploy_timeouts_with_index_heartbeat(self):
+        CONF.set_override('wait_timeout_index', True, group='conductor')
+        CONF.set_override('deploy_callback_timeout', 60, group='conductor')
+        self._start_service()
+        node = obj_utils.create_test_node(
+            self.context, driver='fake-hardware',
+            provision_state=states.DEPLOYWAIT,
+            target_provision_state=states.ACTIVE,
+            provision_updated_at=datetime.datetime(2000, 1, 1, 0, 0))
+        self.service._rebuild_wait_timeout_index(
+            self.service._wait_timeout_indexes[states.DEPLOYWAIT])
+        # A heartbeat moves the deadline behind the index's back
+        node.touch_provisioning()
+
+        self.service._check_deploy_timeouts(self.context)
+        node.refresh()
+        self.assertEqual(states.DEPLOYWAIT, node.provision_state)
+        # The node is re-armed with the new deadline
+        index = self.service._wait_timeout_indexes[states.DEPLOYWAIT]
+        self.assertIn(node.uuid, index)
+        self.assertEqual([], index.pop_expired())
+
     def _check_cleanwait_timeouts(self, manual=False, with_step=True):
         self._start_service()
         CONF.set_override('clean_callback_timeout', 1, group='conductor')
@@ -3077,7 +3151,8 @@ class DoNodeCleanTestCase(mgr_utils.ServiceSetUpMixin, db_base.DbTestCase):
         self.assertEqual(states.CLEANING, node.provision_state)
         self.assertEqual(tgt_prv_state, node.target_provision_state)
         mock_spawn.assert_called_with(
-            self.service, cleaning.continue_node_clean, mock.ANY)
+            self.service, cleaning.continue_node_clean, mock.ANY,
+            _worker_class=worker_classes.CONTINUATION)
 
     def test_continue_node_clean_automated(self):
         self._continue_node_clean(states.CLEANWAIT)
@@ -3330,7 +3405,8 @@ class DoNodeServiceTestCase(mgr_utils.ServiceSetUpMixin, db_base.DbTestCase):
         self.assertEqual(states.SERVICING, node.provision_state)
         self.assertEqual(tgt_prv_state, node.target_provision_state)
         mock_spawn.assert_called_with(
-            self.service, servicing.continue_node_service, mock.ANY)
+            self.service, servicing.continue_node_service, mock.ANY,
+            _worker_class=worker_classes.CONTINUATION)
 
     def test_continue_node_service(self):
         self._continue_node_service(states.SERVICEWAIT)
@@ -3939,7 +4015,7 @@ class MiscTestCase(mgr_utils.ServiceSetUpMixin, mgr_utils.CommonMixIn,
                        autospec=True)
     @mock.patch.object(manager.ConductorManager, '_mapped_to_this_conductor',
                        autospec=True)
-    @mock.patch.object(dbapi.IMPL, 'get_nodeinfo_list', autospec=True)
+    @mock.patch.object(dbapi.IMPL, 'iter_nodeinfo', autospec=True)
     def test_iter_nodes(self, mock_nodeinfo_list, mock_mapped,
                         mock_fail_if_state):
         self._start_service()
@@ -3952,10 +4028,14 @@ class MiscTestCase(mgr_utils.ServiceSetUpMixin, mgr_utils.CommonMixIn,
         mock_mapped.side_effect = [True, False]
 
         result = list(self.service.iter_nodes(fields=['id'],
-                                              filters=mock.sentinel.filters))
+                                              filters={'maintenance': False}))
         self.assertEqual([(nodes[0].uuid, 'fake-hardware', '', 0)], result)
+        # Only nodes that can be mapped to this conductor are fetched
         mock_nodeinfo_list.assert_called_once_with(
-            columns=self.columns, filters=mock.sentinel.filters)
+            columns=self.columns,
+            filters={'maintenance': False, 'conductor_group': '',
+                     'driver_in': self.service.conductor.drivers},
+            chunk_size=1000)
         expected_calls = [mock.call(mock.ANY, mock.ANY,
                                     {'provision_state': 'deploying',
                                      'reserved': False},
@@ -3970,7 +4050,7 @@ class MiscTestCase(mgr_utils.ServiceSetUpMixin, mgr_utils.CommonMixIn,
                                     last_error=mock.ANY)]
         mock_fail_if_state.assert_has_calls(expected_calls)
 
-    @mock.patch.object(dbapi.IMPL, 'get_nodeinfo_list', autospec=True)
+    @mock.patch.object(dbapi.IMPL, 'iter_nodeinfo', autospec=True)
     def test_iter_nodes_shutdown(self, mock_nodeinfo_list):
         self._start_service()
         self.columns = ['uuid', 'driver', 'conductor_group', 'id']
@@ -3979,8 +4059,7 @@ class MiscTestCase(mgr_utils.ServiceSetUpMixin, mgr_utils.CommonMixIn,
             nodes)
         self.service._shutdown = True
 
-        result = list(self.service.iter_nodes(fields=['id'],
-                                              filters=mock.sentinel.filters))
+        result = list(self.service.iter_nodes(fields=['id']))
         self.assertEqual([], result)
 
     def test_get_node_with_token(self):
@@ -4817,7 +4896,7 @@ class SensorsTestCase(mgr_utils.ServiceSetUpMixin, db_base.DbTestCase):
                        autospec=True)
     @mock.patch.object(manager.ConductorManager, '_mapped_to_this_conductor',
                        autospec=True)
-    @mock.patch.object(dbapi.IMPL, 'get_nodeinfo_list', autospec=True)
+    @mock.patch.object(dbapi.IMPL, 'iter_nodeinfo', autospec=True)
     def test___send_sensor_data(self, get_nodeinfo_list_mock,
                                 _mapped_to_this_conductor_mock,
                                 mock_spawn):
@@ -4832,7 +4911,8 @@ class SensorsTestCase(mgr_utils.ServiceSetUpMixin, db_base.DbTestCase):
         self.service._send_sensor_data(self.context)
         mock_spawn.assert_called_with(self.service,
                                       self.service._sensors_nodes_task,
-                                      self.context, mock.ANY)
+                                      self.context, mock.ANY,
+                                      _worker_class=worker_classes.BULK)
 
     @mock.patch.object(queue, 'Queue', autospec=True)
     @mock.patch.object(manager.ConductorManager, '_sensors_conductor',
@@ -4841,7 +4921,7 @@ class SensorsTestCase(mgr_utils.ServiceSetUpMixin, db_base.DbTestCase):
                        autospec=True)
     @mock.patch.object(manager.ConductorManager, '_mapped_to_this_conductor',
                        autospec=True)
-    @mock.patch.object(dbapi.IMPL, 'get_nodeinfo_list', autospec=True)
+    @mock.patch.object(dbapi.IMPL, 'iter_nodeinfo', autospec=True)
     def test___send_sensor_data_disabled(
             self, get_nodeinfo_list_mock,
             _mapped_to_this_conductor_mock,
@@ -4869,7 +4949,7 @@ class SensorsTestCase(mgr_utils.ServiceSetUpMixin, db_base.DbTestCase):
                 autospec=True)
     @mock.patch.object(manager.ConductorManager, '_mapped_to_this_conductor',
                        autospec=True)
-    @mock.patch.object(dbapi.IMPL, 'get_nodeinfo_list', autospec=True)
+    @mock.patch.object(dbapi.IMPL, 'iter_nodeinfo', autospec=True)
     def test___send_sensor_data_multiple_workers(
             self, get_nodeinfo_list_mock, _mapped_to_this_conductor_mock,
             mock_spawn):
@@ -4899,7 +4979,7 @@ class SensorsTestCase(mgr_utils.ServiceSetUpMixin, db_base.DbTestCase):
                 autospec=True)
     @mock.patch.object(manager.ConductorManager, '_mapped_to_this_conductor',
                        autospec=True)
-    @mock.patch.object(dbapi.IMPL, 'get_nodeinfo_list', autospec=True)
+    @mock.patch.object(dbapi.IMPL, 'iter_nodeinfo', autospec=True)
     def test___send_sensor_data_one_worker(
             self, get_nodeinfo_list_mock, _mapped_to_this_conductor_mock,
             mock_spawn):
@@ -5876,12 +5956,12 @@ class ManagerDoSyncPowerStateTestCase(db_base.DbTestCase):
 @mock.patch.object(waiters, 'wait_for_all',
                    new=mock.MagicMock(return_value=(0, 0)))
 @mock.patch.object(manager.ConductorManager, '_spawn_worker',
-                   new=lambda self, fun, *args: fun(*args))
+                   new=lambda self, fun, *args, **kwargs: fun(*args))
 @mock.patch.object(manager, 'do_sync_power_state', autospec=True)
 @mock.patch.object(task_manager, 'acquire', autospec=True)
 @mock.patch.object(manager.ConductorManager, '_mapped_to_this_conductor',
                    autospec=True)
-@mock.patch.object(dbapi.IMPL, 'get_nodeinfo_list', autospec=True)
+@mock.patch.object(dbapi.IMPL, 'iter_nodeinfo', autospec=True)
 class ManagerSyncPowerStatesTestCase(mgr_utils.CommonMixIn,
                                      db_base.DbTestCase):
     def setUp(self):
@@ -5900,7 +5980,8 @@ class ManagerSyncPowerStatesTestCase(mgr_utils.CommonMixIn,
         self.service._sync_power_states(self.context)
 
         get_nodeinfo_mock.assert_called_once_with(
-            columns=self.columns, filters=self.filters)
+            columns=self.columns, filters=self.filters,
+            chunk_size=1000)
         mapped_mock.assert_called_once_with(self.service,
                                             self.node.uuid,
                                             self.node.driver,
@@ -5912,21 +5993,21 @@ class ManagerSyncPowerStatesTestCase(mgr_utils.CommonMixIn,
                                     mapped_mock, acquire_mock, sync_mock):
         get_nodeinfo_mock.return_value = self._get_nodeinfo_list_response()
         mapped_mock.return_value = True
-        task = self._create_task(
-            node_attrs=dict(reservation='host1', uuid=self.node.uuid))
-        acquire_mock.side_effect = self._get_acquire_side_effect(task)
+        acquire_mock.side_effect = exception.NodePreconditionFailed(
+            node=self.node.uuid)
 
         self.service._sync_power_states(self.context)
 
         get_nodeinfo_mock.assert_called_once_with(
-            columns=self.columns, filters=self.filters)
+            columns=self.columns, filters=self.filters,
+            chunk_size=1000)
         mapped_mock.assert_called_once_with(self.service,
                                             self.node.uuid,
                                             self.node.driver,
                                             self.node.conductor_group)
-        acquire_mock.assert_called_once_with(self.context, self.node.uuid,
-                                             purpose=mock.ANY,
-                                             shared=True)
+        acquire_mock.assert_called_once_with(
+            self.context, self.node.uuid, purpose=mock.ANY, shared=True,
+            filters=manager.SYNC_POWER_STATE_FILTERS)
         self.assertFalse(sync_mock.called)
 
     def test_node_in_deploywait_on_acquire(self, get_nodeinfo_mock,
@@ -5934,46 +6015,42 @@ class ManagerSyncPowerStatesTestCase(mgr_utils.CommonMixIn,
                                            sync_mock):
         get_nodeinfo_mock.return_value = self._get_nodeinfo_list_response()
         mapped_mock.return_value = True
-        task = self._create_task(
-            node_attrs=dict(provision_state=states.DEPLOYWAIT,
-                            target_provision_state=states.ACTIVE,
-                            uuid=self.node.uuid))
-        acquire_mock.side_effect = self._get_acquire_side_effect(task)
+        acquire_mock.side_effect = exception.NodePreconditionFailed(
+            node=self.node.uuid)
 
         self.service._sync_power_states(self.context)
 
         get_nodeinfo_mock.assert_called_once_with(
-            columns=self.columns, filters=self.filters)
+            columns=self.columns, filters=self.filters,
+            chunk_size=1000)
         mapped_mock.assert_called_once_with(self.service,
                                             self.node.uuid,
                                             self.node.driver,
                                             self.node.conductor_group)
-        acquire_mock.assert_called_once_with(self.context, self.node.uuid,
-                                             purpose=mock.ANY,
-                                             shared=True)
+        acquire_mock.assert_called_once_with(
+            self.context, self.node.uuid, purpose=mock.ANY, shared=True,
+            filters=manager.SYNC_POWER_STATE_FILTERS)
         self.assertFalse(sync_mock.called)
 
     def test_node_in_enroll_on_acquire(self, get_nodeinfo_mock, mapped_mock,
                                        acquire_mock, sync_mock):
         get_nodeinfo_mock.return_value = self._get_nodeinfo_list_response()
         mapped_mock.return_value = True
-        task = self._create_task(
-            node_attrs=dict(provision_state=states.ENROLL,
-                            target_provision_state=states.NOSTATE,
-                            uuid=self.node.uuid))
-        acquire_mock.side_effect = self._get_acquire_side_effect(task)
+        acquire_mock.side_effect = exception.NodePreconditionFailed(
+            node=self.node.uuid)
 
         self.service._sync_power_states(self.context)
 
         get_nodeinfo_mock.assert_called_once_with(
-            columns=self.columns, filters=self.filters)
+            columns=self.columns, filters=self.filters,
+            chunk_size=1000)
         mapped_mock.assert_called_once_with(self.service,
                                             self.node.uuid,
                                             self.node.driver,
                                             self.node.conductor_group)
-        acquire_mock.assert_called_once_with(self.context, self.node.uuid,
-                                             purpose=mock.ANY,
-                                             shared=True)
+        acquire_mock.assert_called_once_with(
+            self.context, self.node.uuid, purpose=mock.ANY, shared=True,
+            filters=manager.SYNC_POWER_STATE_FILTERS)
         self.assertFalse(sync_mock.called)
 
     def test_node_in_power_transition_on_acquire(self, get_nodeinfo_mock,
@@ -5981,22 +6058,21 @@ class ManagerSyncPowerStatesTestCase(mgr_utils.CommonMixIn,
                                                  sync_mock):
         get_nodeinfo_mock.return_value = self._get_nodeinfo_list_response()
         mapped_mock.return_value = True
-        task = self._create_task(
-            node_attrs=dict(target_power_state=states.POWER_ON,
-                            uuid=self.node.uuid))
-        acquire_mock.side_effect = self._get_acquire_side_effect(task)
+        acquire_mock.side_effect = exception.NodePreconditionFailed(
+            node=self.node.uuid)
 
         self.service._sync_power_states(self.context)
 
         get_nodeinfo_mock.assert_called_once_with(
-            columns=self.columns, filters=self.filters)
+            columns=self.columns, filters=self.filters,
+            chunk_size=1000)
         mapped_mock.assert_called_once_with(self.service,
                                             self.node.uuid,
                                             self.node.driver,
                                             self.node.conductor_group)
-        acquire_mock.assert_called_once_with(self.context, self.node.uuid,
-                                             purpose=mock.ANY,
-                                             shared=True)
+        acquire_mock.assert_called_once_with(
+            self.context, self.node.uuid, purpose=mock.ANY, shared=True,
+            filters=manager.SYNC_POWER_STATE_FILTERS)
         self.assertFalse(sync_mock.called)
 
     def test_node_in_maintenance_on_acquire(self, get_nodeinfo_mock,
@@ -6004,21 +6080,21 @@ class ManagerSyncPowerStatesTestCase(mgr_utils.CommonMixIn,
                                             sync_mock):
         get_nodeinfo_mock.return_value = self._get_nodeinfo_list_response()
         mapped_mock.return_value = True
-        task = self._create_task(
-            node_attrs=dict(maintenance=True, uuid=self.node.uuid))
-        acquire_mock.side_effect = self._get_acquire_side_effect(task)
+        acquire_mock.side_effect = exception.NodePreconditionFailed(
+            node=self.node.uuid)
 
         self.service._sync_power_states(self.context)
 
         get_nodeinfo_mock.assert_called_once_with(
-            columns=self.columns, filters=self.filters)
+            columns=self.columns, filters=self.filters,
+            chunk_size=1000)
         mapped_mock.assert_called_once_with(self.service,
                                             self.node.uuid,
                                             self.node.driver,
                                             self.node.conductor_group)
-        acquire_mock.assert_called_once_with(self.context, self.node.uuid,
-                                             purpose=mock.ANY,
-                                             shared=True)
+        acquire_mock.assert_called_once_with(
+            self.context, self.node.uuid, purpose=mock.ANY, shared=True,
+            filters=manager.SYNC_POWER_STATE_FILTERS)
         self.assertFalse(sync_mock.called)
 
     def test_node_disappears_on_acquire(self, get_nodeinfo_mock,
@@ -6031,14 +6107,15 @@ class ManagerSyncPowerStatesTestCase(mgr_utils.CommonMixIn,
         self.service._sync_power_states(self.context)
 
         get_nodeinfo_mock.assert_called_once_with(
-            columns=self.columns, filters=self.filters)
+            columns=self.columns, filters=self.filters,
+            chunk_size=1000)
         mapped_mock.assert_called_once_with(self.service,
                                             self.node.uuid,
                                             self.node.driver,
                                             self.node.conductor_group)
-        acquire_mock.assert_called_once_with(self.context, self.node.uuid,
-                                             purpose=mock.ANY,
-                                             shared=True)
+        acquire_mock.assert_called_once_with(
+            self.context, self.node.uuid, purpose=mock.ANY, shared=True,
+            filters=manager.SYNC_POWER_STATE_FILTERS)
         self.assertFalse(sync_mock.called)
 
     def test_single_node(self, get_nodeinfo_mock,
@@ -6051,36 +6128,36 @@ class ManagerSyncPowerStatesTestCase(mgr_utils.CommonMixIn,
         self.service._sync_power_states(self.context)
 
         get_nodeinfo_mock.assert_called_once_with(
-            columns=self.columns, filters=self.filters)
+            columns=self.columns, filters=self.filters,
+            chunk_size=1000)
         mapped_mock.assert_called_once_with(self.service,
                                             self.node.uuid,
                                             self.node.driver,
                                             self.node.conductor_group)
-        acquire_mock.assert_called_once_with(self.context, self.node.uuid,
-                                             purpose=mock.ANY,
-                                             shared=True)
+        acquire_mock.assert_called_once_with(
+            self.context, self.node.uuid, purpose=mock.ANY, shared=True,
+            filters=manager.SYNC_POWER_STATE_FILTERS)
         sync_mock.assert_called_once_with(task, mock.ANY)
 
     def test_single_node_adopt_failed(self, get_nodeinfo_mock,
                                       mapped_mock, acquire_mock, sync_mock):
         get_nodeinfo_mock.return_value = self._get_nodeinfo_list_response()
         mapped_mock.return_value = True
-        task = self._create_task(
-            node_attrs=dict(uuid=self.node.uuid,
-                            provision_state=states.ADOPTFAIL))
-        acquire_mock.side_effect = self._get_acquire_side_effect(task)
+        acquire_mock.side_effect = exception.NodePreconditionFailed(
+            node=self.node.uuid)
 
         self.service._sync_power_states(self.context)
 
         get_nodeinfo_mock.assert_called_once_with(
-            columns=self.columns, filters=self.filters)
+            columns=self.columns, filters=self.filters,
+            chunk_size=1000)
         mapped_mock.assert_called_once_with(self.service,
                                             self.node.uuid,
                                             self.node.driver,
                                             self.node.conductor_group)
-        acquire_mock.assert_called_once_with(self.context, self.node.uuid,
-                                             purpose=mock.ANY,
-                                             shared=True)
+        acquire_mock.assert_called_once_with(
+            self.context, self.node.uuid, purpose=mock.ANY, shared=True,
+            filters=manager.SYNC_POWER_STATE_FILTERS)
         sync_mock.assert_not_called()
 
     def test__sync_power_state_multiple_nodes(self, get_nodeinfo_mock,
@@ -6116,6 +6193,9 @@ class ManagerSyncPowerStatesTestCase(mgr_utils.CommonMixIn,
 
         tasks = [self._create_task(node_attrs=node_attrs[x.uuid])
                  for x in nodes if x.id != 2]
+        # rejected by the preconditions (Node3, Node4 and Node5)
+        for i in (1, 2, 3):
+            tasks[i] = exception.NodePreconditionFailed(node=i + 2)
         # not found during acquire (4 = index of Node6 after removing Node2)
         tasks[4] = exception.NodeNotFound(node=6)
         sync_results = [0] * 7 + [exception.NodeLocked(node=8, host='')]
@@ -6133,13 +6213,15 @@ class ManagerSyncPowerStatesTestCase(mgr_utils.CommonMixIn,
             self.assertEqual(len(nodes) - 1, sleep_mock.call_count)
 
         get_nodeinfo_mock.assert_called_once_with(
-            columns=self.columns, filters=self.filters)
+            columns=self.columns, filters=self.filters,
+            chunk_size=1000)
         mapped_calls = [mock.call(self.service, x.uuid, x.driver,
                                   x.conductor_group) for x in nodes]
         self.assertEqual(mapped_calls, mapped_mock.call_args_list)
         acquire_calls = [mock.call(self.context, x.uuid,
                                    purpose=mock.ANY,
-                                   shared=True)
+                                   shared=True,
+                                   filters=manager.SYNC_POWER_STATE_FILTERS)
                          for x in nodes if x.id != 2]
         self.assertEqual(acquire_calls, acquire_mock.call_args_list)
         # Nodes 1 and 7 (5 = index of Node7 after removing Node2)
@@ -6151,7 +6233,7 @@ class ManagerSyncPowerStatesTestCase(mgr_utils.CommonMixIn,
 @mock.patch.object(task_manager, 'acquire', autospec=True)
 @mock.patch.object(manager.ConductorManager, '_mapped_to_this_conductor',
                    autospec=True)
-@mock.patch.object(dbapi.IMPL, 'get_nodeinfo_list', autospec=True)
+@mock.patch.object(dbapi.IMPL, 'iter_nodeinfo', autospec=True)
 class ManagerPowerRecoveryTestCase(mgr_utils.CommonMixIn,
                                    db_base.DbTestCase):
     def setUp(self):
@@ -6179,7 +6261,8 @@ class ManagerPowerRecoveryTestCase(mgr_utils.CommonMixIn,
         self.service._power_failure_recovery(self.context)
 
         get_nodeinfo_mock.assert_called_once_with(
-            columns=self.columns, filters=self.filters)
+            columns=self.columns, filters=self.filters,
+            chunk_size=1000)
         mapped_mock.assert_called_once_with(self.service,
                                             self.node.uuid,
                                             self.node.driver,
@@ -6198,7 +6281,8 @@ class ManagerPowerRecoveryTestCase(mgr_utils.CommonMixIn,
         self.service._power_failure_recovery(self.context)
 
         get_nodeinfo_mock.assert_called_once_with(
-            columns=self.columns, filters=self.filters)
+            columns=self.columns, filters=self.filters,
+            chunk_size=1000)
         mapped_mock.assert_called_once_with(self.service,
                                             self.node.uuid,
                                             self.node.driver,
@@ -6245,7 +6329,8 @@ class ManagerPowerRecoveryTestCase(mgr_utils.CommonMixIn,
         self.service._power_failure_recovery(self.context)
 
         get_nodeinfo_mock.assert_called_once_with(
-            columns=self.columns, filters=self.filters)
+            columns=self.columns, filters=self.filters,
+            chunk_size=1000)
         mapped_mock.assert_called_once_with(self.service,
                                             self.node.uuid,
                                             self.node.driver,
@@ -6271,7 +6356,8 @@ class ManagerPowerRecoveryTestCase(mgr_utils.CommonMixIn,
         self.service._power_failure_recovery(self.context)
 
         get_nodeinfo_mock.assert_called_once_with(
-            columns=self.columns, filters=self.filters)
+            columns=self.columns, filters=self.filters,
+            chunk_size=1000)
         mapped_mock.assert_called_once_with(self.service,
                                             self.node.uuid,
                                             self.node.driver,
@@ -6300,7 +6386,8 @@ class ManagerPowerRecoveryTestCase(mgr_utils.CommonMixIn,
         self.service._power_failure_recovery(self.context)
 
         get_nodeinfo_mock.assert_called_once_with(
-            columns=self.columns, filters=self.filters)
+            columns=self.columns, filters=self.filters,
+            chunk_size=1000)
         mapped_mock.assert_called_once_with(self.service,
                                             self.node.uuid,
                                             self.node.driver,
@@ -6319,7 +6406,7 @@ class ManagerPowerRecoveryTestCase(mgr_utils.CommonMixIn,
 @mock.patch.object(task_manager, 'acquire', autospec=True)
 @mock.patch.object(manager.ConductorManager, '_mapped_to_this_conductor',
                    autospec=True)
-@mock.patch.object(dbapi.IMPL, 'get_nodeinfo_list', autospec=True)
+@mock.patch.object(dbapi.IMPL, 'iter_nodeinfo', autospec=True)
 class ManagerCheckDeployTimeoutsTestCase(mgr_utils.CommonMixIn,
                                          db_base.DbTestCase):
     def setUp(self):
@@ -6344,7 +6431,7 @@ class ManagerCheckDeployTimeoutsTestCase(mgr_utils.CommonMixIn,
     def _assert_get_nodeinfo_args(self, get_nodeinfo_mock):
         get_nodeinfo_mock.assert_called_once_with(
             columns=self.columns, filters=self.filters,
-            sort_key='provision_updated_at', sort_dir='asc')
+            sort_key='provision_updated_at', sort_dir='asc', chunk_size=1000)
 
     def test_not_mapped(self, get_nodeinfo_mock, mapped_mock, acquire_mock):
         get_nodeinfo_mock.return_value = self._get_nodeinfo_list_response()
@@ -6732,10 +6819,84 @@ class ParallelPowerSyncTestCase(mgr_utils.CommonMixIn, db_base.DbTestCase):
             queue_mock.return_value.put.assert_has_calls(expected_calls)
 
 
+@mock.patch.object(waiters, 'wait_for_all',
+                   new=mock.MagicMock(return_value=(0, 0)))
+@mock.patch.object(manager.ConductorManager, '_spawn_worker',
+                   new=lambda self, fun, *args, **kwargs: fun(*args))
+@mock.patch.object(manager.ConductorManager, '_mapped_to_this_conductor',
+                   new=mock.MagicMock(return_value=True))
+@mock.patch.object(manager, 'do_sync_power_state', autospec=True)
+@mock.patch.object(timeutils, 'utcnow', autospec=True)
+class AdaptivePowerSyncTestCase(mgr_utils.CommonMixIn, db_base.DbTestCase):
+
+    def setUp(self):
+        super(AdaptivePowerSyncTestCase, self).setUp()
+        self.config(sync_power_state_interval=60,
+                    power_state_sync_max_interval=600,
+                    group='conductor')
+        self.service = manager.ConductorManager('hostname', 'test-topic')
+        self.service.dbapi = self.dbapi
+        self.now = datetime.datetime(2020, 1, 1, 0, 0)
+        self.node = obj_utils.create_test_node(
+            self.context, driver='fake-hardware',
+            power_state=states.POWER_ON,
+            provision_updated_at=datetime.datetime(2000, 1, 1, 0, 0))
+
+    def _run(self, mock_utcnow, seconds):
+        mock_utcnow.return_value = (
+            self.now + datetime.timedelta(seconds=seconds))
+        self.service._sync_power_states(self.context)
+
+    def test_stable_node(self, mock_utcnow, mock_sync):
+        mock_sync.return_value = 0
+        self._run(mock_utcnow, 0)
+        self._run(mock_utcnow, 60)
+        self.assertEqual(2, mock_sync.call_count)
+        # The interval is now doubled
+        self._run(mock_utcnow, 120)
+        self.assertEqual(2, mock_sync.call_count)
+        self._run(mock_utcnow, 180)
+        self.assertEqual(3, mock_sync.call_count)
+
+    def test_power_state_changed(self, mock_utcnow, mock_sync):
+        mock_sync.return_value = 0
+        self._run(mock_utcnow, 0)
+        self._run(mock_utcnow, 60)
+        self.node.power_state = states.POWER_OFF
+        self.node.save()
+        self._run(mock_utcnow, 120)
+        self.assertEqual(3, mock_sync.call_count)
+
+    def test_failing_node(self, mock_utcnow, mock_sync):
+        mock_sync.return_value = 0
+        self._run(mock_utcnow, 0)
+        mock_sync.return_value = 1
+        self._run(mock_utcnow, 60)
+        self._run(mock_utcnow, 120)
+        self.assertEqual(3, mock_sync.call_count)
+
+    def test_disabled(self, mock_utcnow, mock_sync):
+        self.config(power_state_sync_max_interval=0, group='conductor')
+        mock_sync.return_value = 0
+        for seconds in (0, 60, 120):
+            self._run(mock_utcnow, seconds)
+        self.assertEqual(3, mock_sync.call_count)
+        self.assertEqual(0, len(self.service._power_sync_schedule))
+
+    def test_node_removed(self, mock_utcnow, mock_sync):
+        mock_sync.return_value = 0
+        self._run(mock_utcnow, 0)
+        self.assertEqual(1, len(self.service._power_sync_schedule))
+        self.node.maintenance = True
+        self.node.save()
+        self._run(mock_utcnow, 60)
+        self.assertEqual(0, len(self.service._power_sync_schedule))
+
+
 @mock.patch.object(task_manager, 'acquire', autospec=True)
 @mock.patch.object(manager.ConductorManager, '_mapped_to_this_conductor',
                    autospec=True)
-@mock.patch.object(dbapi.IMPL, 'get_nodeinfo_list', autospec=True)
+@mock.patch.object(dbapi.IMPL, 'iter_nodeinfo', autospec=True)
 class ManagerSyncLocalStateTestCase(mgr_utils.CommonMixIn, db_base.DbTestCase):
 
     def setUp(self):
@@ -6743,9 +6904,9 @@ class ManagerSyncLocalStateTestCase(mgr_utils.CommonMixIn, db_base.DbTestCase):
 
         self.service = manager.ConductorManager('hostname', 'test-topic')
 
-        self.service.conductor = mock.Mock()
+        self.service.conductor = mock.Mock(drivers=[])
         self.service.dbapi = self.dbapi
-        self.service.ring_manager = mock.Mock()
+        self.service.ring_manager = mock.Mock(use_groups=False)
 
         self.node = self._create_node(provision_state=states.ACTIVE,
                                       target_provision_state=states.NOSTATE)
@@ -6759,7 +6920,8 @@ class ManagerSyncLocalStateTestCase(mgr_utils.CommonMixIn, db_base.DbTestCase):
 
     def _assert_get_nodeinfo_args(self, get_nodeinfo_mock):
         get_nodeinfo_mock.assert_called_once_with(
-            columns=self.columns, filters=self.filters)
+            columns=self.columns, filters=self.filters,
+            chunk_size=1000)
 
     def test_not_mapped(self, get_nodeinfo_mock, mapped_mock, acquire_mock):
         get_nodeinfo_mock.return_value = self._get_nodeinfo_list_response()
@@ -6992,7 +7154,7 @@ class NodeInspectHardware(mgr_utils.ServiceSetUpMixin, db_base.DbTestCase):
 @mock.patch.object(task_manager, 'acquire', autospec=True)
 @mock.patch.object(manager.ConductorManager, '_mapped_to_this_conductor',
                    autospec=True)
-@mock.patch.object(dbapi.IMPL, 'get_nodeinfo_list', autospec=True)
+@mock.patch.object(dbapi.IMPL, 'iter_nodeinfo', autospec=True)
 class ManagerCheckInspectWaitTimeoutsTestCase(mgr_utils.CommonMixIn,
                                               db_base.DbTestCase):
     def setUp(self):
@@ -7019,7 +7181,7 @@ class ManagerCheckInspectWaitTimeoutsTestCase(mgr_utils.CommonMixIn,
     def _assert_get_nodeinfo_args(self, get_nodeinfo_mock):
         get_nodeinfo_mock.assert_called_once_with(
             sort_dir='asc', columns=self.columns, filters=self.filters,
-            sort_key='inspection_started_at')
+            sort_key='inspection_started_at', chunk_size=1000)
 
     def test__check_inspect_timeouts_not_mapped(self, get_nodeinfo_mock,
                                                 mapped_mock, acquire_mock):
@@ -7909,6 +8071,8 @@ class HeartbeatTestCase(mgr_utils.ServiceSetUpMixin, db_base.DbTestCase):
 
     def _fake_spawn(self, conductor_obj, func, *args, **kwargs):
         self.assertFalse(kwargs.pop('_allow_reserved_pool'))
+        self.assertEqual(worker_classes.CONTINUATION,
+                         kwargs.pop('_worker_class'))
         func(*args, **kwargs)
         return mock.MagicMock()
 
@@ -8769,6 +8933,28 @@ class NodeHistoryRecordCleanupTestCase(mgr_utils.ServiceSetUpMixin,
         events = objects.NodeHistory.list(self.context)
         self.assertEqual(6, len(events))
 
+    @mock.patch.object(manager, 'NODE_HISTORY_PURGE_CHUNK', 1)
+    @mock.patch.object(manager.METRICS, 'send_gauge', autospec=True)
+    def test_history_is_pruned_in_chunks(self, mock_gauge):
+        CONF.set_override('node_history_cleanup_batch_count', 15,
+                          group='conductor')
+        for node in self.nodes:
+            for event in ['one', 'two', 'three']:
+                conductor_utils.node_history_record(node, event=event)
+        delete = self.dbapi.bulk_delete_node_history_records
+        with mock.patch.object(self.dbapi,
+                               'bulk_delete_node_history_records',
+                               autospec=True,
+                               side_effect=delete) as mock_delete:
+            self.service._manage_node_history(self.context)
+        self.assertEqual(3, mock_delete.call_count)
+        for call in mock_delete.call_args_list:
+            self.assertEqual(1, len(call.args[0]))
+        mock_gauge.assert_called_once_with(
+            'ConductorManager.NodeHistoryPurged', 3)
+        events = objects.NodeHistory.list(self.context)
+        self.assertEqual(6, len(events))
+
     def test_history_pruning_no_work(self):
         conductor_utils.node_history_record(self.node1, event='meow')
         with mock.patch.object(self.dbapi,
@@ -8926,7 +9112,8 @@ class ContinueInspectionTestCase(mgr_utils.ServiceSetUpMixin,
         self.assertEqual(states.INSPECTING, node.provision_state)
         mock_spawn.assert_called_once_with(
             self.service, inspection.continue_inspection, mock.ANY,
-            {"test": "inventory"}, ["plugin data"])
+            {"test": "inventory"}, ["plugin data"],
+            _worker_class=worker_classes.CONTINUATION)
 
     @mock.patch.object(manager.ConductorManager, '_spawn_worker',
                        autospec=True)
@@ -8941,7 +9128,8 @@ class ContinueInspectionTestCase(mgr_utils.ServiceSetUpMixin,
         self.assertEqual(states.ENROLL, node.provision_state)
         mock_spawn.assert_called_once_with(
             self.service, inspection.continue_inspection, mock.ANY,
-            {"test": "inventory"}, ["plugin data"])
+            {"test": "inventory"}, ["plugin data"],
+            _worker_class=worker_classes.CONTINUATION)
 
     def test_wrong_state(self):
         for state in (states.ENROLL, states.AVAILABLE, states.ACTIVE):
@@ -12,12 +12,15 @@
 
 from unittest import mock
 
+import futurist
 from oslo_utils import uuidutils
 
 from ironic.common import context as ironic_context
+from ironic.common import exception
 from ironic.conductor import base_manager
 from ironic.conductor import periodics
 from ironic.conductor import task_manager
+from ironic.conductor import worker_classes
 from ironic.drivers.modules import fake
 from ironic.tests.unit.db import base as db_base
 from ironic.tests.unit.objects import utils as obj_utils
@@ -31,6 +34,10 @@ class PeriodicTestService(base_manager.BaseConductorManager):
     def __init__(self, test):
         self.test = test
         self.nodes = []
+        self.counted = 0
+        self._executor = futurist.GreenThreadPoolExecutor(max_workers=8)
+        self._reserved_executor = None
+        self._worker_classes = None
 
     @periodics.node_periodic(purpose="herding cats", spacing=42)
     def simple(self, task, context):
@@ -61,6 +68,24 @@ class PeriodicTestService(base_manager.BaseConductorManager):
         if task.node.uuid == 'stop':
             raise periodics.Stop()
 
+    @periodics.node_periodic(purpose="herding cats", spacing=42,
+                             workers=3)
+    def parallel(self, task, context):
+        self.test.assertIsInstance(context, ironic_context.RequestContext)
+        self.nodes.append(task.node.uuid)
+        if task.node.uuid == 'stop':
+            raise periodics.Stop()
+
+    @periodics.node_periodic(purpose="herding cats", spacing=42,
+                             workers=lambda: 3, limit=4)
+    def parallel_limit(self, task, context):
+        self.nodes.append(task.node.uuid)
+        # Only count every other node
+        result = len(self.nodes) % 2 == 0
+        if result:
+            self.counted += 1
+        return result
+
 
 class PeriodicTestInterface(fake.FakePower):
 
@@ -182,3 +207,108 @@ class NodePeriodicTestCase(db_base.DbTestCase):
         mock_iter_nodes.assert_called_once_with(self.service,
                                                 filters=None, fields=())
         self.assertEqual([self.uuid], iface.nodes)
+
+    @mock.patch.object(task_manager, 'acquire', autospec=True)
+    def test_parallel(self, mock_acquire, mock_iter_nodes):
+        uuids = [uuidutils.generate_uuid() for _ in range(10)]
+        mock_iter_nodes.return_value = iter(
+            (uuid, 'driver1', '') for uuid in uuids)
+        mock_acquire.side_effect = lambda ctx, uuid, **kw: mock.MagicMock(
+            **{'__enter__.return_value.node.uuid': uuid})
+
+        with mock.patch.object(self.service, '_spawn_worker',
+                               wraps=self.service._spawn_worker) as spawn:
+            self.service.parallel(self.ctx)
+            self.assertEqual(2, spawn.call_count)
+
+        self.assertEqual(sorted(uuids), sorted(self.service.nodes))
+
+    @mock.patch.object(task_manager, 'acquire', autospec=True)
+    def test_parallel_fewer_nodes(self, mock_acquire, mock_iter_nodes):
+        mock_iter_nodes.return_value = iter([(self.uuid, 'driver1', '')])
+
+        with mock.patch.object(self.service, '_spawn_worker',
+                               autospec=True) as spawn:
+            self.service.parallel(self.ctx)
+            spawn.assert_not_called()
+
+        self.assertEqual(1, mock_acquire.call_count)
+
+    @mock.patch.object(task_manager, 'acquire', autospec=True)
+    def test_parallel_nodes_fetched_lazily(self, mock_acquire,
+                                           mock_iter_nodes):
+        fetched = []
+
+        def iter_nodes():
+            for i in range(10):
+                fetched.append(i)
+                yield (self.uuid, 'driver1', '')
+
+        mock_iter_nodes.return_value = iter_nodes()
+        mock_acquire.return_value.__enter__.return_value.node.uuid = 'stop'
+
+        self.service.parallel(self.ctx)
+
+        # One node per worker at most, the rest is never fetched
+        self.assertLessEqual(len(fetched), 3)
+        self.assertEqual(len(fetched), len(self.service.nodes))
+
+    @mock.patch.object(task_manager, 'acquire', autospec=True)
+    def test_parallel_max_workers(self, mock_acquire, mock_iter_nodes):
+        self.config(periodic_max_workers=1, group='conductor')
+        mock_iter_nodes.return_value = iter([(self.uuid, 'driver1', '')] * 5)
+        mock_acquire.return_value.__enter__.return_value.node.uuid = self.uuid
+
+        with mock.patch.object(self.service, '_spawn_worker',
+                               autospec=True) as spawn:
+            self.service.parallel(self.ctx)
+            spawn.assert_not_called()
+
+        self.assertEqual([self.uuid] * 5, self.service.nodes)
+
+    @mock.patch.object(task_manager, 'acquire', autospec=True)
+    def test_parallel_no_free_workers(self, mock_acquire, mock_iter_nodes):
+        mock_iter_nodes.return_value = iter([(self.uuid, 'driver1', '')] * 5)
+        mock_acquire.return_value.__enter__.return_value.node.uuid = self.uuid
+
+        with mock.patch.object(self.service, '_spawn_worker',
+                               autospec=True) as spawn:
+            spawn.side_effect = exception.NoFreeConductorWorker()
+            self.service.parallel(self.ctx)
+            spawn.assert_called_once_with(
+                mock.ANY, (self.uuid, ['driver1', '']),
+                _allow_reserved_pool=False,
+                _worker_class=worker_classes.PERIODIC)
+
+        self.assertEqual([self.uuid] * 5, self.service.nodes)
+
+    @mock.patch.object(task_manager, 'acquire', autospec=True)
+    def test_parallel_stop(self, mock_acquire, mock_iter_nodes):
+        mock_iter_nodes.return_value = iter([(self.uuid, 'driver1', '')] * 10)
+        mock_acquire.return_value.__enter__.return_value.node.uuid = 'stop'
+
+        self.service.parallel(self.ctx)
+
+        # Each worker stops after its first node at most
+        self.assertLessEqual(len(self.service.nodes), 3)
+        self.assertEqual(['stop'] * len(self.service.nodes),
+                         self.service.nodes)
+
+    @mock.patch.object(task_manager, 'acquire', autospec=True)
+    def test_parallel_limit(self, mock_acquire, mock_iter_nodes):
+        mock_iter_nodes.return_value = iter([(self.uuid, 'driver1', '')] * 20)
+        mock_acquire.return_value.__enter__.return_value.node.uuid = self.uuid
+
+        self.service.parallel_limit(self.ctx)
+
+        # The limit is reached but never exceeded
+        self.assertEqual(4, self.service.counted)
+        self.assertGreaterEqual(len(self.service.nodes), 8)
+
+    @mock.patch.object(task_manager, 'acquire', autospec=True)
+    def test_parallel_error(self, mock_acquire, mock_iter_nodes):
+        mock_iter_nodes.return_value = iter([(self.uuid, 'driver1', '')] * 10)
+        mock_acquire.side_effect = RuntimeError('boom')
+
+        self.assertRaises(RuntimeError, self.service.parallel, self.ctx)
+        self.assertLessEqual(mock_acquire.call_count, 3)
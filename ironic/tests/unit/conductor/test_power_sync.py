@@ -0,0 +1,124 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import datetime
+
+from ironic.common import states
+from ironic.conductor import power_sync
+from ironic.tests import base as tests_base
+
+
+_NOW = datetime.datetime(2020, 1, 1, 0, 0)
+_PROVISIONED = datetime.datetime(2000, 1, 1, 0, 0)
+
+
+def _after(seconds):
+    return _NOW + datetime.timedelta(seconds=seconds)
+
+
+class PowerSyncScheduleTestCase(tests_base.TestCase):
+
+    def setUp(self):
+        super(PowerSyncScheduleTestCase, self).setUp()
+        self.config(sync_power_state_interval=60,
+                    power_state_sync_max_interval=300,
+                    group='conductor')
+        self.schedule = power_sync.PowerSyncSchedule()
+
+    def _record(self, seconds, power_state=states.POWER_ON,
+                provision_updated_at=_PROVISIONED, failed=False):
+        self.schedule.record('uuid', power_state, provision_updated_at,
+                             failed=failed, now=_after(seconds))
+
+    def _is_due(self, seconds, power_state=states.POWER_ON,
+                provision_updated_at=_PROVISIONED):
+        return self.schedule.is_due('uuid', power_state,
+                                    provision_updated_at, now=_after(seconds))
+
+    def test_enabled(self):
+        self.assertTrue(power_sync.enabled())
+        self.config(power_state_sync_max_interval=0, group='conductor')
+        self.assertFalse(power_sync.enabled())
+        self.config(power_state_sync_max_interval=60, group='conductor')
+        self.assertFalse(power_sync.enabled())
+
+    def test_unknown_node_is_due(self):
+        self.assertTrue(self._is_due(0))
+
+    def test_stable_node_backs_off(self):
+        self._record(0)
+        self.assertTrue(self._is_due(60))
+        self._record(60)
+        # Next sync in 120 seconds
+        self.assertFalse(self._is_due(120))
+        self.assertTrue(self._is_due(180))
+        self._record(180)
+        # Next sync in 240 seconds
+        self.assertFalse(self._is_due(360))
+        self.assertTrue(self._is_due(420))
+        self._record(420)
+        # Capped at 300 seconds
+        self.assertFalse(self._is_due(660))
+        self.assertTrue(self._is_due(720))
+
+    def test_slack(self):
+        self._record(0)
+        # A periodic run starting slightly before the deadline
+        self.assertTrue(self._is_due(59))
+        self.assertFalse(self._is_due(29))
+
+    def test_power_state_changed(self):
+        self._record(0)
+        self._record(60)
+        self.assertTrue(self._is_due(61, power_state=states.POWER_OFF))
+        self._record(61, power_state=states.POWER_OFF)
+        # Back to the base interval
+        self.assertFalse(self._is_due(90, power_state=states.POWER_OFF))
+        self.assertTrue(self._is_due(121, power_state=states.POWER_OFF))
+
+    def test_provision_state_changed(self):
+        self._record(0)
+        self._record(60)
+        self.assertTrue(self._is_due(61, provision_updated_at=_NOW))
+
+    def test_recently_provisioned(self):
+        self._record(0, provision_updated_at=_NOW)
+        self._record(60, provision_updated_at=_NOW)
+        self._record(120, provision_updated_at=_NOW)
+        # Still within the maximum interval from the provision state change
+        self.assertTrue(self._is_due(180, provision_updated_at=_NOW))
+        self._record(300, provision_updated_at=_NOW)
+        self.assertFalse(self._is_due(360, provision_updated_at=_NOW))
+
+    def test_failed(self):
+        self._record(0)
+        self._record(60)
+        self._record(180, failed=True)
+        self.assertTrue(self._is_due(240))
+
+    def test_timezone_aware(self):
+        aware = _PROVISIONED.replace(tzinfo=datetime.timezone.utc)
+        self._record(0, provision_updated_at=aware)
+        self._record(60)
+        self.assertFalse(self._is_due(120))
+
+    def test_forget(self):
+        self._record(0)
+        self.schedule.forget('uuid')
+        self.assertTrue(self._is_due(1))
+
+    def test_retain(self):
+        self._record(0)
+        self.schedule.record('uuid2', states.POWER_ON, None, now=_NOW)
+        self.schedule.retain({'uuid2'})
+        self.assertEqual(1, len(self.schedule))
+        self.assertTrue(self._is_due(1))
@@ -24,6 +24,7 @@ from unittest import mock
 from oslo_config import cfg
 import oslo_messaging as messaging
 from oslo_messaging import _utils as messaging_utils
+from oslo_utils import uuidutils
 
 from ironic.common import boot_devices
 from ironic.common import boot_modes
@@ -36,6 +37,7 @@ from ironic.common import rpc
 from ironic.common import states
 from ironic.conductor import manager as conductor_manager
 from ironic.conductor import rpcapi as conductor_rpcapi
+from ironic.db import api as dbapi
 from ironic import objects
 from ironic.tests import base as tests_base
 from ironic.tests.unit.db import base as db_base
@@ -215,6 +217,28 @@ class RPCAPITestCase(db_base.DbTestCase):
         self.assertEqual(rpcapi.get_conductor_for(self.fake_node_obj),
                          'fake-host')
 
+    def test_get_conductors_for(self):
+        CONF.set_override('host', 'fake-host')
+        c = self.dbapi.register_conductor({'hostname': 'fake-host',
+                                           'drivers': []})
+        self.dbapi.register_conductor_hardware_interfaces(
+            c.id,
+            [{'hardware_type': 'fake-driver', 'interface_type': 'deploy',
+              'interface_name': 'ansible', 'default': True}]
+        )
+        other_node = objects.Node._from_db_object(
+            self.context, objects.Node(),
+            db_utils.get_test_node(id=2, uuid=uuidutils.generate_uuid(),
+                                   driver='other-driver'))
+        rpcapi = conductor_rpcapi.ConductorAPI()
+        self.assertEqual({self.fake_node_obj.uuid: 'fake-host'},
+                         rpcapi.get_conductors_for([self.fake_node_obj,
+                                                    other_node]))
+
+    def test_get_conductors_for_no_conductors(self):
+        rpcapi = conductor_rpcapi.ConductorAPI()
+        self.assertEqual({}, rpcapi.get_conductors_for([self.fake_node_obj]))
+
     def test_get_random_topic(self):
         CONF.set_override('host', 'fake-host')
         self.dbapi.register_conductor({'hostname': 'fake-host', 'drivers': []})
@@ -746,6 +770,20 @@ class RPCAPITestCase(db_base.DbTestCase):
         mock_manager.create_node.assert_called_once_with(
             mock.sentinel.context, node_obj=mock.sentinel.node)
 
+    @mock.patch.object(rpc, 'GLOBAL_MANAGER',
+                       spec_set=conductor_manager.ConductorManager)
+    def test_local_call_no_replica_reads(self, mock_manager):
+        CONF.set_override('host', 'fake.host')
+        self.addCleanup(dbapi.allow_replica_reads, False)
+        dbapi.allow_replica_reads(True)
+        mock_manager.create_node.side_effect = (
+            lambda *args, **kwargs: dbapi.replica_reads_allowed())
+        rpcapi = conductor_rpcapi.ConductorAPI(topic='fake.topic')
+        self.assertFalse(rpcapi.create_node(mock.sentinel.context,
+                                            mock.sentinel.node,
+                                            topic='fake.topic.fake.host'))
+        self.assertTrue(dbapi.replica_reads_allowed())
+
     @mock.patch.object(rpc, 'GLOBAL_MANAGER',
                        spec_set=conductor_manager.ConductorManager)
     def test_local_call_with_rpc_disabled(self, mock_manager):
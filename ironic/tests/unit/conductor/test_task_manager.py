@@ -27,8 +27,10 @@ from ironic.common import driver_factory
 from ironic.common import exception
 from ironic.common import fsm
 from ironic.common import states
+from ironic.conductor import lock_waiters
 from ironic.conductor import notification_utils
 from ironic.conductor import task_manager
+from ironic.db import query_stats
 from ironic import objects
 from ironic.objects import fields
 from ironic.tests import base as tests_base
@@ -99,6 +101,40 @@ class TaskManagerTestCase(db_base.DbTestCase):
             self.assertFalse(task.shared)
         self.assertFalse(build_driver_mock.called)
 
+    @mock.patch.object(query_stats, 'stop', autospec=True)
+    @mock.patch.object(query_stats, 'start', autospec=True)
+    def test_query_stats(self, start_mock, stop_mock, get_voltgt_mock,
+                         get_volconn_mock, get_portgroups_mock,
+                         get_ports_mock, build_driver_mock, reserve_mock,
+                         release_mock, node_get_mock):
+        reserve_mock.return_value = self.node
+        with task_manager.TaskManager(self.context, 'fake-node-id',
+                                      purpose='power state sync'):
+            start_mock.assert_called_once_with(
+                'TaskManager.power_state_sync')
+            self.assertFalse(stop_mock.called)
+        stop_mock.assert_called_with(start_mock.return_value)
+
+    @mock.patch.object(query_stats, 'stop', autospec=True)
+    @mock.patch.object(query_stats, 'start', autospec=True)
+    def test_query_stats_spawn_after(self, start_mock, stop_mock,
+                                     get_voltgt_mock, get_volconn_mock,
+                                     get_portgroups_mock, get_ports_mock,
+                                     build_driver_mock, reserve_mock,
+                                     release_mock, node_get_mock):
+        reserve_mock.return_value = self.node
+        spawn_mock = mock.Mock(return_value=self.future_mock)
+
+        def _spawn():
+            # Collection stops before the worker is spawned
+            stop_mock.assert_called_once_with(start_mock.return_value)
+            return self.future_mock
+
+        spawn_mock.side_effect = _spawn
+        with task_manager.TaskManager(self.context, 'node-id') as task:
+            task.spawn_after(spawn_mock)
+        spawn_mock.assert_called_once_with()
+
     def test_excl_nested_acquire(
             self, get_voltgt_mock, get_volconn_mock, get_portgroups_mock,
             get_ports_mock, build_driver_mock,
@@ -249,6 +285,110 @@ class TaskManagerTestCase(db_base.DbTestCase):
         reserve_mock.assert_has_calls(expected_calls)
         self.assertEqual(4, reserve_mock.call_count)
 
+    @mock.patch.object(lock_waiters, 'wait', autospec=True)
+    def test_excl_lock_exception_woken_time_exceeded(
+            self, wait_mock, get_voltgt_mock, get_volconn_mock,
+            get_portgroups_mock, get_ports_mock, build_driver_mock,
+            reserve_mock, release_mock, node_get_mock):
+        self.config(node_locked_retry_attempts=2, group='conductor')
+        node_get_mock.return_value = self.node
+        reserve_mock.side_effect = exception.NodeLocked(node='foo',
+                                                        host='foo')
+        wait_mock.return_value = True
+
+        # The retry interval is 0, the usual time of all attempts is spent
+        self.assertRaises(exception.NodeLocked,
+                          task_manager.TaskManager,
+                          self.context, 'fake-node-id')
+        self.assertEqual(2, reserve_mock.call_count)
+
+    @mock.patch.object(lock_waiters, 'notify', autospec=True)
+    @mock.patch.object(lock_waiters, 'wait', autospec=True)
+    def test_excl_lock_exception_wait_for_release(
+            self, wait_mock, notify_mock, get_voltgt_mock, get_volconn_mock,
+            get_portgroups_mock, get_ports_mock, build_driver_mock,
+            reserve_mock, release_mock, node_get_mock):
+        self.config(node_locked_retry_attempts=3, group='conductor')
+        self.config(node_locked_retry_interval=5, group='conductor')
+        node_get_mock.return_value = self.node
+        reserve_mock.side_effect = [
+            exception.NodeLocked(node='foo', host='foo'),
+            exception.NodeLocked(node='foo', host='foo'),
+            self.node]
+        # Woken by a release, but the lock is taken before reserving it
+        wait_mock.side_effect = [True, False]
+
+        with task_manager.TaskManager(self.context, 'fake-node-id'):
+            pass
+
+        self.assertEqual(3, reserve_mock.call_count)
+        wait_mock.assert_has_calls([
+            mock.call(self.node.id, 5.0, first=False),
+            mock.call(self.node.id, 5.0, first=True)])
+        # Only notified by the release of the task
+        notify_mock.assert_called_once_with(self.node.id)
+
+    @mock.patch.object(lock_waiters, 'notify', autospec=True)
+    @mock.patch.object(lock_waiters, 'wait', autospec=True)
+    def test_excl_lock_exception_woken_not_counted(
+            self, wait_mock, notify_mock, get_voltgt_mock, get_volconn_mock,
+            get_portgroups_mock, get_ports_mock, build_driver_mock,
+            reserve_mock, release_mock, node_get_mock):
+        self.config(node_locked_retry_attempts=2, group='conductor')
+        self.config(node_locked_retry_interval=5, group='conductor')
+        node_get_mock.return_value = self.node
+        reserve_mock.side_effect = (
+            [exception.NodeLocked(node='foo', host='foo')] * 3 + [self.node])
+        # Woken twice by a release, but the lock is taken before reserving
+        # it, then the lock is released by another conductor.
+        wait_mock.side_effect = [True, True, False]
+
+        with task_manager.TaskManager(self.context, 'fake-node-id'):
+            pass
+
+        self.assertEqual(4, reserve_mock.call_count)
+
+    @mock.patch.object(lock_waiters, 'notify', autospec=True)
+    @mock.patch.object(lock_waiters, 'wait', autospec=True)
+    def test_excl_lock_exception_woken_passes_notification(
+            self, wait_mock, notify_mock, get_voltgt_mock, get_volconn_mock,
+            get_portgroups_mock, get_ports_mock, build_driver_mock,
+            reserve_mock, release_mock, node_get_mock):
+        self.config(node_locked_retry_attempts=3, group='conductor')
+        node_get_mock.return_value = self.node
+        reserve_mock.side_effect = [
+            exception.NodeLocked(node='foo', host='foo'),
+            exception.NodePreconditionFailed(node='foo')]
+        wait_mock.return_value = True
+
+        self.assertRaises(exception.NodePreconditionFailed,
+                          task_manager.TaskManager,
+                          self.context, 'fake-node-id',
+                          filters={'maintenance': False})
+
+        wait_mock.assert_called_once_with(self.node.id, 0, first=False)
+        notify_mock.assert_called_once_with(self.node.id)
+        self.assertFalse(release_mock.called)
+
+    @mock.patch.object(lock_waiters, 'notify', autospec=True)
+    def test_release_notifies_waiters(
+            self, notify_mock, get_voltgt_mock, get_volconn_mock,
+            get_portgroups_mock, get_ports_mock, build_driver_mock,
+            reserve_mock, release_mock, node_get_mock):
+        node_get_mock.return_value = self.node
+        reserve_mock.return_value = self.node
+
+        with task_manager.TaskManager(self.context, 'fake-node-id',
+                                      shared=True):
+            pass
+        self.assertFalse(notify_mock.called)
+
+        with task_manager.TaskManager(self.context, 'fake-node-id'):
+            self.assertFalse(notify_mock.called)
+        release_mock.assert_called_once_with(self.context, self.host,
+                                             self.node.id)
+        notify_mock.assert_called_once_with(self.node.id)
+
     def test_excl_lock_reserve_exception(
             self, get_voltgt_mock, get_volconn_mock, get_portgroups_mock,
             get_ports_mock, build_driver_mock,
@@ -436,6 +576,75 @@ class TaskManagerTestCase(db_base.DbTestCase):
         self.assertFalse(get_voltgt_mock.called)
         self.assertFalse(build_driver_mock.called)
 
+    def test_shared_lock_with_filters(
+            self, get_voltgt_mock, get_volconn_mock, get_portgroups_mock,
+            get_ports_mock, build_driver_mock,
+            reserve_mock, release_mock, node_get_mock):
+        node_get_mock.return_value = self.node
+        filters = {'maintenance': False}
+        with task_manager.TaskManager(self.context, 'fake-node-id',
+                                      shared=True, filters=filters) as task:
+            self.assertEqual(self.node, task.node)
+            self.assertTrue(task.shared)
+
+        self.assertFalse(reserve_mock.called)
+        node_get_mock.assert_called_once_with(self.context, 'fake-node-id',
+                                              filters=filters)
+
+    def test_shared_lock_precondition_failed(
+            self, get_voltgt_mock, get_volconn_mock, get_portgroups_mock,
+            get_ports_mock, build_driver_mock,
+            reserve_mock, release_mock, node_get_mock):
+        node_get_mock.side_effect = exception.NodePreconditionFailed(
+            node='foo')
+
+        self.assertRaises(exception.NodePreconditionFailed,
+                          task_manager.TaskManager,
+                          self.context,
+                          'fake-node-id',
+                          shared=True,
+                          filters={'maintenance': False})
+
+        self.assertFalse(reserve_mock.called)
+        self.assertFalse(release_mock.called)
+        self.assertFalse(build_driver_mock.called)
+
+    def test_excl_lock_with_filters(
+            self, get_voltgt_mock, get_volconn_mock, get_portgroups_mock,
+            get_ports_mock, build_driver_mock,
+            reserve_mock, release_mock, node_get_mock):
+        reserve_mock.return_value = self.node
+        filters = {'maintenance': False}
+        with task_manager.TaskManager(self.context, 'fake-node-id',
+                                      filters=filters) as task:
+            self.assertEqual(self.node, task.node)
+            self.assertFalse(task.shared)
+
+        node_get_mock.assert_called_once_with(self.context, 'fake-node-id',
+                                              filters=filters)
+        reserve_mock.assert_called_once_with(self.context, self.host,
+                                             'fake-node-id', filters=filters)
+        release_mock.assert_called_once_with(self.context, self.host,
+                                             self.node.id)
+
+    def test_excl_lock_precondition_failed_no_retry(
+            self, get_voltgt_mock, get_volconn_mock, get_portgroups_mock,
+            get_ports_mock, build_driver_mock,
+            reserve_mock, release_mock, node_get_mock):
+        self.config(node_locked_retry_attempts=3, group='conductor')
+        reserve_mock.side_effect = exception.NodePreconditionFailed(
+            node='foo')
+
+        self.assertRaises(exception.NodePreconditionFailed,
+                          task_manager.TaskManager,
+                          self.context,
+                          'fake-node-id',
+                          filters={'maintenance': False})
+
+        self.assertEqual(1, reserve_mock.call_count)
+        self.assertFalse(release_mock.called)
+        self.assertFalse(build_driver_mock.called)
+
     def test_shared_lock_get_ports_exception(
             self, get_voltgt_mock, get_volconn_mock, get_portgroups_mock,
             get_ports_mock, build_driver_mock,
@@ -780,6 +989,7 @@ class TaskManagerStateModelTestCases(tests_base.TestCase):
         t._purpose = 'purpose'
         t._debug_timer = mock.Mock()
         t._debug_timer.elapsed.return_value = 3.14
+        t._query_stats = None
 
         t.release_resources(t)
         self.assertIsNone(t.node)
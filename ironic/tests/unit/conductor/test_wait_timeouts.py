@@ -0,0 +1,130 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import datetime
+
+from oslo_utils import uuidutils
+
+from ironic.common import states
+from ironic.conductor import wait_timeouts
+from ironic.tests import base as tests_base
+from ironic.tests.unit.db import base as db_base
+from ironic.tests.unit.objects import utils as obj_utils
+
+
+_START = datetime.datetime(2000, 1, 1, 0, 0)
+
+
+class DeadlineIndexTestCase(tests_base.TestCase):
+
+    def setUp(self):
+        super(DeadlineIndexTestCase, self).setUp()
+        self.index = wait_timeouts.DeadlineIndex(
+            'deploy', states.DEPLOYWAIT, 'provision_updated_at', 60)
+
+    def test_add(self):
+        self.index.add('uuid1', _START)
+        self.assertIn('uuid1', self.index)
+        self.assertEqual(1, len(self.index))
+
+    def test_add_no_timestamp(self):
+        self.index.add('uuid1', _START)
+        self.index.add('uuid1', None)
+        self.assertNotIn('uuid1', self.index)
+
+    def test_pop_expired(self):
+        self.index.add('uuid2', _START + datetime.timedelta(seconds=10))
+        self.index.add('uuid1', _START)
+        self.index.add('uuid3', _START + datetime.timedelta(hours=1))
+
+        result = self.index.pop_expired(
+            now=_START + datetime.timedelta(seconds=100))
+        self.assertEqual(
+            [('uuid1', _START + datetime.timedelta(seconds=60)),
+             ('uuid2', _START + datetime.timedelta(seconds=70))],
+            result)
+        self.assertEqual(1, len(self.index))
+        self.assertIn('uuid3', self.index)
+
+    def test_pop_expired_nothing(self):
+        self.index.add('uuid1', _START)
+        self.assertEqual([], self.index.pop_expired(now=_START))
+        self.assertIn('uuid1', self.index)
+
+    def test_pop_expired_superseded(self):
+        self.index.add('uuid1', _START)
+        self.index.add('uuid1', _START + datetime.timedelta(hours=1))
+        self.index.add('uuid2', _START)
+        self.index.discard('uuid2')
+
+        result = self.index.pop_expired(
+            now=_START + datetime.timedelta(minutes=5))
+        self.assertEqual([], result)
+        self.assertIn('uuid1', self.index)
+        self.assertNotIn('uuid2', self.index)
+
+    def test_add_timezone_aware(self):
+        self.index.add('uuid1', _START.replace(tzinfo=datetime.timezone.utc))
+        result = self.index.pop_expired(
+            now=_START + datetime.timedelta(seconds=60))
+        self.assertEqual(
+            [('uuid1', _START + datetime.timedelta(seconds=60))], result)
+
+    def test_clear(self):
+        self.index.add('uuid1', _START)
+        self.index.clear()
+        self.assertEqual(0, len(self.index))
+        self.assertEqual([], self.index.pop_expired())
+
+
+class TrackTestCase(db_base.DbTestCase):
+
+    def setUp(self):
+        super(TrackTestCase, self).setUp()
+        self.deploy = wait_timeouts.DeadlineIndex(
+            'deploy', states.DEPLOYWAIT, 'provision_updated_at', 60)
+        self.inspect = wait_timeouts.DeadlineIndex(
+            'inspect', states.INSPECTWAIT, 'inspection_started_at', 60)
+        wait_timeouts.register(self.deploy)
+        wait_timeouts.register(self.inspect)
+        self.addCleanup(wait_timeouts.unregister_all)
+
+    def test_track(self):
+        node = obj_utils.create_test_node(
+            self.context, provision_state=states.DEPLOYWAIT,
+            provision_updated_at=_START)
+        wait_timeouts.track(node)
+        self.assertIn(node.uuid, self.deploy)
+        self.assertNotIn(node.uuid, self.inspect)
+
+        node.provision_state = states.INSPECTWAIT
+        node.inspection_started_at = _START
+        wait_timeouts.track(node)
+        self.assertNotIn(node.uuid, self.deploy)
+        self.assertIn(node.uuid, self.inspect)
+
+    def test_track_other_state(self):
+        node = obj_utils.create_test_node(
+            self.context, uuid=uuidutils.generate_uuid(),
+            provision_state=states.ACTIVE)
+        self.deploy.add(node.uuid, _START)
+        wait_timeouts.track(node)
+        self.assertEqual(0, len(self.deploy))
+        self.assertEqual(0, len(self.inspect))
+
+    def test_unregister_all(self):
+        wait_timeouts.unregister_all()
+        node = obj_utils.create_test_node(
+            self.context, provision_state=states.DEPLOYWAIT,
+            provision_updated_at=_START)
+        wait_timeouts.track(node)
+        self.assertNotIn(node.uuid, self.deploy)
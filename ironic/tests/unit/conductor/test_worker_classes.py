@@ -0,0 +1,61 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from ironic.common import exception
+from ironic.conductor import worker_classes
+from ironic.tests import base as tests_base
+
+
+class WorkerClassesTestCase(tests_base.TestCase):
+
+    def test_limits(self):
+        classes = worker_classes.WorkerClasses(
+            10, {'periodic': 50, 'bulk': 1}, 1)
+        self.assertEqual({'interactive': 10, 'continuation': 10,
+                          'periodic': 5, 'bulk': 1}, classes.limits)
+
+    def test_unknown_class(self):
+        self.assertRaises(exception.ConfigInvalid,
+                          worker_classes.WorkerClasses,
+                          10, {'periodic': 50, 'urgent': 100}, 1)
+
+    def test_acquire_limit(self):
+        classes = worker_classes.WorkerClasses(10, {'bulk': 20}, 0)
+        self.assertTrue(classes.acquire(worker_classes.BULK))
+        self.assertTrue(classes.acquire(worker_classes.BULK))
+        self.assertFalse(classes.acquire(worker_classes.BULK))
+        self.assertEqual(2, classes.running(worker_classes.BULK))
+
+        classes.release(worker_classes.BULK)
+        self.assertEqual(1, classes.running(worker_classes.BULK))
+        self.assertTrue(classes.acquire(worker_classes.BULK))
+
+    def test_acquire_pool_full(self):
+        classes = worker_classes.WorkerClasses(4, {}, 0)
+        for _ in range(4):
+            self.assertTrue(classes.acquire(worker_classes.INTERACTIVE))
+        self.assertFalse(classes.acquire(worker_classes.INTERACTIVE))
+        self.assertFalse(classes.acquire(worker_classes.PERIODIC))
+
+    def test_acquire_minimum(self):
+        classes = worker_classes.WorkerClasses(6, {'bulk': 50}, 1)
+        # One worker is kept for each of the three other classes
+        for _ in range(3):
+            self.assertTrue(classes.acquire(worker_classes.INTERACTIVE))
+        self.assertFalse(classes.acquire(worker_classes.INTERACTIVE))
+        # The kept workers are available to the other classes
+        self.assertTrue(classes.acquire(worker_classes.BULK))
+        self.assertFalse(classes.acquire(worker_classes.BULK))
+        self.assertTrue(classes.acquire(worker_classes.CONTINUATION))
+        self.assertTrue(classes.acquire(worker_classes.PERIODIC))
+        self.assertEqual(6, sum(classes.running(cls)
+                                for cls in worker_classes.CLASSES))
@@ -15,11 +15,16 @@
 
 """Ironic DB test base class."""
 
+import contextlib
+import threading
+
 import fixtures
 from oslo_config import cfg
 from oslo_db.sqlalchemy import enginefacade
+from sqlalchemy import event
 
 from ironic.db import api as dbapi
+from ironic.db import query_stats
 from ironic.db import sqlalchemy as dbapi_parent
 from ironic.db.sqlalchemy import migration
 from ironic.db.sqlalchemy import models
@@ -76,3 +81,48 @@ class DbTestCase(base.TestCase):
                                  sql_connection=CONF.database.connection)
             engine.dispose()
         self.useFixture(_DB_CACHE)
+
+    def record_statements(self):
+        """Record the SQL statements executed until the end of the test.
+
+        :returns: a list the executed statements, except for the start of
+            transactions, are appended to.
+        """
+        statements = []
+        engine = enginefacade.writer.get_engine()
+        thread_id = threading.get_ident()
+
+        def _record(conn, cursor, statement, parameters, context,
+                    executemany):
+            # NOTE: transactions are started explicitly with SQLite, and
+            # threads left behind by other tests may still use the engine.
+            if statement != 'BEGIN' and threading.get_ident() == thread_id:
+                statements.append(statement)
+
+        event.listen(engine, 'before_cursor_execute', _record)
+        self.addCleanup(event.remove, engine, 'before_cursor_execute',
+                        _record)
+        return statements
+
+    @contextlib.contextmanager
+    def assertQueryBudget(self, max_queries):
+        """Assert that the block executes at most max_queries statements.
+
+        Only the statements executed by the current thread are counted,
+        except for the start of transactions.
+
+        :returns: the QueryStats object of the block.
+        """
+        stats = query_stats.QueryStats('budget')
+        query_stats.activate(stats)
+        try:
+            yield stats
+        finally:
+            query_stats.deactivate(stats)
+        if stats.queries > max_queries:
+            self.fail('%(count)d queries executed, expected at most '
+                      '%(max)d:\n%(queries)s' %
+                      {'count': stats.queries, 'max': max_queries,
+                       'queries': '\n'.join(
+                           '%d x %s' % (count, shape)
+                           for shape, count in stats.shapes.most_common())})
@@ -11,9 +11,17 @@
 #    under the License.
 
 import inspect
+from unittest import mock
 
+import fixtures
+from oslo_db import exception as db_exc
+from oslo_db.sqlalchemy import enginefacade
+
+from ironic.db import api as db_api
 from ironic.db.sqlalchemy import api as sqlalchemy_api
 from ironic.tests import base as test_base
+from ironic.tests.unit.db import base as db_base
+from ironic.tests.unit.db import utils as db_utils
 
 
 class TestDBWriteMethodsRetryOnDeadlock(test_base.TestCase):
@@ -30,3 +38,141 @@ class TestDBWriteMethodsRetryOnDeadlock(test_base.TestCase):
                     'oslo_db\'s retry_on_deadlock decorator not '
                     'applied to method ironic.db.sqlalchemy.api.Connection.%s '
                     'doing database write' % name)
+
+
+class TestReplicaReads(db_base.DbTestCase):
+
+    def setUp(self):
+        super(TestReplicaReads, self).setUp()
+        self.config(slave_connection='sqlite://', group='database')
+        self.addCleanup(db_api.allow_replica_reads, False)
+        db_api.allow_replica_reads(True)
+        self.useFixture(fixtures.MockPatchObject(
+            sqlalchemy_api, '_REPLICA_STATE',
+            {'checked_at': None, 'fresh': False, 'warned': False}))
+
+    @mock.patch.object(sqlalchemy_api, '_replica_is_fresh', autospec=True)
+    @mock.patch.object(enginefacade, 'reader', autospec=False)
+    def test_session_for_read(self, mock_reader, mock_fresh):
+        mock_fresh.return_value = True
+        sqlalchemy_api._session_for_read(allow_replica=True)
+        mock_reader.async_.using.assert_called_once_with(
+            sqlalchemy_api._CONTEXT)
+        self.assertFalse(mock_reader.using.called)
+
+    @mock.patch.object(sqlalchemy_api, '_replica_is_fresh', autospec=True)
+    @mock.patch.object(enginefacade, 'reader', autospec=False)
+    def test_session_for_read_primary(self, mock_reader, mock_fresh):
+        for allow_replica, allowed, fresh in [(False, True, True),
+                                              (True, False, True),
+                                              (True, True, False)]:
+            mock_reader.reset_mock()
+            db_api.allow_replica_reads(allowed)
+            mock_fresh.return_value = fresh
+            sqlalchemy_api._session_for_read(allow_replica=allow_replica)
+            mock_reader.using.assert_called_once_with(
+                sqlalchemy_api._CONTEXT)
+            self.assertFalse(mock_reader.async_.using.called)
+
+    @mock.patch.object(sqlalchemy_api, '_replica_is_fresh', autospec=True)
+    @mock.patch.object(enginefacade, 'reader', autospec=False)
+    def test_session_for_read_no_replica(self, mock_reader, mock_fresh):
+        self.config(slave_connection=None, group='database')
+        sqlalchemy_api._session_for_read(allow_replica=True)
+        mock_reader.using.assert_called_once_with(sqlalchemy_api._CONTEXT)
+        self.assertFalse(mock_fresh.called)
+
+    @mock.patch.object(sqlalchemy_api, '_replica_is_fresh', autospec=True)
+    def test_get_node_list(self, mock_fresh):
+        mock_fresh.return_value = True
+        node = db_utils.create_test_node()
+        res = self.dbapi.get_node_list()
+        self.assertEqual([node.id], [r.id for r in res])
+        mock_fresh.assert_called_once_with()
+
+    @mock.patch.object(sqlalchemy_api, '_replica_lag', autospec=True)
+    def test_replica_is_fresh(self, mock_lag):
+        mock_lag.return_value = 5
+        self.assertTrue(sqlalchemy_api._replica_is_fresh())
+        # The result is cached
+        self.assertTrue(sqlalchemy_api._replica_is_fresh())
+        mock_lag.assert_called_once_with(mock.ANY)
+
+    @mock.patch.object(sqlalchemy_api, 'REPLICA_CHECK_INTERVAL', 0)
+    @mock.patch.object(sqlalchemy_api, '_replica_lag', autospec=True)
+    def test_replica_is_fresh_stale(self, mock_lag):
+        mock_lag.side_effect = [11, None, 10]
+        self.assertFalse(sqlalchemy_api._replica_is_fresh())
+        self.assertFalse(sqlalchemy_api._replica_is_fresh())
+        self.assertTrue(sqlalchemy_api._replica_is_fresh())
+
+    @mock.patch.object(sqlalchemy_api.LOG, 'warning', autospec=True)
+    @mock.patch.object(sqlalchemy_api, '_replica_lag', autospec=True)
+    def test_replica_is_fresh_error(self, mock_lag, mock_log):
+        mock_lag.side_effect = db_exc.DBConnectionError()
+        self.assertFalse(sqlalchemy_api._replica_is_fresh())
+        self.assertTrue(mock_log.called)
+
+    @mock.patch.object(sqlalchemy_api, 'REPLICA_CHECK_INTERVAL', 0)
+    @mock.patch.object(sqlalchemy_api.LOG, 'debug', autospec=True)
+    @mock.patch.object(sqlalchemy_api.LOG, 'warning', autospec=True)
+    @mock.patch.object(sqlalchemy_api, '_replica_lag', autospec=True)
+    def test_replica_is_fresh_error_warned_once(self, mock_lag, mock_warn,
+                                                mock_debug):
+        mock_lag.side_effect = [db_exc.DBError(), db_exc.DBError(), 5,
+                                db_exc.DBError()]
+        for _ in range(2):
+            self.assertFalse(sqlalchemy_api._replica_is_fresh())
+        self.assertEqual(1, mock_warn.call_count)
+        self.assertEqual(1, mock_debug.call_count)
+        # Warned again after a successful check
+        self.assertTrue(sqlalchemy_api._replica_is_fresh())
+        self.assertFalse(sqlalchemy_api._replica_is_fresh())
+        self.assertEqual(2, mock_warn.call_count)
+
+    @mock.patch.object(sqlalchemy_api, '_replica_lag', autospec=True)
+    def test_replica_is_fresh_no_max_staleness(self, mock_lag):
+        self.config(replica_max_staleness=0, group='database')
+        self.assertTrue(sqlalchemy_api._replica_is_fresh())
+        self.assertFalse(mock_lag.called)
+
+    def test_replica_lag(self):
+        with sqlalchemy_api._session_for_read() as session:
+            self.assertEqual(0, sqlalchemy_api._replica_lag(session))
+
+    def _fake_session(self, dialect):
+        session = mock.Mock()
+        session.get_bind.return_value.dialect.name = dialect
+        return session
+
+    def test_replica_lag_postgresql(self):
+        session = self._fake_session('postgresql')
+        session.execute.return_value.scalar.return_value = 2.5
+        self.assertEqual(2.5, sqlalchemy_api._replica_lag(session))
+
+    def test_replica_lag_mysql(self):
+        session = self._fake_session('mysql')
+        result = session.execute.return_value.mappings.return_value
+        for status, lag in [(None, 0),
+                            ({'Seconds_Behind_Source': 3}, 3),
+                            ({'Seconds_Behind_Master': 4}, 4),
+                            ({'Seconds_Behind_Source': None}, None)]:
+            result.first.return_value = status
+            self.assertEqual(lag, sqlalchemy_api._replica_lag(session))
+
+    def test_replica_lag_mysql_old_statement(self):
+        session = self._fake_session('mysql')
+        status = mock.Mock()
+        status.mappings.return_value.first.return_value = {
+            'Seconds_Behind_Master': 4}
+        session.execute.side_effect = [db_exc.DBError(), status]
+        self.assertEqual(4, sqlalchemy_api._replica_lag(session))
+        self.assertEqual(['SHOW REPLICA STATUS', 'SHOW SLAVE STATUS'],
+                         [str(c.args[0])
+                          for c in session.execute.call_args_list])
+
+    def test_replica_lag_mysql_error(self):
+        session = self._fake_session('mysql')
+        session.execute.side_effect = db_exc.DBError()
+        self.assertRaises(db_exc.DBError, sqlalchemy_api._replica_lag,
+                          session)
@@ -1490,6 +1490,21 @@ class MigrationCheckersMixin(object):
             )
             connection.execute(del_stmt)
 
+    def _check_5e8a1c3b9d42(self, engine, data):
+        membership = db_utils.get_table(engine, 'conductor_membership')
+        col_names = [column.name for column in membership.c]
+        expected_names = ['version', 'created_at', 'updated_at', 'id',
+                          'generation']
+        self.assertEqual(sorted(expected_names), sorted(col_names))
+        self.assertIsInstance(membership.c.generation.type,
+                              sqlalchemy.types.Integer)
+
+        with engine.begin() as connection:
+            rows = connection.execute(
+                sqlalchemy.select(membership.c.id,
+                                  membership.c.generation)).fetchall()
+            self.assertEqual([(1, 0)], [tuple(row) for row in rows])
+
     def test_upgrade_and_version(self):
         with patch_with_engine(self.engine):
             self.migration_api.upgrade('head')
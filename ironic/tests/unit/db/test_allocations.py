@@ -56,6 +56,17 @@ class AllocationsTestCase(base.DbTestCase):
         self.assertRaises(exception.AllocationNotFound,
                           self.dbapi.get_allocation_by_id, 99)
 
+    def test_get_allocation_uuids_by_ids(self):
+        allocation2 = db_utils.create_test_allocation(
+            name='host2', uuid=uuidutils.generate_uuid())
+        res = self.dbapi.get_allocation_uuids_by_ids(
+            [self.allocation.id, allocation2.id, 99])
+        self.assertEqual({self.allocation.id: self.allocation.uuid,
+                          allocation2.id: allocation2.uuid}, res)
+
+    def test_get_allocation_uuids_by_ids_empty(self):
+        self.assertEqual({}, self.dbapi.get_allocation_uuids_by_ids([]))
+
     def test_get_allocation_by_uuid(self):
         res = self.dbapi.get_allocation_by_uuid(self.allocation.uuid)
         self.assertEqual(self.allocation.id, res.id)
@@ -65,6 +76,15 @@ class AllocationsTestCase(base.DbTestCase):
                           self.dbapi.get_allocation_by_uuid,
                           'EEEEEEEE-EEEE-EEEE-EEEE-EEEEEEEEEEEE')
 
+    def test_get_allocation_watermark(self):
+        count, latest = self.dbapi.get_allocation_watermark()
+        self.assertEqual(2, count)
+        self.assertEqual(self.allocation.created_at, latest)
+        allocation = self.dbapi.update_allocation(self.allocation.id,
+                                                  {'state': 'error'})
+        self.assertEqual((2, allocation.updated_at),
+                         self.dbapi.get_allocation_watermark())
+
     def test_get_allocation_by_name(self):
         res = self.dbapi.get_allocation_by_name(self.allocation.name)
         self.assertEqual(self.allocation.id, res.id)
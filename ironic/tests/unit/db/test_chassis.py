@@ -42,6 +42,16 @@ class DbChassisTestCase(base.DbTestCase):
 
         self.assertEqual(self.chassis.uuid, chassis.uuid)
 
+    def test_get_chassis_uuids_by_ids(self):
+        ch2 = utils.create_test_chassis(uuid=uuidutils.generate_uuid())
+        res = self.dbapi.get_chassis_uuids_by_ids(
+            [self.chassis.id, ch2.id, 42])
+        self.assertEqual({self.chassis.id: self.chassis.uuid,
+                          ch2.id: ch2.uuid}, res)
+
+    def test_get_chassis_uuids_by_ids_empty(self):
+        self.assertEqual({}, self.dbapi.get_chassis_uuids_by_ids([]))
+
     def test_get_chassis_by_uuid(self):
         chassis = self.dbapi.get_chassis_by_uuid(self.chassis.uuid)
 
@@ -192,6 +192,58 @@ class DbConductorTestCase(base.DbTestCase):
         self.dbapi.touch_conductor(c.hostname)
         self.dbapi.get_conductor(c.hostname)
 
+    def test_get_conductor_membership_stamp(self):
+        generation, hostnames = self.dbapi.get_conductor_membership_stamp()
+        self.assertEqual(frozenset(), hostnames)
+
+        c = self._create_test_cdr(hardware_types=['generic'])
+        stamp = self.dbapi.get_conductor_membership_stamp()
+        self.assertGreater(stamp[0], generation)
+        self.assertEqual(frozenset([c.hostname]), stamp[1])
+
+    def test_get_conductor_membership_stamp_changes(self):
+        c = self._create_test_cdr()
+        stamp = self.dbapi.get_conductor_membership_stamp()
+
+        self.dbapi.register_conductor_hardware_interfaces(
+            c.id,
+            [{'hardware_type': 'generic', 'interface_type': 'power',
+              'interface_name': 'fake', 'default': True}])
+        new_stamp = self.dbapi.get_conductor_membership_stamp()
+        self.assertGreater(new_stamp[0], stamp[0])
+        stamp = new_stamp
+
+        self.dbapi.unregister_conductor_hardware_interfaces(c.id)
+        new_stamp = self.dbapi.get_conductor_membership_stamp()
+        self.assertGreater(new_stamp[0], stamp[0])
+        stamp = new_stamp
+
+        self.dbapi.unregister_conductor(c.hostname)
+        new_stamp = self.dbapi.get_conductor_membership_stamp()
+        self.assertGreater(new_stamp[0], stamp[0])
+        self.assertEqual(frozenset(), new_stamp[1])
+
+    def test_get_conductor_membership_stamp_touch(self):
+        c = self._create_test_cdr()
+        stamp = self.dbapi.get_conductor_membership_stamp()
+        self.dbapi.touch_conductor(c.hostname)
+        self.assertEqual(stamp, self.dbapi.get_conductor_membership_stamp())
+
+    @mock.patch.object(common_utils, 'is_ironic_using_sqlite', autospec=True)
+    @mock.patch.object(timeutils, 'utcnow', autospec=True)
+    def test_get_conductor_membership_stamp_old_conductor(
+            self, mock_utcnow, mock_is_sqlite):
+        mock_is_sqlite.return_value = False
+        self.config(heartbeat_timeout=60, group='conductor')
+        past = datetime.datetime(2000, 1, 1, 0, 0)
+        mock_utcnow.return_value = past
+        self._create_test_cdr(id=1, hostname='old-host')
+        mock_utcnow.return_value = past + datetime.timedelta(minutes=2)
+        self._create_test_cdr(id=2, hostname='new-host')
+
+        stamp = self.dbapi.get_conductor_membership_stamp()
+        self.assertEqual(frozenset(['new-host']), stamp[1])
+
     def test_clear_node_reservations_for_conductor(self):
         node1 = self.dbapi.create_node({'reservation': 'hostname1'})
         node2 = self.dbapi.create_node({'reservation': 'hostname2'})
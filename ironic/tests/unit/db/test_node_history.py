@@ -10,9 +10,14 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import datetime
+from unittest import mock
+
 from oslo_utils import uuidutils
 
 from ironic.common import exception
+from ironic.db.sqlalchemy import api as sqlalchemy_api
+from ironic.tests import base as test_base
 from ironic.tests.unit.db import base
 from ironic.tests.unit.db import utils as db_utils
 
@@ -45,6 +50,27 @@ class DBNodeHistoryTestCase(base.DbTestCase):
         self.assertRaises(exception.NodeHistoryNotFound,
                           self.dbapi.get_node_history_by_id, -1)
 
+    def test_create_node_history_records(self):
+        created_at = datetime.datetime(2024, 1, 2, 3, 4, 5)
+        self.dbapi.create_node_history_records([
+            {'node_id': self.node.id, 'event': 'event 1',
+             'created_at': created_at},
+            {'node_id': self.node.id, 'event': 'event 2',
+             'severity': 'ERROR', 'uuid': uuidutils.generate_uuid()},
+        ])
+        res = self.dbapi.get_node_history_by_node_id(self.node.id)
+        self.assertEqual([self.history.event, 'event 1', 'event 2'],
+                         [r.event for r in res])
+        self.assertEqual(created_at, res[1].created_at)
+        self.assertIsNotNone(res[2].created_at)
+        self.assertEqual([None, 'ERROR'], [r.severity for r in res[1:]])
+        self.assertTrue(all(uuidutils.is_uuid_like(r.uuid) for r in res))
+
+    def test_create_node_history_records_empty(self):
+        self.dbapi.create_node_history_records([])
+        self.assertEqual(
+            1, len(self.dbapi.get_node_history_by_node_id(self.node.id)))
+
     def test_get_history_by_uuid(self):
         res = self.dbapi.get_node_history_by_uuid(self.history.uuid)
         self.assertEqual(self.history.id, res.id)
@@ -92,3 +118,106 @@ class DBNodeHistoryTestCase(base.DbTestCase):
         self.assertEqual(self.history.event, res[0].event)
         self.assertEqual(self.history.event_type, res[0].event_type)
         self.assertEqual(self.history.severity, res[0].severity)
+
+    def test_get_history_by_node_id_uuid_marker(self):
+        uuids = self._prepare_history_entries()
+        res = self.dbapi.get_node_history_by_node_id(
+            self.node.id, limit=2, marker=uuids[1], sort_key='created_at')
+        self.assertEqual(uuids[2:4], [r.uuid for r in res])
+
+
+class DBNodeHistoryPurgeTestCase(base.DbTestCase):
+
+    def setUp(self):
+        super(DBNodeHistoryPurgeTestCase, self).setUp()
+        self.config(node_history_max_entries=2, group='conductor')
+        self.conductor = db_utils.create_test_conductor()
+        self.nodes = [
+            db_utils.create_test_node(uuid=uuidutils.generate_uuid(),
+                                      conductor_affinity=self.conductor.id)
+            for _ in range(2)]
+        other_node = db_utils.create_test_node(uuid=uuidutils.generate_uuid())
+        self.now = datetime.datetime.now()
+        self.ids = {}
+        # Created in a different order than the time of the events.
+        for days in (1, 5, 2, 4, 3):
+            for node in self.nodes + [other_node]:
+                history = db_utils.create_test_history(
+                    uuid=uuidutils.generate_uuid(), node_id=node.id,
+                    created_at=self.now - datetime.timedelta(days=days))
+                self.ids[(node.id, days)] = history.id
+
+    def _expected(self, days):
+        return sorted(self.ids[(node.id, d)]
+                      for node in self.nodes for d in days)
+
+    def _test_get_ids(self, window_functions):
+        with mock.patch.object(sqlalchemy_api, '_supports_window_functions',
+                               autospec=True,
+                               return_value=window_functions):
+            res = self.dbapi.get_node_history_ids_for_purge(
+                self.conductor.id, limit=10)
+            self.assertEqual(self._expected([5, 4, 3]), res)
+
+            res = self.dbapi.get_node_history_ids_for_purge(
+                self.conductor.id, limit=2, marker=res[1])
+            self.assertEqual(self._expected([5, 4, 3])[2:4], res)
+
+            self.config(node_history_minimum_days=3, group='conductor')
+            res = self.dbapi.get_node_history_ids_for_purge(
+                self.conductor.id, limit=10)
+            # Only the entries older than 3 days are counted
+            self.assertEqual(self._expected([5]), res)
+
+    def test_get_node_history_ids_for_purge(self):
+        self._test_get_ids(True)
+
+    def test_get_node_history_ids_for_purge_no_window_functions(self):
+        self._test_get_ids(False)
+
+    def test_get_node_history_ids_for_purge_same_time(self):
+        node = db_utils.create_test_node(
+            uuid=uuidutils.generate_uuid(),
+            conductor_affinity=self.conductor.id)
+        ids = [db_utils.create_test_history(
+            uuid=uuidutils.generate_uuid(), node_id=node.id,
+            created_at=self.now).id for _ in range(4)]
+        for window_functions in (True, False):
+            with mock.patch.object(
+                    sqlalchemy_api, '_supports_window_functions',
+                    autospec=True, return_value=window_functions):
+                res = self.dbapi.get_node_history_ids_for_purge(
+                    self.conductor.id, limit=2, marker=max(self.ids.values()))
+                self.assertEqual(ids[:2], res)
+
+    def test_get_node_history_ids_for_purge_nothing(self):
+        self.config(node_history_max_entries=5, group='conductor')
+        self.assertEqual([], self.dbapi.get_node_history_ids_for_purge(
+            self.conductor.id, limit=10))
+
+    def test_bulk_delete_node_history_records(self):
+        ids = self._expected([5, 4])
+        self.dbapi.bulk_delete_node_history_records(ids)
+        for node in self.nodes:
+            res = self.dbapi.get_node_history_by_node_id(node.id)
+            self.assertEqual(3, len(res))
+
+
+class SupportsWindowFunctionsTestCase(test_base.TestCase):
+
+    def test_supports_window_functions(self):
+        for name, version, mariadb, expected in [
+                ('postgresql', None, False, True),
+                ('sqlite', (3, 24, 0), False, False),
+                ('sqlite', (3, 25, 0), False, True),
+                ('mysql', (5, 7, 40), False, False),
+                ('mysql', (8, 0, 32), False, True),
+                ('mysql', (10, 1, 48), True, False),
+                ('mysql', (10, 11, 6), True, True)]:
+            dialect = mock.Mock(is_mariadb=mariadb,
+                                server_version_info=version)
+            dialect.name = name
+            dialect.dbapi.sqlite_version_info = version
+            self.assertEqual(
+                expected, sqlalchemy_api._supports_window_functions(dialect),
+                (name, version))
@@ -17,9 +17,11 @@
 
 import copy
 import datetime
+import threading
 from unittest import mock
 
 from oslo_config import cfg
+from oslo_db.sqlalchemy import enginefacade
 from oslo_utils import timeutils
 from oslo_utils import uuidutils
 from sqlalchemy import exc as sa_exc
@@ -102,6 +104,59 @@ class DbNodeTestCase(base.DbTestCase):
         self.assertCountEqual(['trait1', 'trait2'],
                               [trait.trait for trait in res.traits])
 
+    def test_get_node_uuids_by_ids(self):
+        node1 = utils.create_test_node(uuid=uuidutils.generate_uuid())
+        node2 = utils.create_test_node(uuid=uuidutils.generate_uuid())
+        utils.create_test_node(uuid=uuidutils.generate_uuid())
+        res = self.dbapi.get_node_uuids_by_ids([node1.id, node2.id, 42])
+        self.assertEqual({node1.id: node1.uuid, node2.id: node2.uuid}, res)
+
+    def test_get_node_uuids_by_ids_empty(self):
+        self.assertEqual({}, self.dbapi.get_node_uuids_by_ids([]))
+
+    def test_get_node_watermark(self):
+        self.assertEqual((0, None), self.dbapi.get_node_watermark())
+        node = utils.create_test_node()
+        count, latest = self.dbapi.get_node_watermark()
+        self.assertEqual(1, count)
+        self.assertEqual(node.created_at, latest)
+        node = self.dbapi.update_node(node.id, {'power_state': 'power off'})
+        self.assertEqual((1, node.updated_at),
+                         self.dbapi.get_node_watermark())
+        trait = self.dbapi.add_node_trait(node.id, 'CUSTOM_1', '1.0')
+        self.assertEqual((2, trait.created_at),
+                         self.dbapi.get_node_watermark())
+        self.dbapi.unset_node_traits(node.id)
+        self.assertEqual((1, node.updated_at),
+                         self.dbapi.get_node_watermark())
+
+    def test_get_node_by_uuid_with_filters(self):
+        node = utils.create_test_node(provision_state=states.ACTIVE)
+        res = self.dbapi.get_node_by_uuid(
+            node.uuid, filters={'maintenance': False,
+                                'provision_state_not_in': [states.DEPLOYWAIT]})
+        self.assertEqual(node.id, res.id)
+
+    def test_get_node_by_id_with_filters_not_matching(self):
+        node = utils.create_test_node(maintenance=True)
+        self.assertRaises(exception.NodePreconditionFailed,
+                          self.dbapi.get_node_by_id, node.id,
+                          filters={'maintenance': False})
+
+    def test_get_node_by_uuid_with_filters_not_found(self):
+        self.assertRaises(exception.NodeNotFound,
+                          self.dbapi.get_node_by_uuid,
+                          '12345678-9999-0000-aaaa-123456789012',
+                          filters={'maintenance': False})
+
+    def test_get_node_by_uuid_with_filters_child_node(self):
+        parent = utils.create_test_node()
+        child = utils.create_test_node(uuid=uuidutils.generate_uuid(),
+                                       parent_node=parent.uuid)
+        res = self.dbapi.get_node_by_uuid(child.uuid,
+                                          filters={'maintenance': False})
+        self.assertEqual(child.id, res.id)
+
     def test_get_node_by_name(self):
         node = utils.create_test_node()
         self.dbapi.set_node_tags(node.id, ['tag1', 'tag2'])
@@ -133,6 +188,35 @@ class DbNodeTestCase(base.DbTestCase):
         res = [i[0] for i in self.dbapi.get_nodeinfo_list()]
         self.assertEqual(sorted(res), sorted(node_id_list))
 
+    def test_iter_nodeinfo(self):
+        nodes = [utils.create_test_node(uuid=uuidutils.generate_uuid())
+                 for _ in range(5)]
+        with mock.patch.object(dbapi, '_session_for_read',
+                               wraps=dbapi._session_for_read) as mock_read:
+            res = list(self.dbapi.iter_nodeinfo(columns=['uuid'],
+                                                chunk_size=2))
+        self.assertEqual([(n.uuid,) for n in nodes], res)
+        # Each chunk is fetched by its own query
+        self.assertEqual(3, mock_read.call_count)
+
+    def test_iter_nodeinfo_sort_limit(self):
+        nodes = [utils.create_test_node(uuid=uuidutils.generate_uuid(),
+                                        name=name)
+                 for name in ('node-c', None, 'node-a', 'node-b')]
+        res = list(self.dbapi.iter_nodeinfo(columns=['id'], sort_key='name',
+                                            sort_dir='desc', limit=3,
+                                            chunk_size=2))
+        self.assertEqual([(nodes[i].id,) for i in (0, 3, 2)], res)
+
+    def test_iter_nodeinfo_driver_in(self):
+        node = utils.create_test_node(uuid=uuidutils.generate_uuid(),
+                                      driver='driver-a')
+        utils.create_test_node(uuid=uuidutils.generate_uuid(),
+                               driver='driver-b')
+        res = list(self.dbapi.iter_nodeinfo(
+            filters={'driver_in': ['driver-a', 'driver-c']}))
+        self.assertEqual([(node.id,)], res)
+
     def test_get_nodeinfo_list_with_cols(self):
         uuids = {}
         extras = {}
@@ -265,6 +349,11 @@ class DbNodeTestCase(base.DbTestCase):
             filters={'provision_state_in': [states.ACTIVE, states.DEPLOYING]})
         self.assertEqual([node1.id], [r[0] for r in res])
 
+        res = self.dbapi.get_nodeinfo_list(
+            filters={'provision_state_not_in': [states.AVAILABLE,
+                                                states.DEPLOYWAIT]})
+        self.assertEqual([node1.id], [r[0] for r in res])
+
     @mock.patch.object(timeutils, 'utcnow', autospec=True)
     def test_get_nodeinfo_list_inspection(self, mock_utcnow):
         past = datetime.datetime(2000, 1, 1, 0, 0)
@@ -304,6 +393,45 @@ class DbNodeTestCase(base.DbTestCase):
                                                     'World!'})
         self.assertEqual([node2.id], [r[0] for r in res])
 
+    def test_get_nodeinfo_list_traits(self):
+        node1 = utils.create_test_node(uuid=uuidutils.generate_uuid())
+        node2 = utils.create_test_node(uuid=uuidutils.generate_uuid())
+        utils.create_test_node(uuid=uuidutils.generate_uuid())
+        utils.create_test_node_traits(['tr1', 'tr2'], node_id=node1.id)
+        utils.create_test_node_traits(['tr2', 'tr3'], node_id=node2.id)
+
+        res = self.dbapi.get_nodeinfo_list(filters={'traits': ['tr2']})
+        self.assertEqual(sorted([node1.id, node2.id]),
+                         sorted(r[0] for r in res))
+
+        res = self.dbapi.get_nodeinfo_list(
+            filters={'traits': ['tr2', 'tr3']})
+        self.assertEqual([node2.id], [r[0] for r in res])
+
+        res = self.dbapi.get_nodeinfo_list(
+            filters={'traits': ['tr1', 'tr3']})
+        self.assertEqual([], res)
+
+    def test_get_nodeinfo_list_name(self):
+        node = utils.create_test_node(uuid=uuidutils.generate_uuid(),
+                                      name='node-1')
+        utils.create_test_node(uuid=uuidutils.generate_uuid(), name='node-2')
+        res = self.dbapi.get_nodeinfo_list(filters={'name': 'node-1'})
+        self.assertEqual([node.id], [r[0] for r in res])
+
+    def test_get_nodeinfo_sample(self):
+        ids = [utils.create_test_node(uuid=uuidutils.generate_uuid(),
+                                      driver='driver-%d' % (i % 2)).id
+               for i in range(6)]
+        res = self.dbapi.get_nodeinfo_sample(columns=['id', 'driver'],
+                                             filters={'driver': 'driver-0'})
+        self.assertEqual(sorted(ids[::2]), sorted(r[0] for r in res))
+        self.assertEqual({'driver-0'}, {r[1] for r in res})
+
+        res = self.dbapi.get_nodeinfo_sample(limit=4)
+        self.assertEqual(4, len(res))
+        self.assertTrue({r[0] for r in res}.issubset(ids))
+
     def test_get_node_list(self):
         uuids = []
         for i in range(1, 6):
@@ -330,6 +458,59 @@ class DbNodeTestCase(base.DbTestCase):
             self.assertEqual([], r.tags)
             self.assertEqual(2, len(r.traits))
 
+    def _paginate_nodes(self, use_uuid, **kwargs):
+        pages = []
+        marker = None
+        while True:
+            page = self.dbapi.get_node_list(limit=2, marker=marker, **kwargs)
+            if not page:
+                return pages
+            pages.append([n.uuid for n in page])
+            marker = page[-1].uuid if use_uuid else page[-1]
+
+    def test_get_node_list_paginate(self):
+        uuids = [utils.create_test_node(uuid=uuidutils.generate_uuid()).uuid
+                 for _ in range(5)]
+        for use_uuid in (True, False):
+            self.assertEqual([uuids[0:2], uuids[2:4], uuids[4:]],
+                             self._paginate_nodes(use_uuid))
+            self.assertEqual([uuids[4:2:-1], uuids[2:0:-1], uuids[:1]],
+                             self._paginate_nodes(use_uuid, sort_dir='desc'))
+
+    def test_get_node_list_paginate_nullable_sort_key(self):
+        nodes = {}
+        for name in (None, 'node-b', None, 'node-a', 'node-c'):
+            node = utils.create_test_node(uuid=uuidutils.generate_uuid(),
+                                          name=name)
+            nodes.setdefault(name, []).append(node.uuid)
+        # NULL values are ordered first
+        expected = (nodes[None] + nodes['node-a'] + nodes['node-b']
+                    + nodes['node-c'])
+        for use_uuid in (True, False):
+            pages = self._paginate_nodes(use_uuid, sort_key='name')
+            self.assertEqual(expected, sum(pages, []))
+            self.assertEqual(3, len(pages))
+            pages = self._paginate_nodes(use_uuid, sort_key='name',
+                                         sort_dir='desc')
+            self.assertEqual(expected[::-1], sum(pages, []))
+
+    def test_get_node_list_paginate_unknown_marker(self):
+        utils.create_test_node()
+        self.assertEqual(
+            [], self.dbapi.get_node_list(marker=uuidutils.generate_uuid()))
+
+    def test_get_node_list_paginate_unknown_marker_nullable_sort_key(self):
+        utils.create_test_node(name='node-a')
+        for sort_dir in ('asc', 'desc'):
+            self.assertEqual(
+                [], self.dbapi.get_node_list(marker=uuidutils.generate_uuid(),
+                                             sort_key='name',
+                                             sort_dir=sort_dir))
+
+    def test_get_node_list_invalid_sort_key(self):
+        self.assertRaises(exception.InvalidParameterValue,
+                          self.dbapi.get_node_list, sort_key='traits')
+
     def test_get_node_list_with_filters(self):
         ch1 = utils.create_test_chassis(uuid=uuidutils.generate_uuid())
         ch2 = utils.create_test_chassis(uuid=uuidutils.generate_uuid())
@@ -413,6 +594,10 @@ class DbNodeTestCase(base.DbTestCase):
         res = self.dbapi.get_node_list(filters={'with_power_state': False})
         self.assertEqual([node1.id], [r.id for r in res])
 
+        res = self.dbapi.get_node_list(
+            filters={'with_target_power_state': False})
+        self.assertCountEqual([node1.id, node2.id], [r.id for r in res])
+
         # ensure unknown filters explode
         filters = {'bad_filter': 'foo'}
         self.assertRaisesRegex(ValueError,
@@ -853,6 +1038,72 @@ class DbNodeTestCase(base.DbTestCase):
         res = self.dbapi.update_node(node.id, {'extra': new_extra})
         self.assertEqual([trait.trait], [t.trait for t in res.traits])
 
+    def test_update_node_statements(self):
+        node = utils.create_test_node()
+        utils.create_test_node_trait(node_id=node.id)
+        statements = self.record_statements()
+
+        res = self.dbapi.update_node(node.id, {'extra': {'foo': 'bar'}},
+                                     load_relationships=False)
+        self.assertEqual({'foo': 'bar'}, res.extra)
+        self.assertEqual(1, len(statements), statements)
+        self.assertTrue(statements[0].startswith('UPDATE nodes'))
+        self.assertIn('RETURNING', statements[0])
+
+    def test_update_node_statements_relationships(self):
+        node = utils.create_test_node()
+        trait = utils.create_test_node_trait(node_id=node.id)
+        statements = self.record_statements()
+
+        res = self.dbapi.update_node(node.id, {'extra': {'foo': 'bar'}})
+        self.assertEqual([trait.trait], [t.trait for t in res.traits])
+        # The update, then the tags and the traits
+        self.assertEqual(3, len(statements), statements)
+
+    def test_update_node_without_returning(self):
+        node = utils.create_test_node()
+        engine = enginefacade.writer.get_engine()
+        statements = self.record_statements()
+
+        with mock.patch.object(engine.dialect, 'update_returning', False):
+            res = self.dbapi.update_node(node.uuid,
+                                         {'extra': {'foo': 'bar'}},
+                                         load_relationships=False)
+        self.assertEqual({'foo': 'bar'}, res.extra)
+        self.assertEqual(2, len(statements), statements)
+        self.assertNotIn('RETURNING', statements[0])
+        self.assertTrue(statements[1].startswith('SELECT'))
+
+    def test_update_node_without_returning_not_found(self):
+        engine = enginefacade.writer.get_engine()
+        with mock.patch.object(engine.dialect, 'update_returning', False):
+            self.assertRaises(exception.NodeNotFound, self.dbapi.update_node,
+                              uuidutils.generate_uuid(), {'extra': {}})
+
+    def test_update_node_no_values(self):
+        node = utils.create_test_node()
+        statements = self.record_statements()
+
+        res = self.dbapi.update_node(node.id, {}, load_relationships=False)
+        self.assertEqual(node.updated_at, res.updated_at)
+        self.assertEqual(1, len(statements), statements)
+        self.assertTrue(statements[0].startswith('SELECT'))
+
+    def test_get_node_serialized_json(self):
+        node = utils.create_test_node(driver_info={'foo': 'bar'})
+        res = self.dbapi.get_node_by_uuid(node.uuid)
+        self.assertEqual({'foo': 'bar'}, res.driver_info)
+        self.assertEqual('{"foo": "bar"}', res.driver_info.serialized)
+
+    def test_get_node_list_undecoded_json(self):
+        utils.create_test_node(driver_info={'foo': 'bar'})
+        res = self.dbapi.get_node_list(decode_json=False)
+        self.assertEqual('{"foo": "bar"}', res[0].driver_info)
+        self.assertEqual('{"foo": "bar"}', res[0].driver_info.serialized)
+        # Only while listing
+        res = self.dbapi.get_node_list()
+        self.assertEqual({'foo': 'bar'}, res[0].driver_info)
+
     def test_update_node_not_found(self):
         node_uuid = uuidutils.generate_uuid()
         new_extra = {'foo': 'bar'}
@@ -1039,6 +1290,28 @@ class DbNodeTestCase(base.DbTestCase):
         res = self.dbapi.get_node_by_uuid(uuid)
         self.assertEqual(r1, res.reservation)
 
+    def test_reserve_node_with_filters(self):
+        node = utils.create_test_node(target_power_state=None)
+        res = self.dbapi.reserve_node('fake-reservation', node.uuid,
+                                      filters={'with_target_power_state':
+                                               False})
+        self.assertEqual('fake-reservation', res.reservation)
+
+    def test_reserve_node_with_filters_not_matching(self):
+        node = utils.create_test_node(target_power_state=states.POWER_ON)
+        self.assertRaises(exception.NodePreconditionFailed,
+                          self.dbapi.reserve_node, 'fake-reservation',
+                          node.uuid,
+                          filters={'with_target_power_state': False})
+        res = self.dbapi.get_node_by_uuid(node.uuid)
+        self.assertIsNone(res.reservation)
+
+    def test_reserve_node_with_filters_locked(self):
+        node = utils.create_test_node(reservation='other-host')
+        self.assertRaises(exception.NodeLocked,
+                          self.dbapi.reserve_node, 'fake-reservation',
+                          node.uuid, filters={'maintenance': False})
+
     def test_reserve_node_reads_reservation_once_sqlite(self):
         node = utils.create_test_node()
         uuid = node.uuid
@@ -1051,6 +1324,44 @@ class DbNodeTestCase(base.DbTestCase):
             self.dbapi.reserve_node(r1, uuid)
             mock_get_res.assert_called_once_with(mock.ANY, node.uuid)
 
+    @mock.patch.object(dbapi, '_reservation_lock', autospec=True)
+    @mock.patch.object(dbapi.METRICS, 'send_timer', autospec=True)
+    def test_reserve_node_lock_wait_metric(self, mock_timer, mock_lock):
+        node = utils.create_test_node()
+        self.dbapi.reserve_node('fake-reservation', node.uuid)
+        mock_lock.assert_called_once_with(node.id)
+        mock_lock.return_value.__enter__.assert_called_once_with()
+        mock_timer.assert_called_once_with('Connection.ReserveNodeLockWait',
+                                           mock.ANY)
+
+    def _lock_in_thread(self, node_id):
+        acquired = threading.Event()
+
+        def _lock():
+            with dbapi._reservation_lock(node_id):
+                acquired.set()
+
+        thread = threading.Thread(target=_lock)
+        thread.start()
+        self.addCleanup(thread.join)
+        return acquired
+
+    @mock.patch.object(common_utils, 'is_ironic_using_sqlite', autospec=True)
+    def test_reservation_lock_striped(self, is_sqlite_mock):
+        is_sqlite_mock.return_value = False
+        with dbapi._reservation_lock(1):
+            # Another node can be reserved in parallel, the same node cannot
+            self.assertTrue(self._lock_in_thread(2).wait(5))
+            self.assertFalse(self._lock_in_thread(1).wait(0.1))
+            self.assertFalse(self._lock_in_thread(
+                1 + dbapi.RESERVATION_LOCK_STRIPES).wait(0.1))
+
+    @mock.patch.object(common_utils, 'is_ironic_using_sqlite', autospec=True)
+    def test_reservation_lock_sqlite(self, is_sqlite_mock):
+        is_sqlite_mock.return_value = True
+        with dbapi._reservation_lock(1):
+            self.assertFalse(self._lock_in_thread(2).wait(0.1))
+
     @mock.patch.object(common_utils, 'is_ironic_using_sqlite', autospec=True)
     def test_reserve_node_reads_reservation_twice(self, is_sqlite_mock):
         # Ensure we re-query for who holds the reservation *when* lock fails
@@ -66,6 +66,18 @@ class DbportgroupTestCase(base.DbTestCase):
                           self.dbapi.get_portgroup_by_uuid,
                           'EEEEEEEE-EEEE-EEEE-EEEE-EEEEEEEEEEEE')
 
+    def test_get_portgroup_uuids_by_ids(self):
+        portgroup = db_utils.create_test_portgroup(
+            uuid=uuidutils.generate_uuid(), name='pg2',
+            address='52:54:00:cf:2d:32', node_id=self.node.id)
+        res = self.dbapi.get_portgroup_uuids_by_ids(
+            [self.portgroup.id, portgroup.id, 42])
+        self.assertEqual({self.portgroup.id: self.portgroup.uuid,
+                          portgroup.id: portgroup.uuid}, res)
+
+    def test_get_portgroup_uuids_by_ids_empty(self):
+        self.assertEqual({}, self.dbapi.get_portgroup_uuids_by_ids([]))
+
     def test_get_portgroup_by_address(self):
         res = self.dbapi.get_portgroup_by_address(self.portgroup.address)
         self.assertEqual(self.portgroup.id, res.id)
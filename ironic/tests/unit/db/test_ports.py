@@ -90,6 +90,17 @@ class DbPortTestCase(base.DbTestCase):
         res = self.dbapi.get_port_by_name(self.port.name)
         self.assertEqual(self.port.id, res.id)
 
+    def test_get_port_watermark(self):
+        count, latest = self.dbapi.get_port_watermark()
+        self.assertEqual(3, count)
+        self.assertEqual(self.port.created_at, latest)
+        node = self.dbapi.update_node(self.node.id, {'owner': '67890'})
+        self.assertEqual((3, node.updated_at),
+                         self.dbapi.get_port_watermark())
+        self.dbapi.destroy_port(self.port.id)
+        self.assertEqual((2, node.updated_at),
+                         self.dbapi.get_port_watermark())
+
     def test_get_port_list(self):
         uuids = []
         for i in range(1, 6):
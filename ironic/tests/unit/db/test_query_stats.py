@@ -0,0 +1,174 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Tests for collecting database query statistics."""
+
+import threading
+from unittest import mock
+
+from oslo_utils import uuidutils
+
+from ironic.db import query_stats
+from ironic import objects
+from ironic.tests import base
+from ironic.tests.unit.db import base as db_base
+from ironic.tests.unit.db import utils as db_utils
+
+
+class StatementShapeTestCase(base.TestCase):
+
+    def test_in_clause(self):
+        self.assertEqual(
+            query_stats.statement_shape('SELECT a FROM t WHERE b IN (?)'),
+            query_stats.statement_shape(
+                'SELECT a FROM t WHERE b IN (?, ?, ?)'))
+
+    def test_named_parameters(self):
+        self.assertEqual(
+            'SELECT a FROM t WHERE b IN (?) AND c = %(c_1)s',
+            query_stats.statement_shape(
+                'SELECT a FROM t WHERE b IN (%(b_1_1)s, %(b_1_2)s) '
+                'AND c = %(c_1)s'))
+
+    def test_function_call_kept(self):
+        statement = 'SELECT count(t.id) AS count_1 FROM t'
+        self.assertEqual(statement, query_stats.statement_shape(statement))
+
+
+@mock.patch.object(query_stats.METRICS, 'send_timer', autospec=True)
+@mock.patch.object(query_stats.METRICS, 'send_counter', autospec=True)
+class QueryStatsTestCase(db_base.DbTestCase):
+
+    def setUp(self):
+        super(QueryStatsTestCase, self).setUp()
+        self.config(collect_query_stats=True, group='database')
+        self.nodes = [db_utils.create_test_node(
+            uuid=uuidutils.generate_uuid()) for _ in range(3)]
+
+    def test_disabled(self, mock_counter, mock_timer):
+        self.config(collect_query_stats=False, group='database')
+        with query_stats.collect('Test') as stats:
+            self.dbapi.get_nodeinfo_list()
+        self.assertIsNone(stats)
+        self.assertFalse(mock_counter.called)
+        self.assertFalse(mock_timer.called)
+
+    def test_collect(self, mock_counter, mock_timer):
+        with query_stats.collect('Test') as stats:
+            self.dbapi.get_nodeinfo_list()
+        self.assertEqual(1, stats.queries)
+        mock_counter.assert_has_calls([mock.call('Test.Queries', 1),
+                                       mock.call('Test.Rows', mock.ANY)])
+        mock_timer.assert_called_once_with('Test.QueryTime', mock.ANY)
+        # Statements executed after the end are not accounted for
+        self.dbapi.get_nodeinfo_list()
+        self.assertEqual(1, stats.queries)
+
+    def test_collect_nested(self, mock_counter, mock_timer):
+        with query_stats.collect('Outer') as outer:
+            self.dbapi.get_nodeinfo_list()
+            with query_stats.collect('Inner') as inner:
+                self.dbapi.get_nodeinfo_list()
+        self.assertEqual(2, outer.queries)
+        self.assertEqual(1, inner.queries)
+
+    def test_collect_other_thread(self, mock_counter, mock_timer):
+        with query_stats.collect('Test') as stats:
+            thread = threading.Thread(target=self.dbapi.get_nodeinfo_list)
+            thread.start()
+            thread.join()
+        self.assertEqual(0, stats.queries)
+
+    def test_stop_other_thread(self, mock_counter, mock_timer):
+        stats = query_stats.start('Test')
+        self.addCleanup(query_stats.deactivate, stats)
+        thread = threading.Thread(target=query_stats.stop, args=(stats,))
+        thread.start()
+        thread.join()
+        self.assertFalse(mock_counter.called)
+        self.dbapi.get_nodeinfo_list()
+        self.assertEqual(1, stats.queries)
+
+    def test_stop_twice(self, mock_counter, mock_timer):
+        stats = query_stats.start('Test')
+        query_stats.stop(stats)
+        query_stats.stop(stats)
+        mock_timer.assert_called_once_with('Test.QueryTime', mock.ANY)
+
+    @mock.patch.object(query_stats.LOG, 'warning', autospec=True)
+    def test_repeated_queries(self, mock_log, mock_counter, mock_timer):
+        self.config(repeated_query_threshold=3, group='database')
+        with query_stats.collect('Test') as stats:
+            for node in self.nodes:
+                self.dbapi.get_nodeinfo_list(filters={'uuid': node.uuid})
+            self.dbapi.get_nodeinfo_list()
+        self.assertEqual(4, stats.queries)
+        mock_log.assert_called_once_with(
+            mock.ANY, {'name': 'Test', 'count': 3, 'query': mock.ANY})
+
+    @mock.patch.object(query_stats.LOG, 'warning', autospec=True)
+    def test_repeated_queries_relationships(self, mock_log, mock_counter,
+                                            mock_timer):
+        self.config(repeated_query_threshold=3, group='database')
+        with query_stats.collect('Test'):
+            for node in self.nodes:
+                self.dbapi.get_node_by_id(node.id)
+        # The node, its tags and its traits are loaded for every node
+        self.assertEqual(3, mock_log.call_count)
+
+    @mock.patch.object(query_stats.LOG, 'warning', autospec=True)
+    def test_repeated_queries_disabled(self, mock_log, mock_counter,
+                                       mock_timer):
+        with query_stats.collect('Test'):
+            for node in self.nodes:
+                self.dbapi.get_node_by_id(node.id)
+        self.assertFalse(mock_log.called)
+
+
+class QueryBudgetTestCase(db_base.DbTestCase):
+    """Number of queries of the frequent database operations."""
+
+    def setUp(self):
+        super(QueryBudgetTestCase, self).setUp()
+        for i in range(10):
+            node = db_utils.create_test_node(uuid=uuidutils.generate_uuid(),
+                                             name='node-%d' % i)
+            self.dbapi.set_node_traits(node.id, ['CUSTOM_1', 'CUSTOM_2'],
+                                       '1.0')
+            self.dbapi.set_node_tags(node.id, ['tag1'])
+
+    def test_node_list(self):
+        # The nodes, their tags and their traits
+        with self.assertQueryBudget(3):
+            nodes = objects.Node.list(self.context)
+            for node in nodes:
+                node.traits
+
+    def test_node_list_filtered(self):
+        with self.assertQueryBudget(3):
+            self.dbapi.get_node_list(
+                filters={'provision_state': 'available'}, limit=5)
+
+    def test_nodeinfo_list(self):
+        with self.assertQueryBudget(1):
+            self.dbapi.get_nodeinfo_list(
+                columns=['id', 'uuid', 'driver'],
+                filters={'reserved': False, 'maintenance': False})
+
+    def test_budget_exceeded(self):
+        nodes = self.dbapi.get_node_list()
+        self.assertRaises(AssertionError, self._get_nodes, nodes, 5)
+
+    def _get_nodes(self, nodes, budget):
+        with self.assertQueryBudget(budget):
+            for node in nodes:
+                self.dbapi.get_node_by_id(node.id)
@@ -24,6 +24,7 @@ import requests
 import sushy
 
 from ironic.common import exception
+from ironic.drivers.modules import bmc_limiter
 from ironic.drivers.modules.redfish import utils as redfish_utils
 from ironic.tests.unit.db import base as db_base
 from ironic.tests.unit.db import utils as db_utils
@@ -400,6 +401,26 @@ class RedfishUtilsAuthTestCase(db_base.DbTestCase):
             auth=mock_basic_auth.return_value
         )
 
+    @mock.patch.object(sushy, 'Sushy', autospec=True)
+    @mock.patch('ironic.drivers.modules.redfish.utils.'
+                'SessionCache._sessions', {})
+    def test_bmc_limiter_connector(self, mock_sushy):
+        self.config(bmc_max_concurrent_requests=2, group='redfish')
+        redfish_utils.get_system(self.node)
+        connector = mock_sushy.call_args[1]['connector']
+        self.assertIsInstance(connector, redfish_utils.LimitedConnector)
+        self.assertEqual(self.parsed_driver_info['address'],
+                         connector._address)
+        self.assertEqual(10, connector._server_side_retries)
+
+    @mock.patch.object(bmc_limiter, 'limit', autospec=True)
+    @mock.patch.object(sushy.connector.Connector, '_op', autospec=True)
+    def test_limited_connector_op(self, mock_op, mock_limit):
+        connector = redfish_utils.LimitedConnector('https://example.com')
+        connector._op('GET', '/redfish/v1')
+        mock_limit.assert_called_once_with('redfish', 'https://example.com')
+        mock_op.assert_called_once_with(connector, 'GET', '/redfish/v1')
+
 
 class RedfishUtilsSystemTestCase(db_base.DbTestCase):
 
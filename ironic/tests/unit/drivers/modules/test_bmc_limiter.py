@@ -0,0 +1,115 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import threading
+import time
+from unittest import mock
+
+from ironic.drivers.modules import bmc_limiter
+from ironic.tests import base
+
+
+class NormalizeAddressTestCase(base.TestCase):
+
+    def test_normalize(self):
+        for address in ('10.0.0.1', '10.0.0.1:623', 'https://10.0.0.1',
+                        'HTTPS://10.0.0.1:8443/redfish/v1', ' 10.0.0.1 '):
+            self.assertEqual('10.0.0.1',
+                             bmc_limiter._normalize_address(address))
+
+    def test_normalize_ipv6(self):
+        for address in ('[fd00::1]', 'https://[FD00::1]:443/', 'fd00::1'):
+            self.assertEqual('fd00::1',
+                             bmc_limiter._normalize_address(address))
+
+    def test_normalize_hostname(self):
+        self.assertEqual('bmc.example.com',
+                         bmc_limiter._normalize_address('BMC.example.com'))
+
+
+@mock.patch.object(bmc_limiter, 'METRICS', autospec=True)
+class LimitTestCase(base.TestCase):
+
+    def setUp(self):
+        super(LimitTestCase, self).setUp()
+        self.addCleanup(bmc_limiter._LIMITERS.clear)
+
+    def test_disabled(self, mock_metrics):
+        with bmc_limiter.limit('ipmi', '10.0.0.1'):
+            pass
+        self.assertFalse(bmc_limiter.enabled('ipmi'))
+        self.assertEqual({}, bmc_limiter._LIMITERS)
+        self.assertFalse(mock_metrics.send_timer.called)
+
+    def test_max_concurrent(self, mock_metrics):
+        self.config(bmc_max_concurrent_requests=1, group='ipmi')
+        entered = threading.Event()
+        done = []
+
+        def _request():
+            entered.set()
+            with bmc_limiter.limit('ipmi', '10.0.0.1:623'):
+                done.append(True)
+
+        with bmc_limiter.limit('ipmi', '10.0.0.1'):
+            thread = threading.Thread(target=_request)
+            thread.start()
+            entered.wait(5)
+            time.sleep(0.1)
+            # Blocked on the same BMC, but not on another one
+            self.assertEqual([], done)
+            with bmc_limiter.limit('ipmi', '10.0.0.2'):
+                pass
+        thread.join(5)
+        self.assertEqual([True], done)
+        mock_metrics.send_timer.assert_called_once_with(
+            'BMCLimiter.ipmi.ThrottledWait', mock.ANY)
+
+    def test_nested(self, mock_metrics):
+        self.config(bmc_max_concurrent_requests=1, group='redfish')
+        with bmc_limiter.limit('redfish', 'https://bmc'):
+            with bmc_limiter.limit('redfish', 'https://bmc/redfish/v1'):
+                pass
+        with bmc_limiter.limit('redfish', 'https://bmc'):
+            pass
+        self.assertFalse(mock_metrics.send_timer.called)
+
+    def test_groups(self, mock_metrics):
+        self.config(bmc_max_concurrent_requests=1, group='snmp')
+        with bmc_limiter.limit('snmp', '10.0.0.1'):
+            with bmc_limiter.limit('ipmi', '10.0.0.1'):
+                pass
+        self.assertEqual(1, len(bmc_limiter._LIMITERS))
+
+    @mock.patch.object(time, 'sleep', autospec=True)
+    def test_rate(self, mock_sleep, mock_metrics):
+        self.config(bmc_requests_per_second=2, bmc_requests_burst=2,
+                    group='snmp')
+        for _ in range(3):
+            with bmc_limiter.limit('snmp', '10.0.0.1'):
+                pass
+        # The burst is not throttled, the third request waits for a token
+        mock_sleep.assert_called_once_with(mock.ANY)
+        self.assertAlmostEqual(0.5, mock_sleep.call_args[0][0], delta=0.05)
+        mock_metrics.send_timer.assert_called_once_with(
+            'BMCLimiter.snmp.ThrottledWait', mock.ANY)
+
+    def test_release_on_error(self, mock_metrics):
+        self.config(bmc_max_concurrent_requests=1, group='ipmi')
+
+        def _request():
+            with bmc_limiter.limit('ipmi', '10.0.0.1'):
+                raise RuntimeError()
+
+        self.assertRaises(RuntimeError, _request)
+        self.assertRaises(RuntimeError, _request)
+        self.assertFalse(mock_metrics.send_timer.called)
@@ -42,6 +42,7 @@ from ironic.common import states
 from ironic.common import utils
 from ironic.conductor import task_manager
 import ironic.conf
+from ironic.drivers.modules import bmc_limiter
 from ironic.drivers.modules import boot_mode_utils
 from ironic.drivers.modules import console_utils
 from ironic.drivers.modules import ipmitool as ipmi
@@ -940,6 +941,23 @@ class IPMIToolPrivateMethodTestCase(
         mock_exec.assert_called_once_with(*args)
         self.assertFalse(self.mock_sleep.called)
 
+    @mock.patch.object(bmc_limiter, 'limit', autospec=True)
+    @mock.patch.object(ipmi, '_is_option_supported', autospec=True)
+    @mock.patch.object(ipmi, '_prepare_ipmi_password',
+                       _prepare_ipmi_password_stub)
+    @mock.patch.object(utils, 'execute', autospec=True)
+    def test__exec_ipmitool_bmc_limiter(self, mock_exec, mock_support,
+                                        mock_limit):
+        ipmi.LAST_CMD_TIME = {}
+        mock_support.return_value = False
+        mock_exec.return_value = (None, None)
+
+        ipmi._exec_ipmitool(self.info, 'A B C')
+
+        mock_limit.assert_called_once_with('ipmi', self.info['address'])
+        self.assertTrue(mock_limit.return_value.__enter__.called)
+        self.assertTrue(mock_exec.called)
+
     @mock.patch.object(ipmi, '_is_option_supported', autospec=True)
     @mock.patch.object(ipmi, '_prepare_ipmi_password',
                        _prepare_ipmi_password_stub)
@@ -26,6 +26,7 @@ from pysnmp import hlapi as pysnmp
 from ironic.common import exception
 from ironic.common import states
 from ironic.conductor import task_manager
+from ironic.drivers.modules import bmc_limiter
 from ironic.drivers.modules import snmp
 from ironic.drivers.modules.snmp import SNMPDriverAuto
 from ironic.tests import base
@@ -175,6 +176,20 @@ class SNMPClientTestCase(base.TestCase):
         self.assertEqual(var_bind[1], val)
         self.assertEqual(1, mock_getcmd.call_count)
 
+    @mock.patch.object(bmc_limiter, 'limit', autospec=True)
+    @mock.patch.object(pysnmp, 'getCmd', autospec=True)
+    @mock.patch.object(snmp.SNMPClient, '_get_transport', autospec=True)
+    @mock.patch.object(snmp.SNMPClient, '_get_context', autospec=True)
+    @mock.patch.object(snmp.SNMPClient, '_get_auth', autospec=True)
+    def test_get_bmc_limiter(self, mock_auth, mock_context, mock_transport,
+                             mock_getcmd, mock_limit):
+        var_bind = (self.oid, self.value)
+        mock_getcmd.return_value = iter([("", None, 0, [var_bind])])
+        client = snmp.SNMPClient(self.address, self.port, snmp.SNMP_V3)
+        client.get(self.oid)
+        mock_limit.assert_called_once_with('snmp', self.address)
+        self.assertTrue(mock_limit.return_value.__enter__.called)
+
     @mock.patch.object(pysnmp, 'nextCmd', autospec=True)
     @mock.patch.object(snmp.SNMPClient, '_get_transport', autospec=True)
     @mock.patch.object(snmp.SNMPClient, '_get_context', autospec=True)
@@ -14,6 +14,7 @@
 #    under the License.
 
 import datetime
+import json
 from unittest import mock
 
 from oslo_serialization import jsonutils
@@ -116,7 +117,7 @@ class TestNodeObject(db_base.DbTestCase, obj_utils.SchemasTestMixIn):
 
             node = objects.Node.get(self.context, node_id)
 
-            mock_get_node.assert_called_once_with(node_id)
+            mock_get_node.assert_called_once_with(node_id, filters=None)
             self.assertEqual(self.context, node._context)
 
     def test_get_by_uuid(self):
@@ -127,7 +128,7 @@ class TestNodeObject(db_base.DbTestCase, obj_utils.SchemasTestMixIn):
 
             node = objects.Node.get(self.context, uuid)
 
-            mock_get_node.assert_called_once_with(uuid)
+            mock_get_node.assert_called_once_with(uuid, filters=None)
             self.assertEqual(self.context, node._context)
 
     def test_get_bad_id_and_uuid(self):
@@ -205,11 +206,12 @@ class TestNodeObject(db_base.DbTestCase, obj_utils.SchemasTestMixIn):
                 n.driver = "fake-driver"
                 n.save()
 
-                mock_get_node.assert_called_once_with(uuid)
+                mock_get_node.assert_called_once_with(uuid, filters=None)
                 mock_update_node.assert_called_once_with(
                     uuid, {'properties': {"fake": "property"},
                            'driver': 'fake-driver',
-                           'version': objects.Node.VERSION})
+                           'version': objects.Node.VERSION},
+                    load_relationships=False)
                 self.assertEqual(self.context, n._context)
                 res_updated_at = (n.updated_at).replace(tzinfo=None)
                 self.assertEqual(test_time, res_updated_at)
@@ -252,7 +254,7 @@ class TestNodeObject(db_base.DbTestCase, obj_utils.SchemasTestMixIn):
                         uuid)],
                     log_mock.mock_calls)
 
-                mock_get_node.assert_called_once_with(uuid)
+                mock_get_node.assert_called_once_with(uuid, filters=None)
                 mock_update_node.assert_called_once_with(
                     uuid,
                     {
@@ -265,7 +267,8 @@ class TestNodeObject(db_base.DbTestCase, obj_utils.SchemasTestMixIn):
                         'last_error':
                             last_error[
                             0:node_objects.CONF.log_in_db_max_size]
-                    }
+                    },
+                    load_relationships=False
                 )
                 self.assertEqual(self.context, n._context)
                 res_updated_at = (n.updated_at).replace(tzinfo=None)
@@ -292,17 +295,89 @@ class TestNodeObject(db_base.DbTestCase, obj_utils.SchemasTestMixIn):
                 n.driver_internal_info = {}
                 n.save()
 
-                mock_get_node.assert_called_once_with(uuid)
+                mock_get_node.assert_called_once_with(uuid, filters=None)
                 mock_update_node.assert_called_once_with(
                     uuid, {'properties': {"fake": "property"},
                            'driver': 'fake-driver',
                            'driver_internal_info': {},
                            'extra': {'test': 123},
-                           'version': objects.Node.VERSION})
+                           'version': objects.Node.VERSION},
+                    load_relationships=False)
                 self.assertEqual(self.context, n._context)
                 res_updated_at = n.updated_at.replace(tzinfo=None)
                 self.assertEqual(test_time, res_updated_at)
 
+    def test_save_statements(self):
+        node = obj_utils.create_test_node(self.context)
+        trait = db_utils.create_test_node_trait(node_id=node.id)
+        n = objects.Node.get(self.context, node.uuid)
+        statements = self.record_statements()
+        n.extra = {'foo': 'bar'}
+        n.save()
+        # A single UPDATE ... RETURNING, the traits are not reloaded
+        self.assertEqual(1, len(statements), statements)
+        self.assertEqual({'foo': 'bar'}, n.extra)
+        self.assertEqual([trait.trait], n.traits.get_trait_names())
+
+    def test_save_without_traits(self):
+        node = obj_utils.create_test_node(self.context)
+        trait = db_utils.create_test_node_trait(node_id=node.id)
+        n = objects.Node.get(self.context, node.uuid)
+        delattr(n, 'traits')
+        n.extra = {'foo': 'bar'}
+        n.save()
+        self.assertEqual([trait.trait], n.traits.get_trait_names())
+
+    def test_save_unchanged_json_fields(self):
+        node = obj_utils.create_test_node(
+            self.context, driver_internal_info={'agent_url': 'url'})
+        n = objects.Node.get(self.context, node.uuid)
+        n.set_driver_internal_info('agent_url', 'url')
+        n.instance_info = dict(n.instance_info)
+        n.extra = {'foo': 'bar'}
+        with mock.patch.object(self.dbapi, 'update_node',
+                               wraps=self.dbapi.update_node) as mock_update:
+            n.save()
+        mock_update.assert_called_once_with(
+            node.uuid, {'extra': {'foo': 'bar'},
+                        'version': objects.Node.VERSION},
+            load_relationships=False)
+        self.assertEqual({}, n.obj_get_changes())
+
+    def test_save_changed_nested_json_field(self):
+        node = obj_utils.create_test_node(
+            self.context, driver_internal_info={'nested': {'a': 1}})
+        n = objects.Node.get(self.context, node.uuid)
+        n.driver_internal_info['nested']['a'] = 2
+        n.set_driver_internal_info('nested', n.driver_internal_info['nested'])
+        n.save()
+        n.refresh()
+        self.assertEqual({'nested': {'a': 2}}, n.driver_internal_info)
+
+    def test_save_no_changes(self):
+        node = obj_utils.create_test_node(self.context)
+        n = objects.Node.get(self.context, node.uuid)
+        n.driver_info = dict(n.driver_info)
+        n.set_instance_info('foo', 'bar')
+        statements = self.record_statements()
+        with mock.patch.object(self.dbapi, 'update_node',
+                               autospec=True) as mock_update:
+            n.save()
+        self.assertFalse(mock_update.called)
+        self.assertEqual([], statements)
+        self.assertEqual({}, n.obj_get_changes())
+
+    def test_save_no_changes_old_version(self):
+        node = obj_utils.create_test_node(self.context)
+        n = objects.Node.get(self.context, node.uuid)
+        n._db_version = '1.0'
+        with mock.patch.object(self.dbapi, 'update_node',
+                               wraps=self.dbapi.update_node) as mock_update:
+            n.save()
+        mock_update.assert_called_once_with(
+            node.uuid, {'version': objects.Node.VERSION},
+            load_relationships=False)
+
     def test_save_with_traits(self):
         uuid = self.fake_node['uuid']
         with mock.patch.object(self.dbapi, 'get_node_by_uuid',
@@ -332,7 +407,8 @@ class TestNodeObject(db_base.DbTestCase, obj_utils.SchemasTestMixIn):
                 self.assertTrue(mock_update_node.called)
                 mock_update_node.assert_called_once_with(
                     uuid, {'conductor_group': 'group1',
-                           'version': objects.Node.VERSION})
+                           'version': objects.Node.VERSION},
+                    load_relationships=False)
 
     def test_save_with_conductor_group_uppercase(self):
         uuid = self.fake_node['uuid']
@@ -348,7 +424,8 @@ class TestNodeObject(db_base.DbTestCase, obj_utils.SchemasTestMixIn):
                 n.save()
                 mock_update_node.assert_called_once_with(
                     uuid, {'conductor_group': 'group1',
-                           'version': objects.Node.VERSION})
+                           'version': objects.Node.VERSION},
+                    load_relationships=False)
 
     def test_save_with_conductor_group_fail(self):
         uuid = self.fake_node['uuid']
@@ -366,7 +443,8 @@ class TestNodeObject(db_base.DbTestCase, obj_utils.SchemasTestMixIn):
         uuid = self.fake_node['uuid']
         returns = [dict(self.fake_node, properties={"fake": "first"}),
                    dict(self.fake_node, properties={"fake": "second"})]
-        expected = [mock.call(uuid), mock.call(uuid)]
+        expected = [mock.call(uuid, filters=None),
+                    mock.call(uuid, filters=None)]
         with mock.patch.object(self.dbapi, 'get_node_by_uuid',
                                side_effect=returns,
                                autospec=True) as mock_get_node:
@@ -399,6 +477,42 @@ class TestNodeObject(db_base.DbTestCase, obj_utils.SchemasTestMixIn):
             self.assertEqual(self.context, nodes[0]._context)
             self.assertIsInstance(nodes[0].traits, objects.TraitList)
 
+    def test_list_decodes_json_on_access(self):
+        obj_utils.create_test_node(self.context, driver_info={'foo': 'bar'})
+        with mock.patch.object(json, 'loads', autospec=True,
+                               side_effect=json.loads) as mock_loads:
+            nodes = objects.Node.list(self.context)
+            self.assertFalse(mock_loads.called)
+            self.assertTrue(nodes[0].obj_attr_is_set('driver_info'))
+            self.assertEqual({'foo': 'bar'}, nodes[0].driver_info)
+            mock_loads.assert_called_once_with('{"foo": "bar"}')
+        self.assertEqual({}, nodes[0].obj_get_changes())
+
+    def test_list_undecoded_json_as_dict(self):
+        node = obj_utils.create_test_node(self.context,
+                                          properties={'cpus': 4})
+        n = objects.Node.list(self.context)[0]
+        self.assertEqual({'cpus': 4}, n.as_dict()['properties'])
+        primitive = n.obj_to_primitive()
+        self.assertEqual(node.instance_info,
+                         primitive['ironic_object.data']['instance_info'])
+        self.assertNotIn('ironic_object.changes', primitive)
+
+    def test_list_undecoded_json_save(self):
+        node = obj_utils.create_test_node(self.context)
+        n = objects.Node.list(self.context)[0]
+        n.set_driver_internal_info('foo', 'bar')
+        n.properties = dict(n.properties)
+        with mock.patch.object(self.dbapi, 'update_node',
+                               wraps=self.dbapi.update_node) as mock_update:
+            n.save()
+        mock_update.assert_called_once_with(
+            node.uuid, {'driver_internal_info': n.driver_internal_info,
+                        'version': objects.Node.VERSION},
+            load_relationships=False)
+        self.assertEqual('bar', n.driver_internal_info['foo'])
+        self.assertEqual(node.instance_info, n.instance_info)
+
     def test_list_with_fields(self):
         with mock.patch.object(self.dbapi, 'get_node_list',
                                autospec=True) as mock_get_list:
@@ -411,7 +525,8 @@ class TestNodeObject(db_base.DbTestCase, obj_utils.SchemasTestMixIn):
                 sort_dir=None,
                 fields=['id', 'name', 'uuid', 'provision_state', 'version',
                         'updated_at', 'created_at', 'owner', 'lessee',
-                        'driver', 'conductor_group'])
+                        'driver', 'conductor_group'],
+                decode_json=False)
             self.assertThat(nodes, matchers.HasLength(1))
             self.assertEqual(self.fake_node['uuid'], nodes[0].uuid)
             self.assertEqual(self.fake_node['provision_state'],
@@ -467,7 +582,8 @@ class TestNodeObject(db_base.DbTestCase, obj_utils.SchemasTestMixIn):
             fake_tag = 'fake-tag'
             node = objects.Node.reserve(self.context, fake_tag, node_id)
             self.assertIsInstance(node, objects.Node)
-            mock_reserve.assert_called_once_with(fake_tag, node_id)
+            mock_reserve.assert_called_once_with(fake_tag, node_id,
+                                                 filters=None)
             self.assertEqual(self.context, node._context)
 
     def test_reserve_node_not_found(self):
@@ -539,7 +655,7 @@ class TestNodeObject(db_base.DbTestCase, obj_utils.SchemasTestMixIn):
                                'cpu_arch': 'x86_64'}
             self.assertRaisesRegex(exception.InvalidParameterValue,
                                    ".*local_gb=5G, memory_mb=-5$", node.save)
-            mock_get_node.assert_called_once_with(uuid)
+            mock_get_node.assert_called_once_with(uuid, filters=None)
 
     def test__validate_property_values_success(self):
         uuid = self.fake_node['uuid']
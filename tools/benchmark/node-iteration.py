@@ -0,0 +1,67 @@
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Benchmark of iterating over all nodes like the periodic tasks do.
+
+Compares fetching the whole list of nodes with get_nodeinfo_list with
+fetching them in chunks with iter_nodeinfo, reporting the time and the peak
+memory allocated while going over the nodes. Uses the configured database,
+e.g. the one populated by do_not_run_create_benchmark_data.py.
+"""
+
+import sys
+import time
+import tracemalloc
+
+from ironic.common import service
+from ironic.conf import CONF  # noqa To Load Configuration
+from ironic.db import api as db_api
+
+
+COLUMNS = ['uuid', 'driver', 'conductor_group', 'id', 'power_state',
+           'maintenance', 'provision_state']
+FILTERS = {'maintenance': False}
+
+
+def _measure(name, func):
+    tracemalloc.start()
+    start = time.monotonic()
+    count = 0
+    for _row in func():
+        count += 1
+    elapsed = time.monotonic() - start
+    _current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print('%-30s %6d nodes in %6.3f seconds, peak memory %8.1f KiB'
+          % (name, count, elapsed, peak / 1024))
+
+
+def main():
+    service.prepare_command(sys.argv)
+    CONF.set_override('debug', False)
+    dbapi = db_api.get_instance()
+    # Warm up the connection pool
+    dbapi.get_nodeinfo_list(limit=1)
+
+    _measure('get_nodeinfo_list',
+             lambda: dbapi.get_nodeinfo_list(columns=COLUMNS,
+                                             filters=FILTERS))
+    for chunk_size in (100, 1000):
+        _measure('iter_nodeinfo (chunks of %d)' % chunk_size,
+                 lambda: dbapi.iter_nodeinfo(columns=COLUMNS,
+                                             filters=FILTERS,
+                                             chunk_size=chunk_size))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
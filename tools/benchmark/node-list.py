@@ -0,0 +1,72 @@
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Benchmark of listing node objects with lazily decoded JSON fields.
+
+Compares listing all nodes with every JSON field decoded when loaded from
+the database with Node.list, which only decodes them when accessed,
+reporting the time and the peak memory allocated. Uses the configured
+database, e.g. the one populated by do_not_run_create_benchmark_data.py.
+"""
+
+import sys
+import time
+import tracemalloc
+
+from ironic.common import context
+from ironic.common import service
+from ironic.conf import CONF  # noqa To Load Configuration
+from ironic.objects import node
+
+
+def _decoded(ctx):
+    db_nodes = node.Node.dbapi.get_node_list()
+    return node.Node._from_db_object_list(ctx, db_nodes)
+
+
+def _lazy(ctx):
+    return node.Node.list(ctx)
+
+
+def _lazy_driver_info(ctx):
+    nodes = node.Node.list(ctx)
+    for n in nodes:
+        n.driver_info
+    return nodes
+
+
+def _measure(name, func, ctx):
+    tracemalloc.start()
+    start = time.monotonic()
+    nodes = func(ctx)
+    elapsed = time.monotonic() - start
+    _current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print('%-36s %6d nodes in %6.3f seconds, peak memory %8.1f KiB'
+          % (name, len(nodes), elapsed, peak / 1024))
+
+
+def main():
+    service.prepare_command(sys.argv)
+    CONF.set_override('debug', False)
+    ctx = context.get_admin_context()
+    # Warm up the connection pool
+    node.Node.list(ctx, limit=1)
+
+    _measure('decoded when loaded', _decoded, ctx)
+    _measure('Node.list', _lazy, ctx)
+    _measure('Node.list, reading driver_info', _lazy_driver_info, ctx)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
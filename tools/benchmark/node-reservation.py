@@ -0,0 +1,115 @@
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Benchmark of concurrent node reservations within one conductor.
+
+Runs THREAD_COUNT threads, each reserving random nodes out of NODE_COUNT
+nodes, first with a single process-wide reservation lock (as before the
+lock was striped) and then with the striped lock. The database update is
+replaced by a sleep of DB_LATENCY seconds so that only the in-process
+locking is measured; does not need a database. Like the conductor, runs
+with eventlet monkey patching enabled.
+"""
+
+# NOTE: Monkey patches eventlet like the ironic services do.
+from ironic import command  # noqa
+
+import random
+import sys
+import threading
+import time
+from unittest import mock
+
+import osprofiler.opts as profiler_opts
+
+from ironic.common import exception
+from ironic.conf import CONF
+
+
+THREAD_COUNT = 50
+NODE_COUNT = 1000
+RESERVATIONS_PER_THREAD = 40
+DB_LATENCY = 0.002
+
+
+class _Node(object):
+
+    def __init__(self, node_id):
+        self.id = node_id
+        self.uuid = 'node-%d' % node_id
+
+
+def _run(dbapi, stripes):
+    reserved = set()
+    reserved_lock = threading.Lock()
+    waits = []
+
+    def _fake_update(self, tag, node, filters=None):
+        # Emulate the conditional UPDATE of the reservation column
+        with reserved_lock:
+            if node.id in reserved:
+                raise exception.NodeLocked(node=node.uuid, host=tag)
+            reserved.add(node.id)
+        time.sleep(DB_LATENCY)
+
+    def _worker():
+        conn = dbapi.Connection()
+        for _ in range(RESERVATIONS_PER_THREAD):
+            node = _Node(random.randrange(NODE_COUNT))
+            try:
+                conn._reserve_node_place_lock('bench', node.id, node)
+            except exception.NodeLocked:
+                continue
+            with reserved_lock:
+                reserved.discard(node.id)
+
+    with mock.patch.object(dbapi, 'RESERVATION_LOCK_STRIPES', stripes), \
+            mock.patch.object(dbapi.utils, 'is_ironic_using_sqlite',
+                              lambda: False), \
+            mock.patch.object(dbapi.Connection, '_reserve_node_update',
+                              _fake_update), \
+            mock.patch.object(dbapi.METRICS, 'send_timer',
+                              lambda name, value: waits.append(value)):
+        threads = [threading.Thread(target=_worker)
+                   for _ in range(THREAD_COUNT)]
+        start = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - start
+
+    waits.sort()
+    total = THREAD_COUNT * RESERVATIONS_PER_THREAD
+    print('%-8s %8.0f reservations/s, lock wait p50 %7.2f ms, '
+          'p99 %7.2f ms'
+          % ('global' if stripes == 1 else 'striped', total / elapsed,
+             waits[len(waits) // 2], waits[int(len(waits) * 0.99)]))
+
+
+def main():
+    CONF([], project='ironic')
+    profiler_opts.set_defaults(CONF)
+    # NOTE: The database API needs the profiler options at import time.
+    from ironic.db.sqlalchemy import api as dbapi
+
+    print('%d threads reserving %d nodes, %d reservations each, '
+          '%.1f ms of database latency'
+          % (THREAD_COUNT, NODE_COUNT, RESERVATIONS_PER_THREAD,
+             DB_LATENCY * 1000))
+    _run(dbapi, 1)
+    _run(dbapi, dbapi.RESERVATION_LOCK_STRIPES)
+
+
+if __name__ == '__main__':
+    sys.exit(main())